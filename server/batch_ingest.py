@@ -0,0 +1,198 @@
+"""
+Ingesta de lotes estructurados (NDJSON / CSV) sin pasar por Excel.
+
+El cuerpo de la petición se procesa como stream: se decodifica por bloques,
+se divide en líneas y cada línea se valida con las mismas reglas que
+leer_archivo_excel (nombre no vacío, correo con '@', reserva "N/A" si falta).
+
+Campos aceptados (con alias):
+    reserva: reserva, reservation, no_rsrv, confirmation
+    nombre:  nombre, name, guest_name, nombre_completo
+    correo:  correo, email, email_address, correo_electronico
+
+combinar_registros une los registros de varias fuentes (archivos, hojas o
+lotes) en una sola tarea, deduplicando por correo.
+"""
+import codecs
+import csv
+import json
+import os
+from typing import AsyncIterator, Dict, Iterable, List, Optional, Tuple
+
+from registros import Registro
+
+MAX_REGISTROS_LOTE = int(os.getenv("MAX_BATCH_RECORDS", "100000"))
+
+ALIAS_CAMPOS = {
+    "reserva": ("reserva", "reservation", "no_rsrv", "confirmation", "no. rsrv"),
+    "nombre": ("nombre", "name", "guest_name", "nombre_completo", "nombre del huésped"),
+    "correo": ("correo", "email", "email_address", "correo_electronico", "correo electrónico"),
+}
+
+FORMATOS_LOTE = {
+    "ndjson": ("application/x-ndjson", "application/ndjson", "application/jsonl", "application/json-lines"),
+    "csv": ("text/csv", "application/csv"),
+}
+
+VALORES_VACIOS = ("", "nan", "none", "null")
+
+
+class ErrorLote(ValueError):
+    """Error de formato o de tamaño en un lote"""
+
+    def __init__(self, mensaje: str, status_code: int = 400):
+        super().__init__(mensaje)
+        self.status_code = status_code
+
+
+def detectar_formato(content_type: Optional[str], formato: Optional[str] = None) -> str:
+    """Formato del lote a partir del parámetro explícito o del Content-Type"""
+    if formato:
+        formato = formato.lower()
+        if formato in ("jsonl", "json"):
+            formato = "ndjson"
+        if formato not in FORMATOS_LOTE:
+            raise ErrorLote("formato debe ser 'ndjson' o 'csv'")
+        return formato
+
+    tipo = (content_type or "").split(";")[0].strip().lower()
+    for nombre, tipos in FORMATOS_LOTE.items():
+        if tipo in tipos:
+            return nombre
+    raise ErrorLote(
+        "Content-Type no soportado. Usa application/x-ndjson o text/csv (o el parámetro formato)",
+        status_code=415,
+    )
+
+
+def limpiar_registro(reserva, nombre, correo, fila: int, origen: Optional[str] = None) -> Optional[Registro]:
+    """Aplicar las reglas de validación de la ingesta Excel. None si se descarta"""
+    reserva = str(reserva).strip() if reserva is not None else ""
+    nombre = str(nombre).strip() if nombre is not None else ""
+    correo = str(correo).strip().lower() if correo is not None else ""
+
+    if nombre.lower() in VALORES_VACIOS:
+        return None
+    if correo in VALORES_VACIOS or "@" not in correo:
+        return None
+
+    return Registro(
+        reserva=reserva if reserva.lower() not in VALORES_VACIOS else "N/A",
+        nombre=nombre,
+        correo=correo,
+        fila=fila,
+        origen=origen,
+    )
+
+
+def _resolver_campo(datos: Dict, campo: str):
+    for alias in ALIAS_CAMPOS[campo]:
+        if alias in datos:
+            return datos[alias]
+    return None
+
+
+async def iterar_lineas(stream: AsyncIterator[bytes]) -> AsyncIterator[str]:
+    """Dividir un stream de bytes UTF-8 en líneas sin cargarlo completo"""
+    decodificador = codecs.getincrementaldecoder("utf-8-sig")(errors="replace")
+    resto = ""
+    async for bloque in stream:
+        texto = resto + decodificador.decode(bloque)
+        lineas = texto.split("\n")
+        resto = lineas.pop()
+        for linea in lineas:
+            yield linea.rstrip("\r")
+    resto += decodificador.decode(b"", final=True)
+    if resto:
+        yield resto.rstrip("\r")
+
+
+async def _registros_ndjson(lineas: AsyncIterator[str]) -> AsyncIterator[Tuple[int, Optional[Dict]]]:
+    numero = 0
+    async for linea in lineas:
+        numero += 1
+        if not linea.strip():
+            continue
+        try:
+            datos = json.loads(linea)
+        except json.JSONDecodeError as e:
+            raise ErrorLote(f"Línea {numero}: JSON inválido ({e.msg})")
+        if not isinstance(datos, dict):
+            raise ErrorLote(f"Línea {numero}: se esperaba un objeto JSON")
+        datos = {str(clave).strip().lower(): valor for clave, valor in datos.items()}
+        yield numero, limpiar_registro(
+            _resolver_campo(datos, "reserva"),
+            _resolver_campo(datos, "nombre"),
+            _resolver_campo(datos, "correo"),
+            numero,
+        )
+
+
+async def _registros_csv(lineas: AsyncIterator[str]) -> AsyncIterator[Tuple[int, Optional[Dict]]]:
+    indices = None
+    numero = 0
+    async for linea in lineas:
+        numero += 1
+        if not linea.strip():
+            continue
+        # Las líneas ya vienen separadas; los campos con saltos de línea no se soportan
+        valores = next(csv.reader([linea]))
+
+        if indices is None:
+            encabezados = [valor.strip().lower() for valor in valores]
+            indices = {}
+            for campo, alias in ALIAS_CAMPOS.items():
+                for nombre in alias:
+                    if nombre in encabezados:
+                        indices[campo] = encabezados.index(nombre)
+                        break
+            faltantes = [campo for campo in ("nombre", "correo") if campo not in indices]
+            if faltantes:
+                raise ErrorLote(f"Encabezado CSV sin columnas requeridas: {', '.join(faltantes)}")
+            continue
+
+        valor = lambda campo: valores[indices[campo]] if campo in indices and indices[campo] < len(valores) else None
+        yield numero, limpiar_registro(valor("reserva"), valor("nombre"), valor("correo"), numero)
+
+
+async def leer_lote(stream: AsyncIterator[bytes], formato: str) -> Tuple[List[Dict], int]:
+    """
+    Parsear un lote en streaming.
+    Devuelve (registros válidos, cantidad de líneas descartadas).
+    """
+    lineas = iterar_lineas(stream)
+    parser = _registros_ndjson(lineas) if formato == "ndjson" else _registros_csv(lineas)
+
+    registros, descartados = [], 0
+    async for _, registro in parser:
+        if registro is None:
+            descartados += 1
+            continue
+        registros.append(registro)
+        if len(registros) > MAX_REGISTROS_LOTE:
+            raise ErrorLote(f"El lote excede el máximo de {MAX_REGISTROS_LOTE} registros", status_code=413)
+    return registros, descartados
+
+
+def combinar_registros(fuentes: Iterable[List[Dict]]) -> Tuple[List[Dict], List[Dict]]:
+    """
+    Unir registros de varias fuentes conservando el orden de llegada.
+    El primer registro de cada correo se queda; los repetidos se devuelven
+    aparte con "duplicado_de" apuntando al origen que se conservó.
+    Devuelve (registros únicos, duplicados).
+    """
+    vistos: Dict[str, Dict] = {}
+    unicos, duplicados = [], []
+    for registros in fuentes:
+        for registro in registros:
+            correo = registro["correo"]
+            primero = vistos.get(correo)
+            if primero is None:
+                vistos[correo] = registro
+                unicos.append(registro)
+            else:
+                duplicados.append({
+                    **registro,
+                    "duplicado_de": f"{primero.get('origen') or ''} fila {primero.get('fila')}".strip(),
+                })
+    return unicos, duplicados
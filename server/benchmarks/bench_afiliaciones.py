@@ -0,0 +1,284 @@
+"""
+Benchmark end-to-end de procesar_afiliaciones_background contra el sitio simulado.
+
+Levanta benchmarks/sitio_simulado.py en un hilo local, apunta el procesador a él
+y ejecuta una tarea completa con huéspedes sintéticos. Reporta huéspedes/minuto,
+latencia p50/p95 por huésped y memoria (RSS) por sesión de navegador.
+
+Requiere Chrome + ChromeDriver instalados (igual que en producción).
+
+Uso:
+    python benchmarks/bench_afiliaciones.py --registros 20 --latencia-ms 300 --tasa-fallo 0.05
+"""
+import argparse
+import asyncio
+import json
+import math
+import os
+import sys
+import tempfile
+import threading
+import time
+import uuid
+from datetime import datetime
+
+DIR_BENCH = os.path.dirname(os.path.abspath(__file__))
+DIR_SERVER = os.path.dirname(DIR_BENCH)
+sys.path.insert(0, DIR_SERVER)
+sys.path.insert(0, DIR_BENCH)
+
+from sitio_simulado import ConfiguracionSitio, SitioSimulado  # noqa: E402
+
+
+# === MEDICIÓN DE MEMORIA (Linux /proc) ===
+def _hijos_por_pid():
+    """Mapa ppid -> [pids] leyendo /proc"""
+    hijos = {}
+    for entrada in os.listdir("/proc"):
+        if not entrada.isdigit():
+            continue
+        try:
+            with open(f"/proc/{entrada}/stat") as f:
+                campos = f.read().rsplit(")", 1)[1].split()
+            hijos.setdefault(int(campos[1]), []).append(int(entrada))
+        except (OSError, IndexError, ValueError):
+            continue
+    return hijos
+
+
+def _rss_kb(pid):
+    try:
+        with open(f"/proc/{pid}/status") as f:
+            for linea in f:
+                if linea.startswith("VmRSS:"):
+                    return int(linea.split()[1])
+    except OSError:
+        pass
+    return 0
+
+
+def rss_arbol_mb(pid_raiz):
+    """RSS total (MB) de un proceso y todos sus descendientes"""
+    if not pid_raiz or not os.path.isdir("/proc"):
+        return 0.0
+    hijos = _hijos_por_pid()
+    pendientes, total_kb = [pid_raiz], 0
+    while pendientes:
+        pid = pendientes.pop()
+        total_kb += _rss_kb(pid)
+        pendientes.extend(hijos.get(pid, []))
+    return total_kb / 1024
+
+
+class MuestreadorMemoria:
+    """Muestrea periódicamente el RSS del árbol chromedriver -> chrome de cada sesión"""
+
+    def __init__(self, intervalo=0.5):
+        self.intervalo = intervalo
+        self.sesiones = {}   # id sesión -> pid chromedriver
+        self.muestras = {}   # id sesión -> [MB]
+        self._detener = threading.Event()
+        self._hilo = threading.Thread(target=self._bucle, daemon=True)
+
+    def registrar(self, processor):
+        try:
+            pid = processor.driver.service.process.pid
+        except Exception:
+            return
+        self.sesiones[id(processor)] = pid
+        self.muestras.setdefault(id(processor), [])
+
+    def iniciar(self):
+        self._hilo.start()
+        return self
+
+    def detener(self):
+        self._detener.set()
+        self._hilo.join(timeout=2)
+
+    def _bucle(self):
+        while not self._detener.wait(self.intervalo):
+            for sesion, pid in list(self.sesiones.items()):
+                mb = rss_arbol_mb(pid)
+                if mb:
+                    self.muestras[sesion].append(mb)
+
+    def resumen(self):
+        sesiones = []
+        for muestras in self.muestras.values():
+            if muestras:
+                sesiones.append({
+                    "rss_pico_mb": round(max(muestras), 1),
+                    "rss_promedio_mb": round(sum(muestras) / len(muestras), 1),
+                    "muestras": len(muestras),
+                })
+        return sesiones
+
+
+# === UTILIDADES ===
+def percentil(valores, p):
+    """Percentil por rango más cercano"""
+    if not valores:
+        return None
+    ordenados = sorted(valores)
+    indice = max(0, min(len(ordenados) - 1, math.ceil(p / 100 * len(ordenados)) - 1))
+    return ordenados[indice]
+
+
+def generar_registros(cantidad):
+    """Huéspedes sintéticos con dominios permitidos"""
+    dominios = ["gmail.com", "hotmail.com", "outlook.com", "icloud.com"]
+    return [
+        {
+            "reserva": f"R{100000 + i}",
+            "nombre": f"Huesped{i} Prueba Benchmark",
+            "correo": f"huesped{i}.bench@{dominios[i % len(dominios)]}",
+            "fila": i + 5,
+        }
+        for i in range(cantidad)
+    ]
+
+
+def apuntar_perfiles_a_sitio(sitio):
+    """Configurar site_config (vía entorno) para usar el sitio simulado.
+
+    Debe llamarse antes de importar main/selenium_processor, porque los
+    perfiles se cargan una sola vez al importar.
+    """
+    os.environ["URL_EXPRESS"] = sitio.url_afiliacion("cunxc")
+    os.environ["URL_JUNIOR"] = sitio.url_afiliacion("cunjc")
+    os.environ["BROWSER_TEST_URL"] = sitio.url_base + "/"
+
+
+def instrumentar_procesador(selenium_processor, latencias, arranques, muestreador):
+    """Mide tiempos de arranque y por huésped de MarriottProcessor"""
+    Processor = selenium_processor.MarriottProcessor
+
+    setup_original = Processor.setup_chrome_driver
+    procesar_original = Processor.procesar_afiliacion
+
+    async def setup_medido(self):
+        inicio = time.perf_counter()
+        ok = await setup_original(self)
+        arranques.append(time.perf_counter() - inicio)
+        if ok:
+            muestreador.registrar(self)
+        return ok
+
+    async def procesar_medido(self, *args, **kwargs):
+        inicio = time.perf_counter()
+        resultado = await procesar_original(self, *args, **kwargs)
+        latencias.append(time.perf_counter() - inicio)
+        return resultado
+
+    Processor.setup_chrome_driver = setup_medido
+    Processor.procesar_afiliacion = procesar_medido
+
+
+def ejecutar_benchmark(args):
+    config = ConfiguracionSitio(
+        latencia_ms=args.latencia_ms,
+        jitter_ms=args.jitter_ms,
+        tasa_fallo=args.tasa_fallo,
+        tasa_sin_codigo=args.tasa_sin_codigo,
+        tasa_formulario_lento=args.tasa_formulario_lento,
+        semilla=args.semilla,
+    )
+
+    # Ejecutar en un directorio temporal para no ensuciar temp_results
+    directorio_trabajo = tempfile.mkdtemp(prefix="bench_afiliaciones_")
+    os.chdir(directorio_trabajo)
+
+    latencias, arranques = [], []
+    muestreador = MuestreadorMemoria(intervalo=args.intervalo_memoria)
+
+    with SitioSimulado(config) as sitio:
+        apuntar_perfiles_a_sitio(sitio)
+        import main
+        import selenium_processor
+
+        instrumentar_procesador(selenium_processor, latencias, arranques, muestreador)
+        muestreador.iniciar()
+
+        registros = generar_registros(args.registros)
+        task_id = str(uuid.uuid4())
+        main.tasks_storage[task_id] = {
+            "task_id": task_id,
+            "status": "pending",
+            "progress": 0,
+            "total_records": len(registros),
+            "processed_records": 0,
+            "successful_records": 0,
+            "error_records": 0,
+            "current_processing": "Preparando...",
+            "message": "Benchmark",
+            "logs": [],
+            "result_file_url": None,
+            "created_at": datetime.now().isoformat(),
+            "last_updated": datetime.now().isoformat(),
+            "tipo_afiliacion": args.tipo,
+            "nombre_afiliador": "benchmark",
+        }
+
+        inicio = time.perf_counter()
+        asyncio.run(main.procesar_afiliaciones_background(task_id, registros, args.tipo, "benchmark"))
+        duracion = time.perf_counter() - inicio
+        muestreador.detener()
+
+        tarea = main.tasks_storage[task_id]
+        estadisticas_sitio = dict(sitio.estadisticas)
+
+    return {
+        "benchmark": "afiliaciones_end_to_end",
+        "fecha": datetime.now().isoformat(),
+        "parametros": {
+            "registros": args.registros,
+            "tipo_afiliacion": args.tipo,
+            "latencia_ms": args.latencia_ms,
+            "jitter_ms": args.jitter_ms,
+            "tasa_fallo": args.tasa_fallo,
+            "tasa_sin_codigo": args.tasa_sin_codigo,
+            "tasa_formulario_lento": args.tasa_formulario_lento,
+        },
+        "estado_tarea": tarea["status"],
+        "exitosos": tarea["successful_records"],
+        "errores": tarea["error_records"],
+        "duracion_total_s": round(duracion, 2),
+        "huespedes_por_minuto": round(len(latencias) / duracion * 60, 2) if duracion else 0,
+        "arranque_navegador_s": [round(t, 2) for t in arranques],
+        "latencia_por_huesped_s": {
+            "p50": round(percentil(latencias, 50), 2) if latencias else None,
+            "p95": round(percentil(latencias, 95), 2) if latencias else None,
+            "max": round(max(latencias), 2) if latencias else None,
+            "muestras": len(latencias),
+        },
+        "memoria_por_sesion": muestreador.resumen(),
+        "sitio_simulado": estadisticas_sitio,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark de afiliaciones contra sitio simulado")
+    parser.add_argument("--registros", type=int, default=10)
+    parser.add_argument("--tipo", choices=["express", "junior"], default="express")
+    parser.add_argument("--latencia-ms", type=float, default=200.0)
+    parser.add_argument("--jitter-ms", type=float, default=100.0)
+    parser.add_argument("--tasa-fallo", type=float, default=0.0)
+    parser.add_argument("--tasa-sin-codigo", type=float, default=0.0)
+    parser.add_argument("--tasa-formulario-lento", type=float, default=0.0)
+    parser.add_argument("--semilla", type=int, default=42)
+    parser.add_argument("--intervalo-memoria", type=float, default=0.5)
+    parser.add_argument("--salida", help="Archivo JSON donde guardar el reporte")
+    args = parser.parse_args()
+
+    salida = os.path.abspath(args.salida) if args.salida else None
+    reporte = ejecutar_benchmark(args)
+    texto = json.dumps(reporte, indent=2, ensure_ascii=False)
+    print(texto)
+    if salida:
+        with open(salida, "w", encoding="utf-8") as f:
+            f.write(texto)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,147 @@
+"""
+Benchmark de arranque en frío: perfil `python -X importtime -c "import main"`.
+
+Ejecuta varias importaciones limpias de main en subprocesos y compara el mínimo
+del tiempo acumulado de importación con la línea base registrada en
+benchmarks/presupuesto_arranque.json: falla si la supera en más de
+tolerancia_relativa. Entre corridas el tiempo varía ±30% o más (CPU compartida),
+y ese ruido solo suma, así que el mínimo es la medida estable; la mediana y el
+máximo se reportan pero no deciden. También verifica que los módulos pesados
+(pandas, openpyxl, selenium...) NO se importen al arrancar.
+
+Sale con código 1 si se excede el presupuesto, para usarlo en CI. Tras un cambio
+que mueva el arranque a propósito, --registrar-linea-base guarda el mínimo
+medido como nueva línea base.
+
+Uso:
+    python benchmarks/bench_arranque.py --repeticiones 7
+    python benchmarks/bench_arranque.py --presupuesto-ms 1500 --salida arranque.json
+    python benchmarks/bench_arranque.py --repeticiones 15 --registrar-linea-base
+"""
+import argparse
+import json
+import os
+import re
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+
+DIR_BENCH = os.path.dirname(os.path.abspath(__file__))
+DIR_SERVER = os.path.dirname(DIR_BENCH)
+ARCHIVO_PRESUPUESTO = os.path.join(DIR_BENCH, "presupuesto_arranque.json")
+
+# "import time:   self [us] | cumulative | imported package"
+PATRON_IMPORTTIME = re.compile(r"^import time:\s+(\d+)\s+\|\s+(\d+)\s+\|(\s*)(\S+)\s*$")
+
+
+def perfilar_importacion(modulo="main"):
+    """Importar `modulo` en un proceso limpio y devolver (tiempos por módulo, wall clock)"""
+    entorno = dict(os.environ)
+    entorno["PYTHONPATH"] = DIR_SERVER + os.pathsep + entorno.get("PYTHONPATH", "")
+    entorno.pop("PYTHONDONTWRITEBYTECODE", None)
+
+    # Directorio temporal para no crear temp_results en el repositorio
+    with tempfile.TemporaryDirectory(prefix="bench_arranque_") as cwd:
+        inicio = time.perf_counter()
+        proceso = subprocess.run(
+            [sys.executable, "-X", "importtime", "-c", f"import {modulo}"],
+            cwd=cwd, env=entorno, capture_output=True, text=True,
+        )
+        wall = time.perf_counter() - inicio
+
+    if proceso.returncode != 0:
+        raise RuntimeError(f"La importación de {modulo} falló:\n{proceso.stderr[-2000:]}")
+
+    modulos = {}
+    for linea in proceso.stderr.splitlines():
+        match = PATRON_IMPORTTIME.match(linea)
+        if match:
+            propio, acumulado, _, nombre = match.groups()
+            modulos[nombre] = {"propio_us": int(propio), "acumulado_us": int(acumulado)}
+    return modulos, wall
+
+
+def cargar_presupuesto():
+    with open(ARCHIVO_PRESUPUESTO, encoding="utf-8") as f:
+        return json.load(f)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark de tiempo de importación de main")
+    parser.add_argument("--repeticiones", type=int, default=7)
+    parser.add_argument("--modulo", default="main")
+    parser.add_argument("--presupuesto-ms", type=float, help="Límite absoluto en lugar de línea base + tolerancia")
+    parser.add_argument("--registrar-linea-base", action="store_true",
+                        help="Guardar el mínimo medido como linea_base_ms del presupuesto")
+    parser.add_argument("--top", type=int, default=15, help="Módulos más costosos a reportar")
+    parser.add_argument("--salida", help="Archivo JSON donde guardar el reporte")
+    args = parser.parse_args()
+
+    presupuesto = cargar_presupuesto()
+    limite_ms = args.presupuesto_ms or round(
+        presupuesto["linea_base_ms"] * (1 + presupuesto["tolerancia_relativa"]), 1
+    )
+    prohibidos = presupuesto.get("modulos_diferidos", [])
+
+    # Calentamiento: compila .pyc para medir arranques en frío comparables
+    perfilar_importacion(args.modulo)
+
+    tiempos_ms, walls_ms, ultimo = [], [], {}
+    for _ in range(args.repeticiones):
+        modulos, wall = perfilar_importacion(args.modulo)
+        tiempos_ms.append(modulos[args.modulo]["acumulado_us"] / 1000)
+        walls_ms.append(wall * 1000)
+        ultimo = modulos
+
+    minimo_ms = min(tiempos_ms)
+    importados_prohibidos = sorted(nombre for nombre in prohibidos if nombre in ultimo)
+    top = sorted(ultimo.items(), key=lambda item: item[1]["propio_us"], reverse=True)[:args.top]
+
+    reporte = {
+        "benchmark": "arranque_import_main",
+        "python": sys.version.split()[0],
+        "repeticiones": args.repeticiones,
+        "import_ms": {
+            "min": round(minimo_ms, 1),
+            "mediana": round(statistics.median(tiempos_ms), 1),
+            "max": round(max(tiempos_ms), 1),
+        },
+        "proceso_completo_ms_mediana": round(statistics.median(walls_ms), 1),
+        "linea_base_ms": presupuesto["linea_base_ms"],
+        "presupuesto_ms": limite_ms,
+        "modulos_cargados": len(ultimo),
+        "modulos_diferidos_importados": importados_prohibidos,
+        "top_modulos_propio_ms": {nombre: round(t["propio_us"] / 1000, 1) for nombre, t in top},
+    }
+
+    if args.registrar_linea_base:
+        presupuesto["linea_base_ms"] = round(minimo_ms)
+        with open(ARCHIVO_PRESUPUESTO, "w", encoding="utf-8") as f:
+            json.dump(presupuesto, f, indent=2, ensure_ascii=False)
+            f.write("\n")
+        print(f"[📝] Línea base registrada: {round(minimo_ms)} ms", file=sys.stderr)
+
+    errores = []
+    if minimo_ms > limite_ms:
+        errores.append(f"import {args.modulo}: mínimo {minimo_ms:.1f} ms > presupuesto {limite_ms} ms")
+    if importados_prohibidos:
+        errores.append(f"Módulos que deben cargarse en diferido se importaron al arrancar: {importados_prohibidos}")
+    reporte["dentro_de_presupuesto"] = not errores
+
+    texto = json.dumps(reporte, indent=2, ensure_ascii=False)
+    print(texto)
+    if args.salida:
+        with open(args.salida, "w", encoding="utf-8") as f:
+            f.write(texto)
+
+    if errores:
+        for error in errores:
+            print(f"[❌] {error}", file=sys.stderr)
+        sys.exit(1)
+    print("[✅] Arranque dentro de presupuesto", file=sys.stderr)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,186 @@
+"""
+Benchmark de la caché HTTP compartida entre sesiones de Chrome (perfiles_navegador.py).
+
+Abre --sesiones sesiones reales de MarriottProcessor (misma configuración de
+Chrome que producción, más el log de rendimiento de DevTools) y en cada una
+carga la página de afiliación --huespedes-por-sesion veces, como lo hace cada
+huésped. Se repite en dos modos, cada uno con directorios de caché vacíos:
+
+- sin_cache: BROWSER_SHARED_CACHE=0 (perfil nuevo y caché vacía por sesión,
+  el comportamiento anterior).
+- compartida: la caché de cada sesión parte de la que publicó la anterior.
+
+Por carga mide el tiempo hasta document.readyState == "complete" y los bytes
+descargados de la red (suma de encodedDataLength de Network.loadingFinished;
+lo servido desde la caché de disco no cuenta). Reporta por modo la media y
+p50/p90 por huésped, aparte la primera carga de cada sesión (donde actúa la
+caché compartida) y el ahorro de la caché compartida sobre sin_cache.
+
+Necesita Chrome y acceso a la URL (por defecto la del perfil de --tipo).
+
+Uso:
+    python benchmarks/bench_cache_navegador.py --sesiones 5 --huespedes-por-sesion 3
+    python benchmarks/bench_cache_navegador.py --url http://127.0.0.1:8765/calaqr/s/ES/ch/ --salida cache.json
+"""
+import argparse
+import asyncio
+import json
+import os
+import statistics
+import sys
+import tempfile
+import time
+from datetime import datetime
+
+DIR_BENCH = os.path.dirname(os.path.abspath(__file__))
+DIR_SERVER = os.path.dirname(DIR_BENCH)
+sys.path.insert(0, DIR_SERVER)
+sys.path.insert(0, DIR_BENCH)
+
+from bench_afiliaciones import percentil  # noqa: E402
+
+MODOS = ("sin_cache", "compartida")
+
+
+def bytes_de_red(entradas):
+    """(bytes descargados, respuestas servidas desde caché) de un log de rendimiento"""
+    descargados, desde_cache = 0, 0
+    for entrada in entradas:
+        mensaje = json.loads(entrada["message"])["message"]
+        metodo, parametros = mensaje.get("method"), mensaje.get("params", {})
+        if metodo == "Network.loadingFinished":
+            descargados += parametros.get("encodedDataLength", 0)
+        elif metodo == "Network.requestServedFromCache":
+            desde_cache += 1
+        elif metodo == "Network.responseReceived" and parametros.get("response", {}).get("fromDiskCache"):
+            desde_cache += 1
+    return descargados, desde_cache
+
+
+async def medir_modo(modo, url, tipo, sesiones, huespedes, espera_s):
+    import selenium_processor
+    from perfiles_navegador import GestorPerfiles
+
+    base = tempfile.mkdtemp(prefix=f"bench_cache_{modo}_")
+    gestor = GestorPerfiles(
+        dir_cache=os.path.join(base, "cache"),
+        dir_perfiles=os.path.join(base, "perfiles"),
+        compartir=modo == "compartida",
+    )
+    selenium_processor.gestor_perfiles = gestor
+
+    class SesionMedida(selenium_processor.MarriottProcessor):
+        def _get_chrome_options(self, is_production=True):
+            options = super()._get_chrome_options(is_production)
+            options.add_argument("--headless=new")
+            options.set_capability("goog:loggingPrefs", {"performance": "ALL"})
+            return options
+
+    cargas = []
+    for sesion in range(sesiones):
+        processor = SesionMedida(tipo, "Operador Benchmark")
+        if not await processor.preparar():
+            raise RuntimeError("No se pudo abrir Chrome (¿está instalado?)")
+        try:
+            for huesped in range(huespedes):
+                processor.driver.get_log("performance")  # Descartar lo anterior
+                inicio = time.perf_counter()
+                processor.driver.get(url)
+                while processor.driver.execute_script("return document.readyState") != "complete":
+                    await asyncio.sleep(0.05)
+                segundos = time.perf_counter() - inicio
+                await asyncio.sleep(espera_s)  # Recursos diferidos
+                descargados, desde_cache = bytes_de_red(processor.driver.get_log("performance"))
+                cargas.append({
+                    "sesion": sesion,
+                    "primera_de_sesion": huesped == 0,
+                    "segundos": segundos,
+                    "bytes": descargados,
+                    "desde_cache": desde_cache,
+                })
+        finally:
+            await processor.close()
+    return cargas, gestor.resumen()
+
+
+def resumir(cargas):
+    def estadisticas(filas):
+        if not filas:
+            return None
+        segundos = [fila["segundos"] for fila in filas]
+        kb = [fila["bytes"] / 1024 for fila in filas]
+        return {
+            "cargas": len(filas),
+            "segundos_media": round(statistics.mean(segundos), 3),
+            "segundos_p50": round(percentil(segundos, 50), 3),
+            "segundos_p90": round(percentil(segundos, 90), 3),
+            "kb_media": round(statistics.mean(kb), 1),
+            "kb_p50": round(percentil(kb, 50), 1),
+            "respuestas_desde_cache_media": round(statistics.mean(fila["desde_cache"] for fila in filas), 1),
+        }
+    return {
+        "por_huesped": estadisticas(cargas),
+        "primera_de_sesion": estadisticas([c for c in cargas if c["primera_de_sesion"]]),
+        # La primera sesión arranca sin caché en ambos modos
+        "primera_de_sesion_sin_la_inicial": estadisticas([c for c in cargas if c["primera_de_sesion"] and c["sesion"] > 0]),
+    }
+
+
+def ahorro(antes, despues):
+    if not antes or not despues:
+        return None
+    return {
+        "segundos": f"{1 - despues['segundos_media'] / antes['segundos_media']:.0%}" if antes["segundos_media"] else None,
+        "kb": f"{1 - despues['kb_media'] / antes['kb_media']:.0%}" if antes["kb_media"] else None,
+    }
+
+
+async def ejecutar(args):
+    from site_config import obtener_perfil
+
+    url = args.url or obtener_perfil(args.tipo).url
+    modos = {}
+    for modo in MODOS:
+        print(f"[⏱️] Modo {modo}: {args.sesiones} sesiones x {args.huespedes_por_sesion} cargas de {url}", file=sys.stderr)
+        cargas, cache = await medir_modo(modo, url, args.tipo, args.sesiones, args.huespedes_por_sesion, args.espera)
+        modos[modo] = {**resumir(cargas), "cache": cache}
+
+    sin_cache, compartida = modos["sin_cache"], modos["compartida"]
+    return {
+        "benchmark": "cache_navegador",
+        "fecha": datetime.now().isoformat(),
+        "parametros": {
+            "url": url,
+            "sesiones": args.sesiones,
+            "huespedes_por_sesion": args.huespedes_por_sesion,
+        },
+        "modos": modos,
+        "ahorro": {
+            "por_huesped": ahorro(sin_cache["por_huesped"], compartida["por_huesped"]),
+            "primera_de_sesion": ahorro(
+                sin_cache["primera_de_sesion_sin_la_inicial"], compartida["primera_de_sesion_sin_la_inicial"]
+            ),
+        },
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Tiempo de carga y bytes por huésped con/sin caché compartida de Chrome")
+    parser.add_argument("--tipo", default="express", help="Perfil de sitio cuya URL se carga")
+    parser.add_argument("--url", help="URL a cargar (por defecto la del perfil)")
+    parser.add_argument("--sesiones", type=int, default=5)
+    parser.add_argument("--huespedes-por-sesion", type=int, default=3)
+    parser.add_argument("--espera", type=float, default=1.0, help="Segundos tras cargar para recursos diferidos")
+    parser.add_argument("--salida", help="Archivo JSON donde guardar el reporte")
+    args = parser.parse_args()
+
+    reporte = asyncio.run(ejecutar(args))
+    texto = json.dumps(reporte, indent=2, ensure_ascii=False)
+    print(texto)
+    if args.salida:
+        with open(args.salida, "w", encoding="utf-8") as f:
+            f.write(texto)
+
+
+if __name__ == "__main__":
+    main()
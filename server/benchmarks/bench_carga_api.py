@@ -0,0 +1,386 @@
+"""
+Prueba de carga de la API: varios operadores concurrentes contra un servidor real.
+
+Levanta main:app con uvicorn en un subproceso (o usa --url) con el motor
+"simulado" de benchmarks/motor_simulado.py, así que no hace falta Chrome ni el
+sitio de Marriott. Cada etapa simula N operadores que suben un libro Excel
+sintético a POST /procesar y sondean GET /status/{task_id} hasta que termina,
+mientras en paralelo se piden /status, /tasks y /health a ritmo fijo (lazo
+abierto: la latencia se mide desde el instante programado, así que un event
+loop bloqueado aparece como latencia y no como menos peticiones).
+
+Reporta por etapa y endpoint: peticiones, errores, tasa de error, peticiones/s
+y latencia p50/p90/p99/max en ms. El reporte JSON tiene claves estables para
+compararlo entre versiones; con --comparar base.json sale con código 1 si el
+p99 o la tasa de error empeoran más allá de --umbral.
+
+Uso:
+    python benchmarks/bench_carga_api.py --operadores 1,4,16 --duracion 30
+    python benchmarks/bench_carga_api.py --tasa-status 50 --tasa-tasks 5 --salida carga.json
+    python benchmarks/bench_carga_api.py --comparar carga.json --umbral 0.25
+    python benchmarks/bench_carga_api.py --motor-bloqueante   # reproduce el bloqueo de Selenium
+"""
+import argparse
+import asyncio
+import io
+import itertools
+import json
+import os
+import random
+import socket
+import subprocess
+import sys
+import tempfile
+import time
+from collections import Counter, defaultdict
+from datetime import datetime
+
+DIR_BENCH = os.path.dirname(os.path.abspath(__file__))
+DIR_SERVER = os.path.dirname(DIR_BENCH)
+sys.path.insert(0, DIR_SERVER)
+sys.path.insert(0, DIR_BENCH)
+
+from bench_afiliaciones import percentil  # noqa: E402
+from results_janitor import ESTADOS_TERMINADOS  # noqa: E402
+
+PROCESAR = "POST /procesar"
+STATUS = "GET /status/{task_id}"
+TASKS = "GET /tasks"
+HEALTH = "GET /health"
+ENDPOINTS = (PROCESAR, STATUS, TASKS, HEALTH)
+
+MIME_XLSX = "application/vnd.openxmlformats-officedocument.spreadsheetml.sheet"
+
+# Diferencias de p99 por debajo de esto se consideran ruido al comparar
+RUIDO_MS = 5.0
+
+
+# === DATOS SINTÉTICOS ===
+def generar_libro(lote, filas):
+    """Libro .xlsx con el layout clásico (encabezados en fila 4, columnas C/G/I).
+
+    Los correos dependen del lote para que cada envío sea distinto y no caiga
+    en la deduplicación de envíos repetidos de /procesar.
+    """
+    from openpyxl import Workbook
+
+    libro = Workbook()
+    hoja = libro.active
+    hoja["C4"], hoja["G4"], hoja["I4"] = "No. Rsrv", "Nombre del huésped", "Correo"
+    dominios = ["gmail.com", "hotmail.com", "outlook.com", "icloud.com"]
+    for i in range(filas):
+        fila = 5 + i
+        hoja[f"C{fila}"] = f"L{lote}R{i}"
+        hoja[f"G{fila}"] = f"Huesped{i} Lote{lote} Carga"
+        hoja[f"I{fila}"] = f"carga.{lote}.{i}@{dominios[i % len(dominios)]}"
+    salida = io.BytesIO()
+    libro.save(salida)
+    return salida.getvalue()
+
+
+# === SERVIDOR ===
+def servir(puerto):
+    """Modo subproceso: registrar el motor simulado y servir main:app"""
+    import uvicorn
+
+    import motor_simulado
+    motor_simulado.registrar()
+    import main as api
+
+    uvicorn.run(api.app, host="127.0.0.1", port=puerto, log_level="warning", access_log=False)
+
+
+def puerto_libre():
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+
+def levantar_servidor(args, directorio):
+    """Arrancar el servidor en un subproceso y esperar a que /health responda"""
+    import httpx
+
+    puerto = puerto_libre()
+    entorno = {
+        **os.environ,
+        "EXECUTION_MODE": "local",
+        "TEMP_DIR": os.path.join(directorio, "temp_results"),
+        "MOTOR_SIMULADO_LATENCIA_MS": str(args.latencia_motor_ms),
+        "MOTOR_SIMULADO_TASA_FALLO": str(args.tasa_fallo_motor),
+        "MOTOR_SIMULADO_BLOQUEANTE": "1" if args.motor_bloqueante else "0",
+    }
+    bitacora = open(os.path.join(directorio, "servidor.log"), "w", encoding="utf-8")
+    proceso = subprocess.Popen(
+        [sys.executable, os.path.abspath(__file__), "--servir", "--puerto", str(puerto)],
+        cwd=directorio, env=entorno, stdout=bitacora, stderr=subprocess.STDOUT
+    )
+    url = f"http://127.0.0.1:{puerto}"
+    limite = time.monotonic() + 30
+    while time.monotonic() < limite:
+        if proceso.poll() is not None:
+            raise RuntimeError(f"El servidor terminó al arrancar (ver {bitacora.name})")
+        try:
+            if httpx.get(f"{url}/health", timeout=2).status_code == 200:
+                return proceso, url, bitacora
+        except httpx.HTTPError:
+            pass
+        time.sleep(0.2)
+    proceso.kill()
+    raise RuntimeError(f"El servidor no respondió en 30 s (ver {bitacora.name})")
+
+
+# === MEDICIÓN ===
+class Medidor:
+    """Latencias y errores por endpoint de una etapa"""
+
+    def __init__(self):
+        self.latencias = defaultdict(list)
+        self.errores = defaultdict(Counter)
+
+    async def medir(self, endpoint, programada, peticion):
+        """Esperar la petición y registrar su latencia desde el instante programado"""
+        import httpx
+
+        respuesta = None
+        try:
+            respuesta = await peticion
+            if respuesta.status_code >= 400:
+                self.errores[endpoint][f"HTTP {respuesta.status_code}"] += 1
+        except httpx.HTTPError as e:
+            self.errores[endpoint][type(e).__name__] += 1
+        self.latencias[endpoint].append(time.perf_counter() - programada)
+        return respuesta
+
+    def resumen(self, duracion):
+        endpoints = {}
+        for endpoint in ENDPOINTS:
+            latencias = [s * 1000 for s in self.latencias.get(endpoint, [])]
+            errores = sum(self.errores[endpoint].values())
+            endpoints[endpoint] = {
+                "peticiones": len(latencias),
+                "errores": errores,
+                "tasa_error": round(errores / len(latencias), 4) if latencias else 0.0,
+                "peticiones_por_s": round(len(latencias) / duracion, 2) if duracion else 0.0,
+                "latencia_ms": {
+                    "p50": round(percentil(latencias, 50), 1) if latencias else None,
+                    "p90": round(percentil(latencias, 90), 1) if latencias else None,
+                    "p99": round(percentil(latencias, 99), 1) if latencias else None,
+                    "max": round(max(latencias), 1) if latencias else None,
+                },
+                "tipos_error": dict(self.errores[endpoint].most_common()),
+            }
+        return endpoints
+
+
+# === GENERADORES DE CARGA ===
+async def a_ritmo(tasa, fin, peticion, pendientes):
+    """Lanzar peticion(programada) tasa veces por segundo hasta fin, sin esperar respuestas"""
+    if tasa <= 0:
+        return
+    intervalo = 1 / tasa
+    siguiente = time.perf_counter()
+    while siguiente < fin:
+        await asyncio.sleep(max(0.0, siguiente - time.perf_counter()))
+        pendientes.append(asyncio.create_task(peticion(siguiente)))
+        siguiente += intervalo
+
+
+async def operador(cliente, medidor, args, numero, fin, lotes, tareas):
+    """Sube un libro, sondea su tarea hasta que termina y repite"""
+    nombre = f"Operador Carga {numero}"
+    while time.perf_counter() < fin:
+        lote = next(lotes)
+        contenido = await asyncio.to_thread(generar_libro, lote, args.filas)
+        respuesta = await medidor.medir(PROCESAR, time.perf_counter(), cliente.post(
+            "/procesar",
+            files={"archivo_excel": (f"huespedes_{lote}.xlsx", contenido, MIME_XLSX)},
+            data={"tipo_afiliacion": args.tipo, "nombre_afiliador": nombre, "motor": args.motor},
+        ))
+        if respuesta is None or respuesta.status_code >= 400:
+            await asyncio.sleep(args.intervalo_sondeo)
+            continue
+        task_id = respuesta.json()["task_id"]
+        tareas.append(task_id)
+
+        while time.perf_counter() < fin:
+            await asyncio.sleep(args.intervalo_sondeo)
+            estado = await medidor.medir(STATUS, time.perf_counter(), cliente.get(f"/status/{task_id}"))
+            if estado is not None and estado.status_code == 200 and estado.json()["status"] in ESTADOS_TERMINADOS:
+                break
+
+
+async def ejecutar_etapa(url, args, operadores, lotes, tareas):
+    import httpx
+
+    medidor = Medidor()
+    azar = random.Random(args.semilla + operadores)
+    limites = httpx.Limits(max_connections=args.max_conexiones, max_keepalive_connections=args.max_conexiones)
+    async with httpx.AsyncClient(base_url=url, timeout=args.timeout, limits=limites) as cliente:
+        async def status(programada):
+            if tareas:
+                await medidor.medir(STATUS, programada, cliente.get(f"/status/{azar.choice(tareas)}"))
+
+        async def listar(programada):
+            await medidor.medir(TASKS, programada, cliente.get("/tasks"))
+
+        async def salud(programada):
+            await medidor.medir(HEALTH, programada, cliente.get("/health"))
+
+        pendientes = []
+        inicio = time.perf_counter()
+        fin = inicio + args.duracion
+        await asyncio.gather(
+            *(operador(cliente, medidor, args, n + 1, fin, lotes, tareas) for n in range(operadores)),
+            a_ritmo(args.tasa_status, fin, status, pendientes),
+            a_ritmo(args.tasa_tasks, fin, listar, pendientes),
+            a_ritmo(args.tasa_health, fin, salud, pendientes),
+        )
+        await asyncio.gather(*pendientes)
+        duracion = time.perf_counter() - inicio
+
+        final = (await cliente.get("/tasks")).json()
+    estados = Counter(t["status"] for t in final["tasks"])
+    return {
+        "operadores": operadores,
+        "duracion_s": round(duracion, 2),
+        "endpoints": medidor.resumen(duracion),
+        "tareas_en_servidor": final["total_active_tasks"],
+        "tareas_por_estado": dict(sorted(estados.items())),
+    }
+
+
+# === COMPARACIÓN ENTRE VERSIONES ===
+def comparar(reporte, base, umbral):
+    """Regresiones de p99 y tasa de error respecto a un reporte anterior"""
+    etapas_base = {etapa["operadores"]: etapa for etapa in base.get("etapas", [])}
+    regresiones, detalle = [], []
+    for etapa in reporte["etapas"]:
+        anterior = etapas_base.get(etapa["operadores"])
+        if anterior is None:
+            continue
+        for endpoint, actual in etapa["endpoints"].items():
+            previo = anterior["endpoints"].get(endpoint)
+            if not previo or not actual["peticiones"] or not previo["peticiones"]:
+                continue
+            p99, p99_base = actual["latencia_ms"]["p99"], previo["latencia_ms"]["p99"]
+            fila = {
+                "operadores": etapa["operadores"],
+                "endpoint": endpoint,
+                "p99_ms": p99,
+                "p99_base_ms": p99_base,
+                "p99_ratio": round(p99 / p99_base, 2) if p99_base else None,
+                "tasa_error": actual["tasa_error"],
+                "tasa_error_base": previo["tasa_error"],
+            }
+            detalle.append(fila)
+            if p99 - p99_base > RUIDO_MS and p99 > p99_base * (1 + umbral):
+                regresiones.append(f"{endpoint} con {etapa['operadores']} operadores: p99 {p99_base} -> {p99} ms")
+            if actual["tasa_error"] > previo["tasa_error"] + 0.01:
+                regresiones.append(
+                    f"{endpoint} con {etapa['operadores']} operadores: "
+                    f"tasa de error {previo['tasa_error']} -> {actual['tasa_error']}"
+                )
+    return {"umbral": umbral, "detalle": detalle, "regresiones": regresiones}
+
+
+def ejecutar_benchmark(args):
+    niveles = [int(n) for n in args.operadores.split(",") if n.strip()]
+    proceso = bitacora = None
+    url = args.url
+    if not url:
+        directorio = tempfile.mkdtemp(prefix="bench_carga_api_")
+        proceso, url, bitacora = levantar_servidor(args, directorio)
+
+    lotes = itertools.count(1)
+    tareas = []
+    etapas = []
+    try:
+        for operadores in niveles:
+            print(f"[⏱️] Etapa con {operadores} operadores durante {args.duracion:.0f}s...", file=sys.stderr)
+            etapas.append(asyncio.run(ejecutar_etapa(url, args, operadores, lotes, tareas)))
+    finally:
+        if proceso is not None:
+            proceso.terminate()
+            try:
+                proceso.wait(timeout=10)
+            except subprocess.TimeoutExpired:
+                proceso.kill()
+            bitacora.close()
+
+    return {
+        "benchmark": "carga_api",
+        "fecha": datetime.now().isoformat(),
+        "parametros": {
+            "operadores": niveles,
+            "duracion_s": args.duracion,
+            "filas_por_libro": args.filas,
+            "intervalo_sondeo_s": args.intervalo_sondeo,
+            "tasa_status": args.tasa_status,
+            "tasa_tasks": args.tasa_tasks,
+            "tasa_health": args.tasa_health,
+            "motor": args.motor,
+            "latencia_motor_ms": args.latencia_motor_ms,
+            "tasa_fallo_motor": args.tasa_fallo_motor,
+            "motor_bloqueante": args.motor_bloqueante,
+            "servidor_externo": bool(args.url),
+        },
+        "etapas": etapas,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Prueba de carga de la API con motor simulado")
+    parser.add_argument("--operadores", default="1,4,16", help="Operadores concurrentes por etapa, separados por comas")
+    parser.add_argument("--duracion", type=float, default=30.0, help="Segundos por etapa")
+    parser.add_argument("--filas", type=int, default=5, help="Huéspedes por libro subido")
+    parser.add_argument("--intervalo-sondeo", type=float, default=1.0, help="Segundos entre /status de cada operador")
+    parser.add_argument("--tasa-status", type=float, default=20.0, help="GET /status extra por segundo")
+    parser.add_argument("--tasa-tasks", type=float, default=2.0, help="GET /tasks por segundo")
+    parser.add_argument("--tasa-health", type=float, default=5.0, help="GET /health por segundo")
+    parser.add_argument("--tipo", choices=["express", "junior"], default="express")
+    parser.add_argument("--motor", default="simulado", help="Motor de las tareas (simulado salvo con --url)")
+    parser.add_argument("--latencia-motor-ms", type=float, default=200.0)
+    parser.add_argument("--tasa-fallo-motor", type=float, default=0.05)
+    parser.add_argument("--motor-bloqueante", action="store_true", help="El motor simulado bloquea el event loop")
+    parser.add_argument("--max-conexiones", type=int, default=200)
+    parser.add_argument("--timeout", type=float, default=30.0)
+    parser.add_argument("--semilla", type=int, default=42)
+    parser.add_argument("--url", help="Usar un servidor ya levantado en lugar de arrancar uno")
+    parser.add_argument("--comparar", help="Reporte JSON anterior contra el que buscar regresiones")
+    parser.add_argument("--umbral", type=float, default=0.25, help="Empeoramiento relativo de p99 tolerado")
+    parser.add_argument("--salida", help="Archivo JSON donde guardar el reporte")
+    parser.add_argument("--servir", action="store_true", help=argparse.SUPPRESS)
+    parser.add_argument("--puerto", type=int, default=8000, help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.servir:
+        servir(args.puerto)
+        return
+
+    salida = os.path.abspath(args.salida) if args.salida else None
+    base = None
+    if args.comparar:
+        with open(args.comparar, encoding="utf-8") as f:
+            base = json.load(f)
+
+    reporte = ejecutar_benchmark(args)
+    if base is not None:
+        reporte["comparacion"] = comparar(reporte, base, args.umbral)
+
+    texto = json.dumps(reporte, indent=2, ensure_ascii=False)
+    print(texto)
+    if salida:
+        with open(salida, "w", encoding="utf-8") as f:
+            f.write(texto)
+
+    if base is not None:
+        regresiones = reporte["comparacion"]["regresiones"]
+        if regresiones:
+            for regresion in regresiones:
+                print(f"[❌] {regresion}", file=sys.stderr)
+            sys.exit(1)
+        print("[✅] Sin regresiones respecto al reporte base", file=sys.stderr)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,200 @@
+"""
+Benchmark de memoria por fila: registros como dict/list frente a registros.py.
+
+Construye N huéspedes sintéticos (nombres y dominios repetidos, varias hojas de
+origen, un porcentaje de filas con error) de dos formas y mide con tracemalloc
+cuánta memoria queda retenida por fila:
+
+- antes: la representación histórica; un dict por huésped normalizado
+  ({"reserva", "nombre", "correo", "fila", "origen", "nombre_pila", "apellido"})
+  y una lista por fila de resultados.
+- despues: el camino real de la ingesta Excel y del procesamiento
+  (Registro con __slots__ -> normalizar_registros; construir_fila_resultado
+  -> tupla con textos internados).
+
+Los textos de entrada se generan antes de medir, así que solo cuenta lo que
+cada representación retiene (incluidos los textos nuevos que crea). Los
+tiempos incluyen el costo de tracemalloc: sirven solo para comparar entre sí.
+
+Uso:
+    python benchmarks/bench_memoria_registros.py --registros 100000
+    python benchmarks/bench_memoria_registros.py --registros 200000 --tasa-error 0.2 --salida memoria.json
+"""
+import argparse
+import gc
+import json
+import os
+import random
+import sys
+import tempfile
+import time
+import tracemalloc
+from datetime import datetime
+
+DIR_BENCH = os.path.dirname(os.path.abspath(__file__))
+DIR_SERVER = os.path.dirname(DIR_BENCH)
+sys.path.insert(0, DIR_SERVER)
+
+NOMBRES = ["María José", "Juan Carlos", "Ana", "José Luis", "Sofía", "Luis", "Fernanda", "Miguel Ángel"]
+APELLIDOS = ["de la Cruz López", "Pérez García", "Hernández", "Martínez Soto", "del Río", "Ramírez"]
+DOMINIOS = ["gmail.com", "hotmail.com", "outlook.com", "icloud.com"]
+ERRORES = ["Código no encontrado en la página", "Formulario tardó en cargar", "Extensión yahoo.com no permitida"]
+
+
+def generar_crudos(cantidad, hojas, semilla):
+    """Celdas de entrada (reserva, nombre, correo, fila, origen) como las deja pandas"""
+    azar = random.Random(semilla)
+    origenes = [f"reporte_pms.xlsx#Hoja{n + 1}" for n in range(hojas)]
+    return [
+        (
+            f"R{700000 + i}",
+            f"{azar.choice(NOMBRES)} {azar.choice(APELLIDOS)}",
+            f"huesped{i}@{azar.choice(DOMINIOS)}",
+            i + 5,
+            origenes[i * hojas // cantidad],
+        )
+        for i in range(cantidad)
+    ]
+
+
+def resultados_simulados(cantidad, tasa_error, semilla):
+    """(exito, codigo, mensaje) por fila; los mensajes se arman por fila como en los motores"""
+    azar = random.Random(semilla + 1)
+    salida = []
+    for i in range(cantidad):
+        if azar.random() < tasa_error:
+            salida.append((False, "N/A", f"Error: {azar.choice(ERRORES)}"))
+        else:
+            salida.append((True, f"{azar.randrange(10 ** 9):09d}", None))
+    return salida
+
+
+# === REPRESENTACIONES ===
+def registros_antes(crudos):
+    from normalizacion import normalizar_correo, normalizar_nombre
+
+    registros = []
+    for reserva, nombre, correo, fila, origen in crudos:
+        registro = {"reserva": reserva, "nombre": nombre.strip(), "correo": correo.strip().lower(),
+                    "fila": fila, "origen": origen}
+        resultado = normalizar_nombre(registro["nombre"])
+        normalizado, _ = normalizar_correo(registro["correo"])
+        nuevo = dict(registro)
+        nuevo["nombre"] = resultado.completo
+        nuevo["nombre_pila"] = resultado.nombre
+        nuevo["apellido"] = resultado.apellido
+        if normalizado != registro["correo"]:
+            nuevo["correo_original"] = registro["correo"]
+            nuevo["correo"] = normalizado
+        registros.append(nuevo)
+    return registros
+
+
+def registros_despues(crudos):
+    from normalizacion import normalizar_registros
+    from registros import Registro
+
+    # Igual que main._extraer_registros_hoja
+    leidos = (
+        Registro(reserva, nombre.strip(), correo.strip().lower(), fila, origen)
+        for reserva, nombre, correo, fila, origen in crudos
+    )
+    return normalizar_registros(leidos)[0]
+
+
+def filas_antes(registros, resultados, afiliador):
+    filas = []
+    for registro, (exito, codigo, mensaje) in zip(registros, resultados):
+        filas.append([
+            registro["fila"], registro["reserva"], registro["nombre"], registro["correo"], codigo, afiliador,
+            "EXITOSO" if exito else "ERROR", "Afiliación completada correctamente" if exito else mensaje,
+            datetime.now().strftime("%Y-%m-%d %H:%M:%S"), registro.get("origen", ""),
+        ])
+    return filas
+
+
+def filas_despues(registros, resultados, afiliador):
+    from main import construir_fila_resultado
+
+    return [
+        construir_fila_resultado(
+            registro, codigo, afiliador, "EXITOSO" if exito else "ERROR",
+            "Afiliación completada correctamente" if exito else mensaje
+        )
+        for registro, (exito, codigo, mensaje) in zip(registros, resultados)
+    ]
+
+
+def medir(funcion, *argumentos):
+    """(resultado, bytes retenidos, segundos) de construir la estructura"""
+    gc.collect()
+    tracemalloc.reset_peak()
+    antes = tracemalloc.get_traced_memory()[0]
+    inicio = time.perf_counter()
+    resultado = funcion(*argumentos)
+    segundos = time.perf_counter() - inicio
+    gc.collect()
+    return resultado, tracemalloc.get_traced_memory()[0] - antes, segundos
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Memoria por fila de registros y resultados (antes/después)")
+    parser.add_argument("--registros", type=int, default=100000)
+    parser.add_argument("--hojas", type=int, default=4, help="Hojas de origen distintas")
+    parser.add_argument("--tasa-error", type=float, default=0.1, help="Fracción de filas con error")
+    parser.add_argument("--semilla", type=int, default=11)
+    parser.add_argument("--salida", help="Archivo JSON donde guardar el reporte")
+    args = parser.parse_args()
+
+    salida = os.path.abspath(args.salida) if args.salida else None
+    # main crea su directorio temporal al importarse
+    os.chdir(tempfile.mkdtemp(prefix="bench_memoria_"))
+    import main as _  # noqa: F401  (importar antes de medir)
+    import normalizacion  # noqa: F401
+
+    n = args.registros
+    crudos = generar_crudos(n, args.hojas, args.semilla)
+    resultados = resultados_simulados(n, args.tasa_error, args.semilla)
+    afiliador = "Operador Benchmark"
+
+    tracemalloc.start()
+    medidas = {}
+    for version, construir_registros, construir_filas in (
+        ("antes", registros_antes, filas_antes),
+        ("despues", registros_despues, filas_despues),
+    ):
+        registros, bytes_registros, s_registros = medir(construir_registros, crudos)
+        filas, bytes_filas, s_filas = medir(construir_filas, registros, resultados, afiliador)
+        medidas[version] = {
+            "bytes_por_registro": round(bytes_registros / n, 1),
+            "bytes_por_fila_resultado": round(bytes_filas / n, 1),
+            "bytes_por_fila_total": round((bytes_registros + bytes_filas) / n, 1),
+            "mb_total": round((bytes_registros + bytes_filas) / (1024 * 1024), 1),
+            "segundos_registros": round(s_registros, 2),
+            "segundos_filas": round(s_filas, 2),
+        }
+        del registros, filas
+    tracemalloc.stop()
+
+    antes, despues = medidas["antes"], medidas["despues"]
+    reporte = {
+        "benchmark": "memoria_registros",
+        "fecha": datetime.now().isoformat(),
+        "python": sys.version.split()[0],
+        "parametros": {"registros": n, "hojas": args.hojas, "tasa_error": args.tasa_error},
+        "antes": antes,
+        "despues": despues,
+        "reduccion": {
+            clave: f"{1 - despues[clave] / antes[clave]:.0%}" if antes[clave] else None
+            for clave in ("bytes_por_registro", "bytes_por_fila_resultado", "bytes_por_fila_total")
+        },
+    }
+    texto = json.dumps(reporte, indent=2, ensure_ascii=False)
+    print(texto)
+    if salida:
+        with open(salida, "w", encoding="utf-8") as f:
+            f.write(texto)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,200 @@
+"""
+Benchmark comparativo de motores de afiliación: HTTP plano, Selenium y CDP.
+
+Levanta benchmarks/sitio_simulado.py y procesa los mismos huéspedes sintéticos
+con cada motor, llamando directamente a afiliar (sin la pausa de 2 s entre
+filas de ejecutar_afiliaciones, que es igual para todos). Reporta
+arranque, huéspedes/minuto, latencia p50/p95 por huésped y memoria (RSS):
+del árbol chromedriver -> chrome para Selenium, del árbol del propio proceso
+(driver de Playwright + Chromium) para CDP y del propio proceso para HTTP.
+
+Selenium requiere Chrome + ChromeDriver y CDP requiere Playwright con Chromium;
+si un motor no puede arrancar se reporta como omitido y el resto del reporte
+sigue siendo válido.
+
+Uso:
+    python benchmarks/bench_motores.py --registros 20 --latencia-ms 300
+    python benchmarks/bench_motores.py --motores cdp --sesiones 4 --registros 40
+    python benchmarks/bench_motores.py --motores http --registros 200 --salida motores.json
+"""
+import argparse
+import asyncio
+import json
+import os
+import sys
+import tempfile
+import time
+from datetime import datetime
+
+DIR_BENCH = os.path.dirname(os.path.abspath(__file__))
+DIR_SERVER = os.path.dirname(DIR_BENCH)
+sys.path.insert(0, DIR_SERVER)
+sys.path.insert(0, DIR_BENCH)
+
+from bench_afiliaciones import (  # noqa: E402
+    _rss_kb, apuntar_perfiles_a_sitio, generar_registros, percentil, rss_arbol_mb
+)
+from sitio_simulado import ConfiguracionSitio, SitioSimulado  # noqa: E402
+
+MOTORES = ("http", "selenium", "cdp")
+
+
+def crear_motor(nombre, tipo):
+    if nombre == "http":
+        # Solo HTTP (sin el respaldo en Selenium del motor "http" de producción)
+        from http_processor import ProcesadorHTTP
+        return ProcesadorHTTP(tipo, "benchmark")
+    from motores import crear_motor as crear
+    return crear(nombre, tipo, "benchmark")
+
+
+def medir_rss_mb(nombre, processor):
+    if nombre == "selenium":
+        return rss_arbol_mb(processor._pid_servicio())
+    if nombre == "cdp":
+        return rss_arbol_mb(os.getpid())
+    return _rss_kb(os.getpid()) / 1024
+
+
+async def _sesion(nombre, args, registros, latencias, memoria, contadores):
+    """Una sesión del motor procesando sus registros en secuencia"""
+    processor = crear_motor(nombre, args.tipo)
+    inicio = time.perf_counter()
+    try:
+        listo = await processor.preparar()
+    except Exception as e:
+        listo, contadores["motivo"] = False, str(e)
+    contadores["arranques"].append(time.perf_counter() - inicio)
+    if not listo:
+        contadores.setdefault("motivo", "preparar() devolvió False")
+        await processor.close()
+        return False
+    try:
+        for registro in registros:
+            inicio = time.perf_counter()
+            resultado = await processor.afiliar(registro)
+            latencias.append(time.perf_counter() - inicio)
+            memoria.append(medir_rss_mb(nombre, processor))
+            contadores["exitosos" if resultado["success"] else "errores"] += 1
+    finally:
+        await processor.close()
+    return True
+
+
+async def medir_motor(nombre, args, registros):
+    rss_inicial = _rss_kb(os.getpid()) / 1024
+    # Selenium es síncrono: varias sesiones en un event loop se bloquean entre sí
+    sesiones = 1 if nombre == "selenium" else max(1, args.sesiones)
+    partes = [registros[i::sesiones] for i in range(sesiones)]
+
+    latencias, memoria = [], []
+    contadores = {"exitosos": 0, "errores": 0, "arranques": []}
+    inicio_filas = time.perf_counter()
+    listos = await asyncio.gather(*(
+        _sesion(nombre, args, parte, latencias, memoria, contadores) for parte in partes
+    ))
+    duracion = time.perf_counter() - inicio_filas
+    if not all(listos):
+        return {"motor": nombre, "omitido": True, "motivo": contadores.get("motivo", "")[:200]}
+
+    exitosos, errores, arranques = contadores["exitosos"], contadores["errores"], contadores["arranques"]
+    return {
+        "motor": nombre,
+        "omitido": False,
+        "sesiones": sesiones,
+        "exitosos": exitosos,
+        "errores": errores,
+        "arranque_s": round(max(arranques), 3),
+        "duracion_s": round(duracion, 2),
+        "huespedes_por_minuto": round(len(latencias) / duracion * 60, 2) if duracion else 0,
+        "latencia_por_huesped_s": {
+            "p50": round(percentil(latencias, 50), 3) if latencias else None,
+            "p95": round(percentil(latencias, 95), 3) if latencias else None,
+            "max": round(max(latencias), 3) if latencias else None,
+            "muestras": len(latencias),
+        },
+        "memoria": {
+            "rss_pico_mb": round(max(memoria), 1) if memoria else None,
+            "rss_promedio_mb": round(sum(memoria) / len(memoria), 1) if memoria else None,
+            # Para HTTP el RSS es el del proceso completo; el delta es lo atribuible al motor
+            "rss_delta_proceso_mb": round(_rss_kb(os.getpid()) / 1024 - rss_inicial, 1),
+        },
+    }
+
+
+def ejecutar_benchmark(args):
+    config = ConfiguracionSitio(
+        latencia_ms=args.latencia_ms,
+        jitter_ms=args.jitter_ms,
+        tasa_fallo=args.tasa_fallo,
+        tasa_sin_codigo=args.tasa_sin_codigo,
+        semilla=args.semilla,
+    )
+    os.chdir(tempfile.mkdtemp(prefix="bench_motores_"))
+
+    motores = [m.strip() for m in args.motores.split(",") if m.strip()]
+    resultados = []
+    with SitioSimulado(config) as sitio:
+        apuntar_perfiles_a_sitio(sitio)
+        for nombre in motores:
+            # Correos distintos por motor: los duplicados se rechazan antes de enviar
+            registros = [
+                {**registro, "correo": f"{nombre}.{registro['correo']}"}
+                for registro in generar_registros(args.registros)
+            ]
+            print(f"[⏱️] Midiendo motor {nombre} ({len(registros)} huéspedes)...", file=sys.stderr)
+            resultados.append(asyncio.run(medir_motor(nombre, args, registros)))
+        estadisticas_sitio = dict(sitio.estadisticas)
+
+    medidos = {r["motor"]: r for r in resultados if not r["omitido"]}
+    comparacion = None
+    if "selenium" in medidos and medidos["selenium"]["huespedes_por_minuto"]:
+        base = medidos["selenium"]["huespedes_por_minuto"]
+        comparacion = {
+            f"aceleracion_{nombre}_vs_selenium": round(r["huespedes_por_minuto"] / base, 1)
+            for nombre, r in medidos.items() if nombre != "selenium"
+        }
+
+    return {
+        "benchmark": "motores_afiliacion",
+        "fecha": datetime.now().isoformat(),
+        "parametros": {
+            "registros": args.registros,
+            "sesiones": args.sesiones,
+            "tipo_afiliacion": args.tipo,
+            "latencia_ms": args.latencia_ms,
+            "jitter_ms": args.jitter_ms,
+            "tasa_fallo": args.tasa_fallo,
+            "tasa_sin_codigo": args.tasa_sin_codigo,
+        },
+        "motores": resultados,
+        "comparacion": comparacion,
+        "sitio_simulado": estadisticas_sitio,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark HTTP vs Selenium vs CDP contra sitio simulado")
+    parser.add_argument("--motores", default=",".join(MOTORES), help="Lista separada por comas (http,selenium,cdp)")
+    parser.add_argument("--registros", type=int, default=10)
+    parser.add_argument("--sesiones", type=int, default=1, help="Sesiones concurrentes en un event loop (http y cdp)")
+    parser.add_argument("--tipo", choices=["express", "junior"], default="express")
+    parser.add_argument("--latencia-ms", type=float, default=200.0)
+    parser.add_argument("--jitter-ms", type=float, default=100.0)
+    parser.add_argument("--tasa-fallo", type=float, default=0.0)
+    parser.add_argument("--tasa-sin-codigo", type=float, default=0.0)
+    parser.add_argument("--semilla", type=int, default=42)
+    parser.add_argument("--salida", help="Archivo JSON donde guardar el reporte")
+    args = parser.parse_args()
+
+    salida = os.path.abspath(args.salida) if args.salida else None
+    reporte = ejecutar_benchmark(args)
+    texto = json.dumps(reporte, indent=2, ensure_ascii=False)
+    print(texto)
+    if salida:
+        with open(salida, "w", encoding="utf-8") as f:
+            f.write(texto)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,113 @@
+"""
+Benchmark de normalizacion.normalizar_registros.
+
+Genera registros sintéticos con los problemas típicos de los reportes del PMS
+(MAYÚSCULAS, forma "APELLIDO, NOMBRE", NBSP, acentos descompuestos, typos de
+dominio) y mide el throughput del lote. También compara cuántos registros
+llegarían mal al formulario con la separación histórica (primer token = nombre)
+frente a la normalizada.
+
+Uso:
+    python benchmarks/bench_normalizacion.py --registros 100000 --repeticiones 5
+"""
+import argparse
+import json
+import os
+import random
+import statistics
+import sys
+import time
+import unicodedata
+
+DIR_BENCH = os.path.dirname(os.path.abspath(__file__))
+DIR_SERVER = os.path.dirname(DIR_BENCH)
+sys.path.insert(0, DIR_SERVER)
+
+from motores import EXTENSIONES_PERMITIDAS  # noqa: E402
+from normalizacion import dominio_correo, normalizar_registros  # noqa: E402
+
+NOMBRES = ["María José", "Juan Carlos", "Ana", "José Luis", "Sofía", "Jean-Pierre", "Renée"]
+APELLIDOS = ["de la Cruz López", "Pérez García", "van der Berg", "Hernández", "O'Brien", "del Río"]
+DOMINIOS = ["gmail.com", "hotmail.com", "outlook.com", "icloud.com", "gmial.com", "hotmail.con"]
+
+
+def generar_registros(cantidad, semilla=7):
+    """Registros con una mezcla realista de formatos sucios"""
+    azar = random.Random(semilla)
+    registros = []
+    for i in range(cantidad):
+        nombre, apellido = azar.choice(NOMBRES), azar.choice(APELLIDOS)
+        forma = i % 5
+        if forma == 0:
+            texto = f"{apellido}, {nombre}".upper()
+        elif forma == 1:
+            texto = f"{nombre}  {apellido}".upper()
+        elif forma == 2:
+            texto = unicodedata.normalize("NFD", f"  {nombre} {apellido} ")
+        else:
+            texto = f"{nombre} {apellido}"
+        usuario = f"huesped{i}"
+        correo = f" {usuario.upper()}@{azar.choice(DOMINIOS)} " if forma == 3 else f"{usuario}@{azar.choice(DOMINIOS)}"
+        registros.append({"reserva": f"R{i}", "nombre": texto, "correo": correo, "fila": i + 5})
+    return registros
+
+
+def problemas_legacy(registro):
+    """¿El registro llegaría mal con las reglas históricas?"""
+    partes = registro["nombre"].strip().split()
+    correo = registro["correo"].strip().lower()
+    return (
+        len(partes) < 2
+        or partes[0].endswith(",")
+        or partes[0].isupper()
+        or dominio_correo(correo) not in EXTENSIONES_PERMITIDAS
+    )
+
+
+def problemas_normalizado(registro):
+    return (
+        not registro["apellido"]
+        or registro["nombre_pila"].isupper()
+        or dominio_correo(registro["correo"]) not in EXTENSIONES_PERMITIDAS
+    )
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark de normalización de nombres y correos")
+    parser.add_argument("--registros", type=int, default=100000)
+    parser.add_argument("--repeticiones", type=int, default=5)
+    parser.add_argument("--salida", help="Archivo JSON donde guardar el reporte")
+    args = parser.parse_args()
+
+    registros = generar_registros(args.registros)
+
+    tiempos = []
+    for _ in range(args.repeticiones):
+        inicio = time.perf_counter()
+        normalizados, estadisticas = normalizar_registros(registros)
+        tiempos.append(time.perf_counter() - inicio)
+
+    mediana = statistics.median(tiempos)
+    antes = sum(problemas_legacy(registro) for registro in registros)
+    despues = sum(problemas_normalizado(registro) for registro in normalizados)
+
+    reporte = {
+        "benchmark": "normalizacion",
+        "python": sys.version.split()[0],
+        "registros": args.registros,
+        "repeticiones": args.repeticiones,
+        "segundos_mediana": round(mediana, 4),
+        "registros_por_segundo": round(args.registros / mediana),
+        "us_por_registro": round(mediana / args.registros * 1e6, 2),
+        "estadisticas": estadisticas,
+        "registros_con_problemas": {"reglas_historicas": antes, "normalizados": despues},
+    }
+    texto = json.dumps(reporte, indent=2, ensure_ascii=False)
+    print(texto)
+    if args.salida:
+        with open(args.salida, "w", encoding="utf-8") as f:
+            f.write(texto)
+
+
+if __name__ == "__main__":
+    main()
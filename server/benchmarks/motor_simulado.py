@@ -0,0 +1,84 @@
+"""
+Motor de afiliación simulado para pruebas de carga de la API.
+
+No abre navegador ni hace peticiones: cada huésped tarda
+MOTOR_SIMULADO_LATENCIA_MS (± MOTOR_SIMULADO_JITTER_MS) y falla con
+probabilidad MOTOR_SIMULADO_TASA_FALLO (fallo permanente, sin reintentos).
+Con MOTOR_SIMULADO_BLOQUEANTE=1 la espera se hace con time.sleep, que bloquea
+el event loop igual que las llamadas síncronas de Selenium; sirve para
+comprobar que la prueba de carga detecta ese bloqueo.
+
+registrar() lo agrega a motores.MOTORES como "simulado"; debe llamarse en el
+proceso del servidor antes de recibir tareas.
+"""
+import asyncio
+import os
+import random
+import time
+from typing import Dict
+
+from motores import MOTORES, MotorAfiliacion
+from retry_policy import PERMANENTE
+
+NOMBRE_MOTOR = "simulado"
+
+LATENCIA_MS = float(os.getenv("MOTOR_SIMULADO_LATENCIA_MS", "200"))
+JITTER_MS = float(os.getenv("MOTOR_SIMULADO_JITTER_MS", "50"))
+ARRANQUE_MS = float(os.getenv("MOTOR_SIMULADO_ARRANQUE_MS", "100"))
+TASA_FALLO = float(os.getenv("MOTOR_SIMULADO_TASA_FALLO", "0"))
+BLOQUEANTE = os.getenv("MOTOR_SIMULADO_BLOQUEANTE", "0").lower() in ("1", "true", "yes")
+
+
+async def _esperar(milisegundos: float):
+    if BLOQUEANTE:
+        time.sleep(milisegundos / 1000)
+    else:
+        await asyncio.sleep(milisegundos / 1000)
+
+
+class MotorSimulado(MotorAfiliacion):
+    """Sesión falsa con latencia y tasa de fallo configurables"""
+
+    motor = NOMBRE_MOTOR
+
+    def __init__(self, tipo_afiliacion, nombre_afiliador, task_id=None):
+        super().__init__(tipo_afiliacion, nombre_afiliador, task_id=task_id)
+        self.abierta = False
+        self.azar = random.Random(task_id)
+        self.codigos = 0
+
+    async def preparar(self) -> bool:
+        await _esperar(ARRANQUE_MS)
+        self.abierta = True
+        return True
+
+    async def procesar_afiliacion(self, nombre_completo, correo, numero_reserva, nombre=None, apellido=None) -> Dict:
+        valido, motivo = self.es_correo_valido(correo)
+        if not valido:
+            return self._fallo(correo, f"Correo inválido: {motivo}", categoria=PERMANENTE)
+        self.correos_procesados.add(correo)
+
+        self._punto_control()
+        await _esperar(max(0.0, LATENCIA_MS + self.azar.uniform(-JITTER_MS, JITTER_MS)))
+
+        if self.azar.random() < TASA_FALLO:
+            return self._fallo(correo, "Código no encontrado en la página (simulado)", categoria=PERMANENTE)
+        self.codigos += 1
+        return {
+            "success": True,
+            "codigo": f"SIM{self.codigos:06d}",
+            "nombre": nombre_completo,
+            "correo": correo,
+            "reserva": numero_reserva
+        }
+
+    async def sesion_activa(self) -> bool:
+        return self.abierta
+
+    async def close(self):
+        self.abierta = False
+
+
+def registrar():
+    """Hacer disponible el motor "simulado" en /procesar y /procesar/batch"""
+    MOTORES[NOMBRE_MOTOR] = (__name__, MotorSimulado.__name__)
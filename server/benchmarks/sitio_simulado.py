@@ -0,0 +1,267 @@
+"""
+Sitio simulado de afiliación Marriott Bonvoy para benchmarks offline.
+
+Reproduce los IDs del formulario que usa MarriottProcessor (partial_enroll_form,
+first_name, last_name, email_address, country, ctlAgree, chk_mi y el botón
+ASP.NET de envío) y una página de confirmación con un código MB.
+
+Uso independiente:
+    python benchmarks/sitio_simulado.py --puerto 8765 --latencia-ms 300 --tasa-fallo 0.05
+"""
+import argparse
+import html
+import random
+import secrets
+import threading
+import time
+from dataclasses import dataclass
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlencode, urlparse
+
+BOTON_ENVIO_ID = "ctl00_PartialEnrollFormPlaceholder_partial_enroll_EnrollButton"
+BOTON_ENVIO_NAME = "ctl00$PartialEnrollFormPlaceholder$partial_enroll$EnrollButton"
+RUTA_AFILIACION = "/calaqr/s/ES/ch/"
+RUTA_CONFIRMACION = "/calaqr/confirmation"
+
+
+@dataclass
+class ConfiguracionSitio:
+    """Parámetros de latencia e inyección de fallos del sitio simulado"""
+    latencia_ms: float = 200.0       # Latencia base por petición
+    jitter_ms: float = 100.0         # Variación aleatoria (+/-)
+    tasa_fallo: float = 0.0          # Probabilidad de HTTP 500 al enviar
+    tasa_sin_codigo: float = 0.0     # Probabilidad de confirmación sin código MB
+    tasa_formulario_lento: float = 0.0  # Probabilidad de formulario muy lento
+    retraso_lento_ms: float = 5000.0
+    semilla: int = None
+
+
+PAGINA_FORMULARIO = """<!DOCTYPE html>
+<html lang="es">
+<head><meta charset="utf-8"><title>Únete a Marriott Bonvoy</title></head>
+<body>
+<h1>Únete a Marriott Bonvoy</h1>
+<form id="partial_enroll_form" name="aspnetForm" method="post" action="{accion}">
+  <input type="hidden" name="__EVENTTARGET" id="__EVENTTARGET" value="">
+  <input type="hidden" name="__EVENTARGUMENT" id="__EVENTARGUMENT" value="">
+  <input type="hidden" name="__VIEWSTATE" id="__VIEWSTATE" value="{viewstate}">
+  <input type="hidden" name="__EVENTVALIDATION" id="__EVENTVALIDATION" value="{validacion}">
+  <label>Nombre <input type="text" id="first_name" name="first_name"></label>
+  <label>Apellido <input type="text" id="last_name" name="last_name"></label>
+  <label>Correo <input type="email" id="email_address" name="email_address"></label>
+  <select id="country" name="country">
+    <option value="">Selecciona</option>
+    <option value="US">Estados Unidos</option>
+    <option value="MX">México</option>
+  </select>
+  <label><input type="checkbox" id="ctlAgree" name="ctlAgree" value="on"> Acepto los términos</label>
+  <label><input type="checkbox" id="chk_mi" name="chk_mi" value="on"> Recibir ofertas</label>
+  <a id="{boton_id}" class="css_button" href="javascript:__doPostBack('{boton_name}','')">Inscribirme</a>
+</form>
+<script>
+function __doPostBack(eventTarget, eventArgument) {{
+  var form = document.getElementById('partial_enroll_form');
+  form.__EVENTTARGET.value = eventTarget;
+  form.__EVENTARGUMENT.value = eventArgument;
+  form.submit();
+}}
+</script>
+</body>
+</html>
+"""
+
+PAGINA_CONFIRMACION = """<!DOCTYPE html>
+<html lang="es">
+<head><meta charset="utf-8"><title>Confirmation</title></head>
+<body>
+<div class="confirmation">
+  <h2>Congratulations, {nombre}!</h2>
+  <p>Your member number: <strong>{codigo}</strong></p>
+</div>
+</body>
+</html>
+"""
+
+PAGINA_CONFIRMACION_SIN_CODIGO = """<!DOCTYPE html>
+<html lang="es">
+<head><meta charset="utf-8"><title>Confirmation</title></head>
+<body><div class="confirmation"><p>Procesando tu solicitud...</p></div></body>
+</html>
+"""
+
+
+class SitioSimulado:
+    """Servidor HTTP local que imita el flujo de afiliación"""
+
+    def __init__(self, config: ConfiguracionSitio = None, host="127.0.0.1", puerto=0):
+        self.config = config or ConfiguracionSitio()
+        self.random = random.Random(self.config.semilla)
+        self._lock = threading.Lock()
+        self._viewstates = set()
+        self.estadisticas = {"formularios": 0, "envios": 0, "exitos": 0, "fallos_inyectados": 0}
+        self._servidor = ThreadingHTTPServer((host, puerto), self._crear_handler())
+        self._servidor.daemon_threads = True
+        self._hilo = None
+
+    @property
+    def url_base(self):
+        host, puerto = self._servidor.server_address[:2]
+        return f"http://{host}:{puerto}"
+
+    def url_afiliacion(self, codigo_hotel):
+        return f"{self.url_base}{RUTA_AFILIACION}{codigo_hotel}"
+
+    def iniciar(self):
+        self._hilo = threading.Thread(target=self._servidor.serve_forever, daemon=True)
+        self._hilo.start()
+        return self
+
+    def detener(self):
+        self._servidor.shutdown()
+        self._servidor.server_close()
+
+    def __enter__(self):
+        return self.iniciar()
+
+    def __exit__(self, *exc):
+        self.detener()
+
+    # === LÓGICA DEL SITIO ===
+    def _sortear(self, probabilidad):
+        with self._lock:
+            return self.random.random() < probabilidad
+
+    def _esperar_latencia(self):
+        with self._lock:
+            variacion = self.random.uniform(-self.config.jitter_ms, self.config.jitter_ms)
+        retraso = max(0.0, self.config.latencia_ms + variacion)
+        time.sleep(retraso / 1000)
+
+    def _contar(self, clave):
+        with self._lock:
+            self.estadisticas[clave] += 1
+
+    def _emitir_viewstate(self):
+        token = secrets.token_urlsafe(24)
+        with self._lock:
+            self._viewstates.add(token)
+        return token
+
+    def _consumir_viewstate(self, token):
+        with self._lock:
+            if token in self._viewstates:
+                self._viewstates.discard(token)
+                return True
+            return False
+
+    def _generar_codigo(self):
+        with self._lock:
+            return "MB" + "".join(str(self.random.randint(0, 9)) for _ in range(9))
+
+    def _crear_handler(self):
+        sitio = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = "HTTP/1.1"
+
+            def log_message(self, *args):
+                pass
+
+            def _responder(self, status, cuerpo, headers=None):
+                datos = cuerpo.encode("utf-8")
+                self.send_response(status)
+                self.send_header("Content-Type", "text/html; charset=utf-8")
+                self.send_header("Content-Length", str(len(datos)))
+                for clave, valor in (headers or {}).items():
+                    self.send_header(clave, valor)
+                self.end_headers()
+                self.wfile.write(datos)
+
+            def do_GET(self):
+                ruta = urlparse(self.path)
+                sitio._esperar_latencia()
+
+                if ruta.path.startswith(RUTA_AFILIACION):
+                    sitio._contar("formularios")
+                    if sitio._sortear(sitio.config.tasa_formulario_lento):
+                        time.sleep(sitio.config.retraso_lento_ms / 1000)
+                    pagina = PAGINA_FORMULARIO.format(
+                        accion=html.escape(ruta.path),
+                        viewstate=sitio._emitir_viewstate(),
+                        validacion=secrets.token_hex(8),
+                        boton_id=BOTON_ENVIO_ID,
+                        boton_name=BOTON_ENVIO_NAME,
+                    )
+                    return self._responder(200, pagina)
+
+                if ruta.path == RUTA_CONFIRMACION:
+                    params = parse_qs(ruta.query)
+                    codigo = params.get("codigo", [""])[0]
+                    nombre = html.escape(params.get("nombre", [""])[0])
+                    if not codigo:
+                        return self._responder(200, PAGINA_CONFIRMACION_SIN_CODIGO)
+                    return self._responder(200, PAGINA_CONFIRMACION.format(nombre=nombre, codigo=codigo))
+
+                return self._responder(404, "<html><body>Not found</body></html>")
+
+            def do_POST(self):
+                ruta = urlparse(self.path)
+                longitud = int(self.headers.get("Content-Length") or 0)
+                datos = parse_qs(self.rfile.read(longitud).decode("utf-8"))
+                campo = lambda nombre: datos.get(nombre, [""])[0].strip()
+                sitio._esperar_latencia()
+
+                if not ruta.path.startswith(RUTA_AFILIACION):
+                    return self._responder(404, "<html><body>Not found</body></html>")
+
+                sitio._contar("envios")
+                if sitio._sortear(sitio.config.tasa_fallo):
+                    sitio._contar("fallos_inyectados")
+                    return self._responder(500, "<html><body>Service Unavailable</body></html>")
+
+                if not sitio._consumir_viewstate(campo("__VIEWSTATE")):
+                    return self._responder(400, "<html><body>Invalid viewstate</body></html>")
+
+                requeridos = ("first_name", "last_name", "email_address", "country")
+                if any(not campo(nombre) for nombre in requeridos) or "@" not in campo("email_address"):
+                    return self._responder(400, "<html><body>Formulario incompleto</body></html>")
+
+                params = {"nombre": campo("first_name")}
+                if not sitio._sortear(sitio.config.tasa_sin_codigo):
+                    sitio._contar("exitos")
+                    params["codigo"] = sitio._generar_codigo()
+                destino = f"{RUTA_CONFIRMACION}?{urlencode(params)}"
+                return self._responder(303, "", headers={"Location": destino})
+
+        return Handler
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Sitio simulado de afiliación Marriott")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--puerto", type=int, default=8765)
+    parser.add_argument("--latencia-ms", type=float, default=200.0)
+    parser.add_argument("--jitter-ms", type=float, default=100.0)
+    parser.add_argument("--tasa-fallo", type=float, default=0.0)
+    parser.add_argument("--tasa-sin-codigo", type=float, default=0.0)
+    parser.add_argument("--tasa-formulario-lento", type=float, default=0.0)
+    args = parser.parse_args()
+
+    config = ConfiguracionSitio(
+        latencia_ms=args.latencia_ms,
+        jitter_ms=args.jitter_ms,
+        tasa_fallo=args.tasa_fallo,
+        tasa_sin_codigo=args.tasa_sin_codigo,
+        tasa_formulario_lento=args.tasa_formulario_lento,
+    )
+    sitio = SitioSimulado(config, host=args.host, puerto=args.puerto).iniciar()
+    print(f"[🧪] Sitio simulado en {sitio.url_afiliacion('cunxc')}")
+    try:
+        while True:
+            time.sleep(1)
+    except KeyboardInterrupt:
+        sitio.detener()
+
+
+if __name__ == "__main__":
+    main()
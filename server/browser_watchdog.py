@@ -0,0 +1,332 @@
+"""
+Vigilancia de memoria de Chrome y limpieza de procesos huérfanos.
+
+- RegistroSesiones: sesiones de navegador vivas (pid de chromedriver, tarea,
+  páginas abiertas) y su RSS más reciente, para /health.
+- PoliticaMemoria: umbrales para reciclar una sesión (RSS del árbol
+  chromedriver -> chrome y cantidad de páginas cargadas).
+- VigilanteNavegadores: tarea asyncio que muestrea el RSS de cada sesión y mata
+  procesos chrome/chromedriver que no pertenecen a ninguna sesión viva. Los
+  que quedaron colgados de init solo se tocan si los lanzó esta aplicación
+  (perfil bajo BROWSER_PROFILES_DIR o MARCA_PROCESO en la línea de comandos),
+  nunca el Chrome del usuario ni el de otra aplicación.
+
+Solo funciona en Linux (lee /proc); en otros sistemas queda desactivado.
+
+Configuración por entorno:
+    CHROME_MAX_RSS_MB          RSS máximo por sesión antes de reciclar (900)
+    CHROME_MAX_PAGES           Páginas por sesión antes de reciclar (200)
+    WATCHDOG_INTERVAL_SECONDS  Intervalo de muestreo y limpieza (30)
+    ORPHAN_GRACE_SECONDS       Edad mínima de un proceso para considerarlo huérfano (120)
+"""
+import asyncio
+import itertools
+import os
+import signal
+import time
+from datetime import datetime
+from typing import Dict, List, Optional, Set
+
+from perfiles_navegador import gestor_perfiles
+
+DISPONIBLE = os.path.isdir("/proc")
+
+# Nombres de proceso (/proc/<pid>/comm, truncado a 15 caracteres)
+PREFIJOS_NAVEGADOR = ("chrome", "chromium", "chromedriver", "headless_shell")
+
+# Argumento que se agrega a los navegadores que no usan perfiles_navegador (CDP)
+MARCA_PROCESO = "--vladware-automatizacion"
+
+try:
+    _TICKS = os.sysconf("SC_CLK_TCK")
+except (AttributeError, ValueError, OSError):  # pragma: no cover - no Linux
+    _TICKS = 100
+
+
+# === /proc ===
+def _leer(ruta: str) -> Optional[str]:
+    try:
+        with open(ruta) as f:
+            return f.read()
+    except OSError:
+        return None
+
+
+def _stat(pid: int) -> Optional[List[str]]:
+    """Campos de /proc/<pid>/stat a partir del estado (el nombre puede tener espacios)"""
+    contenido = _leer(f"/proc/{pid}/stat")
+    if not contenido:
+        return None
+    return contenido.rsplit(")", 1)[1].split()
+
+
+def hijos_por_pid() -> Dict[int, List[int]]:
+    """Mapa ppid -> [pids]"""
+    hijos: Dict[int, List[int]] = {}
+    for entrada in os.listdir("/proc"):
+        if entrada.isdigit():
+            campos = _stat(int(entrada))
+            if campos:
+                hijos.setdefault(int(campos[1]), []).append(int(entrada))
+    return hijos
+
+
+def arbol(pid_raiz: int, hijos: Optional[Dict[int, List[int]]] = None) -> List[int]:
+    """El proceso y todos sus descendientes"""
+    hijos = hijos if hijos is not None else hijos_por_pid()
+    pids, pendientes = [], [pid_raiz]
+    while pendientes:
+        pid = pendientes.pop()
+        pids.append(pid)
+        pendientes.extend(hijos.get(pid, []))
+    return pids
+
+
+def rss_mb(pid: int) -> float:
+    contenido = _leer(f"/proc/{pid}/status") or ""
+    for linea in contenido.splitlines():
+        if linea.startswith("VmRSS:"):
+            return int(linea.split()[1]) / 1024
+    return 0.0
+
+
+def rss_arbol_mb(pid_raiz: Optional[int], hijos: Optional[Dict[int, List[int]]] = None) -> float:
+    """RSS total (MB) de un proceso y sus descendientes"""
+    if not pid_raiz or not DISPONIBLE:
+        return 0.0
+    return sum(rss_mb(pid) for pid in arbol(pid_raiz, hijos))
+
+
+def _edad_s(pid: int) -> float:
+    campos = _stat(pid)
+    uptime = _leer("/proc/uptime")
+    if not campos or not uptime:
+        return 0.0
+    # starttime es el campo 22 de stat (índice 19 contando desde el estado)
+    return float(uptime.split()[0]) - int(campos[19]) / _TICKS
+
+
+def proceso_vivo(pid: int) -> bool:
+    """Existe y no es zombi"""
+    campos = _stat(pid)
+    return bool(campos) and campos[0] != "Z"
+
+
+def _es_navegador(pid: int) -> bool:
+    nombre = (_leer(f"/proc/{pid}/comm") or "").strip().lower()
+    return nombre.startswith(PREFIJOS_NAVEGADOR)
+
+
+def _lanzado_por_la_app(pid: int) -> bool:
+    """Línea de comandos con un perfil de perfiles_navegador o con MARCA_PROCESO"""
+    argumentos = (_leer(f"/proc/{pid}/cmdline") or "").split("\0")
+    perfil = f"--user-data-dir={os.path.join(gestor_perfiles.dir_perfiles, '')}"
+    return any(a == MARCA_PROCESO or a.startswith(perfil) for a in argumentos)
+
+
+def _es_propio(pid: int) -> bool:
+    try:
+        return os.stat(f"/proc/{pid}").st_uid == os.getuid()
+    except OSError:
+        return False
+
+
+def matar_procesos(pids) -> int:
+    """SIGKILL a cada pid (recogiendo zombis si son hijos directos)"""
+    muertos = 0
+    for pid in pids:
+        try:
+            os.kill(pid, signal.SIGKILL)
+            muertos += 1
+        except (ProcessLookupError, PermissionError):
+            continue
+        try:
+            os.waitpid(pid, os.WNOHANG)
+        except ChildProcessError:
+            pass
+    return muertos
+
+
+# === SESIONES ===
+class RegistroSesiones:
+    """Sesiones de navegador vivas en este proceso"""
+
+    def __init__(self):
+        self._sesiones: Dict[int, Dict] = {}
+        self._ids = itertools.count(1)
+
+    def registrar(self, pid: Optional[int], task_id: Optional[str] = None) -> int:
+        sesion_id = next(self._ids)
+        self._sesiones[sesion_id] = {
+            "pid": pid,
+            "task_id": task_id,
+            "paginas": 0,
+            "rss_mb": 0.0,
+            "rss_pico_mb": 0.0,
+            "creada": time.monotonic(),
+        }
+        return sesion_id
+
+    def eliminar(self, sesion_id: Optional[int]):
+        self._sesiones.pop(sesion_id, None)
+
+    def contar_pagina(self, sesion_id: Optional[int]):
+        sesion = self._sesiones.get(sesion_id)
+        if sesion:
+            sesion["paginas"] += 1
+
+    def obtener(self, sesion_id: Optional[int]) -> Optional[Dict]:
+        return self._sesiones.get(sesion_id)
+
+    def muestrear(self, sesion_id: int, hijos=None) -> float:
+        sesion = self._sesiones.get(sesion_id)
+        if not sesion:
+            return 0.0
+        mb = rss_arbol_mb(sesion["pid"], hijos)
+        sesion["rss_mb"] = mb
+        sesion["rss_pico_mb"] = max(sesion["rss_pico_mb"], mb)
+        return mb
+
+    def pids_protegidos(self, hijos) -> Set[int]:
+        protegidos = set()
+        for sesion in list(self._sesiones.values()):
+            if sesion["pid"]:
+                protegidos.update(arbol(sesion["pid"], hijos))
+        return protegidos
+
+    def ids(self) -> List[int]:
+        return list(self._sesiones)
+
+    def resumen(self) -> List[Dict]:
+        ahora = time.monotonic()
+        return [
+            {
+                "session": sesion_id,
+                "task_id": sesion["task_id"],
+                "pid": sesion["pid"],
+                "pages": sesion["paginas"],
+                "rss_mb": round(sesion["rss_mb"], 1),
+                "rss_peak_mb": round(sesion["rss_pico_mb"], 1),
+                "age_seconds": int(ahora - sesion["creada"]),
+            }
+            for sesion_id, sesion in list(self._sesiones.items())
+        ]
+
+
+class PoliticaMemoria:
+    """Cuándo reciclar una sesión de navegador"""
+
+    def __init__(self, max_rss_mb=900.0, max_paginas=200):
+        self.max_rss_mb = max_rss_mb
+        self.max_paginas = max_paginas
+
+    @classmethod
+    def desde_entorno(cls):
+        return cls(
+            max_rss_mb=float(os.getenv("CHROME_MAX_RSS_MB", "900")),
+            max_paginas=int(os.getenv("CHROME_MAX_PAGES", "200")),
+        )
+
+    def motivo_reciclaje(self, sesion: Optional[Dict], rss_actual_mb: float) -> Optional[str]:
+        if not sesion:
+            return None
+        if self.max_rss_mb and rss_actual_mb > self.max_rss_mb:
+            return f"memoria {rss_actual_mb:.0f} MB > {self.max_rss_mb:.0f} MB"
+        if self.max_paginas and sesion["paginas"] >= self.max_paginas:
+            return f"{sesion['paginas']} páginas cargadas (máx. {self.max_paginas})"
+        return None
+
+
+sesiones_navegador = RegistroSesiones()
+politica_memoria = PoliticaMemoria.desde_entorno()
+
+
+# === VIGILANTE ===
+class VigilanteNavegadores:
+    """Tarea asyncio: muestreo de RSS por sesión y limpieza de huérfanos"""
+
+    def __init__(self, registro: RegistroSesiones, intervalo_s: float, gracia_s: float):
+        self.registro = registro
+        self.intervalo_s = intervalo_s
+        self.gracia_s = gracia_s
+        self.huerfanos_eliminados = 0
+        self.ultima_ejecucion: Optional[str] = None
+        self._tarea: Optional[asyncio.Task] = None
+
+    @classmethod
+    def desde_entorno(cls, registro: RegistroSesiones):
+        return cls(
+            registro,
+            intervalo_s=float(os.getenv("WATCHDOG_INTERVAL_SECONDS", "30")),
+            gracia_s=float(os.getenv("ORPHAN_GRACE_SECONDS", "120")),
+        )
+
+    def buscar_huerfanos(self, hijos) -> List[int]:
+        """
+        Procesos chrome/chromedriver del mismo usuario que no cuelgan de una
+        sesión viva. Solo se consideran los que descienden de este servidor o
+        quedaron colgados de init (ppid 1) y los lanzó esta aplicación (un
+        chromedriver no lleva el perfil, pero sí alguno de sus Chrome), y con
+        más de `gracia_s` de vida (una sesión recién lanzada todavía no está
+        registrada).
+        """
+        protegidos = self.registro.pids_protegidos(hijos)
+        propios = set(arbol(os.getpid(), hijos)) - {os.getpid()}
+        colgados = {
+            pid for pid in hijos.get(1, [])
+            if any(_lanzado_por_la_app(descendiente) for descendiente in arbol(pid, hijos))
+        }
+        candidatos = propios | colgados
+        return [
+            pid for pid in candidatos
+            if pid not in protegidos
+            and proceso_vivo(pid)
+            and _es_navegador(pid)
+            and _es_propio(pid)
+            and _edad_s(pid) > self.gracia_s
+        ]
+
+    def ejecutar(self) -> Dict:
+        if not DISPONIBLE:
+            return {}
+        hijos = hijos_por_pid()
+        for sesion_id in self.registro.ids():
+            self.registro.muestrear(sesion_id, hijos)
+        eliminados = matar_procesos(self.buscar_huerfanos(hijos))
+        if eliminados:
+            print(f"[🧟] {eliminados} procesos de navegador huérfanos eliminados")
+        self.huerfanos_eliminados += eliminados
+        self.ultima_ejecucion = datetime.now().isoformat()
+        return {"huerfanos_eliminados": eliminados}
+
+    def resumen(self) -> Dict:
+        return {
+            "enabled": DISPONIBLE,
+            "sessions": self.registro.resumen(),
+            "orphans_reaped": self.huerfanos_eliminados,
+            "last_run": self.ultima_ejecucion,
+            "max_rss_mb": politica_memoria.max_rss_mb,
+            "max_pages": politica_memoria.max_paginas,
+        }
+
+    # === CICLO DE VIDA ===
+    async def _bucle(self):
+        while True:
+            await asyncio.sleep(self.intervalo_s)
+            try:
+                self.ejecutar()
+            except Exception as e:
+                print(f"[⚠️] Error en vigilancia de navegadores: {e}")
+
+    def iniciar(self):
+        if DISPONIBLE and (self._tarea is None or self._tarea.done()):
+            self._tarea = asyncio.create_task(self._bucle())
+
+    async def detener(self):
+        if self._tarea:
+            self._tarea.cancel()
+            try:
+                await self._tarea
+            except asyncio.CancelledError:
+                pass
+            self._tarea = None
@@ -0,0 +1,370 @@
+"""
+Motor de afiliación por Chrome DevTools Protocol (API async de Playwright).
+
+A diferencia de MarriottProcessor (WebDriver síncrono: cada comando bloquea el
+event loop o necesita un hilo), aquí todo es awaitable sobre una conexión CDP:
+muchas sesiones se manejan desde un solo event loop sin saltos a hilos.
+
+- Un Chromium por proceso (_NavegadorCompartido), lanzado en headless o
+  conectado a uno existente por CDP_ENDPOINT.
+- Cada sesión (tarea o worker) tiene su propio BrowserContext: cookies y
+  almacenamiento aislados, y abrirlo cuesta milisegundos, no un navegador.
+- Sin esperas fijas: Playwright espera a que cada elemento exista y sea
+  accionable; las esperas del perfil solo acotan la búsqueda del código.
+
+Es el motor "cdp" de motores.py (ENROLLMENT_ENGINE=cdp o motor=cdp por tarea).
+Requiere `pip install -r requirements-cdp.txt` y `playwright install chromium`
+(opcional: sin ellos el motor no arranca y los demás siguen disponibles).
+
+Configuración por entorno:
+    CDP_ENDPOINT      Chrome ya lanzado (http://host:9222 o ws://...); vacío = lanzar Chromium
+    CDP_MAX_PAGES     Páginas por contexto antes de reciclarlo (200)
+"""
+import asyncio
+import os
+from typing import List, Optional, Set
+
+from browser_watchdog import DISPONIBLE as PROC_DISPONIBLE, MARCA_PROCESO, hijos_por_pid, sesiones_navegador
+from control_tareas import TareaCancelada
+from http_processor import USER_AGENT
+from motores import MotorAfiliacion
+from normalizacion import normalizar_nombre
+from retry_policy import PERMANENTE, clasificar_excepcion, es_sesion_muerta
+from site_config import CONFIG_NAVEGADOR, obtener_perfil
+
+try:  # Dependencia opcional
+    from playwright.async_api import Error as ErrorPlaywright, async_playwright
+except ImportError:  # pragma: no cover - depende del entorno
+    async_playwright = None
+    ErrorPlaywright = Exception
+
+ENDPOINT_CDP = os.getenv("CDP_ENDPOINT", "").strip()
+MAX_PAGINAS_CONTEXTO = int(os.getenv("CDP_MAX_PAGES", "200"))
+
+ARGUMENTOS_CHROMIUM = [
+    "--no-sandbox",
+    "--disable-dev-shm-usage",
+    "--disable-gpu",
+    "--disable-blink-features=AutomationControlled",
+    "--disable-extensions",
+]
+
+# Recursos que no hacen falta para afiliar (equivale a --disable-images)
+PATRON_RECURSOS_BLOQUEADOS = "**/*.{png,jpg,jpeg,gif,webp,svg,woff,woff2,ttf}"
+
+# Estrategias de site_config (valores de selenium By.*) -> selectores de Playwright
+_SELECTORES = {
+    "id": lambda valor: f'[id="{valor}"]',
+    "name": lambda valor: f'[name="{valor}"]',
+    "css selector": lambda valor: valor,
+    "xpath": lambda valor: f"xpath={valor}",
+    "class name": lambda valor: f".{valor}",
+    "tag name": lambda valor: valor,
+}
+
+
+def selector_playwright(estrategia: str, valor: str) -> str:
+    return _SELECTORES[estrategia](valor)
+
+
+class _NavegadorCompartido:
+    """Un Chromium (y su conexión CDP) para todas las sesiones del proceso"""
+
+    def __init__(self):
+        self._playwright = None
+        self._navegador = None
+        self._usuarios = 0
+        self._lock: Optional[asyncio.Lock] = None
+        # Sesiones de browser_watchdog que protegen los procesos del navegador
+        self._sesiones_vigilante: List[int] = []
+
+    def _obtener_lock(self) -> asyncio.Lock:
+        if self._lock is None:
+            self._lock = asyncio.Lock()
+        return self._lock
+
+    async def adquirir(self):
+        async with self._obtener_lock():
+            if self._navegador is None or not self._navegador.is_connected():
+                await self._cerrar()
+                previos = self._procesos_hijos()
+                self._playwright = await async_playwright().start()
+                if ENDPOINT_CDP:
+                    print(f"[🔌] Conectando a Chrome por CDP: {ENDPOINT_CDP}")
+                    self._navegador = await self._playwright.chromium.connect_over_cdp(ENDPOINT_CDP)
+                else:
+                    print("[🔧] Lanzando Chromium compartido (CDP)...")
+                    self._navegador = await self._playwright.chromium.launch(
+                        headless=True, args=ARGUMENTOS_CHROMIUM + [MARCA_PROCESO]
+                    )
+                self._registrar_procesos(previos)
+            self._usuarios += 1
+            return self._navegador
+
+    async def soltar(self):
+        """El último usuario cierra el navegador"""
+        async with self._obtener_lock():
+            self._usuarios = max(0, self._usuarios - 1)
+            if self._usuarios == 0:
+                await self._cerrar()
+
+    @staticmethod
+    def _procesos_hijos() -> Set[int]:
+        return set(hijos_por_pid().get(os.getpid(), [])) if PROC_DISPONIBLE else set()
+
+    def _registrar_procesos(self, previos: Set[int]):
+        """
+        Registrar en el vigilante los procesos que lanzó Playwright (driver ->
+        Chromium): si no, buscar_huerfanos los mataría a mitad de una tarea.
+        Playwright no expone el pid del navegador, así que se toman los hijos
+        nuevos de este proceso; el vigilante protege el árbol de cada uno.
+        """
+        for pid in self._procesos_hijos() - previos:
+            self._sesiones_vigilante.append(sesiones_navegador.registrar(pid, "cdp-compartido"))
+
+    async def _cerrar(self):
+        for sesion_id in self._sesiones_vigilante:
+            sesiones_navegador.eliminar(sesion_id)
+        self._sesiones_vigilante = []
+        if self._navegador is not None:
+            try:
+                await self._navegador.close()
+            except Exception as e:
+                print(f"[⚠️] Error cerrando Chromium compartido: {e}")
+        if self._playwright is not None:
+            try:
+                await self._playwright.stop()
+            except Exception:
+                pass
+        self._navegador, self._playwright = None, None
+
+    def resumen(self):
+        return {"connected": bool(self._navegador and self._navegador.is_connected()), "sessions": self._usuarios}
+
+
+navegador_compartido = _NavegadorCompartido()
+
+
+class ProcesadorCDP(MotorAfiliacion):
+    """Afiliación con un BrowserContext propio sobre el Chromium compartido"""
+
+    motor = "cdp"
+
+    def __init__(self, tipo_afiliacion, nombre_afiliador, task_id=None):
+        super().__init__(tipo_afiliacion, nombre_afiliador, task_id=task_id)
+        self.perfil = obtener_perfil(self.tipo_afiliacion)
+        self.contexto = None
+        self.pagina = None
+        self.paginas = 0
+        self._navegador_adquirido = False
+
+    async def preparar(self):
+        if async_playwright is None:
+            print("[❌] Motor CDP no disponible: instalar playwright (pip install -r requirements-cdp.txt && playwright install chromium)")
+            return False
+        try:
+            navegador = await navegador_compartido.adquirir()
+            self._navegador_adquirido = True
+            ancho, alto = (int(v) for v in CONFIG_NAVEGADOR.window_size.split(","))
+            self.contexto = await navegador.new_context(
+                user_agent=USER_AGENT,
+                viewport={"width": ancho, "height": alto},
+                locale="es-MX",
+            )
+            await self.contexto.route(PATRON_RECURSOS_BLOQUEADOS, lambda ruta: ruta.abort())
+            self.pagina = await self.contexto.new_page()
+            self.pagina.set_default_timeout(self.perfil.esperas.timeout * 1000)
+            self.paginas = 0
+            print("[✅] Contexto CDP listo")
+            return True
+        except Exception as e:
+            print(f"[❌] Error abriendo contexto CDP: {e}")
+            await self.close()
+            return False
+
+    # === FORMULARIO ===
+    async def _localizar(self, campo: str, nombre_elemento: str):
+        """Primer localizador del perfil que existe en la página"""
+        for estrategia, valor in self.perfil.localizadores[campo]:
+            elemento = self.pagina.locator(selector_playwright(estrategia, valor)).first
+            try:
+                if await elemento.count():
+                    return elemento
+            except ErrorPlaywright:
+                continue  # p. ej. xpath que Playwright no acepta
+        print(f"[❌] {nombre_elemento} no encontrado")
+        return None
+
+    async def _llenar(self, campo: str, valor: str, nombre_elemento: str) -> bool:
+        elemento = await self._localizar(campo, nombre_elemento)
+        if elemento is None:
+            return False
+        try:
+            await elemento.fill(valor)
+            exito = await elemento.input_value() == valor
+        except ErrorPlaywright as e:
+            print(f"[❌] Error llenando {nombre_elemento}: {e}")
+            return False
+        print(f"[{'✅' if exito else '⚠️'}] {nombre_elemento}: {valor}")
+        return exito
+
+    async def _seleccionar_pais(self) -> bool:
+        select = await self._localizar("pais", "Dropdown país")
+        if select is None:
+            return False
+        try:
+            await select.select_option(value=self.perfil.pais, timeout=2000)
+            return True
+        except ErrorPlaywright:
+            pass
+        opciones = select.locator("option")
+        for indice in range(await opciones.count()):
+            opcion = opciones.nth(indice)
+            texto = (await opcion.inner_text()).lower()
+            if any(buscado in texto for buscado in self.perfil.opciones_pais):
+                await select.select_option(value=await opcion.get_attribute("value"))
+                return True
+        print("[⚠️] No se pudo seleccionar México")
+        return False
+
+    async def _marcar_checkboxes(self) -> int:
+        """Los del perfil y cualquier otro sin marcar (como marcar_checkboxes_inteligente)"""
+        casillas = self.pagina.locator('input[type="checkbox"]')
+        marcados = 0
+        for indice in range(await casillas.count()):
+            casilla = casillas.nth(indice)
+            try:
+                if not await casilla.is_checked():
+                    await casilla.check()
+                    marcados += 1
+            except ErrorPlaywright:
+                continue
+        print(f"[✅] {marcados} checkboxes marcados")
+        return marcados
+
+    async def _buscar_codigo(self) -> Optional[str]:
+        perfil = self.perfil
+        # Esperar la confirmación (URL o texto), como mucho intentos_confirmacion segundos
+        for _ in range(perfil.esperas.intentos_confirmacion * 4):
+            try:
+                if any(p in self.pagina.url.lower() for p in perfil.palabras_confirmacion_url):
+                    break
+                texto = (await self.pagina.content()).lower()
+                if any(p in texto for p in perfil.palabras_confirmacion):
+                    break
+            except ErrorPlaywright:
+                pass  # navegación en curso
+            await asyncio.sleep(0.25)
+
+        for selector in perfil.selectores_codigo:
+            try:
+                textos = await self.pagina.locator(f"xpath={selector}").all_inner_texts()
+            except ErrorPlaywright:
+                continue  # selectores //text() no son elementos
+            for codigo in (t.strip() for t in textos):
+                if codigo and len(codigo) >= 6 and any(c.isdigit() for c in codigo):
+                    return codigo
+
+        contenido = await self.pagina.content()
+        for patron in perfil.patrones_codigo:
+            for match in patron.findall(contenido):
+                if not perfil.patron_descartar.match(match):
+                    return match
+        return None
+
+    # === FLUJO ===
+    async def procesar_afiliacion(self, nombre_completo, correo, numero_reserva, nombre=None, apellido=None):
+        """Mismo contrato que MarriottProcessor.procesar_afiliacion"""
+        try:
+            print(f"[🔄] Procesando (CDP): {nombre_completo} ({correo})")
+
+            es_valido, razon = self.es_correo_valido(correo)
+            if not es_valido:
+                return self._fallo(correo, f"Correo inválido: {razon}", PERMANENTE)
+
+            if nombre is None or apellido is None:
+                separado = normalizar_nombre(nombre_completo)
+                nombre, apellido = separado.nombre, separado.apellido
+            if not nombre or not apellido:
+                return self._fallo(correo, "Nombre completo debe tener al menos nombre y apellido", PERMANENTE)
+
+            self.correos_procesados.add(correo)
+            localizadores = self.perfil.localizadores
+
+            await self.pagina.goto(self.perfil.url, wait_until="domcontentloaded")
+            self.paginas += 1
+            self._punto_control()
+
+            try:
+                await self.pagina.locator(selector_playwright(*localizadores["formulario"][0])).first.wait_for(
+                    state="attached"
+                )
+            except ErrorPlaywright:
+                print("[⚠️] Formulario tardó en cargar, continuando...")
+            self._punto_control()
+
+            if not await self._llenar("nombre", nombre, "Nombre"):
+                return self._fallo(correo, "No se pudo llenar el nombre")
+            if not await self._llenar("apellido", apellido, "Apellido"):
+                return self._fallo(correo, "No se pudo llenar el apellido")
+            if not await self._llenar("email", correo, "Email"):
+                return self._fallo(correo, "No se pudo llenar el email")
+            await self._seleccionar_pais()
+            await self._marcar_checkboxes()
+
+            # Último punto donde se puede cancelar
+            self._punto_control()
+            boton = await self._localizar("boton_envio", "Botón enviar")
+            if boton is None:
+                return self._fallo(correo, "Botón de envío no encontrado")
+            await boton.click()
+            print("[📤] Formulario enviado (CDP)")
+
+            codigo = await self._buscar_codigo()
+            if codigo:
+                print(f"[🎉] ¡ÉXITO! {nombre_completo} | Código: {codigo}")
+                return {
+                    "success": True,
+                    "codigo": codigo,
+                    "nombre": nombre_completo,
+                    "correo": correo,
+                    "reserva": numero_reserva
+                }
+            return self._fallo(correo, "Código no encontrado en la página")
+
+        except TareaCancelada:
+            self.correos_procesados.discard(correo)
+            raise
+        except Exception as e:
+            error_msg = f"Error procesando {nombre_completo}: {str(e)}"
+            print(f"[🚨] {error_msg}")
+            resultado = self._fallo(correo, error_msg, clasificar_excepcion(e))
+            resultado["sesion_muerta"] = es_sesion_muerta(e)
+            return resultado
+
+    # === VIDA DE LA SESIÓN ===
+    async def sesion_activa(self):
+        if self.pagina is None or self.pagina.is_closed():
+            return False
+        try:
+            await self.pagina.evaluate("1")
+            return True
+        except Exception as e:
+            return not es_sesion_muerta(e)
+
+    def motivo_reciclaje(self):
+        if self.paginas >= MAX_PAGINAS_CONTEXTO:
+            return f"{self.paginas} páginas en el contexto (máximo {MAX_PAGINAS_CONTEXTO})"
+        return None
+
+    async def close(self):
+        if self.contexto is not None:
+            try:
+                await self.contexto.close()
+                print("[✅] Contexto CDP cerrado")
+            except Exception as e:
+                print(f"[⚠️] Error cerrando contexto CDP: {e}")
+        self.contexto, self.pagina = None, None
+        if self._navegador_adquirido:
+            self._navegador_adquirido = False
+            await navegador_compartido.soltar()
@@ -0,0 +1,189 @@
+"""
+Control adaptativo de concurrencia (AIMD) según la latencia y los fallos del sitio.
+
+Con un número fijo de sesiones y una pausa fija de 2 s entre filas el proceso
+va lento cuando el sitio responde bien y demasiado agresivo cuando está
+degradado (errores "Formulario tardó en cargar", código no encontrado...).
+ControladorConcurrencia mide cada afiliar() (latencia y si falló por causa del
+sitio) y, por cada ventana de resultados:
+
+- Sitio sano (tasa de error y mediana de latencia bajo sus umbrales): aumento
+  aditivo; una sesión más permitida y la pausa entre filas baja un paso.
+- Sitio degradado: reducción multiplicativa; el límite de sesiones se
+  multiplica por CONCURRENCY_DECREASE_FACTOR y la pausa se duplica. La ventana
+  se vacía para medir el efecto antes de volver a ajustar.
+
+Las sesiones por encima del límite ceden su navegador en el siguiente punto de
+control entre filas y esperan lugar (las más recientes primero). Además, todos
+los envíos del proceso pasan por un tope duro de filas por minuto que ningún
+ajuste puede superar. Los valores vigentes se publican en /health.
+
+En modo cola cada worker tiene su propio controlador (una sesión por proceso):
+ahí solo actúan la pausa y el tope por minuto.
+
+Configuración por entorno:
+    CONCURRENCY_MIN_SESSIONS      Sesiones activas mínimas (1)
+    CONCURRENCY_MAX_SESSIONS      Sesiones activas máximas (4)
+    CONCURRENCY_INITIAL_SESSIONS  Límite de sesiones al arrancar (2)
+    PACING_MIN_SECONDS            Pausa mínima entre filas de una sesión (1)
+    PACING_MAX_SECONDS            Pausa máxima entre filas de una sesión (30)
+    PACING_INITIAL_SECONDS        Pausa al arrancar (2)
+    PACING_STEP_SECONDS           Reducción de la pausa por ventana sana (0.25)
+    RATE_CEILING_PER_MINUTE       Tope duro de envíos por minuto del proceso (30)
+    CONCURRENCY_TARGET_SECONDS    Mediana de latencia por huésped tolerada (40)
+    CONCURRENCY_MAX_ERROR_RATE    Tasa de fallos del sitio tolerada (0.2)
+    CONCURRENCY_WINDOW            Resultados por ventana de ajuste (10)
+    CONCURRENCY_DECREASE_FACTOR   Factor de la reducción multiplicativa (0.5)
+"""
+import asyncio
+import os
+import statistics
+import time
+from datetime import datetime
+from typing import Dict, List, Optional
+
+# Cada cuánto revisa una sesión en espera si ya hay lugar
+INTERVALO_ESPERA_S = 1.0
+
+
+class ControladorConcurrencia:
+    """Límite de sesiones y pausa entre filas ajustados con AIMD, bajo un tope de envíos/minuto"""
+
+    def __init__(self, min_sesiones=1, max_sesiones=4, sesiones_iniciales=2,
+                 pausa_minima_s=1.0, pausa_maxima_s=30.0, pausa_inicial_s=2.0, paso_pausa_s=0.25,
+                 tope_por_minuto=30.0, latencia_objetivo_s=40.0, tasa_error_maxima=0.2,
+                 ventana=10, factor_reduccion=0.5):
+        self.min_sesiones = max(1, min_sesiones)
+        self.max_sesiones = max(self.min_sesiones, max_sesiones)
+        self.pausa_minima_s = pausa_minima_s
+        self.pausa_maxima_s = max(pausa_minima_s, pausa_maxima_s)
+        self.paso_pausa_s = paso_pausa_s
+        self.tope_por_minuto = tope_por_minuto
+        self.latencia_objetivo_s = latencia_objetivo_s
+        self.tasa_error_maxima = tasa_error_maxima
+        self.tamano_ventana = max(1, ventana)
+        self.factor_reduccion = factor_reduccion
+
+        self.limite = float(min(self.max_sesiones, max(self.min_sesiones, sesiones_iniciales)))
+        self.pausa_s = min(self.pausa_maxima_s, max(self.pausa_minima_s, pausa_inicial_s))
+        self.ventana: List[tuple] = []  # (segundos, exito) desde el último ajuste
+
+        # Sesiones con lugar, en orden de llegada (dict como conjunto ordenado)
+        self.activas: Dict[str, float] = {}
+        self.esperando: List[str] = []
+        self._proximo_envio = 0.0
+
+        self.aumentos = 0
+        self.reducciones = 0
+        self.ultimo_ajuste: Optional[Dict] = None
+
+    @classmethod
+    def desde_entorno(cls):
+        return cls(
+            min_sesiones=int(os.getenv("CONCURRENCY_MIN_SESSIONS", "1")),
+            max_sesiones=int(os.getenv("CONCURRENCY_MAX_SESSIONS", "4")),
+            sesiones_iniciales=int(os.getenv("CONCURRENCY_INITIAL_SESSIONS", "2")),
+            pausa_minima_s=float(os.getenv("PACING_MIN_SECONDS", "1")),
+            pausa_maxima_s=float(os.getenv("PACING_MAX_SECONDS", "30")),
+            pausa_inicial_s=float(os.getenv("PACING_INITIAL_SECONDS", "2")),
+            paso_pausa_s=float(os.getenv("PACING_STEP_SECONDS", "0.25")),
+            tope_por_minuto=float(os.getenv("RATE_CEILING_PER_MINUTE", "30")),
+            latencia_objetivo_s=float(os.getenv("CONCURRENCY_TARGET_SECONDS", "40")),
+            tasa_error_maxima=float(os.getenv("CONCURRENCY_MAX_ERROR_RATE", "0.2")),
+            ventana=int(os.getenv("CONCURRENCY_WINDOW", "10")),
+            factor_reduccion=float(os.getenv("CONCURRENCY_DECREASE_FACTOR", "0.5")),
+        )
+
+    @property
+    def limite_sesiones(self) -> int:
+        return max(self.min_sesiones, int(self.limite))
+
+    # === SESIONES ===
+    def hay_lugar(self) -> bool:
+        return not self.esperando and len(self.activas) < self.limite_sesiones
+
+    async def adquirir_sesion(self, sesion: str, control=None):
+        """Esperar (en orden de llegada) a que haya lugar para una sesión más"""
+        self.esperando.append(sesion)
+        try:
+            while len(self.activas) + self.esperando.index(sesion) >= self.limite_sesiones:
+                if control is not None:
+                    await control.esperar(INTERVALO_ESPERA_S)
+                else:
+                    await asyncio.sleep(INTERVALO_ESPERA_S)
+        finally:
+            self.esperando.remove(sesion)
+        self.activas[sesion] = time.monotonic()
+
+    def liberar_sesion(self, sesion: str):
+        self.activas.pop(sesion, None)
+
+    def debe_ceder(self, sesion: str) -> bool:
+        """¿La sesión sobra con el límite actual? Ceden las que llegaron últimas"""
+        sobrantes = len(self.activas) - self.limite_sesiones
+        return sobrantes > 0 and sesion in list(self.activas)[-sobrantes:]
+
+    # === RITMO ===
+    async def esperar_envio(self, control=None):
+        """Reservar el siguiente turno de envío respetando el tope por minuto"""
+        if self.tope_por_minuto <= 0:
+            return
+        ahora = time.monotonic()
+        turno = max(ahora, self._proximo_envio)
+        self._proximo_envio = turno + 60 / self.tope_por_minuto
+        if control is not None:
+            await control.esperar(turno - ahora)
+        elif turno > ahora:
+            await asyncio.sleep(turno - ahora)
+
+    # === AJUSTE AIMD ===
+    def registrar(self, segundos: float, exito: bool) -> Optional[Dict]:
+        """Registrar un envío atribuible al sitio; devuelve el ajuste si la ventana se cerró"""
+        self.ventana.append((segundos, exito))
+        if len(self.ventana) < self.tamano_ventana:
+            return None
+
+        tasa_error = sum(1 for _, ok in self.ventana if not ok) / len(self.ventana)
+        mediana = statistics.median(s for s, _ in self.ventana)
+        self.ventana = []
+
+        if tasa_error > self.tasa_error_maxima or mediana > self.latencia_objetivo_s:
+            self.limite = max(float(self.min_sesiones), self.limite * self.factor_reduccion)
+            self.pausa_s = min(self.pausa_maxima_s, self.pausa_s * 2)
+            self.reducciones += 1
+            direccion = "reduccion"
+        else:
+            self.limite = min(float(self.max_sesiones), self.limite + 1)
+            self.pausa_s = max(self.pausa_minima_s, self.pausa_s - self.paso_pausa_s)
+            self.aumentos += 1
+            direccion = "aumento"
+
+        self.ultimo_ajuste = {
+            "direction": direccion,
+            "window_error_rate": round(tasa_error, 3),
+            "window_median_seconds": round(mediana, 2),
+            "session_limit": self.limite_sesiones,
+            "pacing_seconds": round(self.pausa_s, 2),
+            "at": datetime.now().isoformat(),
+        }
+        return self.ultimo_ajuste
+
+    def resumen(self) -> Dict:
+        return {
+            "session_limit": self.limite_sesiones,
+            "session_bounds": [self.min_sesiones, self.max_sesiones],
+            "active_sessions": len(self.activas),
+            "waiting_sessions": len(self.esperando),
+            "pacing_seconds": round(self.pausa_s, 2),
+            "pacing_bounds_seconds": [self.pausa_minima_s, self.pausa_maxima_s],
+            "rate_ceiling_per_minute": self.tope_por_minuto,
+            "target_median_seconds": self.latencia_objetivo_s,
+            "max_error_rate": self.tasa_error_maxima,
+            "window_samples": len(self.ventana),
+            "increases": self.aumentos,
+            "decreases": self.reducciones,
+            "last_adjustment": self.ultimo_ajuste,
+        }
+
+
+controlador_concurrencia = ControladorConcurrencia.desde_entorno()
@@ -0,0 +1,69 @@
+"""
+Cancelación y pausa cooperativas de tareas en curso.
+
+El procesamiento consulta el ControlTarea de su tarea entre filas y entre los
+pasos del formulario (siempre antes de enviarlo, para no dejar una afiliación
+hecha sin registrar su código). Las esperas largas (backoff, circuit breaker,
+pausa entre filas) usan ControlTarea.esperar, que se corta al cancelar.
+"""
+import asyncio
+from typing import Dict, Optional
+
+
+class TareaCancelada(Exception):
+    """La tarea se canceló: cortar en el siguiente punto de control"""
+
+
+class ControlTarea:
+    """Banderas de cancelación/pausa de una tarea"""
+
+    def __init__(self):
+        self.cancelada = False
+        self.motivo: Optional[str] = None
+        self._activa = asyncio.Event()     # set = corriendo, clear = en pausa
+        self._activa.set()
+        self._cancelacion = asyncio.Event()
+
+    @property
+    def pausada(self) -> bool:
+        return not self._activa.is_set()
+
+    def cancelar(self, motivo: str = "Cancelada por el usuario"):
+        self.cancelada = True
+        self.motivo = motivo
+        self._cancelacion.set()
+        self._activa.set()  # despertar a quien espera en pausa
+
+    def pausar(self):
+        if not self.cancelada:
+            self._activa.clear()
+
+    def reanudar(self):
+        self._activa.set()
+
+    def verificar(self):
+        """Punto de control síncrono (entre pasos del formulario)"""
+        if self.cancelada:
+            raise TareaCancelada(self.motivo)
+
+    async def esperar_reanudacion(self):
+        await self._activa.wait()
+        self.verificar()
+
+    async def esperar(self, segundos: float):
+        """asyncio.sleep que termina antes (con TareaCancelada) si se cancela"""
+        self.verificar()
+        if segundos <= 0:
+            return
+        try:
+            await asyncio.wait_for(self._cancelacion.wait(), timeout=segundos)
+        except asyncio.TimeoutError:
+            return
+        self.verificar()
+
+
+controles_tareas: Dict[str, ControlTarea] = {}
+
+
+def obtener_control(task_id: str) -> ControlTarea:
+    return controles_tareas.setdefault(task_id, ControlTarea())
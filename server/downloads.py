@@ -0,0 +1,218 @@
+"""
+Descargas eficientes de resultados.
+
+- Exportación en streaming a CSV / JSONL desde los registros de la tarea
+- Negociación de Content-Encoding (zstd si está instalado `zstandard`, gzip)
+- Soporte de HTTP Range (descargas reanudables) para archivos grandes
+- Paquete ZIP con los resultados de varias tareas
+"""
+import csv
+import io
+import json
+import os
+import re
+import tempfile
+import zipfile
+import zlib
+from typing import Iterable, Iterator, List, Optional, Sequence, Tuple
+
+from fastapi import HTTPException
+from fastapi.responses import FileResponse, StreamingResponse
+
+try:  # Dependencia opcional
+    import zstandard
+except ImportError:  # pragma: no cover - depende del entorno
+    zstandard = None
+
+TAMANO_BLOQUE = 64 * 1024
+MEDIA_XLSX = "application/vnd.openxmlformats-officedocument.spreadsheetml.sheet"
+
+FORMATOS_EXPORTACION = {
+    "csv": ("text/csv; charset=utf-8", ".csv"),
+    "jsonl": ("application/x-ndjson", ".jsonl"),
+}
+
+PATRON_RANGO = re.compile(r"^bytes=(\d*)-(\d*)$")
+
+
+# === SERIALIZACIÓN EN STREAMING ===
+def iterar_csv(encabezados: Sequence[str], filas: Iterable[Sequence]) -> Iterator[bytes]:
+    """Generar el CSV en bloques de ~64 KB sin materializarlo completo"""
+    buffer = io.StringIO()
+    escritor = csv.writer(buffer)
+    escritor.writerow(encabezados)
+    for fila in filas:
+        escritor.writerow(fila)
+        if buffer.tell() >= TAMANO_BLOQUE:
+            yield buffer.getvalue().encode("utf-8")
+            buffer.seek(0)
+            buffer.truncate()
+    if buffer.tell():
+        yield buffer.getvalue().encode("utf-8")
+
+
+def iterar_jsonl(claves: Sequence[str], filas: Iterable[Sequence]) -> Iterator[bytes]:
+    """Generar JSON Lines (un objeto por registro) en bloques"""
+    partes, tamano = [], 0
+    for fila in filas:
+        linea = json.dumps(dict(zip(claves, fila)), ensure_ascii=False, default=str) + "\n"
+        partes.append(linea)
+        tamano += len(linea)
+        if tamano >= TAMANO_BLOQUE:
+            yield "".join(partes).encode("utf-8")
+            partes, tamano = [], 0
+    if partes:
+        yield "".join(partes).encode("utf-8")
+
+
+# === COMPRESIÓN ===
+def elegir_codificacion(accept_encoding: Optional[str]) -> Optional[str]:
+    """Elegir la mejor codificación soportada según Accept-Encoding (respeta q=0)"""
+    aceptadas = {}
+    for parte in (accept_encoding or "").split(","):
+        parte = parte.strip()
+        if not parte:
+            continue
+        nombre, _, parametros = parte.partition(";")
+        calidad = 1.0
+        match = re.search(r"q=([0-9.]+)", parametros)
+        if match:
+            try:
+                calidad = float(match.group(1))
+            except ValueError:
+                calidad = 0.0
+        aceptadas[nombre.strip().lower()] = calidad
+
+    candidatas = []
+    if zstandard is not None:
+        candidatas.append("zstd")
+    candidatas.append("gzip")
+
+    for codificacion in candidatas:
+        calidad = aceptadas.get(codificacion, aceptadas.get("*", 0.0))
+        if calidad > 0:
+            return codificacion
+    return None
+
+
+def comprimir(bloques: Iterable[bytes], codificacion: Optional[str]) -> Iterator[bytes]:
+    """Comprimir un flujo de bytes de forma incremental"""
+    if codificacion is None:
+        yield from bloques
+        return
+
+    if codificacion == "zstd":
+        compresor = zstandard.ZstdCompressor(level=3).compressobj()
+    else:
+        compresor = zlib.compressobj(6, zlib.DEFLATED, 31)  # wbits=31 -> formato gzip
+
+    for bloque in bloques:
+        salida = compresor.compress(bloque)
+        if salida:
+            yield salida
+    yield compresor.flush()
+
+
+def respuesta_exportacion(
+    bloques: Iterable[bytes],
+    formato: str,
+    nombre_base: str,
+    accept_encoding: Optional[str],
+) -> StreamingResponse:
+    """StreamingResponse con el Content-Encoding negociado"""
+    media_type, extension = FORMATOS_EXPORTACION[formato]
+    codificacion = elegir_codificacion(accept_encoding)
+    headers = {
+        "Content-Disposition": f"attachment; filename={nombre_base}{extension}",
+        "Vary": "Accept-Encoding",
+    }
+    if codificacion:
+        headers["Content-Encoding"] = codificacion
+    return StreamingResponse(comprimir(bloques, codificacion), media_type=media_type, headers=headers)
+
+
+# === RANGOS HTTP ===
+def parsear_rango(cabecera: str, tamano: int) -> Optional[Tuple[int, int]]:
+    """Convertir 'bytes=inicio-fin' en (inicio, fin) inclusivos. None si no aplica"""
+    match = PATRON_RANGO.match(cabecera.strip())
+    if not match:
+        return None  # Rangos múltiples o inválidos: se ignora y se envía completo
+    inicio_txt, fin_txt = match.groups()
+    if not inicio_txt and not fin_txt:
+        return None
+    if not inicio_txt:  # Sufijo: últimos N bytes
+        longitud = int(fin_txt)
+        if longitud == 0:
+            raise HTTPException(status_code=416, detail="Rango no satisfacible",
+                                headers={"Content-Range": f"bytes */{tamano}"})
+        return max(0, tamano - longitud), tamano - 1
+    inicio = int(inicio_txt)
+    fin = int(fin_txt) if fin_txt else tamano - 1
+    if inicio >= tamano or fin < inicio:
+        raise HTTPException(status_code=416, detail="Rango no satisfacible",
+                            headers={"Content-Range": f"bytes */{tamano}"})
+    return inicio, min(fin, tamano - 1)
+
+
+def _leer_rango(ruta: str, inicio: int, fin: int) -> Iterator[bytes]:
+    with open(ruta, "rb") as archivo:
+        archivo.seek(inicio)
+        restantes = fin - inicio + 1
+        while restantes > 0:
+            bloque = archivo.read(min(TAMANO_BLOQUE, restantes))
+            if not bloque:
+                break
+            restantes -= len(bloque)
+            yield bloque
+
+
+def respuesta_archivo(ruta: str, nombre: str, media_type: str, cabecera_rango: Optional[str] = None,
+                      cabecera_if_range: Optional[str] = None):
+    """FileResponse con soporte de Range/If-Range para reanudar descargas"""
+    info = os.stat(ruta)
+    etag = f'"{int(info.st_mtime)}-{info.st_size}"'
+    headers = {
+        "Accept-Ranges": "bytes",
+        "ETag": etag,
+        "Content-Disposition": f"attachment; filename={nombre}",
+    }
+
+    rango = None
+    if cabecera_rango and (not cabecera_if_range or cabecera_if_range == etag):
+        rango = parsear_rango(cabecera_rango, info.st_size)
+
+    if rango is None:
+        return FileResponse(path=ruta, media_type=media_type, filename=nombre, headers=headers, stat_result=info)
+
+    inicio, fin = rango
+    headers["Content-Range"] = f"bytes {inicio}-{fin}/{info.st_size}"
+    headers["Content-Length"] = str(fin - inicio + 1)
+    return StreamingResponse(_leer_rango(ruta, inicio, fin), status_code=206, media_type=media_type, headers=headers)
+
+
+# === PAQUETE ZIP ===
+def construir_zip(entradas: List[Tuple[str, object]]) -> Iterator[bytes]:
+    """
+    Construir un ZIP y emitirlo en bloques.
+
+    entradas: [(nombre_en_zip, ruta_archivo | iterable de bytes)]
+    Los .xlsx ya están comprimidos, así que se guardan sin recomprimir.
+    """
+    with tempfile.SpooledTemporaryFile(max_size=8 * 1024 * 1024) as temporal:
+        with zipfile.ZipFile(temporal, "w") as paquete:
+            for nombre, origen in entradas:
+                metodo = zipfile.ZIP_STORED if nombre.endswith(".xlsx") else zipfile.ZIP_DEFLATED
+                if isinstance(origen, str):
+                    paquete.write(origen, arcname=nombre, compress_type=metodo)
+                else:
+                    info = zipfile.ZipInfo(nombre)
+                    info.compress_type = metodo
+                    with paquete.open(info, "w") as destino:
+                        for bloque in origen:
+                            destino.write(bloque)
+        temporal.seek(0)
+        while True:
+            bloque = temporal.read(TAMANO_BLOQUE)
+            if not bloque:
+                break
+            yield bloque
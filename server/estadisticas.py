@@ -0,0 +1,322 @@
+"""
+Estadísticas de afiliación mantenidas de forma incremental (para GET /stats).
+
+Cada fila terminada actualiza, en O(1), los agregados de todas las vistas que
+se pueden consultar: total, por afiliador, por tipo de afiliación, por
+afiliador y tipo, por día y hora, y por afiliador/tipo y día. Consultar es leer
+esos agregados: el costo no depende de cuántas tareas o filas haya en la
+historia.
+
+Cada agregado guarda solo estructuras de tamaño fijo:
+- contadores (filas, exitosas, errores) y suma de segundos medidos
+- histograma logarítmico de la latencia por huésped (mediana aproximada, ±12%)
+- Space-Saving de los motivos de error (top-k con memoria acotada)
+
+Las vistas por hora/día conservan solo los últimos STATS_HOURLY_BUCKETS /
+STATS_DAILY_BUCKETS periodos. El estado se guarda en disco (JSON) al terminar
+cada tarea.
+
+Configuración por entorno:
+    STATS_STATE_FILE       Archivo donde persistir las estadísticas (estadisticas.json)
+    STATS_HOURLY_BUCKETS   Horas que se conservan (48)
+    STATS_DAILY_BUCKETS    Días que se conservan (90)
+"""
+import json
+import math
+import os
+import re
+import threading
+from datetime import datetime
+from typing import Dict, List, Optional, Tuple
+
+# Histograma: 0.1 s * 1.25^i, hasta ~2 horas por huésped
+LATENCIA_MINIMA_S = 0.1
+RAZON_CUBETAS = 1.25
+CUBETAS_LATENCIA = 52
+
+CAPACIDAD_ERRORES = 50   # Motivos vigilados por agregado (Space-Saving)
+TOP_ERRORES = 5
+
+ESTADO_EXITOSO = "EXITOSO"
+
+# Partes variables de las observaciones que no forman parte del motivo
+_SUFIJOS_MOTIVO = re.compile(r"\s*(\(intentos: \d+\)|\[reintento #.*\])\s*$")
+_CORREO = re.compile(r"[\w.+\-]+@[\w\-]+(\.[\w\-]+)+")
+_NUMEROS = re.compile(r"\d+")
+_ESPACIOS = re.compile(r"\s+")
+
+
+def motivo_error(observaciones: str, nombre: str = "", correo: str = "") -> str:
+    """Observaciones -> motivo agrupable (sin nombres, correos ni números)"""
+    motivo = str(observaciones or "Sin detalle")
+    anterior = None
+    while anterior != motivo:
+        anterior, motivo = motivo, _SUFIJOS_MOTIVO.sub("", motivo)
+    if nombre:
+        motivo = motivo.replace(nombre, "<huésped>")
+    if correo:
+        motivo = motivo.replace(correo, "<correo>")
+    motivo = _NUMEROS.sub("#", _CORREO.sub("<correo>", motivo))
+    return _ESPACIOS.sub(" ", motivo).strip()[:120]
+
+
+def _cubeta_latencia(segundos: float) -> int:
+    if segundos <= LATENCIA_MINIMA_S:
+        return 0
+    indice = int(math.log(segundos / LATENCIA_MINIMA_S, RAZON_CUBETAS)) + 1
+    return min(indice, CUBETAS_LATENCIA - 1)
+
+
+def _valor_cubeta(indice: int) -> float:
+    """Centro (geométrico) de la cubeta"""
+    if indice == 0:
+        return LATENCIA_MINIMA_S
+    return LATENCIA_MINIMA_S * RAZON_CUBETAS ** (indice - 0.5)
+
+
+class Agregado:
+    """Contadores de tamaño fijo de un conjunto de filas"""
+
+    def __init__(self):
+        self.filas = 0
+        self.exitosas = 0
+        self.segundos = 0.0
+        self.medidas = 0
+        self.histograma = [0] * CUBETAS_LATENCIA
+        self.errores: Dict[str, int] = {}
+        self.primera: Optional[float] = None
+        self.ultima: Optional[float] = None
+
+    def registrar(self, exito: bool, segundos: Optional[float], motivo: Optional[str], momento: float):
+        self.filas += 1
+        if exito:
+            self.exitosas += 1
+        if segundos is not None and segundos >= 0:
+            self.segundos += segundos
+            self.medidas += 1
+            self.histograma[_cubeta_latencia(segundos)] += 1
+        if motivo:
+            self._contar_error(motivo)
+        self.primera = momento if self.primera is None else min(self.primera, momento)
+        self.ultima = momento if self.ultima is None else max(self.ultima, momento)
+
+    def _contar_error(self, motivo: str):
+        """Space-Saving: si no hay lugar, el motivo nuevo hereda el conteo del menor"""
+        if motivo in self.errores or len(self.errores) < CAPACIDAD_ERRORES:
+            self.errores[motivo] = self.errores.get(motivo, 0) + 1
+            return
+        menor = min(self.errores, key=self.errores.get)
+        self.errores[motivo] = self.errores.pop(menor) + 1
+
+    def mediana(self) -> Optional[float]:
+        if not self.medidas:
+            return None
+        objetivo, acumulado = self.medidas / 2, 0
+        for indice, cantidad in enumerate(self.histograma):
+            acumulado += cantidad
+            if acumulado >= objetivo:
+                return _valor_cubeta(indice)
+        return None
+
+    def ventana_segundos(self) -> Optional[float]:
+        """Tiempo de reloj que cubren las filas: de la primera a la última, más lo que tardó la primera"""
+        if self.primera is None:
+            return None
+        media = self.segundos / self.medidas if self.medidas else 0.0
+        return (self.ultima - self.primera) + media or None
+
+    def resumen(self) -> Dict:
+        errores = self.filas - self.exitosas
+        mediana = self.mediana()
+        ventana = self.ventana_segundos()
+        return {
+            "guests": self.filas,
+            "successful": self.exitosas,
+            "failed": errores,
+            "success_rate": round(self.exitosas / self.filas * 100, 2) if self.filas else None,
+            "guests_per_hour": round(self.filas / ventana * 3600, 1) if ventana else None,
+            "guests_per_session_hour": round(self.medidas / self.segundos * 3600, 1) if self.segundos else None,
+            "median_seconds_per_guest": round(mediana, 2) if mediana is not None else None,
+            "top_errors": [
+                {"reason": motivo, "count": cantidad}
+                for motivo, cantidad in sorted(self.errores.items(), key=lambda e: -e[1])[:TOP_ERRORES]
+            ],
+            "first_at": datetime.fromtimestamp(self.primera).isoformat() if self.primera else None,
+            "last_at": datetime.fromtimestamp(self.ultima).isoformat() if self.ultima else None,
+        }
+
+    def a_dict(self) -> Dict:
+        return dict(vars(self))
+
+    @classmethod
+    def desde_dict(cls, datos: Dict):
+        agregado = cls()
+        for clave, valor in datos.items():
+            if hasattr(agregado, clave):
+                setattr(agregado, clave, valor)
+        if len(agregado.histograma) != CUBETAS_LATENCIA:
+            agregado.histograma = [0] * CUBETAS_LATENCIA
+            agregado.medidas, agregado.segundos = 0, 0.0
+        return agregado
+
+
+# Vistas: nombre -> dimensiones de su clave
+VISTAS = {
+    "total": (),
+    "afiliador": ("afiliador",),
+    "tipo": ("tipo",),
+    "afiliador_tipo": ("afiliador", "tipo"),
+    "dia": ("dia",),
+    "hora": ("hora",),
+    "afiliador_dia": ("afiliador", "dia"),
+    "tipo_dia": ("tipo", "dia"),
+}
+
+Clave = Tuple[str, ...]
+
+
+class EstadisticasAfiliacion:
+    """Agregados por vista, actualizados fila por fila"""
+
+    def __init__(self, horas: int = 48, dias: int = 90, ruta: Optional[str] = None):
+        self.horas = horas
+        self.dias = dias
+        self.ruta = ruta
+        self._vistas: Dict[str, Dict[Clave, Agregado]] = {vista: {} for vista in VISTAS}
+        self._lock = threading.Lock()
+        self._dia_actual: Optional[str] = None
+
+    @classmethod
+    def desde_entorno(cls):
+        estadisticas = cls(
+            horas=int(os.getenv("STATS_HOURLY_BUCKETS", "48")),
+            dias=int(os.getenv("STATS_DAILY_BUCKETS", "90")),
+            ruta=os.getenv("STATS_STATE_FILE", "estadisticas.json"),
+        )
+        estadisticas.cargar()
+        return estadisticas
+
+    # === ACTUALIZACIÓN ===
+    def registrar_fila(self, afiliador: str, tipo: str, estado: str, observaciones: str = "",
+                       segundos: Optional[float] = None, nombre: str = "", correo: str = "",
+                       momento: Optional[datetime] = None):
+        momento = momento or datetime.now()
+        exito = estado == ESTADO_EXITOSO
+        motivo = None if exito else motivo_error(observaciones, nombre, correo)
+        valores = {
+            "afiliador": (afiliador or "").strip() or "(sin afiliador)",
+            "tipo": (tipo or "").lower() or "(sin tipo)",
+            "dia": momento.strftime("%Y-%m-%d"),
+            "hora": momento.strftime("%Y-%m-%dT%H:00"),
+        }
+        marca = momento.timestamp()
+        with self._lock:
+            for vista, dimensiones in VISTAS.items():
+                clave = tuple(valores[d] for d in dimensiones)
+                agregados = self._vistas[vista]
+                if clave not in agregados:
+                    agregados[clave] = Agregado()
+                agregados[clave].registrar(exito, segundos, motivo, marca)
+            if valores["dia"] != self._dia_actual:
+                self._dia_actual = valores["dia"]
+                self._podar()
+            self._podar_horas()
+
+    def _podar_horas(self):
+        horas = self._vistas["hora"]
+        while len(horas) > self.horas:
+            del horas[min(horas)]
+
+    def _podar(self):
+        """Descartar los días fuera de la ventana (una vez por día nuevo)"""
+        dias = sorted({clave[-1] for vista in ("dia", "afiliador_dia", "tipo_dia") for clave in self._vistas[vista]})
+        vencidos = set(dias[:-self.dias]) if len(dias) > self.dias else set()
+        if not vencidos:
+            return
+        for vista in ("dia", "afiliador_dia", "tipo_dia"):
+            agregados = self._vistas[vista]
+            for clave in [c for c in agregados if c[-1] in vencidos]:
+                del agregados[clave]
+
+    # === CONSULTAS ===
+    def _resumen(self, vista: str, clave: Clave) -> Optional[Dict]:
+        agregado = self._vistas[vista].get(clave)
+        return agregado.resumen() if agregado else None
+
+    def consultar(self, afiliador: Optional[str] = None, tipo: Optional[str] = None,
+                  granularidad: str = "dia", periodos: Optional[int] = None) -> Dict:
+        """
+        Sin filtros: total, por afiliador, por tipo y serie de tiempo.
+        Con afiliador y/o tipo: ese agregado y su serie diaria.
+        """
+        afiliador = afiliador.strip() if afiliador else None
+        tipo = tipo.lower() if tipo else None
+        with self._lock:
+            if afiliador and tipo:
+                return {
+                    "filters": {"nombre_afiliador": afiliador, "tipo_afiliacion": tipo},
+                    "summary": self._resumen("afiliador_tipo", (afiliador, tipo)),
+                }
+            if afiliador or tipo:
+                vista, valor = ("afiliador", afiliador) if afiliador else ("tipo", tipo)
+                serie = sorted(
+                    (clave[1], agregado) for clave, agregado in self._vistas[f"{vista}_dia"].items()
+                    if clave[0] == valor
+                )
+                return {
+                    "filters": {"nombre_afiliador": afiliador} if afiliador else {"tipo_afiliacion": tipo},
+                    "summary": self._resumen(vista, (valor,)),
+                    "by_day": self._serie(serie, periodos),
+                }
+
+            vista_tiempo = "hora" if granularidad == "hora" else "dia"
+            serie = sorted((clave[0], agregado) for clave, agregado in self._vistas[vista_tiempo].items())
+            return {
+                "summary": self._resumen("total", ()),
+                "by_affiliator": {
+                    clave[0]: agregado.resumen() for clave, agregado in sorted(self._vistas["afiliador"].items())
+                },
+                "by_type": {clave[0]: agregado.resumen() for clave, agregado in sorted(self._vistas["tipo"].items())},
+                f"by_{'hour' if vista_tiempo == 'hora' else 'day'}": self._serie(serie, periodos),
+            }
+
+    @staticmethod
+    def _serie(serie: List[Tuple[str, Agregado]], periodos: Optional[int]) -> List[Dict]:
+        if periodos:
+            serie = serie[-periodos:]
+        return [{"bucket": periodo, **agregado.resumen()} for periodo, agregado in serie]
+
+    # === PERSISTENCIA ===
+    def guardar(self):
+        if not self.ruta:
+            return
+        with self._lock:
+            datos = {
+                vista: [[list(clave), agregado.a_dict()] for clave, agregado in agregados.items()]
+                for vista, agregados in self._vistas.items()
+            }
+        temporal = f"{self.ruta}.{os.getpid()}.tmp"
+        try:
+            with open(temporal, "w", encoding="utf-8") as f:
+                json.dump(datos, f, ensure_ascii=False)
+            os.replace(temporal, self.ruta)
+        except OSError as e:
+            print(f"[⚠️] No se pudieron guardar las estadísticas: {e}")
+
+    def cargar(self):
+        if not self.ruta or not os.path.exists(self.ruta):
+            return
+        try:
+            with open(self.ruta, encoding="utf-8") as f:
+                datos = json.load(f)
+        except (OSError, ValueError) as e:
+            print(f"[⚠️] Estadísticas ilegibles, se empieza de cero: {e}")
+            return
+        with self._lock:
+            for vista in VISTAS:
+                self._vistas[vista] = {
+                    tuple(clave): Agregado.desde_dict(agregado) for clave, agregado in datos.get(vista, [])
+                }
+
+
+estadisticas_afiliacion = EstadisticasAfiliacion.desde_entorno()
@@ -0,0 +1,197 @@
+"""
+Detección automática del layout de encabezados en reportes Excel.
+
+Los reportes de distintas versiones del PMS cambian la fila de encabezados y
+el orden de columnas. detectar_diseno revisa solo las primeras filas, busca la
+fila de encabezados y ubica reserva/nombre/correo por coincidencia aproximada
+del texto (difflib). La huella de la fila de encabezados se guarda en un caché
+LRU, de modo que las cargas repetidas de un layout conocido se resuelven con un
+hash y pasan directo a una lectura con `usecols`.
+
+Configuración por entorno:
+    EXCEL_HEADER_SCAN_ROWS   Filas revisadas para encontrar encabezados (15)
+    EXCEL_LAYOUT_CACHE_SIZE  Layouts recordados en el caché (64)
+"""
+import difflib
+import hashlib
+import os
+import re
+import threading
+import unicodedata
+from collections import OrderedDict
+from dataclasses import dataclass
+from typing import Dict, List, Optional, Sequence
+
+FILAS_ESCANEO = int(os.getenv("EXCEL_HEADER_SCAN_ROWS", "15"))
+TAMANO_CACHE = int(os.getenv("EXCEL_LAYOUT_CACHE_SIZE", "64"))
+
+# Similitud mínima (0-1) para aceptar un encabezado como coincidencia
+UMBRAL_SIMILITUD = 0.75
+
+CAMPOS_REQUERIDOS = ("nombre", "correo")
+
+ALIAS_ENCABEZADOS = {
+    "reserva": (
+        "no rsrv", "no reserva", "numero de reserva", "reserva", "rsrv",
+        "reservation", "reservation number", "confirmation", "confirmacion", "folio",
+    ),
+    "nombre": (
+        "nombre del huesped", "nombre huesped", "nombre completo", "nombre",
+        "huesped", "guest name", "guest", "name",
+    ),
+    "correo": (
+        "correo electronico", "correo", "email", "e mail", "email address", "mail",
+    ),
+}
+
+
+@dataclass(frozen=True)
+class DisenoHoja:
+    """Layout resuelto: fila de encabezados (índice 0) y columna de cada campo"""
+    fila_encabezado: int
+    columnas: Dict[str, int]
+    desde_cache: bool = False
+
+    @property
+    def usecols(self) -> List[int]:
+        return sorted(self.columnas.values())
+
+
+# Layout histórico (headers en fila 4, columnas C/G/I), usado como respaldo
+DISENO_CLASICO = DisenoHoja(fila_encabezado=3, columnas={"reserva": 2, "nombre": 6, "correo": 8})
+
+
+def normalizar_texto(valor) -> str:
+    """Minúsculas, sin acentos ni puntuación y con espacios simples"""
+    if valor is None:
+        return ""
+    texto = str(valor)
+    if texto.lower() in ("nan", "none"):
+        return ""
+    texto = unicodedata.normalize("NFKD", texto).encode("ascii", "ignore").decode("ascii")
+    return re.sub(r"[^a-z0-9]+", " ", texto.lower()).strip()
+
+
+def huella_encabezado(celdas: Sequence) -> Optional[str]:
+    """Hash estable de una fila de encabezados (ignora celdas vacías al final)"""
+    normalizadas = [normalizar_texto(celda) for celda in celdas]
+    while normalizadas and not normalizadas[-1]:
+        normalizadas.pop()
+    if not any(normalizadas):
+        return None
+    return hashlib.sha1("|".join(normalizadas).encode("utf-8")).hexdigest()
+
+
+def _similitud(celda: str, alias: str) -> float:
+    if not celda:
+        return 0.0
+    if celda == alias:
+        return 1.0
+    if set(alias.split()) <= set(celda.split()):
+        return 0.9
+    return difflib.SequenceMatcher(None, celda, alias).ratio()
+
+
+def _mapear_fila(celdas: Sequence) -> Dict[str, tuple]:
+    """Mejor columna por campo: {campo: (puntaje, índice)} sin repetir columnas"""
+    normalizadas = [normalizar_texto(celda) for celda in celdas]
+    candidatos = []
+    for campo, alias in ALIAS_ENCABEZADOS.items():
+        for indice, celda in enumerate(normalizadas):
+            puntaje = max(_similitud(celda, nombre) for nombre in alias)
+            if puntaje >= UMBRAL_SIMILITUD:
+                candidatos.append((puntaje, campo, indice))
+
+    asignados: Dict[str, tuple] = {}
+    usadas = set()
+    for puntaje, campo, indice in sorted(candidatos, reverse=True):
+        if campo in asignados or indice in usadas:
+            continue
+        asignados[campo] = (puntaje, indice)
+        usadas.add(indice)
+    return asignados
+
+
+def detectar_diseno(filas: Sequence[Sequence]) -> Optional[DisenoHoja]:
+    """
+    Buscar la fila de encabezados entre las primeras filas.
+    Devuelve None si ninguna fila contiene al menos nombre y correo.
+    """
+    mejor, mejor_puntaje = None, 0.0
+    for numero, celdas in enumerate(filas[:FILAS_ESCANEO]):
+        asignados = _mapear_fila(celdas)
+        if not all(campo in asignados for campo in CAMPOS_REQUERIDOS):
+            continue
+        puntaje = sum(valor for valor, _ in asignados.values())
+        if puntaje > mejor_puntaje:
+            mejor_puntaje = puntaje
+            mejor = DisenoHoja(
+                fila_encabezado=numero,
+                columnas={campo: indice for campo, (_, indice) in asignados.items()},
+            )
+    return mejor
+
+
+class CacheDisenos:
+    """Caché LRU huella-de-encabezados -> columnas (seguro entre hilos)"""
+
+    def __init__(self, capacidad: int = TAMANO_CACHE):
+        self.capacidad = capacidad
+        self._datos: "OrderedDict[str, Dict[str, int]]" = OrderedDict()
+        self._lock = threading.Lock()
+        self.aciertos = 0
+        self.fallos = 0
+
+    def buscar(self, huella: str) -> Optional[Dict[str, int]]:
+        with self._lock:
+            columnas = self._datos.get(huella)
+            if columnas is not None:
+                self._datos.move_to_end(huella)
+            return columnas
+
+    def guardar(self, huella: str, columnas: Dict[str, int]):
+        with self._lock:
+            self._datos[huella] = dict(columnas)
+            self._datos.move_to_end(huella)
+            while len(self._datos) > self.capacidad:
+                self._datos.popitem(last=False)
+
+    def resumen(self) -> Dict:
+        return {"layouts": len(self._datos), "aciertos": self.aciertos, "fallos": self.fallos}
+
+
+cache_disenos = CacheDisenos()
+
+
+def resolver_diseno(filas: Sequence[Sequence], cache: CacheDisenos = cache_disenos) -> Optional[DisenoHoja]:
+    """Layout de una hoja a partir de sus primeras filas, usando el caché si es posible"""
+    huellas = [huella_encabezado(celdas) for celdas in filas[:FILAS_ESCANEO]]
+    for numero, huella in enumerate(huellas):
+        if huella is None:
+            continue
+        columnas = cache.buscar(huella)
+        if columnas is not None:
+            cache.aciertos += 1
+            return DisenoHoja(fila_encabezado=numero, columnas=columnas, desde_cache=True)
+
+    cache.fallos += 1
+    diseno = detectar_diseno(filas)
+    if diseno is not None:
+        cache.guardar(huellas[diseno.fila_encabezado], diseno.columnas)
+    return diseno
+
+
+def diseno_de_hoja(filas: Sequence[Sequence], origen: str = "") -> DisenoHoja:
+    """
+    resolver_diseno con respaldo al layout clásico (encabezados en fila 4,
+    columnas C/G/I). ValueError si la hoja está vacía o no tiene el formato.
+    """
+    if not any(celda is not None for celdas in filas for celda in celdas):
+        raise ValueError("La hoja está vacía")
+    diseno = resolver_diseno(filas)
+    if diseno is None:
+        if max(len(celdas) for celdas in filas) < 9 or len(filas) <= 4:
+            raise ValueError("No se encontró una fila de encabezados con columnas de nombre y correo")
+        print(f"[⚠️] [{origen}] Encabezados no reconocidos, usando layout clásico (fila 4, columnas C/G/I)")
+        diseno = DISENO_CLASICO
+    return diseno
@@ -0,0 +1,469 @@
+"""
+Motor de afiliación sin navegador (HTTP plano) con respaldo en Selenium.
+
+ProcesadorHTTP hace el mismo flujo que MarriottProcessor con un cliente httpx
+(conexiones keep-alive reutilizadas entre filas):
+
+1. GET del formulario y lectura de sus campos (html.parser de la librería estándar)
+2. Se copian los campos ocultos de ASP.NET (__VIEWSTATE, __EVENTVALIDATION...)
+   y __EVENTTARGET se toma del __doPostBack(...) del botón de envío del perfil
+   (ctl00_PartialEnrollFormPlaceholder_partial_enroll_EnrollButton)
+3. POST con nombre, apellido, correo, país y checkboxes
+4. Código de afiliación con los patrones del perfil sobre el texto de la confirmación
+
+Cuando el flujo HTTP no puede completarse ANTES de enviar (formulario no
+reconocido, botón sin postback, el sitio bloquea al cliente) el resultado lleva
+"requiere_navegador" y ProcesadorHibrido repite la fila con Selenium. Después
+de enviar no se cambia de motor: un envío rechazado o una respuesta sin código
+(aunque vuelva el formulario) es un fallo transitorio, igual que en Selenium, y
+lo maneja la política de reintentos.
+
+Es el motor "http" de motores.py (ENROLLMENT_ENGINE=http o motor=http por tarea).
+
+Configuración por entorno:
+    HTTP_MAX_CONNECTIONS   Conexiones máximas del cliente HTTP por sesión (4)
+    HTTP_FALLBACK_LIMIT    Respaldos seguidos tras los que la sesión se queda en Selenium (3)
+"""
+import os
+import re
+import time
+from html.parser import HTMLParser
+from typing import Dict, List, Optional, Tuple
+from urllib.parse import urljoin
+
+import httpx
+
+from control_tareas import TareaCancelada
+from motores import MotorAfiliacion
+from normalizacion import normalizar_nombre
+from retry_policy import PERMANENTE, clasificar_excepcion
+from site_config import obtener_perfil
+
+MAX_CONEXIONES = int(os.getenv("HTTP_MAX_CONNECTIONS", "4"))
+LIMITE_RESPALDOS = int(os.getenv("HTTP_FALLBACK_LIMIT", "3"))
+
+# Mismo user agent que las opciones de Chrome de MarriottProcessor
+USER_AGENT = (
+    "Mozilla/5.0 (Linux; x86_64) AppleWebKit/537.36 (KHTML, like Gecko) "
+    "Chrome/120.0.0.0 Safari/537.36"
+)
+CABECERAS = {
+    "User-Agent": USER_AGENT,
+    "Accept": "text/html,application/xhtml+xml,application/xml;q=0.9,*/*;q=0.8",
+    "Accept-Language": "es-MX,es;q=0.9,en;q=0.8",
+}
+
+_POSTBACK = re.compile(r"__doPostBack\(\s*['\"]([^'\"]+)['\"]\s*,\s*['\"]([^'\"]*)['\"]")
+
+# Respuestas del GET que suelen ser bloqueo de clientes sin navegador
+ESTADOS_BLOQUEO = {401, 403, 405, 406, 429}
+
+
+class FormularioNoReconocido(Exception):
+    """El HTML no tiene el formulario/campos del perfil: el flujo necesita navegador"""
+
+
+# === LECTURA DEL HTML ===
+class _LectorFormularios(HTMLParser):
+    """Formularios (campos, selects, botones) y texto visible de una página"""
+
+    def __init__(self):
+        super().__init__(convert_charrefs=True)
+        self.formularios: List[Dict] = []
+        self.elementos_por_id: Dict[str, Dict] = {}
+        self.textos: List[str] = []
+        self._formulario: Optional[Dict] = None
+        self._select: Optional[Dict] = None
+        self._opcion: Optional[Dict] = None
+        self._ignorar = 0  # dentro de <script>/<style>
+
+    def handle_starttag(self, tag, attrs):
+        atributos = {clave: (valor if valor is not None else "") for clave, valor in attrs}
+        elemento = {"tag": tag, **atributos}
+        if atributos.get("id"):
+            self.elementos_por_id[atributos["id"]] = elemento
+
+        if tag in ("script", "style"):
+            self._ignorar += 1
+        elif tag == "form":
+            self._formulario = {**atributos, "campos": [], "selects": [], "botones": []}
+            self.formularios.append(self._formulario)
+        elif self._formulario is None:
+            return
+        elif tag == "input":
+            if atributos.get("type", "text").lower() in ("submit", "image", "button"):
+                self._formulario["botones"].append(elemento)
+            else:
+                self._formulario["campos"].append(elemento)
+        elif tag == "select":
+            self._select = {**elemento, "opciones": []}
+            self._formulario["selects"].append(self._select)
+        elif tag == "option" and self._select is not None:
+            self._opcion = {"value": atributos.get("value"), "texto": "", "selected": "selected" in atributos}
+            self._select["opciones"].append(self._opcion)
+        elif tag in ("a", "button"):
+            self._formulario["botones"].append(elemento)
+
+    def handle_endtag(self, tag):
+        if tag in ("script", "style"):
+            self._ignorar = max(0, self._ignorar - 1)
+        elif tag == "form":
+            self._formulario = None
+        elif tag == "select":
+            self._select = None
+        elif tag == "option":
+            self._opcion = None
+
+    def handle_data(self, data):
+        if self._ignorar:
+            return
+        if self._opcion is not None:
+            self._opcion["texto"] += data
+        texto = data.strip()
+        if texto:
+            self.textos.append(texto)
+
+    @property
+    def texto(self) -> str:
+        return "\n".join(self.textos)
+
+
+def leer_pagina(html: str) -> _LectorFormularios:
+    lector = _LectorFormularios()
+    lector.feed(html)
+    lector.close()
+    return lector
+
+
+# === MOTOR HTTP ===
+class ProcesadorHTTP(MotorAfiliacion):
+    """Afiliación por HTTP plano (sin navegador)"""
+
+    motor = "http"
+
+    def __init__(self, tipo_afiliacion, nombre_afiliador, task_id=None):
+        super().__init__(tipo_afiliacion, nombre_afiliador, task_id=task_id)
+        self.perfil = obtener_perfil(self.tipo_afiliacion)
+        self.cliente: Optional[httpx.AsyncClient] = None
+
+    async def preparar(self):
+        """Abrir el cliente HTTP (pool de conexiones keep-alive)"""
+        if self.cliente is None or self.cliente.is_closed:
+            self.cliente = httpx.AsyncClient(
+                headers=CABECERAS,
+                follow_redirects=True,
+                timeout=httpx.Timeout(self.perfil.esperas.timeout),
+                limits=httpx.Limits(max_connections=MAX_CONEXIONES, max_keepalive_connections=MAX_CONEXIONES),
+            )
+            print("[🌐] Cliente HTTP de afiliación listo")
+        return True
+
+    # === FORMULARIO ===
+    def _buscar_formulario(self, pagina: _LectorFormularios) -> Dict:
+        """Formulario del perfil (por id/name) o, si no, el primero con campo de correo"""
+        for estrategia, valor in self.perfil.localizadores["formulario"]:
+            for formulario in pagina.formularios:
+                if estrategia in ("id", "name") and formulario.get(estrategia) == valor:
+                    return formulario
+        nombres_correo = self._nombres_candidatos("email")
+        for formulario in pagina.formularios:
+            if any(campo.get("name") in nombres_correo for campo in formulario["campos"]):
+                return formulario
+        raise FormularioNoReconocido("Formulario de afiliación no encontrado en el HTML")
+
+    def _nombres_candidatos(self, campo: str) -> List[str]:
+        return [valor for estrategia, valor in self.perfil.localizadores[campo] if estrategia in ("id", "name")]
+
+    def _nombre_campo(self, formulario: Dict, campo: str) -> str:
+        """Atributo name del campo del perfil, localizado por id o name"""
+        elementos = formulario["campos"] + formulario["selects"]
+        for estrategia, valor in self.perfil.localizadores[campo]:
+            if estrategia not in ("id", "name"):
+                continue  # css/xpath solo tienen sentido en el navegador
+            for elemento in elementos:
+                if elemento.get(estrategia) == valor and elemento.get("name"):
+                    return elemento["name"]
+        raise FormularioNoReconocido(f"Campo '{campo}' no encontrado en el formulario")
+
+    def _valor_pais(self, formulario: Dict, nombre_select: str) -> str:
+        select = next(s for s in formulario["selects"] if s.get("name") == nombre_select)
+        valores = [opcion["value"] for opcion in select["opciones"] if opcion["value"] is not None]
+        if self.perfil.pais in valores:
+            return self.perfil.pais
+        for opcion in select["opciones"]:
+            if any(texto in opcion["texto"].lower() for texto in self.perfil.opciones_pais):
+                return opcion["value"] if opcion["value"] is not None else opcion["texto"].strip()
+        raise FormularioNoReconocido(f"País {self.perfil.pais} no disponible en el formulario")
+
+    def _campos_boton(self, pagina: _LectorFormularios, formulario: Dict) -> Dict[str, str]:
+        """Campos que agrega el clic en el botón de envío (postback de ASP.NET o submit)"""
+        for estrategia, valor in self.perfil.localizadores["boton_envio"]:
+            if estrategia != "id" or valor not in pagina.elementos_por_id:
+                continue
+            boton = pagina.elementos_por_id[valor]
+            postback = _POSTBACK.search(boton.get("href", "") + boton.get("onclick", ""))
+            if postback:
+                return {"__EVENTTARGET": postback.group(1), "__EVENTARGUMENT": postback.group(2)}
+            if boton.get("name"):
+                return {boton["name"]: boton.get("value", "")}
+        # Sin id conocido: primer submit del formulario
+        for boton in formulario["botones"]:
+            if boton.get("tag") == "input" and boton.get("name"):
+                return {boton["name"]: boton.get("value", "")}
+        raise FormularioNoReconocido("Botón de envío sin postback reconocible")
+
+    def armar_envio(self, pagina: _LectorFormularios, nombre, apellido, correo) -> Tuple[Dict[str, str], str]:
+        """Datos del POST (campos existentes, ocultos incluidos, + los del huésped) y action del formulario"""
+        formulario = self._buscar_formulario(pagina)
+        datos: Dict[str, str] = {}
+        for campo in formulario["campos"]:
+            nombre_campo = campo.get("name")
+            if not nombre_campo:
+                continue
+            tipo = campo.get("type", "text").lower()
+            if tipo == "checkbox":
+                # Igual que marcar_checkboxes_inteligente: se marcan todos
+                datos[nombre_campo] = campo.get("value") or "on"
+            elif tipo == "radio":
+                if "checked" in campo:
+                    datos[nombre_campo] = campo.get("value", "on")
+            else:
+                datos[nombre_campo] = campo.get("value", "")
+        for select in formulario["selects"]:
+            if not select.get("name"):
+                continue
+            elegida = next((o for o in select["opciones"] if o["selected"]), None) or next(iter(select["opciones"]), None)
+            datos[select["name"]] = (elegida["value"] or "") if elegida else ""
+
+        datos[self._nombre_campo(formulario, "nombre")] = nombre
+        datos[self._nombre_campo(formulario, "apellido")] = apellido
+        datos[self._nombre_campo(formulario, "email")] = correo
+        nombre_pais = self._nombre_campo(formulario, "pais")
+        datos[nombre_pais] = self._valor_pais(formulario, nombre_pais)
+        datos.update(self._campos_boton(pagina, formulario))
+        return datos, formulario.get("action") or ""
+
+    def buscar_codigo(self, pagina: _LectorFormularios) -> Optional[str]:
+        """Patrones del perfil sobre el texto visible (fechas descartadas)"""
+        texto = pagina.texto
+        for patron in self.perfil.patrones_codigo:
+            for match in patron.findall(texto):
+                if not self.perfil.patron_descartar.match(match):
+                    return match
+        return None
+
+    # === FLUJO ===
+    async def procesar_afiliacion(self, nombre_completo, correo, numero_reserva, nombre=None, apellido=None):
+        """Mismo contrato que MarriottProcessor.procesar_afiliacion"""
+        try:
+            print(f"[🔄] Procesando (HTTP): {nombre_completo} ({correo})")
+
+            es_valido, razon = self.es_correo_valido(correo)
+            if not es_valido:
+                return self._fallo(correo, f"Correo inválido: {razon}", PERMANENTE)
+
+            if nombre is None or apellido is None:
+                separado = normalizar_nombre(nombre_completo)
+                nombre, apellido = separado.nombre, separado.apellido
+            if not nombre or not apellido:
+                return self._fallo(correo, "Nombre completo debe tener al menos nombre y apellido", PERMANENTE)
+
+            self.correos_procesados.add(correo)
+            await self.preparar()
+
+            # 1. Formulario
+            respuesta = await self.cliente.get(self.perfil.url)
+            self._punto_control()
+            if respuesta.status_code in ESTADOS_BLOQUEO:
+                return self._fallo(correo, f"El sitio rechazó el cliente HTTP ({respuesta.status_code})",
+                                   requiere_navegador=True)
+            if respuesta.status_code >= 400:
+                return self._fallo(correo, f"Error HTTP {respuesta.status_code} al abrir el formulario")
+
+            # 2. Campos del envío
+            try:
+                datos, accion = self.armar_envio(leer_pagina(respuesta.text), nombre, apellido, correo)
+            except FormularioNoReconocido as e:
+                return self._fallo(correo, f"Formulario no reconocido: {e}", requiere_navegador=True)
+
+            # 3. Envío (último punto donde se puede cancelar)
+            self._punto_control()
+            destino = urljoin(str(respuesta.url), accion)
+            envio = await self.cliente.post(destino, data=datos, headers={"Referer": str(respuesta.url)})
+            print("[📤] Formulario enviado (HTTP)")
+
+            # Ya enviado: no se repite con otro motor (podría quedar afiliado dos veces)
+            if envio.status_code >= 500:
+                return self._fallo(correo, f"Error HTTP {envio.status_code} al enviar el formulario")
+            if envio.status_code >= 400:
+                return self._fallo(correo, f"Envío rechazado por el sitio ({envio.status_code})")
+
+            # 4. Código
+            confirmacion = leer_pagina(envio.text)
+            codigo = self.buscar_codigo(confirmacion)
+            if codigo:
+                print(f"[🎉] ¡ÉXITO! {nombre_completo} | Código: {codigo}")
+                return {
+                    "success": True,
+                    "codigo": codigo,
+                    "nombre": nombre_completo,
+                    "correo": correo,
+                    "reserva": numero_reserva
+                }
+            try:
+                self._buscar_formulario(confirmacion)
+            except FormularioNoReconocido:
+                return self._fallo(correo, "Código no encontrado en la página")
+            return self._fallo(correo, "El sitio devolvió el formulario tras el envío")
+
+        except TareaCancelada:
+            self.correos_procesados.discard(correo)
+            raise
+        except httpx.HTTPError as e:
+            error_msg = f"Error de conexión procesando {nombre_completo}: {type(e).__name__}: {e}"
+            print(f"[🚨] {error_msg}")
+            return self._fallo(correo, error_msg)
+        except Exception as e:
+            error_msg = f"Error procesando {nombre_completo}: {str(e)}"
+            print(f"[🚨] {error_msg}")
+            return self._fallo(correo, error_msg, clasificar_excepcion(e))
+
+    # === VIDA DE LA SESIÓN ===
+    async def sesion_activa(self):
+        return self.cliente is not None and not self.cliente.is_closed
+
+    async def close(self):
+        """Cerrar el cliente (reiniciar descarta también sus conexiones y cookies)"""
+        if self.cliente is not None:
+            await self.cliente.aclose()
+            self.cliente = None
+
+
+# === MOTOR HÍBRIDO ===
+class ProcesadorHibrido(MotorAfiliacion):
+    """
+    HTTP primero; Selenium (abierto solo cuando hace falta) para las filas que
+    el flujo HTTP no puede completar. Tras LIMITE_RESPALDOS respaldos seguidos
+    la sesión se queda en Selenium (el formulario cambió o el sitio bloquea).
+    """
+
+    motor = "http+selenium"
+
+    def __init__(self, tipo_afiliacion, nombre_afiliador, task_id=None):
+        # Sin super().__init__: task_id, control y contadores se delegan a los dos motores
+        self.tipo_afiliacion = tipo_afiliacion.lower()
+        self.nombre_afiliador = nombre_afiliador
+        self.http = ProcesadorHTTP(tipo_afiliacion, nombre_afiliador, task_id=task_id)
+        self.selenium = None
+        self.respaldos_seguidos = 0
+        self.respaldos = 0
+        self.solo_selenium = False
+        self._task_id = task_id
+        self._control = None
+
+    # task_id y control se propagan a ambos motores
+    @property
+    def task_id(self):
+        return self._task_id
+
+    @task_id.setter
+    def task_id(self, valor):
+        self._task_id = valor
+        for motor in (self.http, self.selenium):
+            if motor is not None:
+                motor.task_id = valor
+
+    @property
+    def control(self):
+        return self._control
+
+    @control.setter
+    def control(self, valor):
+        self._control = valor
+        for motor in (self.http, self.selenium):
+            if motor is not None:
+                motor.control = valor
+
+    @property
+    def reinicios(self):
+        return self.http.reinicios + (self.selenium.reinicios if self.selenium else 0)
+
+    @property
+    def reciclajes(self):
+        return self.selenium.reciclajes if self.selenium else 0
+
+    async def preparar(self):
+        """Solo el cliente HTTP; el navegador se abre al primer respaldo"""
+        if self.solo_selenium:
+            await self._obtener_selenium()
+            return True
+        return await self.http.preparar()
+
+    async def _obtener_selenium(self):
+        if self.selenium is None:
+            from selenium_processor import MarriottProcessor
+
+            self.selenium = MarriottProcessor(self.tipo_afiliacion, self.nombre_afiliador, task_id=self.task_id)
+            self.selenium.control = self.control
+            # Un solo conjunto de correos: los duplicados se detectan en ambos motores
+            self.selenium.correos_procesados = self.http.correos_procesados
+        if self.selenium.driver is None:
+            print("[🔁] Abriendo navegador para el respaldo Selenium...")
+            inicio = time.monotonic()
+            if not await self.selenium.preparar():
+                raise Exception("Error configurando ChromeDriver para el respaldo del motor HTTP")
+            print(f"[⏱️] Navegador de respaldo listo en {time.monotonic() - inicio:.1f}s")
+        return self.selenium
+
+    async def procesar_afiliacion(self, nombre_completo, correo, numero_reserva, nombre=None, apellido=None):
+        if not self.solo_selenium:
+            resultado = await self.http.procesar_afiliacion(
+                nombre_completo, correo, numero_reserva, nombre=nombre, apellido=apellido
+            )
+            if not resultado.get("requiere_navegador"):
+                self.respaldos_seguidos = 0
+                return resultado
+            self.respaldos += 1
+            self.respaldos_seguidos += 1
+            print(f"[🔁] Flujo HTTP incompleto ({resultado['error']}); respaldo con Selenium")
+            if self.respaldos_seguidos >= LIMITE_RESPALDOS:
+                self.solo_selenium = True
+                await self.http.close()
+                print(f"[🔁] {self.respaldos_seguidos} respaldos seguidos: la sesión continúa solo con Selenium")
+
+        selenium = await self._obtener_selenium()
+        return await selenium.procesar_afiliacion(
+            nombre_completo, correo, numero_reserva, nombre=nombre, apellido=apellido
+        )
+
+    # === VIDA DE LA SESIÓN ===
+    async def sesion_activa(self):
+        if self.selenium is not None and self.selenium.driver is not None:
+            return await self.selenium.sesion_activa()
+        return self.solo_selenium or await self.http.sesion_activa()
+
+    def motivo_reciclaje(self):
+        if self.selenium is not None and self.selenium.driver is not None:
+            return self.selenium.motivo_reciclaje()
+        return None
+
+    async def liberar(self):
+        await self.http.liberar()
+        if self.selenium is not None:
+            await self.selenium.liberar()
+
+    async def reiniciar_navegador(self):
+        if self.selenium is not None and self.selenium.driver is not None:
+            return await self.selenium.reiniciar_navegador()
+        return await self.http.reiniciar_navegador()
+
+    async def reciclar_navegador(self):
+        if self.selenium is not None and self.selenium.driver is not None:
+            return await self.selenium.reciclar_navegador()
+        return await self.http.reciclar_navegador()
+
+    async def close(self):
+        await self.http.close()
+        if self.selenium is not None:
+            await self.selenium.close()
+
@@ -0,0 +1,265 @@
+"""
+Ingesta en tubería: el procesamiento empieza antes de terminar de leer el libro.
+
+Sin esto, POST /procesar lee y valida el libro completo antes de crear la
+tarea, así que en archivos grandes el primer huésped espera todo el parseo.
+Aquí el parser (productor) y el navegador (consumidor) se solapan:
+
+- preparar_lectura: abre cada libro .xlsx en modo read_only de openpyxl y
+  resuelve el layout de cada hoja con sus primeras filas (los errores de
+  formato se siguen devolviendo como 400 antes de crear la tarea). Los .xls
+  se leen completos con el lector de pandas de main.py.
+- producir: recorre las filas en bloques (en un hilo), las valida,
+  normaliza y deduplica, y las pone en FlujoRegistros, una cola acotada: si
+  el navegador va atrás, el parser se detiene (backpressure).
+- FlujoRegistros: lo consume ejecutar_afiliaciones fila por fila. Mientras se
+  lee, el total todavía no se conoce (total_conocido es None) y el progreso
+  se calcula sobre lo leído hasta el momento.
+
+Solo en modo local: en modo cola los bloques se reparten con la tarea completa.
+
+Configuración por entorno:
+    INGEST_STREAMING      Activar la ingesta en tubería (1)
+    INGEST_QUEUE_SIZE     Registros leídos que pueden esperar al navegador (500)
+    INGEST_CHUNK_ROWS     Filas que el parser lee por bloque en su hilo (200)
+"""
+import asyncio
+import itertools
+import os
+from typing import Callable, Dict, Iterator, List, Optional
+
+from batch_ingest import limpiar_registro
+from excel_layout import FILAS_ESCANEO, diseno_de_hoja
+from normalizacion import estadisticas_vacias, normalizar_registro
+from registros import Registro
+
+INGESTA_CONTINUA = os.getenv("INGEST_STREAMING", "1").lower() in ("1", "true", "yes")
+CAPACIDAD_COLA = int(os.getenv("INGEST_QUEUE_SIZE", "500"))
+FILAS_POR_BLOQUE = int(os.getenv("INGEST_CHUNK_ROWS", "200"))
+
+# Filas de datos sin ningún registro válido tras las que se abandona una hoja
+FILAS_SIN_VALIDOS = 6
+
+_FIN = object()
+
+
+class FlujoRegistros:
+    """Cola acotada de registros normalizados entre el parser y el procesamiento"""
+
+    def __init__(self, capacidad: int = CAPACIDAD_COLA):
+        self.cola: asyncio.Queue = asyncio.Queue(maxsize=max(1, capacidad))
+        # Todos los registros aceptados, en orden (total parcial y /retry-failed)
+        self.registros: List[Registro] = []
+        self.normalizacion = estadisticas_vacias()
+        self.fuentes: Dict[str, int] = {}
+        self.duplicados: List[Dict] = []
+        self.terminado = False     # el productor terminó de leer
+        self.agotado = False       # el consumidor ya tomó el último registro
+        self.cancelado = False
+        self.error: Optional[str] = None
+        self.task_id: Optional[str] = None
+        self._vistos: Dict[str, Registro] = {}
+        self._primero = asyncio.Event()
+
+    @property
+    def total_conocido(self) -> Optional[int]:
+        return len(self.registros) if self.terminado else None
+
+    # === PRODUCTOR ===
+    async def poner(self, registro: Registro):
+        """Normalizar, deduplicar por correo y encolar (espera si la cola está llena)"""
+        registro = normalizar_registro(registro, self.normalizacion)
+        primero = self._vistos.get(registro["correo"])
+        if primero is not None:
+            self.duplicados.append({
+                "origen": registro.get("origen", ""),
+                "fila": registro["fila"],
+                "correo": registro["correo"],
+                "duplicado_de": f"{primero.get('origen', '')} fila {primero['fila']}",
+            })
+            return
+        self._vistos[registro["correo"]] = registro
+        self.registros.append(registro)
+        origen = registro.get("origen", "")
+        self.fuentes[origen] = self.fuentes.get(origen, 0) + 1
+        self._primero.set()
+        await self.cola.put(registro)
+
+    async def cerrar(self, error: Optional[str] = None):
+        self.terminado = True
+        self.error = error
+        self._vistos.clear()
+        self._primero.set()
+        if not self.cancelado:
+            await self.cola.put(_FIN)
+
+    def cancelar(self):
+        """El consumidor ya no leerá: liberar al productor si espera lugar en la cola"""
+        self.cancelado = True
+        self._primero.set()
+        while not self.cola.empty():
+            self.cola.get_nowait()
+
+    # === CONSUMIDOR ===
+    async def esperar_primer_registro(self):
+        """Hasta que haya un registro aceptado o la lectura termine"""
+        await self._primero.wait()
+
+    def hay_listos(self) -> bool:
+        return not self.cola.empty()
+
+    async def siguiente(self) -> Optional[Registro]:
+        """Siguiente registro leído; None cuando la lectura terminó"""
+        if self.cancelado:
+            self.agotado = True
+        if self.agotado:
+            return None
+        registro = await self.cola.get()
+        if registro is _FIN:
+            self.agotado = True
+            return None
+        return registro
+
+    def pendientes(self) -> List[Registro]:
+        """Registros ya leídos que el consumidor no tomó (al cancelar la tarea)"""
+        restantes = []
+        while not self.cola.empty():
+            registro = self.cola.get_nowait()
+            if registro is not _FIN:
+                restantes.append(registro)
+        return restantes
+
+
+# === LECTURA DE LIBROS EN STREAMING ===
+class LecturaLibro:
+    """Libro abierto con el layout de cada hoja ya resuelto, listo para recorrer"""
+
+    def __init__(self, nombre_archivo: str, libro=None, hojas=None, registros: Optional[List[Dict]] = None,
+                 max_guardados: int = 0):
+        self.nombre_archivo = nombre_archivo
+        self.libro = libro
+        self.hojas = hojas or []      # [(hoja, origen, diseno)]
+        self.registros = registros    # Lectura completa (respaldo .xls o caché)
+        # Registros leídos tal como los devuelve la lectura completa, para la
+        # caché de archivos (None si no se guardan o superan max_guardados)
+        self.max_guardados = max_guardados
+        self.leidos: Optional[List[Registro]] = [] if max_guardados and registros is None else None
+
+    def iterar(self) -> Iterator[Registro]:
+        if self.registros is not None:
+            yield from self.registros
+            return
+        try:
+            for hoja, origen, diseno in self.hojas:
+                for registro in _registros_hoja(hoja, origen, diseno):
+                    if self.leidos is not None:
+                        if len(self.leidos) < self.max_guardados:
+                            self.leidos.append(registro)
+                        else:
+                            self.leidos = None
+                    yield registro
+        finally:
+            self.cerrar()
+
+    def cerrar(self):
+        if self.libro is not None:
+            self.libro.close()
+            self.libro = None
+
+
+def _registros_hoja(hoja, origen: str, diseno) -> Iterator[Registro]:
+    """Registros válidos de una hoja read_only, desde la fila siguiente a los encabezados"""
+    columnas = diseno.columnas
+    col_reserva = columnas.get("reserva")
+    col_nombre, col_correo = columnas["nombre"], columnas["correo"]
+    primera = diseno.fila_encabezado + 2  # Fila de Excel (empieza en 1)
+
+    validas = 0
+    for indice, celdas in enumerate(hoja.iter_rows(min_row=primera, values_only=True)):
+        # Igual que la lectura completa: si las primeras filas no tienen ningún
+        # registro válido, la hoja no sigue el layout esperado
+        if indice == FILAS_SIN_VALIDOS and validas == 0:
+            break
+        celda = lambda col: celdas[col] if col is not None and col < len(celdas) else None
+        registro = limpiar_registro(celda(col_reserva), celda(col_nombre), celda(col_correo), primera + indice, origen)
+        if registro is not None:
+            validas += 1
+            yield registro
+    print(f"[📥] [{origen}] {validas} registros válidos leídos en streaming")
+
+
+def preparar_lectura(ruta: str, nombre_archivo: str, todas_las_hojas: bool,
+                     lectura_completa: Callable[[str, bool, str], List[Dict]],
+                     max_guardados: int = 0) -> LecturaLibro:
+    """
+    Abrir el libro y resolver el layout de sus hojas (solo las primeras filas).
+    Los libros que openpyxl no abre (.xls) se leen completos con lectura_completa.
+    Con max_guardados, la lectura conserva hasta esa cantidad de registros
+    (LecturaLibro.leidos) para la caché de archivos.
+    Lanza ValueError si ninguna hoja tiene el formato esperado.
+    """
+    from openpyxl import load_workbook
+
+    try:
+        libro = load_workbook(ruta, read_only=True, data_only=True)
+    except Exception as e:
+        print(f"[DEBUG] {nombre_archivo}: sin lectura en streaming ({e}); lectura completa")
+        registros = lectura_completa(ruta, todas_las_hojas, nombre_archivo)
+        lectura = LecturaLibro(nombre_archivo, registros=registros)
+        if max_guardados and len(registros) <= max_guardados:
+            lectura.leidos = registros
+        return lectura
+
+    hojas, errores = [], []
+    try:
+        candidatas = libro.worksheets if todas_las_hojas else libro.worksheets[:1]
+        for hoja in candidatas:
+            origen = f"{nombre_archivo}#{hoja.title}" if todas_las_hojas else nombre_archivo
+            vista_previa = [list(celdas) for celdas in hoja.iter_rows(max_row=FILAS_ESCANEO, values_only=True)]
+            try:
+                hojas.append((hoja, origen, diseno_de_hoja(vista_previa, origen)))
+            except ValueError as e:
+                if not todas_las_hojas:
+                    raise
+                print(f"[⚠️] Hoja omitida {origen}: {e}")
+                errores.append(f"{hoja.title}: {e}")
+        if not hojas:
+            raise ValueError("Ninguna hoja tiene el formato esperado (" + "; ".join(errores) + ")")
+    except Exception:
+        libro.close()
+        raise
+    return LecturaLibro(nombre_archivo, libro=libro, hojas=hojas, max_guardados=max_guardados)
+
+
+async def producir(flujo: FlujoRegistros, lecturas: List[LecturaLibro],
+                   al_avanzar: Optional[Callable[[FlujoRegistros], None]] = None,
+                   filas_por_bloque: int = FILAS_POR_BLOQUE):
+    """
+    Recorrer los libros en bloques (en un hilo) y alimentar el flujo.
+    al_avanzar(flujo) se llama tras cada bloque y al terminar.
+    """
+    error = None
+    try:
+        for lectura in lecturas:
+            iterador = lectura.iterar()
+            while not flujo.cancelado:
+                bloque = await asyncio.to_thread(lambda: list(itertools.islice(iterador, filas_por_bloque)))
+                if not bloque:
+                    break
+                for registro in bloque:
+                    await flujo.poner(registro)
+                    if flujo.cancelado:
+                        break
+                if al_avanzar:
+                    al_avanzar(flujo)
+            if flujo.cancelado:
+                break
+    except Exception as e:
+        print(f"[ERROR] Lectura en streaming interrumpida: {e}")
+        error = f"Error leyendo archivo Excel: {e}"
+    finally:
+        for lectura in lecturas:
+            lectura.cerrar()
+        await flujo.cerrar(error)
+        if al_avanzar:
+            al_avanzar(flujo)
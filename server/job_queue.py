@@ -0,0 +1,359 @@
+"""
+Cola de trabajos compartida en SQLite para el modo workers.
+
+La API (EXECUTION_MODE=cola) divide cada tarea en bloques de filas y los
+encola; uno o varios procesos worker.py (en esta u otras máquinas que vean el
+mismo archivo) los toman con un arrendamiento (lease) que renuevan con
+heartbeats. Si un worker muere, su lease expira y el bloque se reasigna; las
+filas que ya había terminado no se repiten.
+
+Tablas:
+    trabajos    Un bloque de filas de una tarea (estado, worker, lease, intentos)
+    resultados  Filas de resultados terminadas (únicas por bloque + índice)
+    eventos     Logs de los workers para mostrarlos en /status
+
+Configuración por entorno:
+    JOB_QUEUE_DB        Ruta del archivo SQLite (cola_trabajos.sqlite3)
+    JOB_CHUNK_SIZE      Filas por bloque (25)
+    JOB_LEASE_SECONDS   Duración del lease sin heartbeat (120)
+    JOB_MAX_ATTEMPTS    Arrendamientos máximos de un bloque antes de darlo por fallido (3)
+
+Las tareas se pueden pausar (los bloques pendientes quedan retenidos) y
+cancelar (los workers sueltan sus bloques en el siguiente punto de control).
+
+SQLite en modo WAL admite varios procesos en una máquina; para varias
+máquinas el archivo debe estar en un disco compartido con bloqueos fiables.
+"""
+import json
+import os
+import sqlite3
+import time
+import uuid
+from contextlib import closing
+from typing import Dict, List, Optional, Tuple
+
+PENDIENTE = "pendiente"
+ASIGNADO = "asignado"
+COMPLETADO = "completado"
+FALLIDO = "error"
+PAUSADO = "pausado"          # No se arrienda hasta reanudar la tarea
+CANCELANDO = "cancelando"    # El worker que lo tiene debe soltarlo en el siguiente punto de control
+
+ESQUEMA = """
+CREATE TABLE IF NOT EXISTS trabajos (
+    id TEXT PRIMARY KEY,
+    task_id TEXT NOT NULL,
+    bloque INTEGER NOT NULL,
+    tipo_afiliacion TEXT NOT NULL,
+    nombre_afiliador TEXT NOT NULL,
+    motor TEXT,
+    registros TEXT NOT NULL,
+    estado TEXT NOT NULL,
+    worker TEXT,
+    lease_hasta REAL,
+    intentos INTEGER NOT NULL DEFAULT 0,
+    actual TEXT,
+    error TEXT,
+    creado REAL NOT NULL,
+    actualizado REAL NOT NULL
+);
+CREATE INDEX IF NOT EXISTS idx_trabajos_estado ON trabajos (estado, creado);
+CREATE INDEX IF NOT EXISTS idx_trabajos_tarea ON trabajos (task_id);
+CREATE TABLE IF NOT EXISTS resultados (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    task_id TEXT NOT NULL,
+    trabajo_id TEXT NOT NULL,
+    indice INTEGER NOT NULL,
+    fila TEXT NOT NULL,
+    segundos REAL,
+    UNIQUE (trabajo_id, indice)
+);
+CREATE TABLE IF NOT EXISTS eventos (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    task_id TEXT NOT NULL,
+    mensaje TEXT NOT NULL,
+    creado REAL NOT NULL
+);
+"""
+
+
+class ColaTrabajos:
+    """Broker de trabajos sobre un archivo SQLite (sin servicios externos)"""
+
+    def __init__(self, ruta: str, lease_s: float = 120.0, max_intentos: int = 3, tamano_bloque: int = 25):
+        self.ruta = ruta
+        self.lease_s = lease_s
+        self.max_intentos = max_intentos
+        self.tamano_bloque = tamano_bloque
+        directorio = os.path.dirname(os.path.abspath(ruta))
+        os.makedirs(directorio, exist_ok=True)
+        with closing(self._conectar()) as conexion:
+            conexion.execute("PRAGMA journal_mode=WAL")
+            conexion.executescript(ESQUEMA)
+            # Colas creadas con versiones anteriores del esquema
+            for tabla, columna, tipo in (("trabajos", "motor", "TEXT"), ("resultados", "segundos", "REAL")):
+                columnas = {fila["name"] for fila in conexion.execute(f"PRAGMA table_info({tabla})")}
+                if columna not in columnas:
+                    conexion.execute(f"ALTER TABLE {tabla} ADD COLUMN {columna} {tipo}")
+
+    @classmethod
+    def desde_entorno(cls):
+        return cls(
+            os.getenv("JOB_QUEUE_DB", "cola_trabajos.sqlite3"),
+            lease_s=float(os.getenv("JOB_LEASE_SECONDS", "120")),
+            max_intentos=int(os.getenv("JOB_MAX_ATTEMPTS", "3")),
+            tamano_bloque=int(os.getenv("JOB_CHUNK_SIZE", "25")),
+        )
+
+    def _conectar(self) -> sqlite3.Connection:
+        # isolation_level=None: transacciones explícitas (BEGIN IMMEDIATE al arrendar)
+        conexion = sqlite3.connect(self.ruta, timeout=30, isolation_level=None)
+        conexion.row_factory = sqlite3.Row
+        conexion.execute("PRAGMA busy_timeout=30000")
+        return conexion
+
+    # === API: ENCOLAR Y LEER NOVEDADES ===
+    def encolar_tarea(self, task_id: str, registros: List[Dict], tipo_afiliacion: str, nombre_afiliador: str,
+                      motor: Optional[str] = None) -> int:
+        """Dividir la tarea en bloques de filas. Devuelve la cantidad de bloques"""
+        ahora = time.time()
+        bloques = [
+            registros[inicio:inicio + self.tamano_bloque]
+            for inicio in range(0, len(registros), self.tamano_bloque)
+        ]
+        with closing(self._conectar()) as conexion:
+            conexion.execute("BEGIN")
+            conexion.executemany(
+                "INSERT INTO trabajos (id, task_id, bloque, tipo_afiliacion, nombre_afiliador, motor, registros,"
+                " estado, creado, actualizado) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)",
+                [
+                    (str(uuid.uuid4()), task_id, numero, tipo_afiliacion, nombre_afiliador, motor,
+                     json.dumps(bloque, ensure_ascii=False, default=dict), PENDIENTE, ahora, ahora)
+                    for numero, bloque in enumerate(bloques)
+                ],
+            )
+            conexion.execute("COMMIT")
+        return len(bloques)
+
+    def ultimo_cursor(self) -> Tuple[int, int]:
+        with closing(self._conectar()) as conexion:
+            fila = conexion.execute(
+                "SELECT (SELECT COALESCE(MAX(id), 0) FROM resultados), (SELECT COALESCE(MAX(id), 0) FROM eventos)"
+            ).fetchone()
+        return fila[0], fila[1]
+
+    def leer_novedades(self, cursor: Tuple[int, int], limite: int = 1000):
+        """Resultados y eventos nuevos desde `cursor`. Devuelve (resultados, eventos, cursor)"""
+        ultimo_resultado, ultimo_evento = cursor
+        with closing(self._conectar()) as conexion:
+            resultados = conexion.execute(
+                "SELECT id, task_id, fila, segundos FROM resultados WHERE id > ? ORDER BY id LIMIT ?",
+                (ultimo_resultado, limite),
+            ).fetchall()
+            eventos = conexion.execute(
+                "SELECT id, task_id, mensaje FROM eventos WHERE id > ? ORDER BY id LIMIT ?",
+                (ultimo_evento, limite),
+            ).fetchall()
+        if resultados:
+            ultimo_resultado = resultados[-1]["id"]
+        if eventos:
+            ultimo_evento = eventos[-1]["id"]
+        return (
+            [(fila["task_id"], json.loads(fila["fila"]), fila["segundos"]) for fila in resultados],
+            [(evento["task_id"], evento["mensaje"]) for evento in eventos],
+            (ultimo_resultado, ultimo_evento),
+        )
+
+    def estado_tarea(self, task_id: str) -> Dict:
+        """Bloques por estado y fila en curso de una tarea"""
+        with closing(self._conectar()) as conexion:
+            filas = conexion.execute(
+                "SELECT estado, COUNT(*) AS cantidad FROM trabajos WHERE task_id = ? GROUP BY estado",
+                (task_id,),
+            ).fetchall()
+            actual = conexion.execute(
+                "SELECT worker, actual FROM trabajos WHERE task_id = ? AND estado = ? ORDER BY actualizado DESC",
+                (task_id, ASIGNADO),
+            ).fetchall()
+            errores = conexion.execute(
+                "SELECT error FROM trabajos WHERE task_id = ? AND estado = ?",
+                (task_id, FALLIDO),
+            ).fetchall()
+        conteo = {fila["estado"]: fila["cantidad"] for fila in filas}
+        return {
+            "bloques": conteo,
+            "total": sum(conteo.values()),
+            "terminados": conteo.get(COMPLETADO, 0) + conteo.get(FALLIDO, 0),
+            "en_curso": [f"{fila['worker']}: {fila['actual'] or '...'}" for fila in actual],
+            "errores": [fila["error"] for fila in errores if fila["error"]],
+        }
+
+    def resumen(self) -> Dict:
+        ahora = time.time()
+        with closing(self._conectar()) as conexion:
+            filas = conexion.execute("SELECT estado, COUNT(*) AS cantidad FROM trabajos GROUP BY estado").fetchall()
+            workers = conexion.execute(
+                "SELECT COUNT(DISTINCT worker) FROM trabajos WHERE estado = ? AND lease_hasta > ?",
+                (ASIGNADO, ahora),
+            ).fetchone()[0]
+        return {"jobs": {fila["estado"]: fila["cantidad"] for fila in filas}, "active_workers": workers}
+
+    # === WORKERS: ARRENDAR, RENOVAR, TERMINAR ===
+    def arrendar(self, worker: str) -> Optional[Dict]:
+        """
+        Tomar el bloque pendiente más antiguo (o uno con lease vencido).
+        Devuelve el trabajo con sus registros y los índices ya terminados.
+        """
+        ahora = time.time()
+        with closing(self._conectar()) as conexion:
+            conexion.execute("BEGIN IMMEDIATE")
+            try:
+                while True:
+                    fila = conexion.execute(
+                        "SELECT * FROM trabajos WHERE estado = ? OR (estado = ? AND lease_hasta < ?)"
+                        " ORDER BY creado, bloque LIMIT 1",
+                        (PENDIENTE, ASIGNADO, ahora),
+                    ).fetchone()
+                    if fila is None:
+                        conexion.execute("COMMIT")
+                        return None
+                    if fila["intentos"] >= self.max_intentos:
+                        # Bloque que tumba a todos los workers: no reasignarlo más
+                        conexion.execute(
+                            "UPDATE trabajos SET estado = ?, error = COALESCE(error, ?), actualizado = ? WHERE id = ?",
+                            (FALLIDO, f"Lease vencido {fila['intentos']} veces", ahora, fila["id"]),
+                        )
+                        continue
+                    conexion.execute(
+                        "UPDATE trabajos SET estado = ?, worker = ?, lease_hasta = ?, intentos = intentos + 1,"
+                        " actual = NULL, actualizado = ? WHERE id = ?",
+                        (ASIGNADO, worker, ahora + self.lease_s, ahora, fila["id"]),
+                    )
+                    hechos = {
+                        r["indice"] for r in conexion.execute(
+                            "SELECT indice FROM resultados WHERE trabajo_id = ?", (fila["id"],)
+                        )
+                    }
+                    conexion.execute("COMMIT")
+                    break
+            except Exception:
+                conexion.execute("ROLLBACK")
+                raise
+
+        trabajo = dict(fila)
+        trabajo["registros"] = json.loads(trabajo["registros"])
+        trabajo["hechos"] = hechos
+        trabajo["intentos"] += 1
+        return trabajo
+
+    def renovar(self, trabajo_id: str, worker: str, actual: Optional[str] = None) -> bool:
+        """Heartbeat: extender el lease. False si el trabajo ya no es de este worker"""
+        ahora = time.time()
+        with closing(self._conectar()) as conexion:
+            cursor = conexion.execute(
+                "UPDATE trabajos SET lease_hasta = ?, actual = COALESCE(?, actual), actualizado = ?"
+                " WHERE id = ? AND worker = ? AND estado = ?",
+                (ahora + self.lease_s, actual, ahora, trabajo_id, worker, ASIGNADO),
+            )
+            return cursor.rowcount == 1
+
+    def registrar_resultado(self, trabajo: Dict, indice: int, fila: List, segundos: Optional[float] = None):
+        with closing(self._conectar()) as conexion:
+            conexion.execute(
+                "INSERT OR IGNORE INTO resultados (task_id, trabajo_id, indice, fila, segundos) VALUES (?, ?, ?, ?, ?)",
+                (trabajo["task_id"], trabajo["id"], indice, json.dumps(fila, ensure_ascii=False, default=str), segundos),
+            )
+
+    def registrar_evento(self, task_id: str, mensaje: str):
+        with closing(self._conectar()) as conexion:
+            conexion.execute(
+                "INSERT INTO eventos (task_id, mensaje, creado) VALUES (?, ?, ?)",
+                (task_id, mensaje, time.time()),
+            )
+
+    def completar(self, trabajo_id: str, worker: str) -> bool:
+        with closing(self._conectar()) as conexion:
+            cursor = conexion.execute(
+                "UPDATE trabajos SET estado = ?, lease_hasta = NULL, actual = NULL, actualizado = ?"
+                " WHERE id = ? AND worker = ? AND estado = ?",
+                (COMPLETADO, time.time(), trabajo_id, worker, ASIGNADO),
+            )
+            return cursor.rowcount == 1
+
+    def fallar(self, trabajo_id: str, worker: str, error: str) -> str:
+        """
+        Liberar un bloque que falló: vuelve a pendiente si le quedan intentos.
+        Un bloque en CANCELANDO (tarea cancelada) queda fallido, nunca pendiente.
+        """
+        with closing(self._conectar()) as conexion:
+            conexion.execute("BEGIN IMMEDIATE")
+            fila = conexion.execute("SELECT intentos, estado FROM trabajos WHERE id = ?", (trabajo_id,)).fetchone()
+            if fila is not None and fila["estado"] == CANCELANDO:
+                conexion.execute(
+                    "UPDATE trabajos SET estado = ?, lease_hasta = NULL, actual = NULL, actualizado = ?"
+                    " WHERE id = ? AND worker = ? AND estado = ?",
+                    (FALLIDO, time.time(), trabajo_id, worker, CANCELANDO),
+                )
+                conexion.execute("COMMIT")
+                return FALLIDO
+            estado = FALLIDO if fila is None or fila["intentos"] >= self.max_intentos else PENDIENTE
+            conexion.execute(
+                "UPDATE trabajos SET estado = ?, worker = NULL, lease_hasta = NULL, error = ?, actualizado = ?"
+                " WHERE id = ? AND worker = ? AND estado = ?",
+                (estado, error[:500], time.time(), trabajo_id, worker, ASIGNADO),
+            )
+            conexion.execute("COMMIT")
+        return estado
+
+    # === CONTROL DE TAREAS: PAUSA Y CANCELACIÓN ===
+    def _cambiar_estado_tarea(self, task_id: str, desde, hacia: str, error: Optional[str] = None) -> int:
+        marcas = ", ".join("?" for _ in desde)
+        with closing(self._conectar()) as conexion:
+            cursor = conexion.execute(
+                f"UPDATE trabajos SET estado = ?, error = COALESCE(?, error), actualizado = ?"
+                f" WHERE task_id = ? AND estado IN ({marcas})",
+                (hacia, error, time.time(), task_id, *desde),
+            )
+            return cursor.rowcount
+
+    def pausar_tarea(self, task_id: str) -> int:
+        """Retener los bloques pendientes (los que están en curso terminan)"""
+        return self._cambiar_estado_tarea(task_id, (PENDIENTE,), PAUSADO)
+
+    def reanudar_tarea(self, task_id: str) -> int:
+        return self._cambiar_estado_tarea(task_id, (PAUSADO,), PENDIENTE)
+
+    def cancelar_tarea(self, task_id: str, motivo: str) -> int:
+        """
+        Cancelar los bloques sin terminar. Los pendientes quedan fallidos de
+        inmediato; los asignados pasan a CANCELANDO y su worker los suelta
+        (confirmar_cancelacion) al detectar que el heartbeat ya no renueva.
+        """
+        self._cambiar_estado_tarea(task_id, (ASIGNADO,), CANCELANDO, motivo)
+        return self._cambiar_estado_tarea(task_id, (PENDIENTE, PAUSADO), FALLIDO, motivo)
+
+    def confirmar_cancelacion(self, trabajo_id: str, worker: str) -> bool:
+        with closing(self._conectar()) as conexion:
+            cursor = conexion.execute(
+                "UPDATE trabajos SET estado = ?, lease_hasta = NULL, actual = NULL, actualizado = ?"
+                " WHERE id = ? AND worker = ? AND estado = ?",
+                (FALLIDO, time.time(), trabajo_id, worker, CANCELANDO),
+            )
+            return cursor.rowcount == 1
+
+    def vencer_cancelaciones(self) -> int:
+        """Bloques CANCELANDO cuyo worker murió sin confirmar: darlos por fallidos"""
+        with closing(self._conectar()) as conexion:
+            cursor = conexion.execute(
+                "UPDATE trabajos SET estado = ?, actualizado = ? WHERE estado = ? AND lease_hasta < ?",
+                (FALLIDO, time.time(), CANCELANDO, time.time()),
+            )
+            return cursor.rowcount
+
+    def purgar_tarea(self, task_id: str):
+        """Eliminar bloques, resultados y eventos de una tarea terminada"""
+        with closing(self._conectar()) as conexion:
+            conexion.execute("BEGIN")
+            for tabla in ("trabajos", "resultados", "eventos"):
+                conexion.execute(f"DELETE FROM {tabla} WHERE task_id = ?", (task_id,))
+            conexion.execute("COMMIT")
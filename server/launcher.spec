@@ -1,16 +1,25 @@
 # -*- mode: python ; coding: utf-8 -*-
 
+# Paquetes que el servidor no usa y que PyInstaller arrastra por dependencias
+# opcionales (ver build/*/PYZ-00.toc). Excluirlos reduce tamaño y arranque.
+EXCLUDES = [
+    'tkinter', '_tkinter', 'matplotlib', 'IPython', 'jedi', 'notebook',
+    'scipy', 'PIL', 'pygments', 'sqlalchemy', 'mysql', 'pymysql',
+    'setuptools', 'pkg_resources', 'wheel', 'pip', 'pytest', '_pytest',
+    'pluggy', 'werkzeug', 'yaml', 'docutils', 'sphinx', 'pyarrow',
+    'numexpr', 'bottleneck', 'tables', 'lxml', 'bs4', 'html5lib',
+]
 
 a = Analysis(
     ['launcher.py'],
     pathex=[],
     binaries=[],
     datas=[('dist', 'dist')],
-    hiddenimports=[],
+    hiddenimports=['main'],  # uvicorn carga "main:app" por nombre
     hookspath=[],
     hooksconfig={},
     runtime_hooks=[],
-    excludes=[],
+    excludes=EXCLUDES,
     noarchive=False,
     optimize=0,
 )
@@ -1,30 +1,45 @@
-from fastapi import FastAPI, File, UploadFile, Form, HTTPException, BackgroundTasks
+from fastapi import FastAPI, File, UploadFile, Form, HTTPException, BackgroundTasks, APIRouter, Request
 from fastapi.middleware.cors import CORSMiddleware
-from fastapi.responses import FileResponse, JSONResponse
+from fastapi.responses import JSONResponse, StreamingResponse
 import os
+import subprocess
 import tempfile
 import asyncio
+import inspect
+import time
+from collections import deque
 from datetime import datetime
 import uuid
-import json
-from typing import Dict, List, Optional
+from typing import Awaitable, Callable, Dict, List, Optional, Tuple
 from pydantic import BaseModel
-from openpyxl import load_workbook, Workbook
-from selenium_processor import MarriottProcessor
-import uvicorn
-import pandas as pd
-from fastapi.staticfiles import StaticFiles
-
-# Agregar esta ruta a tu main.py
-
-import os
-import subprocess
-from fastapi import APIRouter
-
-app = FastAPI() 
+from site_config import TIPOS_AFILIACION
+from results_janitor import ESTADOS_TERMINADOS, RegistroArchivos, LimpiadorPeriodico
+from browser_watchdog import VigilanteNavegadores, sesiones_navegador
+from perfiles_navegador import gestor_perfiles
+from job_queue import ColaTrabajos
+from throughput import modelo_rendimiento
+from control_tareas import TareaCancelada, controles_tareas, obtener_control
+from upload_cache import cache_lecturas, guardar_con_hash, registro_envios
+from estadisticas import estadisticas_afiliacion
+from concurrencia import controlador_concurrencia
+from motores import MOTOR_POR_DEFECTO, MOTORES, crear_motor, validar_motor
+from retry_policy import (
+    TRANSITORIO, PoliticaReintentos, CircuitBreaker, clasificar_fallo, clasificar_excepcion,
+    es_sesion_muerta
+)
+from excel_layout import FILAS_ESCANEO, cache_disenos, diseno_de_hoja
+from normalizacion import normalizar_registros
+from ingesta_continua import INGESTA_CONTINUA, FlujoRegistros, LecturaLibro, preparar_lectura, producir
+from registros import Registro, fila_compacta
+from batch_ingest import ErrorLote, combinar_registros, detectar_formato, leer_lote
+from downloads import (
+    FORMATOS_EXPORTACION, MEDIA_XLSX, construir_zip, iterar_csv, iterar_jsonl,
+    respuesta_archivo, respuesta_exportacion
+)
 
-frontend_path = os.path.join(os.path.dirname(__file__), "dist")
-app.mount("/", StaticFiles(directory=frontend_path, html=True), name="static")
+# pandas, openpyxl y selenium (vía selenium_processor) se importan de forma diferida
+# dentro de las funciones que los usan para acelerar el arranque en frío
+# (ver benchmarks/bench_arranque.py).
 
 router = APIRouter()
 
@@ -132,9 +147,10 @@ app.add_middleware(
 # === MODELOS DE DATOS ===
 class TaskStatus(BaseModel):
     task_id: str
-    status: str  # "pending", "processing", "completed", "error"
+    status: str  # "pending", "queued", "processing", "paused", "completed", "cancelled", "error"
     progress: int  # 0-100
     total_records: int
+    total_known: bool = True  # False mientras el archivo se sigue leyendo (ingesta en tubería)
     processed_records: int
     successful_records: int
     error_records: int
@@ -144,24 +160,134 @@ class TaskStatus(BaseModel):
     result_file_url: Optional[str] = None
     created_at: str
 
+# Columnas del archivo de resultados (Excel) y claves equivalentes para CSV/JSONL
+ENCABEZADOS_RESULTADOS = [
+    "No. Fila Original", "No. Reserva", "Nombre Completo", 
+    "Correo", "Código Afiliación", "Afiliador", "Estado", 
+    "Observaciones", "Fecha Proceso", "Origen"
+]
+CAMPOS_RESULTADOS = [
+    "fila_original", "reserva", "nombre", "correo", "codigo",
+    "afiliador", "estado", "observaciones", "fecha_proceso", "origen"
+]
+
 # === ALMACENAMIENTO EN MEMORIA DE TAREAS ===
 tasks_storage: Dict[str, Dict] = {}
-temp_files_dir = "temp_results"
+temp_files_dir = os.getenv("TEMP_DIR", "temp_results")
 
 # Crear directorio temporal si no existe
 os.makedirs(temp_files_dir, exist_ok=True)
 
+def archivos_en_uso():
+    """Archivos de resultados de tareas que aún se están escribiendo"""
+    return [
+        tarea["archivo_resultados"]
+        for tarea in list(tasks_storage.values())
+        if tarea.get("archivo_resultados") and tarea["status"] not in ESTADOS_TERMINADOS
+    ]
+
+# Contador incremental de resultados y limpieza periódica (ver results_janitor.py)
+registro_resultados = RegistroArchivos(temp_files_dir)
+limpiador = LimpiadorPeriodico.desde_entorno(registro_resultados, tasks_storage, archivos_en_uso)
+
+# Memoria por sesión de Chrome y limpieza de procesos huérfanos (ver browser_watchdog.py)
+vigilante = VigilanteNavegadores.desde_entorno(sesiones_navegador)
+
+# Modo de ejecución: "local" (navegador en este proceso) o "cola" (worker.py
+# toma los bloques de una cola SQLite compartida; ver job_queue.py)
+MODO_EJECUCION = os.getenv("EXECUTION_MODE", "local").lower()
+cola_trabajos = ColaTrabajos.desde_entorno() if MODO_EJECUCION == "cola" else None
+INTERVALO_SINCRONIZACION = float(os.getenv("QUEUE_SYNC_SECONDS", "2"))
+tarea_sincronizacion: Optional[asyncio.Task] = None
+
+# Funciones que reciben cada log (el worker los reenvía a la cola)
+oyentes_log: List[Callable[[str, str], None]] = []
+
 # === FUNCIONES AUXILIARES ===
-def leer_archivo_excel(file_path: str) -> List[Dict]:
+def _extraer_registros_hoja(libro, hoja, origen: str) -> List[Dict]:
     """
-    Leer archivo Excel con diagnóstico completo
+    Extraer los registros de una hoja.
+    El layout (fila de encabezados y columnas de reserva/nombre/correo) se
+    detecta con las primeras filas (ver excel_layout.py) y luego se leen solo
+    esas columnas.
     """
-    try:
-        import os
+    import pandas as pd
+    
+    vista_previa = libro.parse(hoja, header=None, nrows=FILAS_ESCANEO)
+    if vista_previa.empty:
+        raise ValueError("La hoja está vacía")
+    
+    # Con respaldo al layout histórico (headers en fila 4, columnas C/G/I)
+    diseno = diseno_de_hoja(vista_previa.values.tolist(), origen)
+    
+    fila_encabezado = diseno.fila_encabezado
+    print(
+        f"[DEBUG] [{origen}] Encabezados en fila {fila_encabezado + 1}, columnas {diseno.columnas}"
+        f"{' (caché)' if diseno.desde_cache else ''}"
+    )
+    
+    # Leer solo las columnas necesarias, desde la fila siguiente a los encabezados
+    df = libro.parse(hoja, header=None, skiprows=fila_encabezado + 1, usecols=diseno.usecols)
+    posicion = {indice: posicion for posicion, indice in enumerate(diseno.usecols)}
+    col_reserva = posicion.get(diseno.columnas.get("reserva"))
+    col_nombre = posicion[diseno.columnas["nombre"]]
+    col_correo = posicion[diseno.columnas["correo"]]
+    
+    registros = []
+    filas_validas = 0
+    
+    for index, fila in enumerate(df.itertuples(index=False, name=None)):
+        numero_fila = fila_encabezado + index + 2  # Fila de Excel (empieza en 1)
+        
+        # Si las primeras 6 filas de datos no tienen ningún registro válido,
+        # la hoja no sigue el layout esperado: no seguir recorriéndola
+        if index == 6 and filas_validas == 0:
+            break
         
+        try:
+            reserva_raw = fila[col_reserva] if col_reserva is not None else None
+            nombre_raw = fila[col_nombre]
+            correo_raw = fila[col_correo]
+            
+            # Limpiar datos
+            reserva = str(reserva_raw).strip() if pd.notna(reserva_raw) else "N/A"
+            nombre = str(nombre_raw).strip() if pd.notna(nombre_raw) else ""
+            correo = str(correo_raw).strip().lower() if pd.notna(correo_raw) else ""
+            
+            # Validar
+            if not nombre or nombre.lower() in ['nan', 'none', '']:
+                continue
+                
+            if not correo or correo.lower() in ['nan', 'none', ''] or '@' not in correo:
+                continue
+            
+            registros.append(Registro(reserva, nombre, correo, numero_fila, origen))
+            filas_validas += 1
+            
+            if filas_validas <= 5:
+                print(f"[DEBUG] ✅ [{origen}] Registro válido {filas_validas}: {nombre} | {correo}")
+            
+        except Exception as e:
+            print(f"[DEBUG] [{origen}] Error en fila {numero_fila}: {e}")
+            continue
+    
+    print(f"[DEBUG] [{origen}] RESUMEN: {filas_validas} registros válidos de {len(df)} filas de datos")
+    return registros
+
+def leer_archivo_excel(file_path: str, todas_las_hojas: bool = False, nombre_archivo: Optional[str] = None) -> List[Dict]:
+    """
+    Leer archivo Excel con diagnóstico completo.
+    Con todas_las_hojas=True se leen todas las hojas del libro (abierto una
+    sola vez); las hojas que no siguen el layout se omiten con un aviso.
+    Cada registro lleva "origen" ("archivo.xlsx" o "archivo.xlsx#Hoja").
+    """
+    import pandas as pd
+    
+    nombre_archivo = nombre_archivo or os.path.basename(file_path)
+    
+    try:
         # === DIAGNÓSTICO COMPLETO ===
-        print(f"[DEBUG] Ruta del archivo: {file_path}")
-        print(f"[DEBUG] ¿Archivo existe? {os.path.exists(file_path)}")
+        print(f"[DEBUG] Ruta del archivo: {file_path} ({nombre_archivo})")
         
         if os.path.exists(file_path):
             file_size = os.path.getsize(file_path)
@@ -171,7 +297,6 @@ def leer_archivo_excel(file_path: str) -> List[Dict]:
             with open(file_path, 'rb') as f:
                 primeros_bytes = f.read(10)
                 print(f"[DEBUG] Primeros 10 bytes (hex): {primeros_bytes.hex()}")
-                print(f"[DEBUG] Primeros 10 bytes (texto): {primeros_bytes}")
         else:
             raise ValueError("El archivo temporal no existe")
         
@@ -181,12 +306,8 @@ def leer_archivo_excel(file_path: str) -> List[Dict]:
         for engine in engines_to_try:
             try:
                 print(f"[DEBUG] Intentando leer con engine: {engine}")
-                
-                # Leer archivo sin asumir headers automáticos
-                df = pd.read_excel(file_path, header=None, engine=engine)
-                
-                print(f"[DEBUG] ¡ÉXITO! Archivo leído con {engine}")
-                print(f"[DEBUG] Dimensiones: {len(df)} filas, {len(df.columns)} columnas")
+                libro = pd.ExcelFile(file_path, engine=engine)
+                print(f"[DEBUG] ¡ÉXITO! Archivo abierto con {engine}: hojas {libro.sheet_names}")
                 break
                 
             except Exception as e:
@@ -195,106 +316,21 @@ def leer_archivo_excel(file_path: str) -> List[Dict]:
                     raise e
                 continue
         
-        # === RESTO DEL CÓDIGO ORIGINAL ===
-        
-        # Verificar que el archivo tiene suficientes filas y columnas
-        if len(df) <= 4:
-            raise ValueError("El archivo Excel debe tener al menos 5 filas (incluyendo headers en fila 4)")
-        
-        if len(df.columns) < 9:
-            raise ValueError("El archivo Excel debe tener al menos 9 columnas (hasta columna I)")
-        
-        # Verificar headers en fila 4 (índice 3)
-        headers_row = df.iloc[3]
-        print(f"[DEBUG] Headers en fila 4: {headers_row.tolist()}")
-        
-        # Posiciones fijas
-        COL_RESERVA = 2   # Columna C
-        COL_NOMBRE = 6    # Columna G 
-        COL_CORREO = 8    # Columna I
-        
-        # Verificar headers específicos
-        header_reserva = str(headers_row.iloc[COL_RESERVA]).strip()
-        header_nombre = str(headers_row.iloc[COL_NOMBRE]).strip()
-        header_correo = str(headers_row.iloc[COL_CORREO]).strip()
-        
-        print(f"[DEBUG] Headers encontrados:")
-        print(f"  - Columna C (Reserva): '{header_reserva}'")
-        print(f"  - Columna G (Nombre): '{header_nombre}'")
-        print(f"  - Columna I (Correo): '{header_correo}'")
-        
-        # Extraer datos desde fila 5
-        registros = []
-        filas_procesadas = 0
-        filas_validas = 0
-        
-        for index in range(4, min(len(df), 10)):  # Solo primeras 6 filas para debug
-            try:
-                fila = df.iloc[index]
-                filas_procesadas += 1
-                
-                reserva_raw = fila.iloc[COL_RESERVA]
-                nombre_raw = fila.iloc[COL_NOMBRE]
-                correo_raw = fila.iloc[COL_CORREO]
-                
-                print(f"[DEBUG] Fila {index + 1}: '{reserva_raw}' | '{nombre_raw}' | '{correo_raw}'")
-                
-                # Limpiar datos
-                reserva = str(reserva_raw).strip() if pd.notna(reserva_raw) else "N/A"
-                nombre = str(nombre_raw).strip() if pd.notna(nombre_raw) else ""
-                correo = str(correo_raw).strip().lower() if pd.notna(correo_raw) else ""
-                
-                # Validar
-                if not nombre or nombre.lower() in ['nan', 'none', '']:
-                    print(f"[DEBUG] Fila {index + 1} saltada: nombre vacío")
-                    continue
-                    
-                if not correo or correo.lower() in ['nan', 'none', ''] or '@' not in correo:
-                    print(f"[DEBUG] Fila {index + 1} saltada: correo inválido")
-                    continue
-                
-                registros.append({
-                    "reserva": reserva,
-                    "nombre": nombre,
-                    "correo": correo,
-                    "fila": index + 1
-                })
-                filas_validas += 1
-                print(f"[DEBUG] ✅ Registro válido {filas_validas}: {nombre} | {correo}")
-                
-            except Exception as e:
-                print(f"[DEBUG] Error en fila {index + 1}: {e}")
-                continue
-        
-        # Procesar el resto de las filas si las primeras 6 funcionaron
-        if filas_validas > 0 and len(df) > 10:
-            print(f"[DEBUG] Procesando el resto de filas ({len(df) - 10} restantes)...")
-            
-            for index in range(10, len(df)):
-                try:
-                    fila = df.iloc[index]
-                    
-                    reserva_raw = fila.iloc[COL_RESERVA]
-                    nombre_raw = fila.iloc[COL_NOMBRE]
-                    correo_raw = fila.iloc[COL_CORREO]
-                    
-                    reserva = str(reserva_raw).strip() if pd.notna(reserva_raw) else "N/A"
-                    nombre = str(nombre_raw).strip() if pd.notna(nombre_raw) else ""
-                    correo = str(correo_raw).strip().lower() if pd.notna(correo_raw) else ""
-                    
-                    if nombre and nombre.lower() not in ['nan', 'none', ''] and correo and '@' in correo:
-                        registros.append({
-                            "reserva": reserva,
-                            "nombre": nombre,
-                            "correo": correo,
-                            "fila": index + 1
-                        })
-                        filas_validas += 1
-                
-                except Exception as e:
-                    continue
-        
-        print(f"[DEBUG] RESUMEN: {filas_validas} registros válidos de {len(df)} filas totales")
+        with libro:
+            if not todas_las_hojas:
+                registros = _extraer_registros_hoja(libro, 0, nombre_archivo)
+            else:
+                registros = []
+                errores_hojas = []
+                for nombre_hoja in libro.sheet_names:
+                    origen = f"{nombre_archivo}#{nombre_hoja}"
+                    try:
+                        registros.extend(_extraer_registros_hoja(libro, nombre_hoja, origen))
+                    except ValueError as e:
+                        print(f"[⚠️] Hoja omitida {origen}: {e}")
+                        errores_hojas.append(f"{nombre_hoja}: {e}")
+                if not registros and errores_hojas:
+                    raise ValueError("Ninguna hoja tiene el formato esperado (" + "; ".join(errores_hojas) + ")")
         
         if not registros:
             raise ValueError("No se encontraron registros válidos")
@@ -304,141 +340,6 @@ def leer_archivo_excel(file_path: str) -> List[Dict]:
     except Exception as e:
         print(f"[ERROR] Error completo: {str(e)}")
         raise ValueError(f"Error leyendo archivo Excel: {str(e)}")
-    """
-    Leer archivo Excel con posiciones exactas conocidas
-    Fila 4 (índice 3): Headers
-    Columna C (índice 2): No. Rsrv
-    Columna G (índice 6): Nombre del Huésped  
-    Columna I (índice 8): Correo Electrónico
-    """
-    try:
-        # Leer archivo sin asumir headers automáticos
-        df = pd.read_excel(file_path, header=None, engine="openpyxl")
-        
-        print(f"[DEBUG] Archivo Excel leído: {len(df)} filas, {len(df.columns)} columnas")
-        
-        # Verificar que el archivo tiene suficientes filas y columnas
-        if len(df) <= 4:
-            raise ValueError("El archivo Excel debe tener al menos 5 filas (incluyendo headers en fila 4)")
-        
-        if len(df.columns) < 9:  # Necesitamos al menos columna I (índice 8)
-            raise ValueError("El archivo Excel debe tener al menos 9 columnas (hasta columna I)")
-        
-        # Verificar headers en fila 4 (índice 3)
-        headers_row = df.iloc[3]
-        print(f"[DEBUG] Headers en fila 4: {headers_row.tolist()}")
-        
-        # Posiciones fijas basadas en tu información
-        COL_RESERVA = 2   # Columna C (índice 2)
-        COL_NOMBRE = 6    # Columna G (índice 6) 
-        COL_CORREO = 8    # Columna I (índice 8)
-        
-        # Verificar que los headers son los esperados (opcional)
-        header_reserva = str(headers_row.iloc[COL_RESERVA]).strip()
-        header_nombre = str(headers_row.iloc[COL_NOMBRE]).strip()
-        header_correo = str(headers_row.iloc[COL_CORREO]).strip()
-        
-        print(f"[DEBUG] Headers encontrados:")
-        print(f"  - Columna C (Reserva): '{header_reserva}'")
-        print(f"  - Columna G (Nombre): '{header_nombre}'")
-        print(f"  - Columna I (Correo): '{header_correo}'")
-        
-        # Extraer datos desde fila 5 en adelante (índice 4+)
-        registros = []
-        filas_procesadas = 0
-        filas_validas = 0
-        
-        for index in range(4, len(df)):  # Desde fila 5 (índice 4)
-            try:
-                fila = df.iloc[index]
-                filas_procesadas += 1
-                
-                # Extraer valores de las columnas específicas
-                reserva_raw = fila.iloc[COL_RESERVA]
-                nombre_raw = fila.iloc[COL_NOMBRE]
-                correo_raw = fila.iloc[COL_CORREO]
-                
-                # Limpiar y validar datos
-                reserva = str(reserva_raw).strip() if pd.notna(reserva_raw) else "N/A"
-                nombre = str(nombre_raw).strip() if pd.notna(nombre_raw) else ""
-                correo = str(correo_raw).strip().lower() if pd.notna(correo_raw) else ""
-                
-                # Validar que tenemos datos esenciales
-                if not nombre or nombre.lower() in ['nan', 'none', '']:
-                    continue
-                    
-                if not correo or correo.lower() in ['nan', 'none', ''] or '@' not in correo:
-                    continue
-                
-                # Agregar registro válido
-                registros.append({
-                    "reserva": reserva,
-                    "nombre": nombre,
-                    "correo": correo,
-                    "fila": index + 1  # +1 porque Excel empieza en 1
-                })
-                filas_validas += 1
-                
-                # Debug cada 10 registros
-                if filas_validas <= 5 or filas_validas % 10 == 0:
-                    print(f"[DEBUG] Registro {filas_validas}: {nombre} | {correo} | {reserva}")
-                
-            except Exception as e:
-                print(f"[WARNING] Error procesando fila {index + 1}: {e}")
-                continue
-        
-        print(f"[DEBUG] Resumen procesamiento:")
-        print(f"  - Filas procesadas: {filas_procesadas}")
-        print(f"  - Registros válidos: {filas_validas}")
-        
-        if not registros:
-            raise ValueError("No se encontraron registros válidos en el archivo. Verifica que:")
-            raise ValueError("1. La fila 4 contenga los headers")
-            raise ValueError("2. Las columnas C, G, I contengan datos")
-            raise ValueError("3. Hay datos desde la fila 5 en adelante")
-        
-        return registros
-        
-    except Exception as e:
-        print(f"[ERROR] Error completo: {str(e)}")
-        raise ValueError(f"Error leyendo archivo Excel: {str(e)}")
-    """
-    Leer archivo Excel y extraer datos relevantes
-    """
-    try:
-        # Detectar columnas automáticamente
-        col_reserva, col_nombre, col_correo = detectar_columnas_excel(file_path)
-        
-        if not all([col_reserva, col_nombre, col_correo]):
-            missing = []
-            if not col_reserva: missing.append("Número de Reserva")
-            if not col_nombre: missing.append("Nombre del Huésped")
-            if not col_correo: missing.append("Correo Electrónico")
-            raise ValueError(f"No se pudieron encontrar las columnas: {', '.join(missing)}")
-        
-        # Leer archivo completo
-        df = pd.read_excel(file_path)
-        
-        # Extraer solo las filas que tienen datos en las 3 columnas importantes
-        registros = []
-        for index, row in df.iterrows():
-            reserva = row.get(col_reserva)
-            nombre = row.get(col_nombre)
-            correo = row.get(col_correo)
-            
-            # Validar que tenemos datos esenciales
-            if pd.notna(nombre) and pd.notna(correo) and str(nombre).strip() and str(correo).strip():
-                registros.append({
-                    "reserva": str(reserva).strip() if pd.notna(reserva) else "N/A",
-                    "nombre": str(nombre).strip(),
-                    "correo": str(correo).strip().lower(),
-                    "fila": index + 2  # +2 porque Excel empieza en 1 y tenemos header
-                })
-        
-        return registros
-        
-    except Exception as e:
-        raise ValueError(f"Error leyendo archivo Excel: {str(e)}")
 
 def actualizar_estado_tarea(task_id: str, **kwargs):
     """Actualizar el estado de una tarea"""
@@ -457,29 +358,389 @@ def agregar_log_tarea(task_id: str, mensaje: str):
         # Mantener solo los últimos 20 logs para no sobrecargar memoria
         if len(tasks_storage[task_id]["logs"]) > 20:
             tasks_storage[task_id]["logs"] = tasks_storage[task_id]["logs"][-20:]
+    
+    for oyente in oyentes_log:
+        oyente(task_id, mensaje)
+
+# Estados de fila que /task/{id}/retry-failed vuelve a procesar
+ESTADOS_FALLIDOS = ("ERROR", "ERROR CRÍTICO")
+
+def registrar_estadistica_fila(tipo_afiliacion: str, fila: List, segundos: Optional[float]):
+    """Actualizar /stats con una fila terminada (ENCABEZADOS_RESULTADOS)"""
+    estadisticas_afiliacion.registrar_fila(
+        afiliador=fila[5],
+        tipo=tipo_afiliacion,
+        estado=fila[6],
+        observaciones=fila[7],
+        segundos=segundos,
+        nombre=fila[2],
+        correo=fila[3]
+    )
+
+def construir_fila_resultado(registro: Dict, codigo: str, nombre_afiliador: str, estado: str, observaciones: str) -> Tuple:
+    """Fila del archivo de resultados (mismo orden que ENCABEZADOS_RESULTADOS), como tupla compacta"""
+    historial = registro.get("historial")
+    if historial:
+        # Fila de una tarea de reintento: resumir el intento anterior
+        previo = historial[-1]
+        observaciones = (
+            f"{observaciones} [reintento #{len(historial)}; antes {previo['estado']} "
+            f"en tarea {previo['task_id'][:8]}: {previo['observaciones'][:60]}]"
+        )
+    return fila_compacta((
+        registro['fila'],              # Fila original del Excel
+        registro['reserva'],           # Número de reserva
+        registro['nombre'],            # Nombre completo
+        registro['correo'],            # Correo electrónico
+        codigo,                        # Código de afiliación o N/A
+        nombre_afiliador,              # Nombre del afiliador
+        estado,                        # EXITOSO, ERROR, ERROR CRÍTICO o CANCELADO
+        observaciones,                 # Detalles/observaciones
+        datetime.now().strftime("%Y-%m-%d %H:%M:%S"),  # Fecha de proceso
+        registro.get('origen', '')     # Archivo/hoja de procedencia
+    ))
+
+async def ejecutar_afiliaciones(
+    task_id: str,
+    processor,
+    registros: List[Dict],
+    nombre_afiliador: str,
+    al_finalizar_fila: Callable[[Dict, List, float], Optional[Awaitable[None]]],
+    flujo: Optional[FlujoRegistros] = None
+) -> Tuple[int, int]:
+    """
+    Procesar los registros fila por fila con un navegador ya configurado.
+    
+    Aplica reintentos, circuit breaker, reciclaje y reinicio del navegador.
+    El ritmo (pausa entre filas, tope de envíos por minuto) y las sesiones
+    activas los ajusta controlador_concurrencia (ver concurrencia.py).
+    Entre filas respeta la pausa/cancelación de la tarea; al cancelar lanza
+    TareaCancelada con las filas sin procesar en `sin_procesar`.
+    al_finalizar_fila(registro, fila_resultado, segundos) se llama con cada fila
+    terminada y su tiempo real (modo local: Excel de resultados y /stats; modo
+    cola: base de datos compartida); si devuelve un awaitable se espera.
+    Con `flujo` (ingesta en tubería, ver ingesta_continua.py) los registros
+    llegan mientras el libro se sigue leyendo: `registros` son los ya leídos
+    y el total se conoce recién al terminar la lectura.
+    Devuelve (exitosos, errores).
+    """
+    resultados_exitosos = 0
+    resultados_error = 0
+    
+    # Reintentos de fallos transitorios y circuit breaker (ver retry_policy.py)
+    politica = PoliticaReintentos.desde_entorno()
+    breaker = CircuitBreaker.desde_entorno()
+    
+    # Cola de trabajo: (registro, intento, disponible_desde). Los fallos
+    # transitorios se re-encolan al final con backoff exponencial.
+    # Con flujo, los registros nuevos se toman de él cuando no hay ninguno
+    # re-encolado listo.
+    if flujo is None:
+        pendientes = deque((registro, 1, 0.0) for registro in registros)
+    else:
+        pendientes = deque()
+    total = len(registros)
+    finalizados = 0
+    reintentos = 0
+    
+    # Reinicio del navegador si la sesión muere a mitad de la tarea. La fila
+    # afectada se repite sin consumir intentos (máx. 2 veces por fila).
+    max_reinicios = int(os.getenv("BROWSER_MAX_RESPAWNS", "5"))
+    repeticiones_fila: Dict[str, int] = {}
+    
+    # Tiempo real por huésped (de una fila terminada a la siguiente, con
+    # reintentos y pausas incluidos) para el modelo de ETAs
+    inicio_fila = time.monotonic()
+    
+    # Cancelación/pausa cooperativas (ver control_tareas.py)
+    control = obtener_control(task_id)
+    processor.control = control
+    
+    async def punto_control():
+        nonlocal inicio_fila
+        control.verificar()
+        if not control.pausada:
+            return
+        # En pausa el navegador se libera; se vuelve a abrir al reanudar
+        agregar_log_tarea(task_id, f"⏸️ Tarea en pausa ({finalizados}/{total} procesados). Navegador liberado")
+        actualizar_estado_tarea(task_id, status="paused", current_processing="En pausa")
+        await processor.liberar()
+        # Ceder también el lugar bajo el límite de sesiones (modo local; los
+        # workers no ocupan lugares)
+        tenia_lugar = task_id in controlador_concurrencia.activas
+        controlador_concurrencia.liberar_sesion(task_id)
+        await control.esperar_reanudacion()
+        if tenia_lugar:
+            if not controlador_concurrencia.hay_lugar():
+                actualizar_estado_tarea(task_id, current_processing="Esperando sesión libre")
+            await controlador_concurrencia.adquirir_sesion(task_id, control)
+        agregar_log_tarea(task_id, "▶️ Tarea reanudada. Abriendo navegador...")
+        actualizar_estado_tarea(task_id, status="processing", current_processing="Reanudando...")
+        if not await processor.preparar():
+            raise Exception("No se pudo abrir el navegador al reanudar la tarea")
+        inicio_fila = time.monotonic()
+    
+    async def ceder_sesion():
+        nonlocal inicio_fila
+        # El sitio está degradado y el límite adaptativo bajó: esta sesión sobra
+        agregar_log_tarea(
+            task_id,
+            f"🔽 Límite de sesiones reducido a {controlador_concurrencia.limite_sesiones} por lentitud/errores del sitio. "
+            "Navegador liberado hasta que haya lugar"
+        )
+        actualizar_estado_tarea(task_id, current_processing="Esperando sesión libre (sitio degradado)")
+        await processor.liberar()
+        controlador_concurrencia.liberar_sesion(task_id)
+        await controlador_concurrencia.adquirir_sesion(task_id, control)
+        agregar_log_tarea(task_id, "🔼 Hay lugar de nuevo. Abriendo navegador...")
+        actualizar_estado_tarea(task_id, current_processing="Reanudando...")
+        if not await processor.preparar():
+            raise Exception("No se pudo abrir el navegador al recuperar la sesión")
+        inicio_fila = time.monotonic()
+    
+    async def recuperar_sesion(motivo: str):
+        if processor.reinicios >= max_reinicios:
+            raise Exception(
+                f"El navegador se cayó más de {max_reinicios} veces; tarea detenida "
+                f"({finalizados}/{total} registros procesados)"
+            )
+        agregar_log_tarea(task_id, f"💀 Sesión del navegador caída: {motivo[:80]}. Reiniciando...")
+        actualizar_estado_tarea(task_id, current_processing="Reiniciando navegador...")
+        if not await processor.reiniciar_navegador():
+            raise Exception("No se pudo reiniciar el navegador tras una caída")
+        actualizar_estado_tarea(task_id, browser_restarts=processor.reinicios)
+        agregar_log_tarea(task_id, f"♻️ Navegador reiniciado ({processor.reinicios}/{max_reinicios})")
+    
+    # PROCESAR FILA POR FILA
+    en_curso = None
+    try:
+        while pendientes or (flujo is not None and not flujo.agotado):
+            await punto_control()
+            if controlador_concurrencia.debe_ceder(task_id):
+                await ceder_sesion()
+            if flujo is not None and not flujo.agotado and (
+                not pendientes or pendientes[0][2] > time.monotonic()
+            ):
+                # Sin filas re-encoladas listas: la siguiente del libro (espera
+                # al parser si todavía no la leyó)
+                nuevo = await flujo.siguiente()
+                total = len(flujo.registros)
+                if nuevo is None:
+                    actualizar_estado_tarea(task_id, total_records=total, total_known=True)
+                    continue
+                pendientes.appendleft((nuevo, 1, 0.0))
+            registro, intento, disponible_desde = pendientes.popleft()
+            en_curso = registro
+            
+            # Respetar el backoff de filas re-encoladas
+            espera = disponible_desde - time.monotonic()
+            if espera > 0:
+                agregar_log_tarea(task_id, f"⏳ Esperando {espera:.0f}s antes de reintentar a {registro['nombre']}")
+                await control.esperar(espera)
+            
+            # Circuit breaker: pausar si el sitio está fallando
+            pausa = breaker.espera_restante()
+            if pausa > 0:
+                agregar_log_tarea(task_id, f"⛔ Circuit breaker abierto: pausa de {pausa:.0f}s (tasa de error {breaker.tasa_actual:.0%})")
+                actualizar_estado_tarea(task_id, current_processing=f"En pausa por errores del sitio ({pausa:.0f}s)")
+                await control.esperar(pausa)
+                breaker.espera_restante()
+            
+            # Reciclar la sesión si superó los límites de memoria o páginas
+            motivo_reciclaje = processor.motivo_reciclaje()
+            if motivo_reciclaje:
+                agregar_log_tarea(task_id, f"♻️ Reciclando navegador: {motivo_reciclaje}")
+                actualizar_estado_tarea(task_id, current_processing="Reciclando navegador...")
+                if not await processor.reciclar_navegador():
+                    raise Exception("No se pudo relanzar el navegador al reciclar la sesión")
+                actualizar_estado_tarea(task_id, browser_recycles=processor.reciclajes)
+            
+            # Sonda de vida entre filas (Chrome pudo morir durante las esperas)
+            if not await processor.sesion_activa():
+                await recuperar_sesion("sin respuesta antes de procesar la fila")
+            
+            critico = False
+            inicio_envio = time.monotonic()
+            try:
+                # Actualizar estado
+                actualizar_estado_tarea(
+                    task_id,
+                    current_processing=f"{registro['nombre']} ({registro['correo']})"
+                )
+                
+                sufijo = f" (intento {intento})" if intento > 1 else ""
+                agregar_log_tarea(
+                    task_id, 
+                    f"[{finalizados + 1}/{total}] Procesando: {registro['nombre']} - {registro['correo']}{sufijo}"
+                )
+                
+                # Procesar afiliación individual (dentro del tope de envíos por minuto)
+                await controlador_concurrencia.esperar_envio(control)
+                inicio_envio = time.monotonic()
+                resultado = await processor.afiliar(registro)
+                
+            except TareaCancelada:
+                raise
+            except Exception as e:
+                # Error en registro individual
+                critico = True
+                agregar_log_tarea(task_id, f"🚨 ERROR CRÍTICO: {registro['nombre']} - {str(e)}")
+                resultado = {
+                    "success": False,
+                    "error": f"Error procesando: {str(e)[:100]}",
+                    "categoria": clasificar_excepcion(e),
+                    "sesion_muerta": es_sesion_muerta(e)
+                }
+            duracion_envio = time.monotonic() - inicio_envio
+            
+            # Sesión caída durante la fila: reiniciar y repetirla de inmediato
+            if not resultado['success'] and (
+                resultado.get('sesion_muerta') or not await processor.sesion_activa()
+            ):
+                repeticiones = repeticiones_fila.get(registro['correo'], 0)
+                if repeticiones < 2:
+                    repeticiones_fila[registro['correo']] = repeticiones + 1
+                    await recuperar_sesion(resultado['error'])
+                    pendientes.appendleft((registro, intento, 0.0))
+                    agregar_log_tarea(task_id, f"⏪ Repitiendo fila de {registro['nombre']} tras el reinicio")
+                    continue
+                # La fila tumba el navegador repetidamente: seguir el flujo normal de reintentos
+                await recuperar_sesion(resultado['error'])
+            
+            categoria = None if resultado['success'] else clasificar_fallo(resultado)
+            
+            # Solo los resultados atribuibles al sitio alimentan el circuit breaker
+            if resultado['success'] or categoria == TRANSITORIO:
+                if breaker.registrar(resultado['success']):
+                    agregar_log_tarea(task_id, f"⛔ Circuit breaker abierto tras {breaker.tasa_actual:.0%} de errores recientes")
+                actualizar_estado_tarea(task_id, circuit_breaker=breaker.resumen())
+                ajuste = controlador_concurrencia.registrar(duracion_envio, resultado['success'])
+                if ajuste and ajuste["direction"] == "reduccion":
+                    agregar_log_tarea(
+                        task_id,
+                        f"🐢 Sitio degradado (error {ajuste['window_error_rate']:.0%}, mediana {ajuste['window_median_seconds']:.1f}s): "
+                        f"{ajuste['session_limit']} sesiones, pausa de {ajuste['pacing_seconds']:.1f}s"
+                    )
+            
+            # Fallo transitorio con intentos disponibles: re-encolar al final
+            if politica.debe_reintentar(categoria, intento):
+                espera = politica.espera(intento)
+                pendientes.append((registro, intento + 1, time.monotonic() + espera))
+                reintentos += 1
+                actualizar_estado_tarea(task_id, retried_records=reintentos)
+                agregar_log_tarea(
+                    task_id,
+                    f"🔁 Reintento {intento + 1}/{politica.max_intentos} programado para {registro['nombre']} en {espera:.0f}s: {resultado['error']}"
+                )
+                await control.esperar(controlador_concurrencia.pausa_s)
+                continue
+            
+            # Preparar datos para Excel
+            if resultado['success']:
+                estado = "EXITOSO"
+                codigo = resultado['codigo']
+                observaciones = "Afiliación completada correctamente"
+                resultados_exitosos += 1
+                agregar_log_tarea(task_id, f"✅ ÉXITO: {registro['nombre']} - Código: {codigo}")
+            else:
+                estado = "ERROR CRÍTICO" if critico else "ERROR"
+                codigo = "N/A"
+                observaciones = resultado['error']
+                resultados_error += 1
+                if not critico:
+                    agregar_log_tarea(task_id, f"❌ ERROR: {registro['nombre']} - {resultado['error']}")
+            
+            if intento > 1:
+                observaciones = f"{observaciones} (intentos: {intento})"
+            
+            # Fila de resultados
+            fila_resultado = construir_fila_resultado(registro, codigo, nombre_afiliador, estado, observaciones)
+            
+            finalizados += 1
+            en_curso = None
+            ahora = time.monotonic()
+            publicada = al_finalizar_fila(registro, fila_resultado, ahora - inicio_fila)
+            if inspect.isawaitable(publicada):
+                await publicada
+            modelo_rendimiento.registrar_fila(processor.tipo_afiliacion, ahora - inicio_fila, sesion=task_id)
+            inicio_fila = ahora
+            if flujo is not None and not flujo.terminado:
+                # Total aún desconocido: progreso sobre lo leído, sin llegar al 100
+                total = len(flujo.registros)
+                progreso = min(99, int(finalizados / total * 100))
+            else:
+                progreso = int(finalizados / total * 100)
+            actualizar_estado_tarea(
+                task_id,
+                processed_records=finalizados,
+                total_records=total,
+                progress=progreso,
+                successful_records=resultados_exitosos,
+                error_records=resultados_error
+            )
+            
+            # Pausa entre procesos (importante para no ser detectado); adaptativa
+            await control.esperar(controlador_concurrencia.pausa_s)
+    except TareaCancelada as cancelacion:
+        # Filas que no llegaron a procesarse (la que estaba en curso no se envió)
+        restantes = [registro for registro, _, _ in pendientes]
+        if flujo is not None:
+            restantes.extend(flujo.pendientes())
+            flujo.cancelar()
+        if en_curso is not None and all(registro is not en_curso for registro in restantes):
+            restantes.insert(0, en_curso)
+        cancelacion.sin_procesar = restantes
+        agregar_log_tarea(task_id, f"🛑 Tarea cancelada: {finalizados}/{total} procesados, {len(restantes)} sin procesar")
+        raise
+    
+    return resultados_exitosos, resultados_error
 
 async def procesar_afiliaciones_background(
     task_id: str, 
     registros: List[Dict], 
     tipo_afiliacion: str, 
-    nombre_afiliador: str
+    nombre_afiliador: str,
+    motor: Optional[str] = None,
+    flujo: Optional[FlujoRegistros] = None
 ):
     """
     Proceso en segundo plano para automatización secuencial de Marriott
+    (con el motor de la tarea o, si no se indicó, el del despliegue).
+    Con `flujo`, el libro se sigue leyendo mientras se procesa.
     """
+    from openpyxl import Workbook
+    
     processor = None
+    wb_result = None
     
     try:
-        agregar_log_tarea(task_id, f"Iniciando procesamiento de {len(registros)} registros")
+        if flujo is not None and not flujo.terminado:
+            agregar_log_tarea(task_id, f"Iniciando procesamiento con {len(registros)} registros leídos (lectura en curso)")
+        else:
+            agregar_log_tarea(task_id, f"Iniciando procesamiento de {len(registros)} registros")
         actualizar_estado_tarea(task_id, status="processing", total_records=len(registros))
         
-        # Crear procesador
-        processor = MarriottProcessor(tipo_afiliacion, nombre_afiliador)
+        # Esperar lugar bajo el límite adaptativo de sesiones (ver concurrencia.py)
+        if not controlador_concurrencia.hay_lugar():
+            agregar_log_tarea(
+                task_id,
+                f"⏳ {controlador_concurrencia.limite_sesiones} sesiones activas (límite adaptativo). Esperando lugar..."
+            )
+            actualizar_estado_tarea(task_id, current_processing="Esperando sesión libre")
+        control = obtener_control(task_id)
+        await controlador_concurrencia.adquirir_sesion(task_id, control)
+        # Con lugar libre no se esperó: cancelada o eliminada antes de arrancar, sin abrir el navegador
+        control.verificar()
+        
+        # Crear procesador (ver motores.py)
+        processor = crear_motor(motor, tipo_afiliacion, nombre_afiliador, task_id=task_id)
         
         # Configurar navegador
-        agregar_log_tarea(task_id, "Configurando navegador...")
-        if not await processor.setup_chrome_driver():
-            raise Exception("Error configurando ChromeDriver")
+        agregar_log_tarea(task_id, f"Configurando navegador (motor {processor.motor})...")
+        inicio_arranque = time.monotonic()
+        if not await processor.preparar():
+            raise Exception(f"Error configurando el motor {processor.motor}")
+        modelo_rendimiento.registrar_arranque(tipo_afiliacion, time.monotonic() - inicio_arranque)
         
         agregar_log_tarea(task_id, "Navegador configurado correctamente")
         
@@ -487,6 +748,7 @@ async def procesar_afiliaciones_background(
         timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
         result_filename = f"afiliaciones_{tipo_afiliacion}_{timestamp}.xlsx"
         result_path = os.path.join(temp_files_dir, result_filename)
+        actualizar_estado_tarea(task_id, archivo_resultados=result_filename)
         
         # Crear Excel de resultados
         wb_result = Workbook()
@@ -494,100 +756,29 @@ async def procesar_afiliaciones_background(
         ws_result.title = "Afiliaciones"
         
         # Headers del Excel
-        headers = [
-            "No. Fila Original", "No. Reserva", "Nombre Completo", 
-            "Correo", "Código Afiliación", "Afiliador", "Estado", 
-            "Observaciones", "Fecha Proceso"
-        ]
-        ws_result.append(headers)
+        ws_result.append(ENCABEZADOS_RESULTADOS)
         
-        resultados_exitosos = 0
-        resultados_error = 0
+        # Registros de resultados en memoria (para exportar CSV/JSONL)
+        filas_resultados = tasks_storage[task_id].setdefault("resultados", [])
         
-        # PROCESAR FILA POR FILA
-        for idx, registro in enumerate(registros):
-            try:
-                # Actualizar estado
-                progress = int((idx + 1) / len(registros) * 100)
-                actualizar_estado_tarea(
-                    task_id,
-                    processed_records=idx + 1,
-                    progress=progress,
-                    current_processing=f"{registro['nombre']} ({registro['correo']})"
-                )
-                
-                agregar_log_tarea(
-                    task_id, 
-                    f"[{idx+1}/{len(registros)}] Procesando: {registro['nombre']} - {registro['correo']}"
-                )
-                
-                # Procesar afiliación individual
-                resultado = await processor.procesar_afiliacion(
-                    registro['nombre'],
-                    registro['correo'], 
-                    registro['reserva']
-                )
-                
-                # Preparar datos para Excel
-                if resultado['success']:
-                    estado = "EXITOSO"
-                    codigo = resultado['codigo']
-                    observaciones = "Afiliación completada correctamente"
-                    resultados_exitosos += 1
-                    agregar_log_tarea(task_id, f"✅ ÉXITO: {registro['nombre']} - Código: {codigo}")
-                else:
-                    estado = "ERROR"
-                    codigo = "N/A"
-                    observaciones = resultado['error']
-                    resultados_error += 1
-                    agregar_log_tarea(task_id, f"❌ ERROR: {registro['nombre']} - {resultado['error']}")
-                
-                # Agregar fila al Excel
-                fila_resultado = [
-                    registro['fila'],              # Fila original del Excel
-                    registro['reserva'],           # Número de reserva
-                    registro['nombre'],            # Nombre completo
-                    registro['correo'],            # Correo electrónico
-                    codigo,                        # Código de afiliación o N/A
-                    nombre_afiliador,              # Nombre del afiliador
-                    estado,                        # EXITOSO o ERROR
-                    observaciones,                 # Detalles/observaciones
-                    datetime.now().strftime("%Y-%m-%d %H:%M:%S")  # Fecha de proceso
-                ]
-                ws_result.append(fila_resultado)
-                
-                # Guardar progreso cada 5 registros
-                if (idx + 1) % 5 == 0:
-                    wb_result.save(result_path)
-                    agregar_log_tarea(task_id, f"Progreso guardado: {idx + 1}/{len(registros)}")
-                
-                # Pausa entre procesos (importante para no ser detectado)
-                await asyncio.sleep(2)
-                
-            except Exception as e:
-                # Error en registro individual
-                resultados_error += 1
-                agregar_log_tarea(task_id, f"🚨 ERROR CRÍTICO: {registro['nombre']} - {str(e)}")
-                
-                # Agregar error al Excel
-                fila_error = [
-                    registro['fila'],
-                    registro['reserva'],
-                    registro['nombre'],
-                    registro['correo'], 
-                    "N/A",
-                    nombre_afiliador,
-                    "ERROR CRÍTICO",
-                    f"Error procesando: {str(e)[:100]}",
-                    datetime.now().strftime("%Y-%m-%d %H:%M%S")
-                ]
-                ws_result.append(fila_error)
-                
-                # Continuar con el siguiente registro
-                continue
+        def guardar_fila(registro: Dict, fila_resultado: List, segundos: float):
+            ws_result.append(fila_resultado)
+            filas_resultados.append(fila_resultado)
+            registrar_estadistica_fila(tipo_afiliacion, fila_resultado, segundos)
+            
+            # Guardar progreso cada 5 registros
+            if len(filas_resultados) % 5 == 0:
+                wb_result.save(result_path)
+                registro_resultados.registrar(result_filename)
+                agregar_log_tarea(task_id, f"Progreso guardado: {len(filas_resultados)}/{len(registros)}")
+        
+        resultados_exitosos, resultados_error = await ejecutar_afiliaciones(
+            task_id, processor, registros, nombre_afiliador, guardar_fila, flujo
+        )
         
         # Guardar archivo final
         wb_result.save(result_path)
+        registro_resultados.registrar(result_filename)
         agregar_log_tarea(task_id, "Archivo Excel de resultados guardado")
         
         # Actualizar estado final
@@ -602,12 +793,43 @@ async def procesar_afiliaciones_background(
         )
         
         mensaje_final = f"✅ Proceso completado exitosamente. Resultados: {resultados_exitosos} exitosos, {resultados_error} errores"
+        if flujo is not None and flujo.error:
+            mensaje_final += f". ⚠️ La lectura del archivo se interrumpió ({flujo.error}): solo se procesaron las filas leídas"
         agregar_log_tarea(task_id, mensaje_final)
         actualizar_estado_tarea(task_id, message=mensaje_final)
         
+    except TareaCancelada as cancelacion:
+        # Cerrar el archivo con lo procesado y las filas pendientes marcadas
+        sin_procesar = getattr(cancelacion, "sin_procesar", [])
+        mensaje = f"🛑 Tarea cancelada: {cancelacion}. {len(sin_procesar)} registros sin procesar"
+        if flujo is not None and not flujo.terminado:
+            mensaje += " (el resto del archivo no llegó a leerse)"
+        if wb_result is not None:
+            for registro in sin_procesar:
+                fila = construir_fila_resultado(registro, "N/A", nombre_afiliador, "CANCELADO", str(cancelacion))
+                ws_result.append(fila)
+                filas_resultados.append(fila)
+            wb_result.save(result_path)
+            registro_resultados.registrar(result_filename)
+            actualizar_estado_tarea(task_id, result_file_url=f"/download/{result_filename}")
+            mensaje += " (resultados parciales guardados)"
+        agregar_log_tarea(task_id, mensaje)
+        actualizar_estado_tarea(task_id, status="cancelled", current_processing="Cancelada", message=mensaje)
+        
     except Exception as e:
         # Error crítico del proceso completo
         error_msg = f"🚨 Error crítico en procesamiento: {str(e)}"
+        
+        # Conservar lo ya procesado
+        if wb_result is not None:
+            try:
+                wb_result.save(result_path)
+                registro_resultados.registrar(result_filename)
+                actualizar_estado_tarea(task_id, result_file_url=f"/download/{result_filename}")
+                error_msg += " (resultados parciales guardados)"
+            except Exception:
+                pass
+        
         actualizar_estado_tarea(task_id, status="error", message=error_msg)
         
     finally:
@@ -618,6 +840,271 @@ async def procesar_afiliaciones_background(
                 agregar_log_tarea(task_id, "Navegador cerrado")
             except Exception:
                 pass
+        
+        # Detener la lectura si la tarea terminó antes que el parser
+        if flujo is not None:
+            flujo.cancelar()
+        
+        controlador_concurrencia.liberar_sesion(task_id)
+        modelo_rendimiento.olvidar_sesion(task_id)
+        controles_tareas.pop(task_id, None)
+        await asyncio.to_thread(modelo_rendimiento.guardar)
+        await asyncio.to_thread(estadisticas_afiliacion.guardar)
+
+# === SINCRONIZACIÓN CON LA COLA (MODO WORKERS) ===
+def escribir_resultados_cola(result_filename: str, resultados: List):
+    """Excel de resultados de una tarea procesada por workers (en un hilo)"""
+    from openpyxl import Workbook
+    
+    wb_result = Workbook(write_only=True)
+    ws_result = wb_result.create_sheet("Afiliaciones")
+    ws_result.append(ENCABEZADOS_RESULTADOS)
+    for fila in resultados:
+        ws_result.append(fila)
+    wb_result.save(os.path.join(temp_files_dir, result_filename))
+    registro_resultados.registrar(result_filename)
+
+async def finalizar_tarea_cola(task_id: str, estado: Dict):
+    """Escribir el Excel de resultados de una tarea procesada por workers"""
+    tarea = tasks_storage[task_id]
+    timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
+    result_filename = f"afiliaciones_{tarea['tipo_afiliacion']}_{timestamp}.xlsx"
+    await asyncio.to_thread(escribir_resultados_cola, result_filename, list(tarea["resultados"]))
+    
+    sin_procesar = tarea["total_records"] - len(tarea["resultados"])
+    cancelada = tarea.get("cancel_requested", False)
+    mensaje_final = (
+        f"{'🛑 Tarea cancelada' if cancelada else '✅ Proceso completado'}. "
+        f"Resultados: {tarea['successful_records']} exitosos, {tarea['error_records']} errores"
+    )
+    if sin_procesar > 0:
+        motivos = list(dict.fromkeys(estado["errores"]))[:3]
+        mensaje_final += f", {sin_procesar} sin procesar ({'; '.join(motivos)})"
+    
+    actualizar_estado_tarea(
+        task_id,
+        status="cancelled" if cancelada else "completed",
+        progress=100,
+        archivo_resultados=result_filename,
+        result_file_url=f"/download/{result_filename}",
+        current_processing="Cancelada" if cancelada else "Proceso completado",
+        message=mensaje_final
+    )
+    agregar_log_tarea(task_id, mensaje_final)
+    await asyncio.to_thread(cola_trabajos.purgar_tarea, task_id)
+    await asyncio.to_thread(estadisticas_afiliacion.guardar)
+
+def leer_cola(task_ids: List[str], cursor):
+    """Lecturas de SQLite de una sincronización (en un hilo: pueden esperar el lock de la cola)"""
+    # Primero los estados: un bloque se marca completado después de publicar sus
+    # filas, así que las novedades leídas a continuación ya las incluyen
+    cola_trabajos.vencer_cancelaciones()
+    estados = {task_id: cola_trabajos.estado_tarea(task_id) for task_id in task_ids}
+    resultados, eventos, cursor = cola_trabajos.leer_novedades(cursor)
+    modelo_rendimiento.recargar_si_cambio()
+    return estados, resultados, eventos, cursor
+
+async def sincronizar_cola(cursor):
+    """Llevar a tasks_storage los resultados y logs que publicaron los workers"""
+    task_ids = [
+        task_id for task_id, tarea in list(tasks_storage.items())
+        if tarea.get("execution_mode") == "cola" and tarea["status"] not in ESTADOS_TERMINADOS
+    ]
+    estados, resultados, eventos, cursor = await asyncio.to_thread(leer_cola, task_ids, cursor)
+    
+    for task_id, mensaje in eventos:
+        agregar_log_tarea(task_id, mensaje)
+    
+    for task_id, fila, segundos in resultados:
+        tarea = tasks_storage.get(task_id)
+        if tarea is None or tarea["status"] in ESTADOS_TERMINADOS:
+            continue
+        fila = fila_compacta(fila)
+        tarea["resultados"].append(fila)
+        registrar_estadistica_fila(tarea["tipo_afiliacion"], fila, segundos)
+        if fila[6] == "EXITOSO":
+            tarea["successful_records"] += 1
+        else:
+            tarea["error_records"] += 1
+        procesados = len(tarea["resultados"])
+        actualizar_estado_tarea(
+            task_id,
+            processed_records=procesados,
+            progress=int(procesados / max(tarea["total_records"], 1) * 100)
+        )
+    
+    for task_id, estado in estados.items():
+        if task_id not in tasks_storage or tasks_storage[task_id]["status"] in ESTADOS_TERMINADOS:
+            continue  # Eliminada o terminada mientras se leía la cola
+        if estado["total"] and estado["terminados"] == estado["total"]:
+            await finalizar_tarea_cola(task_id, estado)
+        elif estado["en_curso"]:
+            actualizar_estado_tarea(
+                task_id,
+                status="paused" if tasks_storage[task_id]["status"] == "paused" else "processing",
+                current_processing=" | ".join(estado["en_curso"]),
+                active_workers=len(estado["en_curso"]),
+                queue=estado["bloques"]
+            )
+    return cursor
+
+async def bucle_sincronizacion_cola():
+    cursor = await asyncio.to_thread(cola_trabajos.ultimo_cursor)
+    while True:
+        await asyncio.sleep(INTERVALO_SINCRONIZACION)
+        try:
+            cursor = await sincronizar_cola(cursor)
+        except Exception as e:
+            print(f"[⚠️] Error sincronizando la cola de trabajos: {e}")
+
+def validar_parametros_tarea(tipo_afiliacion: str, nombre_afiliador: str, motor: Optional[str] = None):
+    """Validar tipo de afiliación, afiliador y motor (común a todas las entradas)"""
+    if tipo_afiliacion.lower() not in TIPOS_AFILIACION:
+        raise HTTPException(
+            status_code=400, 
+            detail=f"tipo_afiliacion debe ser uno de: {', '.join(TIPOS_AFILIACION)}"
+        )
+    
+    if not nombre_afiliador.strip():
+        raise HTTPException(
+            status_code=400, 
+            detail="nombre_afiliador es requerido y no puede estar vacío"
+        )
+    
+    try:
+        validar_motor(motor)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+def crear_tarea(
+    background_tasks: BackgroundTasks,
+    registros: List[Dict],
+    tipo_afiliacion: str,
+    nombre_afiliador: str,
+    origen: str = "excel",
+    motor: Optional[str] = None,
+    flujo: Optional[FlujoRegistros] = None
+) -> str:
+    """
+    Registrar el estado inicial de una tarea y encolar su procesamiento.
+    Con `flujo` (solo modo local) `registros` son los leídos hasta ahora y
+    la lista crece mientras el libro se sigue leyendo.
+    """
+    task_id = str(uuid.uuid4())
+    motor = validar_motor(motor)
+    
+    # === CREAR ESTADO INICIAL DE TAREA ===
+    tasks_storage[task_id] = {
+        "task_id": task_id,
+        "status": "pending",
+        "progress": 0,
+        "total_records": len(registros),
+        "total_known": flujo is None or flujo.terminado,
+        "processed_records": 0,
+        "successful_records": 0,
+        "error_records": 0,
+        "current_processing": "Preparando...",
+        "message": f"Tarea creada. {len(registros)} registros para procesar.",
+        "logs": [f"Tarea iniciada con {len(registros)} registros"],
+        "result_file_url": None,
+        "resultados": [],
+        "created_at": datetime.now().isoformat(),
+        "last_updated": datetime.now().isoformat(),
+        "tipo_afiliacion": tipo_afiliacion.lower(),
+        "nombre_afiliador": nombre_afiliador.strip(),
+        "origen": origen,
+        "motor": motor,
+        "registros": registros  # Para /task/{id}/retry-failed sin re-ingesta
+    }
+    
+    # === MODO COLA: LOS WORKERS TOMAN LOS BLOQUES ===
+    if cola_trabajos is not None:
+        bloques = cola_trabajos.encolar_tarea(
+            task_id, registros, tipo_afiliacion.lower(), nombre_afiliador.strip(), motor=motor
+        )
+        actualizar_estado_tarea(
+            task_id,
+            status="queued",
+            execution_mode="cola",
+            current_processing="Esperando workers...",
+            message=f"Tarea encolada en {bloques} bloques. {len(registros)} registros para procesar."
+        )
+        return task_id
+    
+    # === INICIAR PROCESAMIENTO EN SEGUNDO PLANO ===
+    obtener_control(task_id)
+    background_tasks.add_task(
+        procesar_afiliaciones_background,
+        task_id,
+        registros,
+        tipo_afiliacion.lower(),
+        nombre_afiliador.strip(),
+        motor,
+        flujo
+    )
+    
+    return task_id
+
+def estimar_tarea(task_data: Dict) -> Dict:
+    """ETA de lo que le falta a una tarea según el modelo de rendimiento medido"""
+    tipo = task_data.get("tipo_afiliacion", "")
+    restantes = task_data["total_records"] - task_data["processed_records"]
+    terminada = task_data["status"] in ESTADOS_TERMINADOS
+    if terminada or restantes <= 0:
+        return {"estimated_remaining_minutes": 0, "estimated_remaining_p90_minutes": 0, "estimated_completion": None}
+    
+    # Sin navegador todavía: sumar el arranque. En modo cola varios workers
+    # pueden estar procesando bloques de la misma tarea a la vez
+    arranque = task_data["status"] in ("pending", "queued")
+    paralelo = max(task_data.get("active_workers") or 1, 1)
+    esperado = modelo_rendimiento.estimar(tipo, restantes, sesion=task_data["task_id"], incluir_arranque=arranque) / paralelo
+    pesimista = modelo_rendimiento.estimar(tipo, restantes, sesion=task_data["task_id"], incluir_arranque=arranque, cuantil=0.9) / paralelo
+    return {
+        "estimated_remaining_minutes": round(esperado / 60, 1),
+        "estimated_remaining_p90_minutes": round(max(pesimista, esperado) / 60, 1),
+        "estimated_completion": datetime.fromtimestamp(time.time() + esperado).isoformat(timespec="seconds"),
+    }
+
+def trabajo_pendiente_segundos() -> float:
+    """Tiempo estimado de todo lo que falta procesar (control de admisión / cola)"""
+    return sum(
+        modelo_rendimiento.estimar(
+            tarea.get("tipo_afiliacion", ""),
+            tarea["total_records"] - tarea["processed_records"],
+            sesion=task_id
+        )
+        for task_id, tarea in list(tasks_storage.items())
+        if tarea["status"] not in ESTADOS_TERMINADOS
+    )
+
+def respuesta_tarea_creada(task_id: str, registros: List[Dict], **extra) -> JSONResponse:
+    """Respuesta 202 estándar para una tarea recién creada"""
+    tipo = tasks_storage[task_id]["tipo_afiliacion"]
+    estimado = modelo_rendimiento.estimar(tipo, len(registros), incluir_arranque=True)
+    pesimista = modelo_rendimiento.estimar(tipo, len(registros), incluir_arranque=True, cuantil=0.9)
+    if cola_trabajos is not None:
+        # Los workers comparten la cola: lo que ya estaba pendiente va antes
+        workers = max(cola_trabajos.resumen()["active_workers"], 1)
+        extra.setdefault("estimated_queue_wait_minutes", round(
+            (trabajo_pendiente_segundos() - modelo_rendimiento.estimar(tipo, len(registros))) / workers / 60, 1
+        ))
+    return JSONResponse(
+        status_code=202,  # Accepted
+        content={
+            "success": True,
+            "message": "Procesamiento iniciado exitosamente",
+            "task_id": task_id,
+            "total_records": len(registros),
+            "status_url": f"/status/{task_id}",
+            "estimated_time_minutes": round(estimado / 60, 1),  # Modelo medido (ver throughput.py)
+            "estimated_time_p90_minutes": round(max(pesimista, estimado) / 60, 1),
+            "next_steps": [
+                f"1. Monitorea el progreso en: GET /status/{task_id}",
+                f"2. Descarga los resultados cuando termine: GET /download/[filename]"
+            ],
+            **extra
+        }
+    )
 
 # === ENDPOINTS API ===
 
@@ -629,13 +1116,21 @@ async def root():
         "status": "active",
         "endpoints": {
             "POST /procesar": "Iniciar procesamiento de afiliaciones",
+            "POST /procesar/batch": "Iniciar procesamiento desde NDJSON o CSV (sin Excel)",
             "GET /status/{task_id}": "Obtener estado de tarea en tiempo real", 
-            "GET /download/{filename}": "Descargar archivo Excel con resultados",
+            "POST /task/{task_id}/cancel": "Cancelar una tarea (guarda resultados parciales)",
+            "POST /task/{task_id}/pause": "Pausar una tarea liberando el navegador",
+            "POST /task/{task_id}/resume": "Reanudar una tarea en pausa",
+            "POST /task/{task_id}/retry-failed": "Nueva tarea solo con las filas fallidas",
+            "GET /download/{filename}": "Descargar archivo Excel con resultados (soporta Range)",
+            "GET /export/{task_id}?formato=csv|jsonl": "Exportar resultados en streaming (gzip/zstd)",
+            "GET /export/bundle?task_ids=a,b&formato=xlsx|csv|jsonl": "ZIP con resultados de varias tareas",
             "GET /health": "Health check",
+            "GET /stats?nombre_afiliador=&tipo_afiliacion=&granularidad=dia|hora": "Huéspedes/hora, tasa de éxito, latencia mediana y errores frecuentes",
             "GET /tasks": "Listar todas las tareas activas"
         },
         "supported_files": [".xlsx", ".xls"],
-        "affiliations": ["express", "junior"]
+        "affiliations": list(TIPOS_AFILIACION)
     }
 
 @app.get("/health")
@@ -645,105 +1140,383 @@ async def health_check():
         "status": "healthy", 
         "timestamp": datetime.now().isoformat(),
         "active_tasks": len(tasks_storage),
-        "temp_files": len([f for f in os.listdir(temp_files_dir) if f.endswith('.xlsx')])
+        "temp_files": registro_resultados.cantidad,
+        "temp_files_mb": round(registro_resultados.total_bytes / (1024 * 1024), 2),
+        "last_cleanup": limpiador.ultima_ejecucion,
+        "excel_layouts": cache_disenos.resumen(),
+        "browsers": vigilante.resumen(),
+        "browser_cache": gestor_perfiles.resumen(),
+        "execution_mode": MODO_EJECUCION,
+        "enrollment_engine": MOTOR_POR_DEFECTO,
+        "enrollment_engines": list(MOTORES),
+        "queue": cola_trabajos.resumen() if cola_trabajos else None,
+        "throughput": modelo_rendimiento.resumen(),
+        "concurrency": controlador_concurrencia.resumen(),
+        "pending_work_minutes": round(trabajo_pendiente_segundos() / 60, 1),
+        "upload_cache": cache_lecturas.resumen() | registro_envios.resumen()
+    }
+
+@app.get("/stats")
+async def obtener_estadisticas(
+    nombre_afiliador: Optional[str] = None,
+    tipo_afiliacion: Optional[str] = None,
+    granularidad: str = "dia",
+    periodos: Optional[int] = None
+):
+    """
+    Estadísticas acumuladas de todas las filas procesadas (ver estadisticas.py).
+    Sin filtros: total, por afiliador, por tipo y serie por día u hora.
+    Con nombre_afiliador y/o tipo_afiliacion: ese corte y su serie diaria.
+    """
+    if granularidad not in ("dia", "hora"):
+        raise HTTPException(status_code=400, detail="granularidad debe ser 'dia' u 'hora'")
+    if periodos is not None and periodos <= 0:
+        raise HTTPException(status_code=400, detail="periodos debe ser mayor a 0")
+    
+    return {
+        "generated_at": datetime.now().isoformat(),
+        **estadisticas_afiliacion.consultar(nombre_afiliador, tipo_afiliacion, granularidad, periodos)
     }
 
+async def _guardar_archivos_subidos(archivos: List[UploadFile]) -> Tuple[List[str], List[str]]:
+    """
+    Copiar los archivos subidos a temporales calculando su SHA-256 por bloques.
+    Devuelve (rutas, hashes) en el orden recibido.
+    """
+    rutas, hashes = [], []
+    try:
+        for archivo in archivos:
+            with tempfile.NamedTemporaryFile(delete=False, suffix='.xlsx') as tmp_file:
+                rutas.append(tmp_file.name)
+                hashes.append(await guardar_con_hash(archivo, tmp_file))
+    except Exception:
+        _borrar_temporales(rutas)
+        raise
+    return rutas, hashes
+
+def _borrar_temporales(rutas: List[str]):
+    for ruta in rutas:
+        if os.path.exists(ruta):
+            os.unlink(ruta)
+
+def _leer_libro_cacheado(ruta: str, huella: str, nombre_archivo: str, todas_las_hojas: bool) -> List[Dict]:
+    """leer_archivo_excel con caché por contenido (un libro idéntico no se vuelve a parsear)"""
+    clave = (huella, nombre_archivo, todas_las_hojas)
+    registros = cache_lecturas.buscar(clave)
+    if registros is not None:
+        print(f"[⚡] {nombre_archivo}: {len(registros)} registros desde la caché de archivos")
+        return registros
+    registros = leer_archivo_excel(ruta, todas_las_hojas, nombre_archivo)
+    cache_lecturas.guardar(clave, registros)
+    return registros
+
+async def _leer_archivos_subidos(
+    archivos: List[UploadFile], rutas: List[str], hashes: List[str], todas_las_hojas: bool
+) -> List[List[Dict]]:
+    """
+    Leer en paralelo (un hilo por archivo) los libros ya guardados.
+    Devuelve una lista de registros por archivo, en el orden recibido.
+    """
+    lecturas = [
+        asyncio.to_thread(_leer_libro_cacheado, ruta, huella, archivo.filename, todas_las_hojas)
+        for ruta, huella, archivo in zip(rutas, hashes, archivos)
+    ]
+    resultados = await asyncio.gather(*lecturas, return_exceptions=True)
+    
+    errores = [
+        f"{archivo.filename}: {resultado}"
+        for archivo, resultado in zip(archivos, resultados)
+        if isinstance(resultado, Exception)
+    ]
+    if errores:
+        raise HTTPException(status_code=400, detail=" | ".join(errores))
+    return resultados
+
+def respuesta_envio_repetido(task_id: str) -> JSONResponse:
+    """El mismo envío ya tiene una tarea (en curso o reciente): devolverla"""
+    tarea = tasks_storage[task_id]
+    registro_envios.reutilizados += 1
+    agregar_log_tarea(task_id, "🔁 Envío idéntico recibido; se reutiliza esta tarea")
+    return JSONResponse(
+        status_code=200,
+        content={
+            "success": True,
+            "duplicate_submission": True,
+            "message": "Estos archivos ya se enviaron con los mismos parámetros; se devuelve la tarea existente",
+            "task_id": task_id,
+            "status": tarea["status"],
+            "total_records": tarea["total_records"],
+            "status_url": f"/status/{task_id}",
+            "result_file_url": tarea.get("result_file_url")
+        }
+    )
+
 @app.post("/procesar")
 async def procesar_afiliaciones(
     background_tasks: BackgroundTasks,
-    archivo_excel: UploadFile = File(..., description="Archivo Excel con huéspedes"),
-    tipo_afiliacion: str = Form(..., description="Tipo: 'express' o 'junior'"),
-    nombre_afiliador: str = Form(..., description="Nombre del afiliador")
+    archivo_excel: List[UploadFile] = File(..., description="Uno o varios archivos Excel con huéspedes"),
+    tipo_afiliacion: str = Form(..., description="Tipo: 'express', 'junior' u otro perfil configurado"),
+    nombre_afiliador: str = Form(..., description="Nombre del afiliador"),
+    todas_las_hojas: bool = Form(False, description="Leer todas las hojas de cada libro (no solo la primera)"),
+    motor: Optional[str] = Form(None, description="Motor de afiliación (selenium, http, cdp); por defecto el del despliegue")
 ):
     """
-    Endpoint principal para iniciar procesamiento de afiliaciones Marriott
+    Endpoint principal para iniciar procesamiento de afiliaciones Marriott.
+    Acepta varios archivos (campo archivo_excel repetido) y, opcionalmente,
+    todas sus hojas; los registros se unen en una sola tarea sin correos duplicados.
+    Re-enviar los mismos archivos con los mismos parámetros (en curso o en los
+    últimos UPLOAD_DEDUP_SECONDS) devuelve la tarea existente.
     """
     try:
         # === VALIDACIONES INICIALES ===
-        if not archivo_excel.filename.endswith(('.xlsx', '.xls')):
-            raise HTTPException(
-                status_code=400, 
-                detail="Solo se permiten archivos Excel (.xlsx, .xls)"
-            )
+        for archivo in archivo_excel:
+            if not archivo.filename.endswith(('.xlsx', '.xls')):
+                raise HTTPException(
+                    status_code=400, 
+                    detail=f"Solo se permiten archivos Excel (.xlsx, .xls): {archivo.filename}"
+                )
         
-        if tipo_afiliacion.lower() not in ["express", "junior"]:
-            raise HTTPException(
-                status_code=400, 
-                detail="tipo_afiliacion debe ser 'express' o 'junior'"
-            )
+        validar_parametros_tarea(tipo_afiliacion, nombre_afiliador, motor)
         
-        if not nombre_afiliador.strip():
-            raise HTTPException(
-                status_code=400, 
-                detail="nombre_afiliador es requerido y no puede estar vacío"
+        # === GUARDAR ARCHIVOS (CON HASH DE CONTENIDO) ===
+        rutas, hashes = await _guardar_archivos_subidos(archivo_excel)
+        try:
+            # Envío idempotente: mismos archivos y parámetros -> misma tarea
+            # (motor resuelto: omitirlo equivale a pedir el del despliegue)
+            huella = registro_envios.huella(
+                hashes, tipo_afiliacion, nombre_afiliador, todas_las_hojas, validar_motor(motor)
             )
+            existente = registro_envios.buscar(huella) or await registro_envios.esperar_en_curso(huella)
+            if existente and tasks_storage.get(existente, {}).get("status") not in (None, "error", "cancelled"):
+                return respuesta_envio_repetido(existente)
+            
+            registro_envios.reservar(huella)
+            task_id = None
+            try:
+                task_id, respuesta, en_lectura = await _crear_tarea_desde_archivos(
+                    background_tasks, archivo_excel, rutas, hashes, tipo_afiliacion, nombre_afiliador, todas_las_hojas,
+                    motor
+                )
+            finally:
+                registro_envios.liberar(huella, task_id)
+            if en_lectura:
+                # La lectura en tubería sigue usando los temporales y los borra al terminar
+                rutas = []
+            return respuesta
+        finally:
+            _borrar_temporales(rutas)
         
-        # === PROCESAR ARCHIVO EXCEL ===
-        # Generar ID único para la tarea
-        task_id = str(uuid.uuid4())
-        
-        # Guardar archivo temporal
-        with tempfile.NamedTemporaryFile(delete=False, suffix='.xlsx') as tmp_file:
-            content = await archivo_excel.read()
-            tmp_file.write(content)
-            tmp_path = tmp_file.name
-        
-        # Leer y validar Excel
+    except HTTPException:
+        raise
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"Error interno del servidor: {str(e)}")
+
+async def _crear_tarea_desde_archivos(
+    background_tasks: BackgroundTasks,
+    archivos: List[UploadFile],
+    rutas: List[str],
+    hashes: List[str],
+    tipo_afiliacion: str,
+    nombre_afiliador: str,
+    todas_las_hojas: bool,
+    motor: Optional[str] = None
+) -> Tuple[str, JSONResponse, bool]:
+    """
+    Leer los libros, normalizar y deduplicar, y crear la tarea.
+    Devuelve (task_id, respuesta, en_lectura); con en_lectura los libros se
+    siguen leyendo en tubería y los temporales quedan a cargo de esa lectura.
+    """
+    # === INGESTA EN TUBERÍA (VER ingesta_continua.py) ===
+    claves = [(huella, archivo.filename, todas_las_hojas) for huella, archivo in zip(hashes, archivos)]
+    if INGESTA_CONTINUA and cola_trabajos is None and not all(clave in cache_lecturas for clave in claves):
+        task_id, respuesta = await _crear_tarea_en_tuberia(
+            background_tasks, archivos, rutas, claves, tipo_afiliacion, nombre_afiliador, todas_las_hojas, motor
+        )
+        return task_id, respuesta, True
+    
+    # === PROCESAR ARCHIVOS EXCEL ===
+    por_archivo = await _leer_archivos_subidos(archivos, rutas, hashes, todas_las_hojas)
+    
+    # Normalizar antes de deduplicar, para comparar correos canónicos
+    normalizados, normalizacion = normalizar_registros(
+        registro for registros_archivo in por_archivo for registro in registros_archivo
+    )
+    registros, duplicados = combinar_registros([normalizados])
+    
+    if not registros:
+        raise HTTPException(status_code=400, detail="No se encontraron registros válidos en los archivos Excel")
+    
+    # Registros por archivo/hoja de procedencia
+    fuentes: Dict[str, int] = {}
+    for registro in registros:
+        fuentes[registro["origen"]] = fuentes.get(registro["origen"], 0) + 1
+    
+    task_id = crear_tarea(background_tasks, registros, tipo_afiliacion, nombre_afiliador, motor=motor)
+    if duplicados:
+        agregar_log_tarea(task_id, f"⚠️ {len(duplicados)} correos repetidos entre archivos/hojas se omitieron")
+    
+    return task_id, respuesta_tarea_creada(
+        task_id,
+        registros,
+        sources=fuentes,
+        normalization=normalizacion,
+        duplicate_records=len(duplicados),
+        duplicates=[
+            {"origen": d["origen"], "fila": d["fila"], "correo": d["correo"], "duplicado_de": d["duplicado_de"]}
+            for d in duplicados[:50]
+        ]
+    ), False
+
+# Lecturas en tubería en curso (referencia fuerte a sus asyncio.Task)
+lecturas_en_curso: set = set()
+
+async def _crear_tarea_en_tuberia(
+    background_tasks: BackgroundTasks,
+    archivos: List[UploadFile],
+    rutas: List[str],
+    claves: List[Tuple],
+    tipo_afiliacion: str,
+    nombre_afiliador: str,
+    todas_las_hojas: bool,
+    motor: Optional[str] = None
+) -> Tuple[str, JSONResponse]:
+    """
+    Crear la tarea con el primer registro leído; el resto del libro se sigue
+    leyendo mientras el navegador procesa. Los errores de formato se detectan
+    al abrir cada libro, antes de crear la tarea.
+    """
+    # Abrir los libros y resolver el layout de cada hoja (libros en caché: sus registros)
+    async def abrir(ruta, clave, archivo):
+        cacheados = cache_lecturas.buscar(clave)
+        if cacheados is not None:
+            print(f"[⚡] {archivo.filename}: {len(cacheados)} registros desde la caché de archivos")
+            return LecturaLibro(archivo.filename, registros=cacheados)
+        return await asyncio.to_thread(
+            preparar_lectura, ruta, archivo.filename, todas_las_hojas, leer_archivo_excel, cache_lecturas.max_registros
+        )
+    
+    resultados = await asyncio.gather(
+        *(abrir(ruta, clave, archivo) for ruta, clave, archivo in zip(rutas, claves, archivos)),
+        return_exceptions=True
+    )
+    errores = [
+        f"{archivo.filename}: {resultado}"
+        for archivo, resultado in zip(archivos, resultados)
+        if isinstance(resultado, Exception)
+    ]
+    if errores:
+        for resultado in resultados:
+            if isinstance(resultado, LecturaLibro):
+                resultado.cerrar()
+        _borrar_temporales(rutas)
+        raise HTTPException(status_code=400, detail=" | ".join(errores))
+    
+    flujo = FlujoRegistros()
+    
+    def al_avanzar(flujo: FlujoRegistros):
+        if flujo.task_id is None or flujo.task_id not in tasks_storage:
+            return
+        actualizar_estado_tarea(
+            flujo.task_id,
+            total_records=len(flujo.registros),
+            total_known=flujo.terminado,
+            duplicate_records=len(flujo.duplicados)
+        )
+        if flujo.terminado and not flujo.cancelado:
+            agregar_log_tarea(flujo.task_id, f"📥 Lectura terminada: {len(flujo.registros)} registros válidos")
+            if flujo.duplicados:
+                agregar_log_tarea(flujo.task_id, f"⚠️ {len(flujo.duplicados)} correos repetidos entre archivos/hojas se omitieron")
+    
+    async def leer():
         try:
-            registros = leer_archivo_excel(tmp_path)
-            if not registros:
-                raise ValueError("No se encontraron registros válidos en el archivo Excel")
-                
+            await producir(flujo, resultados, al_avanzar)
+            # Lectura completa y sin errores: llenar la caché de archivos como
+            # la lectura no continua (los re-envíos no vuelven a parsear)
+            if not flujo.error and not flujo.cancelado:
+                for clave, lectura in zip(claves, resultados):
+                    if lectura.leidos is not None:
+                        await asyncio.to_thread(cache_lecturas.guardar, clave, lectura.leidos)
         except Exception as e:
-            os.unlink(tmp_path)  # Limpiar archivo temporal
-            raise HTTPException(status_code=400, detail=str(e))
+            print(f"[⚠️] No se pudo guardar la lectura en la caché de archivos: {e}")
         finally:
-            # Limpiar archivo temporal después de leerlo
-            if os.path.exists(tmp_path):
-                os.unlink(tmp_path)
+            _borrar_temporales(rutas)
+    
+    lectura = asyncio.create_task(leer())
+    lecturas_en_curso.add(lectura)
+    lectura.add_done_callback(lecturas_en_curso.discard)
+    
+    await flujo.esperar_primer_registro()
+    if not flujo.registros:
+        flujo.cancelar()
+        raise HTTPException(
+            status_code=400,
+            detail=flujo.error or "No se encontraron registros válidos en los archivos Excel"
+        )
+    
+    try:
+        task_id = crear_tarea(background_tasks, flujo.registros, tipo_afiliacion, nombre_afiliador, motor=motor, flujo=flujo)
+    except Exception:
+        flujo.cancelar()
+        raise
+    flujo.task_id = task_id
+    al_avanzar(flujo)
+    agregar_log_tarea(task_id, "📥 Procesamiento en tubería: el archivo se sigue leyendo mientras se procesa")
+    
+    return task_id, respuesta_tarea_creada(
+        task_id,
+        flujo.registros,
+        streaming_ingestion=True,
+        total_known=flujo.terminado,
+        sources=dict(flujo.fuentes),
+        normalization=dict(flujo.normalizacion),
+        duplicate_records=len(flujo.duplicados),
+        duplicates=flujo.duplicados[:50]
+    )
+
+@app.post("/procesar/batch")
+async def procesar_lote(
+    request: Request,
+    background_tasks: BackgroundTasks,
+    tipo_afiliacion: str,
+    nombre_afiliador: str,
+    formato: Optional[str] = None,
+    motor: Optional[str] = None
+):
+    """
+    Iniciar procesamiento desde un lote NDJSON o CSV (integraciones PMS).
+    El cuerpo se parsea como stream, sin pasar por Excel.
+    """
+    try:
+        validar_parametros_tarea(tipo_afiliacion, nombre_afiliador, motor)
         
-        # === CREAR ESTADO INICIAL DE TAREA ===
-        tasks_storage[task_id] = {
-            "task_id": task_id,
-            "status": "pending",
-            "progress": 0,
-            "total_records": len(registros),
-            "processed_records": 0,
-            "successful_records": 0,
-            "error_records": 0,
-            "current_processing": "Preparando...",
-            "message": f"Tarea creada. {len(registros)} registros para procesar.",
-            "logs": [f"Tarea iniciada con {len(registros)} registros"],
-            "result_file_url": None,
-            "created_at": datetime.now().isoformat(),
-            "last_updated": datetime.now().isoformat(),
-            "tipo_afiliacion": tipo_afiliacion.lower(),
-            "nombre_afiliador": nombre_afiliador.strip()
-        }
+        try:
+            formato_lote = detectar_formato(request.headers.get("content-type"), formato)
+            registros, descartados = await leer_lote(request.stream(), formato_lote)
+        except ErrorLote as e:
+            raise HTTPException(status_code=e.status_code, detail=str(e))
         
-        # === INICIAR PROCESAMIENTO EN SEGUNDO PLANO ===
-        background_tasks.add_task(
-            procesar_afiliaciones_background,
+        # Normalizar antes de deduplicar, igual que /procesar
+        normalizados, normalizacion = normalizar_registros(registros)
+        registros, duplicados = combinar_registros([normalizados])
+        
+        if not registros:
+            raise HTTPException(status_code=400, detail="No se encontraron registros válidos en el lote")
+        
+        task_id = crear_tarea(
+            background_tasks, registros, tipo_afiliacion, nombre_afiliador, origen=formato_lote, motor=motor
+        )
+        if duplicados:
+            agregar_log_tarea(task_id, f"⚠️ {len(duplicados)} correos repetidos en el lote se omitieron")
+        return respuesta_tarea_creada(
             task_id,
             registros,
-            tipo_afiliacion.lower(),
-            nombre_afiliador.strip()
-        )
-        
-        return JSONResponse(
-            status_code=202,  # Accepted
-            content={
-                "success": True,
-                "message": "Procesamiento iniciado exitosamente",
-                "task_id": task_id,
-                "total_records": len(registros),
-                "status_url": f"/status/{task_id}",
-                "estimated_time_minutes": len(registros) * 0.5,  # Estimación: 30 segundos por registro
-                "next_steps": [
-                    f"1. Monitorea el progreso en: GET /status/{task_id}",
-                    f"2. Descarga los resultados cuando termine: GET /download/[filename]"
-                ]
-            }
+            discarded_records=descartados,
+            normalization=normalizacion,
+            duplicate_records=len(duplicados),
+            duplicates=[
+                {"fila": d["fila"], "correo": d["correo"], "duplicado_de": d["duplicado_de"]}
+                for d in duplicados[:50]
+            ]
         )
         
     except HTTPException:
@@ -765,17 +1538,16 @@ async def obtener_estado(task_id: str):
     if task_data["total_records"] > 0:
         success_rate = (task_data["successful_records"] / task_data["processed_records"] * 100) if task_data["processed_records"] > 0 else 0
         remaining_records = task_data["total_records"] - task_data["processed_records"]
-        estimated_remaining_minutes = remaining_records * 0.5  # 30 seg por registro
     else:
         success_rate = 0
         remaining_records = 0
-        estimated_remaining_minutes = 0
     
     return TaskStatus(
         task_id=task_data["task_id"],
         status=task_data["status"],
         progress=task_data["progress"],
         total_records=task_data["total_records"],
+        total_known=task_data.get("total_known", True),
         processed_records=task_data["processed_records"],
         successful_records=task_data["successful_records"],
         error_records=task_data["error_records"],
@@ -787,15 +1559,21 @@ async def obtener_estado(task_id: str):
     ).dict(exclude_none=True) | {
         "success_rate": round(success_rate, 2),
         "remaining_records": remaining_records,
-        "estimated_remaining_minutes": round(estimated_remaining_minutes, 1),
+        **estimar_tarea(task_data),
+        "engine": task_data.get("motor"),
+        "retry_of": task_data.get("retry_of"),
+        "retries": task_data.get("retries", []),
         "last_updated": task_data["last_updated"]
     }
 
 @app.get("/download/{filename}")
-async def descargar_archivo(filename: str):
+async def descargar_archivo(filename: str, request: Request):
     """
-    Descargar archivo Excel con resultados
+    Descargar archivo Excel con resultados (admite Range para reanudar)
     """
+    if os.path.basename(filename) != filename:
+        raise HTTPException(status_code=400, detail="Nombre de archivo inválido")
+    
     file_path = os.path.join(temp_files_dir, filename)
     
     if not os.path.exists(file_path):
@@ -804,11 +1582,76 @@ async def descargar_archivo(filename: str):
     if not filename.endswith('.xlsx'):
         raise HTTPException(status_code=400, detail="Solo se pueden descargar archivos Excel")
     
-    return FileResponse(
-        path=file_path,
-        media_type="application/vnd.openxmlformats-officedocument.spreadsheetml.sheet",
-        filename=filename,
-        headers={"Content-Disposition": f"attachment; filename={filename}"}
+    return respuesta_archivo(
+        file_path,
+        filename,
+        MEDIA_XLSX,
+        cabecera_rango=request.headers.get("range"),
+        cabecera_if_range=request.headers.get("if-range")
+    )
+
+def _iterar_exportacion(task_data: Dict, formato: str):
+    """Bloques de bytes con los resultados de una tarea en CSV o JSONL"""
+    filas = list(task_data.get("resultados", []))
+    if formato == "csv":
+        return iterar_csv(ENCABEZADOS_RESULTADOS, filas)
+    return iterar_jsonl(CAMPOS_RESULTADOS, filas)
+
+@app.get("/export/bundle")
+async def exportar_paquete(task_ids: str, formato: str = "xlsx"):
+    """
+    Descargar un ZIP con los resultados de varias tareas (task_ids separados por coma)
+    """
+    formato = formato.lower()
+    if formato != "xlsx" and formato not in FORMATOS_EXPORTACION:
+        raise HTTPException(status_code=400, detail="formato debe ser 'xlsx', 'csv' o 'jsonl'")
+    
+    ids = [task_id.strip() for task_id in task_ids.split(",") if task_id.strip()]
+    if not ids:
+        raise HTTPException(status_code=400, detail="Debe indicar al menos un task_id")
+    
+    faltantes = [task_id for task_id in ids if task_id not in tasks_storage]
+    if faltantes:
+        raise HTTPException(status_code=404, detail=f"Tareas no encontradas: {', '.join(faltantes)}")
+    
+    entradas = []
+    for task_id in ids:
+        task_data = tasks_storage[task_id]
+        if formato == "xlsx":
+            archivo = task_data.get("archivo_resultados")
+            ruta = os.path.join(temp_files_dir, archivo) if archivo else None
+            if not ruta or not os.path.exists(ruta):
+                raise HTTPException(status_code=404, detail=f"La tarea {task_id} no tiene archivo de resultados")
+            entradas.append((f"{task_id}_{archivo}", ruta))
+        else:
+            extension = FORMATOS_EXPORTACION[formato][1]
+            entradas.append((f"resultados_{task_id}{extension}", _iterar_exportacion(task_data, formato)))
+    
+    nombre = f"resultados_{datetime.now().strftime('%Y%m%d_%H%M%S')}.zip"
+    return StreamingResponse(
+        construir_zip(entradas),
+        media_type="application/zip",
+        headers={"Content-Disposition": f"attachment; filename={nombre}"}
+    )
+
+@app.get("/export/{task_id}")
+async def exportar_resultados(task_id: str, request: Request, formato: str = "csv"):
+    """
+    Exportar los resultados de una tarea en streaming (CSV o JSONL), comprimidos
+    con gzip/zstd según Accept-Encoding. Funciona también con tareas en curso.
+    """
+    if task_id not in tasks_storage:
+        raise HTTPException(status_code=404, detail="Tarea no encontrada")
+    
+    formato = formato.lower()
+    if formato not in FORMATOS_EXPORTACION:
+        raise HTTPException(status_code=400, detail="formato debe ser 'csv' o 'jsonl'")
+    
+    return respuesta_exportacion(
+        _iterar_exportacion(tasks_storage[task_id], formato),
+        formato,
+        f"resultados_{task_id}",
+        request.headers.get("accept-encoding")
     )
 
 @app.get("/tasks")
@@ -824,11 +1667,13 @@ async def listar_tareas():
             "status": task_data["status"],
             "progress": task_data["progress"],
             "total_records": task_data["total_records"],
+            "total_known": task_data.get("total_known", True),
             "processed_records": task_data["processed_records"],
             "successful_records": task_data["successful_records"],
             "created_at": task_data["created_at"],
             "tipo_afiliacion": task_data.get("tipo_afiliacion", "unknown"),
-            "nombre_afiliador": task_data.get("nombre_afiliador", "unknown")
+            "nombre_afiliador": task_data.get("nombre_afiliador", "unknown"),
+            "estimated_remaining_minutes": estimar_tarea(task_data)["estimated_remaining_minutes"]
         })
     
     return {
@@ -837,6 +1682,136 @@ async def listar_tareas():
         "server_time": datetime.now().isoformat()
     }
 
+def _tarea_controlable(task_id: str, estados_validos) -> Dict:
+    if task_id not in tasks_storage:
+        raise HTTPException(status_code=404, detail="Tarea no encontrada")
+    tarea = tasks_storage[task_id]
+    if tarea["status"] not in estados_validos:
+        raise HTTPException(
+            status_code=409,
+            detail=f"La tarea está en estado '{tarea['status']}'"
+        )
+    return tarea
+
+@app.post("/task/{task_id}/cancel")
+async def cancelar_tarea(task_id: str):
+    """
+    Cancelar una tarea en curso, en pausa o en espera.
+    La fila en curso se corta antes de enviar el formulario, el navegador se
+    cierra y se guardan los resultados parciales (pendientes como CANCELADO).
+    """
+    tarea = _tarea_controlable(task_id, ("pending", "queued", "processing", "paused"))
+    tarea["cancel_requested"] = True
+    
+    if tarea.get("execution_mode") == "cola":
+        cola_trabajos.cancelar_tarea(task_id, "Cancelada por el usuario")
+    else:
+        obtener_control(task_id).cancelar("Cancelada por el usuario")
+    
+    agregar_log_tarea(task_id, "🛑 Cancelación solicitada")
+    actualizar_estado_tarea(task_id, current_processing="Cancelando...")
+    return JSONResponse(
+        status_code=202,
+        content={
+            "message": "Cancelación en curso; los resultados parciales quedarán en result_file_url",
+            "task_id": task_id,
+            "status_url": f"/status/{task_id}"
+        }
+    )
+
+@app.post("/task/{task_id}/pause")
+async def pausar_tarea(task_id: str):
+    """
+    Pausar una tarea: se detiene al terminar la fila en curso y libera el navegador.
+    En modo cola los bloques ya asignados terminan y los pendientes quedan retenidos.
+    """
+    tarea = _tarea_controlable(task_id, ("pending", "queued", "processing"))
+    
+    if tarea.get("execution_mode") == "cola":
+        cola_trabajos.pausar_tarea(task_id)
+        actualizar_estado_tarea(task_id, status="paused")
+    else:
+        obtener_control(task_id).pausar()
+    
+    agregar_log_tarea(task_id, "⏸️ Pausa solicitada")
+    return {"message": "Pausa solicitada", "task_id": task_id}
+
+@app.post("/task/{task_id}/resume")
+async def reanudar_tarea(task_id: str):
+    """Reanudar una tarea en pausa"""
+    tarea = _tarea_controlable(task_id, ("pending", "queued", "processing", "paused"))
+    
+    if tarea.get("execution_mode") == "cola":
+        cola_trabajos.reanudar_tarea(task_id)
+        if tarea["status"] == "paused":
+            actualizar_estado_tarea(task_id, status="queued", current_processing="Esperando workers...")
+    else:
+        obtener_control(task_id).reanudar()
+    
+    agregar_log_tarea(task_id, "▶️ Reanudación solicitada")
+    return {"message": "Tarea reanudada", "task_id": task_id}
+
+def registros_fallidos(task_id: str, tarea: Dict, incluir_cancelados: bool) -> List[Registro]:
+    """
+    Registros de la tarea que terminaron en error (y, opcionalmente, los
+    cancelados o que nunca se procesaron), con el intento actual agregado a
+    su "historial".
+    """
+    filas = {(fila[0], fila[3]): fila for fila in tarea.get("resultados", [])}
+    estados = ESTADOS_FALLIDOS + (("CANCELADO",) if incluir_cancelados else ())
+    fallidos = []
+    for registro in tarea.get("registros", []):
+        fila = filas.get((registro["fila"], registro["correo"]))
+        if fila is None and not incluir_cancelados:
+            continue
+        if fila is not None and fila[6] not in estados:
+            continue
+        fallidos.append(Registro.desde_dict(registro, historial=list(registro.get("historial", [])) + [{
+            "task_id": task_id,
+            "estado": fila[6] if fila else "SIN PROCESAR",
+            "observaciones": str(fila[7]) if fila else "",
+            "fecha": fila[8] if fila else None
+        }]))
+    return fallidos
+
+@app.post("/task/{task_id}/retry-failed")
+async def reintentar_fallidos(task_id: str, background_tasks: BackgroundTasks, incluir_cancelados: bool = True):
+    """
+    Crear una tarea nueva solo con las filas fallidas de una tarea terminada,
+    a partir de los registros guardados (sin volver a subir ni leer el Excel).
+    Ambas tareas quedan enlazadas (retry_of / retries) y cada fila conserva
+    el historial de sus intentos anteriores.
+    """
+    tarea = _tarea_controlable(task_id, ESTADOS_TERMINADOS)
+    
+    # Un reintento a la vez por tarea
+    for reintento_id in tarea.get("retries", []):
+        if tasks_storage.get(reintento_id, {}).get("status") not in (None, *ESTADOS_TERMINADOS):
+            raise HTTPException(
+                status_code=409,
+                detail=f"Ya hay un reintento en curso de esta tarea: {reintento_id}"
+            )
+    
+    registros = registros_fallidos(task_id, tarea, incluir_cancelados)
+    if not registros:
+        raise HTTPException(status_code=400, detail="La tarea no tiene filas fallidas para reintentar")
+    
+    por_estado: Dict[str, int] = {}
+    for registro in registros:
+        estado = registro["historial"][-1]["estado"]
+        por_estado[estado] = por_estado.get(estado, 0) + 1
+    
+    nuevo_id = crear_tarea(
+        background_tasks, registros, tarea["tipo_afiliacion"], tarea["nombre_afiliador"], origen="reintento",
+        motor=tarea.get("motor")
+    )
+    actualizar_estado_tarea(nuevo_id, retry_of=task_id)
+    tarea.setdefault("retries", []).append(nuevo_id)
+    agregar_log_tarea(task_id, f"🔁 Reintento de {len(registros)} filas fallidas en la tarea {nuevo_id}")
+    agregar_log_tarea(nuevo_id, f"🔁 Reintento de la tarea {task_id}: {por_estado}")
+    
+    return respuesta_tarea_creada(nuevo_id, registros, retry_of=task_id, failed_rows=por_estado)
+
 @app.delete("/task/{task_id}")
 async def eliminar_tarea(task_id: str):
     """
@@ -847,12 +1822,20 @@ async def eliminar_tarea(task_id: str):
     
     task_status = tasks_storage[task_id]["status"]
     
-    if task_status == "processing":
+    if task_status in ("processing", "paused"):
         raise HTTPException(
             status_code=400, 
-            detail="No se puede eliminar una tarea en procesamiento"
+            detail=f"No se puede eliminar una tarea en procesamiento (cancélala antes: POST /task/{task_id}/cancel)"
         )
     
+    if tasks_storage[task_id].get("execution_mode") == "cola":
+        # Sin esto los workers seguirían tomando sus bloques de la cola
+        cola_trabajos.cancelar_tarea(task_id, "Tarea eliminada")
+        cola_trabajos.purgar_tarea(task_id)
+    elif task_status not in ESTADOS_TERMINADOS and task_id in controles_tareas:
+        # Pendiente en modo local: que el procesamiento no llegue a arrancar
+        controles_tareas[task_id].cancelar("Tarea eliminada")
+    
     del tasks_storage[task_id]
     
     return {
@@ -869,22 +1852,31 @@ async def startup_event():
     print("=== MARRIOTT AUTOMATION API INICIADA ===")
     print(f"Directorio temporal: {temp_files_dir}")
     
-    # Limpiar archivos antiguos (más de 24 horas)
+    # Indexar resultados existentes y limpiar archivos antiguos
     try:
-        current_time = datetime.now().timestamp()
-        files_cleaned = 0
-        
-        for filename in os.listdir(temp_files_dir):
-            file_path = os.path.join(temp_files_dir, filename)
-            if os.path.getmtime(file_path) < current_time - 86400:  # 24 horas
-                os.remove(file_path)
-                files_cleaned += 1
-        
-        print(f"Limpieza inicial: {files_cleaned} archivos antiguos eliminados")
+        registro_resultados.escanear()
+        resultado = limpiador.limpiar()
+        print(f"Limpieza inicial: {resultado['archivos_eliminados']} archivos antiguos eliminados")
         
     except Exception as e:
         print(f"Error en limpieza inicial: {e}")
     
+    # Limpieza periódica en segundo plano
+    limpiador.iniciar()
+    
+    # Vigilancia de memoria de Chrome y procesos huérfanos
+    try:
+        vigilante.ejecutar()
+    except Exception as e:
+        print(f"Error en limpieza inicial de navegadores: {e}")
+    vigilante.iniciar()
+    
+    # Modo cola: traer resultados y logs de los workers
+    global tarea_sincronizacion
+    if cola_trabajos is not None:
+        tarea_sincronizacion = asyncio.create_task(bucle_sincronizacion_cola())
+        print(f"Modo cola: trabajos en {cola_trabajos.ruta}")
+    
     print("API lista para recibir peticiones")
 
 @app.on_event("shutdown")
@@ -894,8 +1886,10 @@ async def shutdown_event():
     """
     print("=== CERRANDO MARRIOTT AUTOMATION API ===")
     
-    # Aquí podrías agregar lógica para cerrar navegadores activos
-    # y limpiar recursos si fuera necesario
+    await limpiador.detener()
+    await vigilante.detener()
+    if tarea_sincronizacion:
+        tarea_sincronizacion.cancel()
     
     print("API cerrada correctamente")
 
@@ -1,5 +1,14 @@
 # -*- mode: python ; coding: utf-8 -*-
 
+# Paquetes que el servidor no usa y que PyInstaller arrastra por dependencias
+# opcionales (ver build/*/PYZ-00.toc). Excluirlos reduce tamaño y arranque.
+EXCLUDES = [
+    'tkinter', '_tkinter', 'matplotlib', 'IPython', 'jedi', 'notebook',
+    'scipy', 'PIL', 'pygments', 'sqlalchemy', 'mysql', 'pymysql',
+    'setuptools', 'pkg_resources', 'wheel', 'pip', 'pytest', '_pytest',
+    'pluggy', 'werkzeug', 'yaml', 'docutils', 'sphinx', 'pyarrow',
+    'numexpr', 'bottleneck', 'tables', 'lxml', 'bs4', 'html5lib',
+]
 
 a = Analysis(
     ['main.py'],
@@ -10,7 +19,7 @@ a = Analysis(
     hookspath=[],
     hooksconfig={},
     runtime_hooks=[],
-    excludes=[],
+    excludes=EXCLUDES,
     noarchive=False,
     optimize=0,
 )
@@ -0,0 +1,157 @@
+"""
+Interfaz de motores de afiliación y registro de implementaciones.
+
+El procesamiento de tareas (ejecutar_afiliaciones, worker.py) solo habla con
+MotorAfiliacion:
+
+    preparar()        abrir la sesión (navegador, contexto CDP o cliente HTTP)
+    afiliar(registro) procesar un huésped -> {success, codigo, ...} o {success False, error, categoria}
+    sesion_activa()   sonda barata de salud entre filas
+    close()           liberar todo
+
+más los ganchos de vida de la sesión que ya usaba MarriottProcessor (liberar,
+reiniciar_navegador, reciclar_navegador, motivo_reciclaje).
+
+Motores disponibles (los módulos se importan solo al elegirlos):
+    selenium  MarriottProcessor: Selenium WebDriver síncrono (por defecto)
+    http      ProcesadorHibrido: HTTP plano con respaldo en Selenium
+    cdp       ProcesadorCDP: Chrome por DevTools Protocol con la API async de
+              Playwright; muchas sesiones en un solo event loop
+
+Se elige por despliegue (ENROLLMENT_ENGINE) o por tarea (parámetro `motor`
+de /procesar y /procesar/batch).
+"""
+import importlib
+import os
+from abc import ABC, abstractmethod
+from typing import Dict, Optional, Tuple
+
+from normalizacion import dominio_correo
+from retry_policy import TRANSITORIO
+
+# nombre -> (módulo, clase)
+MOTORES: Dict[str, Tuple[str, str]] = {
+    "selenium": ("selenium_processor", "MarriottProcessor"),
+    "http": ("http_processor", "ProcesadorHibrido"),
+    "cdp": ("cdp_processor", "ProcesadorCDP"),
+}
+
+MOTOR_POR_DEFECTO = os.getenv("ENROLLMENT_ENGINE", "selenium").strip().lower()
+
+EXTENSIONES_PERMITIDAS = {
+    'hotmail.com', 'hotmail.es', 'hotmail.mx',
+    'gmail.com', 'gmail.mx',
+    'outlook.com', 'outlook.es', 'outlook.mx',
+    'icloud.com'
+}
+
+
+class MotorAfiliacion(ABC):
+    """Sesión de automatización que afilia huéspedes de un tipo de afiliación"""
+
+    motor = "base"
+
+    def __init__(self, tipo_afiliacion, nombre_afiliador, task_id=None):
+        self.tipo_afiliacion = tipo_afiliacion.lower()
+        self.nombre_afiliador = nombre_afiliador
+        self.task_id = task_id
+        self.correos_procesados = set()
+        self.reinicios = 0
+        self.reciclajes = 0
+        self.control = None  # ControlTarea de la tarea en curso (cancelación entre pasos)
+
+    @abstractmethod
+    async def preparar(self) -> bool:
+        """Abrir la sesión; False si no se pudo"""
+
+    @abstractmethod
+    async def procesar_afiliacion(self, nombre_completo, correo, numero_reserva, nombre=None, apellido=None) -> Dict:
+        """Afiliar a un huésped con sus datos sueltos"""
+
+    @abstractmethod
+    async def sesion_activa(self) -> bool:
+        """¿La sesión sigue respondiendo?"""
+
+    @abstractmethod
+    async def close(self):
+        """Cerrar la sesión y todo lo que dependa de ella"""
+
+    async def afiliar(self, registro: Dict) -> Dict:
+        """Afiliar a un huésped a partir de su registro normalizado"""
+        return await self.procesar_afiliacion(
+            registro['nombre'],
+            registro['correo'],
+            registro['reserva'],
+            nombre=registro.get('nombre_pila'),
+            apellido=registro.get('apellido')
+        )
+
+    # === COMÚN A TODOS LOS MOTORES ===
+    def es_correo_valido(self, correo):
+        """Verifica extensión permitida y evita duplicados"""
+        if not correo or '@' not in correo:
+            return False, "Formato inválido"
+        
+        try:
+            dominio = dominio_correo(correo).lower()
+            
+            if dominio not in EXTENSIONES_PERMITIDAS:
+                return False, f"Extensión {dominio} no permitida"
+                
+            if correo in self.correos_procesados:
+                return False, "Correo ya procesado (duplicado)"
+            
+            return True, "Válido"
+            
+        except IndexError:
+            return False, "Error en formato"
+
+    def _fallo(self, correo, mensaje, categoria=TRANSITORIO, requiere_navegador=False):
+        """Resultado fallido con su categoría; libera el correo si se puede reintentar"""
+        if categoria == TRANSITORIO:
+            self.correos_procesados.discard(correo)
+        resultado = {"success": False, "error": mensaje, "categoria": categoria}
+        if requiere_navegador:
+            # Solo el motor HTTP: la fila se puede repetir con un navegador
+            resultado["requiere_navegador"] = True
+        return resultado
+
+    def _punto_control(self):
+        """Cortar la fila si la tarea se canceló (solo antes de enviar el formulario)"""
+        if self.control is not None:
+            self.control.verificar()
+
+    # === VIDA DE LA SESIÓN ===
+    def motivo_reciclaje(self) -> Optional[str]:
+        """Motivo para reciclar la sesión, o None"""
+        return None
+
+    async def liberar(self):
+        """Cerrar la sesión conservando la configuración (preparar() la vuelve a abrir)"""
+        await self.close()
+
+    async def reiniciar_navegador(self) -> bool:
+        """Descartar una sesión caída y abrir otra"""
+        self.reinicios += 1
+        await self.liberar()
+        return await self.preparar()
+
+    async def reciclar_navegador(self) -> bool:
+        """Reemplazar una sesión sana que superó sus límites"""
+        self.reciclajes += 1
+        await self.liberar()
+        return await self.preparar()
+
+
+def validar_motor(nombre: Optional[str]) -> str:
+    """Nombre de motor normalizado (el del despliegue si no se indica)"""
+    motor = (nombre or MOTOR_POR_DEFECTO).strip().lower()
+    if motor not in MOTORES:
+        raise ValueError(f"Motor '{motor}' no disponible. Motores: {', '.join(MOTORES)}")
+    return motor
+
+
+def crear_motor(nombre: Optional[str], tipo_afiliacion, nombre_afiliador, task_id=None) -> MotorAfiliacion:
+    """Instanciar el motor pedido (importa su módulo solo en este momento)"""
+    modulo, clase = MOTORES[validar_motor(nombre)]
+    return getattr(importlib.import_module(modulo), clase)(tipo_afiliacion, nombre_afiliador, task_id=task_id)
@@ -0,0 +1,190 @@
+"""
+Normalización de nombres y correos al momento de la ingesta.
+
+Se aplica una sola vez, en lote, sobre todos los registros de la tarea para que
+el formulario reciba datos limpios y no se gaste un ciclo de navegador en
+envíos que el sitio va a rechazar:
+
+- Unicode NFC y limpieza de espacios (NBSP, espacios de ancho cero, dobles)
+- Nombres en MAYÚSCULAS/minúsculas del PMS -> Nombre Propio (partículas en minúscula)
+- Forma "APELLIDO(S), NOMBRE(S)" -> nombre y apellido reordenados
+- Apellidos compuestos con partículas (de, del, de la, van, ...) no se parten
+- Correos: minúsculas, sin espacios ni "mailto:", typos de dominio frecuentes
+
+Las tablas y expresiones regulares se compilan al importar el módulo.
+"""
+import re
+import unicodedata
+from typing import Dict, Iterable, List, NamedTuple, Optional, Tuple
+
+from registros import Registro
+
+# === TABLAS PRECOMPILADAS ===
+# Espacios raros del PMS / copiar-pegar: NBSP, ancho cero, tabulaciones...
+_ESPACIOS_RAROS = re.compile(r"[\u00a0\u1680\u2000-\u200b\u202f\u205f\u3000\ufeff\t\r\n]+")
+_ESPACIOS = re.compile(r" {2,}")
+_CARACTERES_NOMBRE = re.compile(r"[^\w\s'\-.,]", re.UNICODE)
+_SEPARADOR_PALABRA = re.compile(r"([\s\-'])")
+_CORREO_VALIDO = re.compile(r"^[a-z0-9._%+\-]+@[a-z0-9\-]+(\.[a-z0-9\-]+)+$")
+_PREFIJO_CORREO = re.compile(r"^(mailto:|<)+|>+$")
+
+PARTICULAS = frozenset({
+    "de", "del", "la", "las", "los", "y", "da", "das", "do", "dos",
+    "di", "du", "van", "von", "der", "den", "le", "san", "santa",
+})
+
+# Dominio mal escrito -> dominio correcto (solo errores frecuentes y sin ambigüedad)
+CORRECCIONES_DOMINIO = {
+    "gmial.com": "gmail.com", "gmai.com": "gmail.com", "gmal.com": "gmail.com",
+    "gamil.com": "gmail.com", "gmaill.com": "gmail.com", "gnail.com": "gmail.com",
+    "gmail.co": "gmail.com", "gmail.con": "gmail.com", "gmail.cm": "gmail.com",
+    "gmail.om": "gmail.com", "gmail.comm": "gmail.com",
+    "hotmial.com": "hotmail.com", "hotmal.com": "hotmail.com", "hotmai.com": "hotmail.com",
+    "homail.com": "hotmail.com", "hotmil.com": "hotmail.com", "hotamil.com": "hotmail.com",
+    "hotmail.co": "hotmail.com", "hotmail.con": "hotmail.com", "hotmail.cm": "hotmail.com",
+    "outlok.com": "outlook.com", "outllok.com": "outlook.com", "outloo.com": "outlook.com",
+    "outlook.co": "outlook.com", "outlook.con": "outlook.com",
+    "iclod.com": "icloud.com", "icoud.com": "icloud.com", "icloud.con": "icloud.com",
+    "icloud.co": "icloud.com",
+}
+
+
+class NombreNormalizado(NamedTuple):
+    nombre: str      # Nombre(s) de pila
+    apellido: str    # Apellido(s), puede estar vacío
+    completo: str    # "nombre apellido" ya normalizado
+    reordenado: bool  # Venía en forma "APELLIDO, NOMBRE"
+    recapitalizado: bool  # Venía todo en mayúsculas o minúsculas
+
+
+# === TEXTO ===
+def limpiar_texto(texto) -> str:
+    """NFC y espacios simples"""
+    if texto is None:
+        return ""
+    texto = unicodedata.normalize("NFC", str(texto))
+    texto = _ESPACIOS_RAROS.sub(" ", texto)
+    return _ESPACIOS.sub(" ", texto).strip()
+
+
+def _capitalizar_palabra(palabra: str, inicial: bool) -> str:
+    if not inicial and palabra.lower() in PARTICULAS:
+        return palabra.lower()
+    # Respetar separadores internos: "pérez-garcía", "o'brien"
+    partes = _SEPARADOR_PALABRA.split(palabra.lower())
+    return "".join(parte[:1].upper() + parte[1:] for parte in partes)
+
+
+def capitalizar_nombre(texto: str) -> str:
+    """'MARÍA DE LA CRUZ' -> 'María de la Cruz'"""
+    palabras = texto.split(" ")
+    return " ".join(_capitalizar_palabra(palabra, i == 0) for i, palabra in enumerate(palabras))
+
+
+def _requiere_capitalizar(texto: str) -> bool:
+    letras = [c for c in texto if c.isalpha()]
+    return bool(letras) and (all(c.isupper() for c in letras) or all(c.islower() for c in letras))
+
+
+# === NOMBRES ===
+def separar_nombre(palabras: List[str]) -> Tuple[str, str]:
+    """
+    Partir en (nombre, apellido).
+    La primera partícula después del primer nombre marca el inicio del
+    apellido ("Juan Carlos de la Rosa"); si no hay, el primer token es el
+    nombre y el resto el apellido (regla histórica del formulario).
+    """
+    if len(palabras) < 2:
+        return (palabras[0] if palabras else ""), ""
+    for indice in range(1, len(palabras) - 1):
+        if palabras[indice].lower() in PARTICULAS:
+            return " ".join(palabras[:indice]), " ".join(palabras[indice:])
+    return palabras[0], " ".join(palabras[1:])
+
+
+def normalizar_nombre(texto) -> NombreNormalizado:
+    texto = limpiar_texto(texto)
+    texto = _CARACTERES_NOMBRE.sub("", texto)
+
+    recapitalizado = _requiere_capitalizar(texto)
+    if recapitalizado:
+        texto = capitalizar_nombre(texto)
+
+    reordenado = False
+    if texto.count(",") == 1:
+        apellido, nombre = (parte.strip(" .") for parte in texto.split(","))
+        # "Cruz, María de la" -> las partículas finales pertenecen al apellido
+        palabras = nombre.split(" ")
+        while len(palabras) > 1 and palabras[-1].lower() in PARTICULAS:
+            apellido = f"{palabras.pop()} {apellido}"
+        nombre = " ".join(palabras)
+        if apellido and nombre:
+            reordenado = True
+            completo = f"{nombre} {apellido}"
+            return NombreNormalizado(nombre, apellido, completo, reordenado, recapitalizado)
+    texto = _ESPACIOS.sub(" ", texto.replace(",", " ")).strip()
+
+    nombre, apellido = separar_nombre(texto.split(" ") if texto else [])
+    return NombreNormalizado(nombre, apellido, texto, reordenado, recapitalizado)
+
+
+# === CORREOS ===
+def normalizar_correo(texto) -> Tuple[str, Optional[str]]:
+    """Devuelve (correo canónico, motivo si es inválido)"""
+    correo = limpiar_texto(texto).lower().replace(" ", "")
+    correo = _PREFIJO_CORREO.sub("", correo).strip(".;,")
+
+    if correo.count("@") != 1:
+        return correo, "Formato inválido"
+
+    usuario, dominio = correo.split("@")
+    dominio = CORRECCIONES_DOMINIO.get(dominio, dominio)
+    correo = f"{usuario}@{dominio}"
+
+    if not _CORREO_VALIDO.match(correo) or ".." in correo:
+        return correo, "Formato inválido"
+    return correo, None
+
+
+def dominio_correo(correo: str) -> str:
+    return correo.rpartition("@")[2]
+
+
+# === LOTE ===
+def estadisticas_vacias() -> Dict[str, int]:
+    return {"reordenados": 0, "recapitalizados": 0, "correos_corregidos": 0, "correos_invalidos": 0}
+
+
+def normalizar_registro(registro: Dict, estadisticas: Dict[str, int]) -> Registro:
+    """Normalizar un registro (ver normalizar_registros) acumulando en estadisticas"""
+    resultado = normalizar_nombre(registro["nombre"])
+    correo, motivo = normalizar_correo(registro["correo"])
+
+    correo_original = None
+    if correo != registro["correo"]:
+        correo_original = registro["correo"]
+        estadisticas["correos_corregidos"] += 1
+
+    estadisticas["reordenados"] += resultado.reordenado
+    estadisticas["recapitalizados"] += resultado.recapitalizado
+    estadisticas["correos_invalidos"] += motivo is not None
+    return Registro(
+        registro["reserva"], resultado.completo, correo, registro["fila"],
+        origen=registro.get("origen"),
+        nombre_pila=resultado.nombre,
+        apellido=resultado.apellido,
+        correo_original=correo_original or registro.get("correo_original"),
+        historial=registro.get("historial"),
+        indice_lote=registro.get("indice_lote"),
+    )
+
+
+def normalizar_registros(registros: Iterable[Dict]) -> Tuple[List[Registro], Dict[str, int]]:
+    """
+    Normalizar todos los registros de una tarea.
+    Agrega "nombre_pila" y "apellido"; conserva "correo_original" si cambió.
+    Devuelve (registros compactos, ver registros.py; estadísticas).
+    """
+    estadisticas = estadisticas_vacias()
+    normalizados = [normalizar_registro(registro, estadisticas) for registro in registros]
+    return normalizados, estadisticas
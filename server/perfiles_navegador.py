@@ -0,0 +1,223 @@
+"""
+Perfiles de Chrome por sesión y caché de disco compartida entre sesiones.
+
+Sin esto cada webdriver.Chrome arranca con un perfil temporal nuevo y vuelve a
+descargar todos los scripts, estilos y fuentes de la página de afiliación (en
+cada tarea, cada reciclaje y cada reinicio tras una caída). Aquí:
+
+- Cada sesión tiene su propio directorio (user-data-dir): cookies, local
+  storage y sesión del sitio quedan aislados y se borran al cerrar.
+- La caché HTTP de la sesión (disk-cache-dir) arranca como copia de la última
+  generación publicada de la caché compartida. Chrome no admite dos procesos
+  escribiendo la misma caché, así que no se comparte en vivo: al cerrar, la
+  sesión publica su caché como generación nueva (copia + rename atómico, vale
+  entre workers de la misma máquina) y se conservan las dos más recientes.
+- Tamaño acotado: Chrome respeta --disk-cache-size y no se publican cachés más
+  grandes que BROWSER_CACHE_MAX_MB.
+
+benchmarks/bench_cache_navegador.py mide tiempo de carga y bytes descargados
+por huésped con y sin la caché compartida.
+
+Configuración por entorno:
+    BROWSER_SHARED_CACHE   Reusar la caché HTTP entre sesiones (1)
+    BROWSER_CACHE_DIR      Directorio de la caché compartida (<tmp>/vladware-chrome-cache)
+    BROWSER_CACHE_TMPFS    Usar /dev/shm para la caché si existe y no hay BROWSER_CACHE_DIR (0)
+    BROWSER_CACHE_MAX_MB   Tamaño máximo de la caché de una sesión (100)
+    BROWSER_PROFILES_DIR   Directorio de los perfiles por sesión (<tmp>/vladware-chrome-perfiles)
+"""
+import itertools
+import os
+import shutil
+import tempfile
+import threading
+import time
+from typing import Dict, Optional
+
+# Generaciones publicadas que se conservan (una sesión puede estar copiando la anterior)
+GENERACIONES = 2
+
+# Perfiles de procesos que murieron sin cerrarlos se borran tras esta edad
+EDAD_PERFIL_HUERFANO_S = 3600
+
+
+def _tamano_bytes(directorio: str) -> int:
+    total = 0
+    for raiz, _, archivos in os.walk(directorio):
+        for archivo in archivos:
+            try:
+                total += os.path.getsize(os.path.join(raiz, archivo))
+            except OSError:
+                continue
+    return total
+
+
+def _proceso_existe(pid: int) -> bool:
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        return True
+    return True
+
+
+class PerfilSesion:
+    """Directorios de una sesión de Chrome"""
+
+    def __init__(self, raiz: str, cache: str, tamano_semilla: int = 0):
+        self.raiz = raiz
+        self.datos = os.path.join(raiz, "perfil")  # --user-data-dir
+        self.cache = cache                          # --disk-cache-dir
+        self.tamano_semilla = tamano_semilla
+
+    def argumentos(self, max_bytes: int):
+        return [
+            f"--user-data-dir={self.datos}",
+            f"--disk-cache-dir={self.cache}",
+            f"--disk-cache-size={max_bytes}",
+        ]
+
+
+class GestorPerfiles:
+    """Crea perfiles aislados por sesión y administra la caché HTTP compartida"""
+
+    def __init__(self, dir_cache: str, dir_perfiles: str, max_mb: float = 100.0, compartir: bool = True):
+        self.dir_cache = dir_cache
+        self.dir_perfiles = dir_perfiles
+        self.max_bytes = int(max_mb * 1024 * 1024)
+        self.compartir = compartir
+        self._ids = itertools.count(1)
+        self._lock = threading.Lock()
+
+        self.abiertas = 0
+        self.sesiones_con_semilla = 0
+        self.sesiones_sin_semilla = 0
+        self.publicaciones = 0
+        self.publicaciones_omitidas = 0
+        self.tamano_publicado = 0  # Bytes de la última generación vista
+
+    @classmethod
+    def desde_entorno(cls):
+        dir_cache = os.getenv("BROWSER_CACHE_DIR")
+        if not dir_cache:
+            base = "/dev/shm" if os.getenv("BROWSER_CACHE_TMPFS", "0").lower() in ("1", "true", "yes") \
+                and os.path.isdir("/dev/shm") else tempfile.gettempdir()
+            dir_cache = os.path.join(base, "vladware-chrome-cache")
+        return cls(
+            dir_cache=dir_cache,
+            dir_perfiles=os.getenv("BROWSER_PROFILES_DIR", os.path.join(tempfile.gettempdir(), "vladware-chrome-perfiles")),
+            max_mb=float(os.getenv("BROWSER_CACHE_MAX_MB", "100")),
+            compartir=os.getenv("BROWSER_SHARED_CACHE", "1").lower() in ("1", "true", "yes"),
+        )
+
+    @property
+    def _dir_generaciones(self) -> str:
+        return os.path.join(self.dir_cache, "generaciones")
+
+    def _generaciones(self):
+        """Generaciones publicadas, de la más reciente a la más vieja"""
+        try:
+            nombres = os.listdir(self._dir_generaciones)
+        except FileNotFoundError:
+            return []
+        return sorted(nombres, reverse=True)
+
+    # === SESIONES ===
+    def abrir_sesion(self) -> PerfilSesion:
+        """Perfil nuevo para una sesión; su caché parte de la última generación publicada"""
+        os.makedirs(self.dir_perfiles, exist_ok=True)
+        self._purgar_huerfanos()
+        raiz = tempfile.mkdtemp(prefix=f"sesion-{os.getpid()}-{next(self._ids)}-", dir=self.dir_perfiles)
+        cache = os.path.join(raiz, "cache")
+
+        tamano = 0
+        if self.compartir:
+            for generacion in self._generaciones():
+                try:
+                    shutil.copytree(os.path.join(self._dir_generaciones, generacion), cache)
+                    tamano = _tamano_bytes(cache)
+                    break
+                except (OSError, shutil.Error):
+                    # Otra sesión la borró mientras se copiaba: probar la siguiente
+                    shutil.rmtree(cache, ignore_errors=True)
+        os.makedirs(cache, exist_ok=True)
+
+        with self._lock:
+            self.abiertas += 1
+            if tamano:
+                self.tamano_publicado = tamano
+                self.sesiones_con_semilla += 1
+            else:
+                self.sesiones_sin_semilla += 1
+        if tamano:
+            print(f"[🗄️] Caché compartida del navegador: {tamano / (1024 * 1024):.1f} MB reutilizados")
+        return PerfilSesion(raiz, cache, tamano)
+
+    def cerrar_sesion(self, perfil: Optional[PerfilSesion]):
+        """Publicar la caché de la sesión (ya cerrada) y borrar su perfil"""
+        if perfil is None:
+            return
+        try:
+            if self.compartir:
+                self._publicar(perfil)
+        except Exception as e:
+            print(f"[⚠️] No se pudo publicar la caché del navegador: {e}")
+        finally:
+            shutil.rmtree(perfil.raiz, ignore_errors=True)
+            with self._lock:
+                self.abiertas = max(0, self.abiertas - 1)
+
+    def _publicar(self, perfil: PerfilSesion):
+        tamano = _tamano_bytes(perfil.cache)
+        if tamano == 0 or tamano == perfil.tamano_semilla:
+            return  # Sin nada nuevo que aportar
+        if tamano > self.max_bytes:
+            with self._lock:
+                self.publicaciones_omitidas += 1
+            return
+
+        os.makedirs(self._dir_generaciones, exist_ok=True)
+        nombre = f"{time.time():017.6f}-{os.getpid()}-{os.path.basename(perfil.raiz)}"
+        temporal = os.path.join(self.dir_cache, f".{nombre}")
+        shutil.copytree(perfil.cache, temporal)
+        os.rename(temporal, os.path.join(self._dir_generaciones, nombre))
+        with self._lock:
+            self.publicaciones += 1
+            self.tamano_publicado = tamano
+
+        for vieja in self._generaciones()[GENERACIONES:]:
+            shutil.rmtree(os.path.join(self._dir_generaciones, vieja), ignore_errors=True)
+
+    def _purgar_huerfanos(self):
+        """Perfiles que quedaron de procesos caídos (nadie los cierra)"""
+        limite = time.time() - EDAD_PERFIL_HUERFANO_S
+        try:
+            entradas = list(os.scandir(self.dir_perfiles))
+        except FileNotFoundError:
+            return
+        for entrada in entradas:
+            # sesion-<pid>-<n>-...: los de procesos vivos siguen en uso
+            partes = entrada.name.split("-")
+            if len(partes) > 1 and partes[1].isdigit() and _proceso_existe(int(partes[1])):
+                continue
+            try:
+                if entrada.is_dir() and entrada.stat().st_mtime < limite:
+                    shutil.rmtree(entrada.path, ignore_errors=True)
+            except OSError:
+                continue
+
+    def resumen(self) -> Dict:
+        return {
+            "shared_cache": self.compartir,
+            "cache_dir": self.dir_cache,
+            "max_mb": round(self.max_bytes / (1024 * 1024), 1),
+            "current_generation_mb": round(self.tamano_publicado / (1024 * 1024), 1),
+            "open_profiles": self.abiertas,
+            "sessions_seeded": self.sesiones_con_semilla,
+            "sessions_cold": self.sesiones_sin_semilla,
+            "publications": self.publicaciones,
+            "publications_skipped_oversize": self.publicaciones_omitidas,
+        }
+
+
+gestor_perfiles = GestorPerfiles.desde_entorno()
@@ -0,0 +1,118 @@
+"""
+Representación compacta de huéspedes y filas de resultados para lotes grandes.
+
+Con lotes de 100k filas, un dict por huésped ({"reserva", "nombre", "correo",
+"fila", "origen", ...}) y una lista por fila de resultados dominan la memoria
+de la tarea (se guardan en tasks_storage durante toda su vida). Aquí:
+
+- Registro: huésped con __slots__ (sin __dict__ por fila). Se comporta como
+  un Mapping de solo lectura, así que el resto del código sigue usando
+  registro["nombre"], registro.get("origen"), {**registro} y dict(registro);
+  los campos opcionales que no se asignaron no aparecen como claves.
+- Los valores que se repiten entre filas (origen, nombre de pila, apellido,
+  "N/A", afiliador, estado, observaciones de error) se internan con
+  sys.intern: miles de filas comparten una sola copia de cada texto.
+- fila_compacta: filas de resultados como tuplas en lugar de listas.
+
+benchmarks/bench_memoria_registros.py mide bytes por fila antes y después.
+"""
+import sys
+from collections.abc import Mapping
+from typing import Any, Dict, Iterator, Optional, Sequence, Tuple
+
+# Columnas de la fila de resultados que se internan (ver ENCABEZADOS_RESULTADOS):
+# afiliador, estado, observaciones y origen
+COLUMNAS_INTERNADAS = (5, 6, 7, 9)
+
+_FALTA = object()
+
+
+def internar(valor):
+    return sys.intern(valor) if type(valor) is str else valor
+
+
+class Registro(Mapping):
+    """Huésped de una tarea (Mapping de solo lectura con __slots__)"""
+
+    __slots__ = (
+        "reserva", "nombre", "correo", "fila", "origen",
+        "nombre_pila", "apellido", "correo_original", "historial", "indice_lote",
+    )
+
+    def __init__(self, reserva, nombre, correo, fila, origen=None, nombre_pila=None, apellido=None,
+                 correo_original=None, historial=None, indice_lote=None):
+        self.reserva = internar(reserva)
+        self.nombre = nombre
+        self.correo = correo
+        self.fila = fila
+        # Los opcionales sin valor quedan sin asignar (no aparecen como claves)
+        if origen is not None:
+            self.origen = internar(origen)
+        if nombre_pila is not None:
+            self.nombre_pila = internar(nombre_pila)
+        if apellido is not None:
+            self.apellido = internar(apellido)
+        if correo_original is not None:
+            self.correo_original = correo_original
+        if historial is not None:
+            self.historial = historial
+        if indice_lote is not None:
+            self.indice_lote = indice_lote
+
+    @classmethod
+    def desde_dict(cls, datos: Mapping, **cambios) -> "Registro":
+        """Registro a partir de un dict (JSON de la cola, otro Registro...); ignora claves ajenas"""
+        if isinstance(datos, Registro):
+            campos = datos.como_dict()
+        else:
+            campos = {campo: valor for campo, valor in datos.items() if campo in CAMPOS}
+        campos.update(cambios)
+        return cls(**campos)
+
+    def reemplazar(self, **cambios) -> "Registro":
+        """Copia con algunos campos cambiados"""
+        return Registro.desde_dict(self, **cambios)
+
+    def como_dict(self) -> Dict[str, Any]:
+        return {campo: valor for campo in self.__slots__ if (valor := getattr(self, campo, _FALTA)) is not _FALTA}
+
+    # === INTERFAZ MAPPING ===
+    def __getitem__(self, campo: str) -> Any:
+        if campo in CAMPOS:
+            valor = getattr(self, campo, _FALTA)
+            if valor is not _FALTA:
+                return valor
+        raise KeyError(campo)
+
+    def __iter__(self) -> Iterator[str]:
+        return iter(self.como_dict())
+
+    def __len__(self) -> int:
+        return len(self.como_dict())
+
+    def __contains__(self, campo) -> bool:
+        return campo in CAMPOS and hasattr(self, campo)
+
+    def keys(self):
+        return self.como_dict().keys()
+
+    def get(self, campo: str, por_defecto: Optional[Any] = None) -> Any:
+        return getattr(self, campo, por_defecto) if campo in CAMPOS else por_defecto
+
+    def __deepcopy__(self, memo) -> "Registro":
+        # Todos los campos son inmutables salvo el historial de reintentos
+        copia = self.reemplazar()
+        if hasattr(self, "historial"):
+            copia.historial = [dict(intento) for intento in self.historial]
+        return copia
+
+    def __repr__(self) -> str:
+        return f"Registro({self.como_dict()!r})"
+
+
+CAMPOS = frozenset(Registro.__slots__)
+
+
+def fila_compacta(valores: Sequence) -> Tuple:
+    """Fila de resultados como tupla, con los textos repetidos internados"""
+    return tuple(internar(valor) if i in COLUMNAS_INTERNADAS else valor for i, valor in enumerate(valores))
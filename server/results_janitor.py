@@ -0,0 +1,216 @@
+"""
+Limpieza periódica de archivos de resultados y tareas terminadas.
+
+- RegistroArchivos: contador incremental de los .xlsx en el directorio de
+  resultados (cantidad y bytes), para que /health no tenga que listar el disco.
+- LimpiadorPeriodico: tarea asyncio que aplica retención por antigüedad,
+  cuota de tamaño del directorio y expulsión de tareas terminadas.
+
+Configuración por entorno:
+    RESULTS_RETENTION_HOURS   Horas que se conservan los resultados (24)
+    RESULTS_MAX_MB            Cuota total del directorio de resultados (500)
+    TASKS_RETENTION_HOURS     Horas que se conservan tareas terminadas (24)
+    TASKS_MAX_RECORDS         Máximo de tareas terminadas en memoria (500)
+    JANITOR_INTERVAL_SECONDS  Intervalo entre limpiezas (600)
+"""
+import asyncio
+import os
+import threading
+import time
+from datetime import datetime
+from typing import Callable, Dict, Iterable, Optional
+
+ESTADOS_TERMINADOS = ("completed", "cancelled", "error")
+
+
+class RegistroArchivos:
+    """Contador incremental de archivos de resultados (O(1) para consultar)"""
+
+    def __init__(self, directorio: str, extensiones=(".xlsx",)):
+        self.directorio = directorio
+        self.extensiones = tuple(extensiones)
+        self._archivos: Dict[str, tuple] = {}  # nombre -> (bytes, mtime)
+        self._total_bytes = 0
+        self._lock = threading.Lock()
+
+    @property
+    def cantidad(self) -> int:
+        return len(self._archivos)
+
+    @property
+    def total_bytes(self) -> int:
+        return self._total_bytes
+
+    def _aplica(self, nombre: str) -> bool:
+        return nombre.endswith(self.extensiones)
+
+    def escanear(self):
+        """Sincronizar con el disco (una vez al arrancar)"""
+        archivos, total = {}, 0
+        with os.scandir(self.directorio) as entradas:
+            for entrada in entradas:
+                if entrada.is_file() and self._aplica(entrada.name):
+                    info = entrada.stat()
+                    archivos[entrada.name] = (info.st_size, info.st_mtime)
+                    total += info.st_size
+        with self._lock:
+            self._archivos, self._total_bytes = archivos, total
+
+    def registrar(self, nombre: str):
+        """Registrar (o actualizar) un archivo recién guardado"""
+        if not self._aplica(nombre):
+            return
+        try:
+            info = os.stat(os.path.join(self.directorio, nombre))
+        except OSError:
+            return
+        with self._lock:
+            anterior = self._archivos.get(nombre)
+            if anterior:
+                self._total_bytes -= anterior[0]
+            self._archivos[nombre] = (info.st_size, info.st_mtime)
+            self._total_bytes += info.st_size
+
+    def eliminar(self, nombre: str) -> bool:
+        """Borrar un archivo del disco y del registro"""
+        try:
+            os.remove(os.path.join(self.directorio, nombre))
+        except FileNotFoundError:
+            pass
+        except OSError as e:
+            print(f"[⚠️] No se pudo eliminar {nombre}: {e}")
+            return False
+        with self._lock:
+            anterior = self._archivos.pop(nombre, None)
+            if anterior:
+                self._total_bytes -= anterior[0]
+        return True
+
+    def por_antiguedad(self):
+        """Lista [(nombre, bytes, mtime)] del más antiguo al más reciente"""
+        with self._lock:
+            items = [(nombre, datos[0], datos[1]) for nombre, datos in self._archivos.items()]
+        return sorted(items, key=lambda item: item[2])
+
+
+class LimpiadorPeriodico:
+    """Tarea asyncio que mantiene acotados el disco y la memoria de tareas"""
+
+    def __init__(
+        self,
+        registro: RegistroArchivos,
+        tareas: Dict[str, Dict],
+        retencion_archivos_s: float,
+        retencion_tareas_s: float,
+        cuota_bytes: int,
+        max_tareas: int,
+        intervalo_s: float,
+        archivos_protegidos: Optional[Callable[[], Iterable[str]]] = None,
+    ):
+        self.registro = registro
+        self.tareas = tareas
+        self.retencion_archivos_s = retencion_archivos_s
+        self.retencion_tareas_s = retencion_tareas_s
+        self.cuota_bytes = cuota_bytes
+        self.max_tareas = max_tareas
+        self.intervalo_s = intervalo_s
+        self.archivos_protegidos = archivos_protegidos or (lambda: ())
+        self.ultima_ejecucion: Optional[str] = None
+        self.ultimo_resultado: Dict = {}
+        self._tarea: Optional[asyncio.Task] = None
+
+    @classmethod
+    def desde_entorno(cls, registro, tareas, archivos_protegidos=None):
+        return cls(
+            registro,
+            tareas,
+            retencion_archivos_s=float(os.getenv("RESULTS_RETENTION_HOURS", "24")) * 3600,
+            retencion_tareas_s=float(os.getenv("TASKS_RETENTION_HOURS", "24")) * 3600,
+            cuota_bytes=int(float(os.getenv("RESULTS_MAX_MB", "500")) * 1024 * 1024),
+            max_tareas=int(os.getenv("TASKS_MAX_RECORDS", "500")),
+            intervalo_s=float(os.getenv("JANITOR_INTERVAL_SECONDS", "600")),
+            archivos_protegidos=archivos_protegidos,
+        )
+
+    # === LIMPIEZA ===
+    def limpiar_archivos(self, ahora: float) -> int:
+        protegidos = set(self.archivos_protegidos())
+        eliminados = 0
+
+        # 1. Retención por antigüedad
+        limite = ahora - self.retencion_archivos_s
+        for nombre, _, mtime in self.registro.por_antiguedad():
+            if mtime >= limite:
+                break
+            if nombre not in protegidos and self.registro.eliminar(nombre):
+                eliminados += 1
+
+        # 2. Cuota de tamaño: borrar los más antiguos hasta quedar bajo la cuota
+        if self.registro.total_bytes > self.cuota_bytes:
+            for nombre, _, _ in self.registro.por_antiguedad():
+                if self.registro.total_bytes <= self.cuota_bytes:
+                    break
+                if nombre not in protegidos and self.registro.eliminar(nombre):
+                    eliminados += 1
+
+        return eliminados
+
+    def limpiar_tareas(self, ahora: float) -> int:
+        terminadas = []
+        for task_id, tarea in list(self.tareas.items()):
+            if tarea.get("status") not in ESTADOS_TERMINADOS:
+                continue
+            try:
+                actualizada = datetime.fromisoformat(tarea.get("last_updated", "")).timestamp()
+            except ValueError:
+                actualizada = 0
+            terminadas.append((actualizada, task_id))
+
+        terminadas.sort()
+        limite = ahora - self.retencion_tareas_s
+        exceso = max(0, len(terminadas) - self.max_tareas)
+        eliminadas = 0
+        for posicion, (actualizada, task_id) in enumerate(terminadas):
+            if actualizada < limite or posicion < exceso:
+                self.tareas.pop(task_id, None)
+                eliminadas += 1
+        return eliminadas
+
+    def limpiar(self) -> Dict:
+        ahora = time.time()
+        resultado = {
+            "archivos_eliminados": self.limpiar_archivos(ahora),
+            "tareas_eliminadas": self.limpiar_tareas(ahora),
+            "archivos_restantes": self.registro.cantidad,
+            "bytes_resultados": self.registro.total_bytes,
+        }
+        self.ultima_ejecucion = datetime.now().isoformat()
+        self.ultimo_resultado = resultado
+        return resultado
+
+    # === CICLO DE VIDA ===
+    async def _bucle(self):
+        while True:
+            await asyncio.sleep(self.intervalo_s)
+            try:
+                resultado = self.limpiar()
+                if resultado["archivos_eliminados"] or resultado["tareas_eliminadas"]:
+                    print(
+                        f"[🧹] Limpieza: {resultado['archivos_eliminados']} archivos, "
+                        f"{resultado['tareas_eliminadas']} tareas eliminadas"
+                    )
+            except Exception as e:
+                print(f"[⚠️] Error en limpieza periódica: {e}")
+
+    def iniciar(self):
+        if self._tarea is None or self._tarea.done():
+            self._tarea = asyncio.create_task(self._bucle())
+
+    async def detener(self):
+        if self._tarea:
+            self._tarea.cancel()
+            try:
+                await self._tarea
+            except asyncio.CancelledError:
+                pass
+            self._tarea = None
@@ -0,0 +1,210 @@
+"""
+Reintentos clasificados por tipo de error y circuit breaker por tarea.
+
+- clasificar_fallo / clasificar_excepcion: separan fallos TRANSITORIOS (timeout de
+  navegación, elemento obsoleto, código aún no renderizado...) de PERMANENTES
+  (dominio no permitido, nombre de una sola palabra, duplicados).
+- PoliticaReintentos: backoff exponencial con jitter para re-encolar filas
+  transitorias al final de la tarea.
+- CircuitBreaker: pausa la tarea cuando la tasa de error del sitio se dispara.
+- es_sesion_muerta: detecta que Chrome/chromedriver murió (la sesión no se
+  recupera reintentando la fila: hay que reiniciar el navegador).
+
+Configuración por entorno:
+    RETRY_MAX_ATTEMPTS     Intentos totales por fila (3)
+    RETRY_BASE_SECONDS     Espera base del backoff (10)
+    RETRY_MAX_SECONDS      Espera máxima del backoff (300)
+    CB_WINDOW              Tamaño de la ventana de resultados (10)
+    CB_MIN_SAMPLES         Muestras mínimas antes de evaluar (5)
+    CB_ERROR_RATE          Tasa de error que abre el circuito (0.6)
+    CB_PAUSE_SECONDS       Pausa inicial con el circuito abierto (60)
+    CB_MAX_PAUSE_SECONDS   Pausa máxima tras aperturas sucesivas (600)
+"""
+import os
+import random
+import re
+import time
+from collections import deque
+
+TRANSITORIO = "transitorio"
+PERMANENTE = "permanente"
+
+# Excepciones de Selenium/Playwright (por nombre, para no importarlos al arrancar)
+EXCEPCIONES_TRANSITORIAS = {
+    "TimeoutException",
+    "TimeoutError",  # playwright.async_api.TimeoutError no hereda del TimeoutError nativo
+    "StaleElementReferenceException",
+    "ElementClickInterceptedException",
+    "ElementNotInteractableException",
+    "NoSuchElementException",
+    "WebDriverException",
+}
+
+# Errores que indican que la sesión del navegador ya no existe
+EXCEPCIONES_SESION_MUERTA = {
+    "InvalidSessionIdException",
+    "NoSuchWindowException",
+    "MaxRetryError",
+    "NewConnectionError",
+    "ConnectionRefusedError",
+    "RemoteDisconnected",
+    "TargetClosedError",
+}
+PATRONES_SESION_MUERTA = re.compile(
+    r"invalid session id|session deleted|chrome not reachable|disconnected:|no such window"
+    r"|target window already closed|connection refused|max retries exceeded|failed to establish a new connection"
+    r"|target page, context or browser has been closed|browser has disconnected",
+    re.IGNORECASE,
+)
+
+# Respaldo por texto del error, para resultados sin categoría explícita
+PATRONES_PERMANENTES = re.compile(
+    r"correo inválido|extensión .* no permitida|duplicado|al menos nombre y apellido|formato inválido",
+    re.IGNORECASE,
+)
+PATRONES_TRANSITORIOS = re.compile(
+    r"timeout|timed out|stale|no se pudo llenar|no encontrad|tardó en cargar|connection|conexión",
+    re.IGNORECASE,
+)
+
+
+def clasificar_excepcion(error: BaseException) -> str:
+    """Clasificar una excepción lanzada durante una afiliación"""
+    nombres = {clase.__name__ for clase in type(error).__mro__}
+    if nombres & EXCEPCIONES_TRANSITORIAS or isinstance(error, (TimeoutError, ConnectionError)):
+        return TRANSITORIO
+    return PERMANENTE
+
+
+def es_sesion_muerta(error: BaseException) -> bool:
+    """¿La excepción indica que el navegador o chromedriver murió?"""
+    nombres = {clase.__name__ for clase in type(error).__mro__}
+    if nombres & EXCEPCIONES_SESION_MUERTA:
+        return True
+    return bool(PATRONES_SESION_MUERTA.search(str(error)))
+
+
+def clasificar_fallo(resultado: dict) -> str:
+    """Categoría de un resultado fallido de procesar_afiliacion"""
+    categoria = resultado.get("categoria")
+    if categoria in (TRANSITORIO, PERMANENTE):
+        return categoria
+    mensaje = resultado.get("error", "")
+    if PATRONES_PERMANENTES.search(mensaje):
+        return PERMANENTE
+    if PATRONES_TRANSITORIOS.search(mensaje):
+        return TRANSITORIO
+    return PERMANENTE
+
+
+class PoliticaReintentos:
+    """Backoff exponencial con jitter: base * 2^(intento-1), acotado a maximo"""
+
+    def __init__(self, max_intentos=3, base_s=10.0, maximo_s=300.0, jitter=0.2):
+        self.max_intentos = max_intentos
+        self.base_s = base_s
+        self.maximo_s = maximo_s
+        self.jitter = jitter
+
+    @classmethod
+    def desde_entorno(cls):
+        return cls(
+            max_intentos=int(os.getenv("RETRY_MAX_ATTEMPTS", "3")),
+            base_s=float(os.getenv("RETRY_BASE_SECONDS", "10")),
+            maximo_s=float(os.getenv("RETRY_MAX_SECONDS", "300")),
+        )
+
+    def debe_reintentar(self, categoria: str, intento: int) -> bool:
+        return categoria == TRANSITORIO and intento < self.max_intentos
+
+    def espera(self, intento: int) -> float:
+        """Segundos a esperar antes del intento número `intento + 1`"""
+        espera = min(self.maximo_s, self.base_s * (2 ** (intento - 1)))
+        return espera * random.uniform(1 - self.jitter, 1 + self.jitter)
+
+
+class CircuitBreaker:
+    """
+    Circuit breaker sobre una ventana deslizante de resultados.
+
+    cerrado -> abierto: la tasa de error de la ventana supera el umbral.
+    abierto -> semiabierto: transcurre la pausa.
+    semiabierto -> cerrado si el siguiente intento tiene éxito; si falla vuelve
+    a abierto con el doble de pausa (hasta pausa_maxima_s).
+    """
+
+    CERRADO = "cerrado"
+    ABIERTO = "abierto"
+    SEMIABIERTO = "semiabierto"
+
+    def __init__(self, ventana=10, muestras_minimas=5, tasa_error=0.6, pausa_s=60.0, pausa_maxima_s=600.0):
+        self.resultados = deque(maxlen=ventana)
+        self.muestras_minimas = muestras_minimas
+        self.tasa_error = tasa_error
+        self.pausa_inicial_s = pausa_s
+        self.pausa_maxima_s = pausa_maxima_s
+        self.pausa_s = pausa_s
+        self.estado = self.CERRADO
+        self.abierto_hasta = 0.0
+        self.aperturas = 0
+
+    @classmethod
+    def desde_entorno(cls):
+        return cls(
+            ventana=int(os.getenv("CB_WINDOW", "10")),
+            muestras_minimas=int(os.getenv("CB_MIN_SAMPLES", "5")),
+            tasa_error=float(os.getenv("CB_ERROR_RATE", "0.6")),
+            pausa_s=float(os.getenv("CB_PAUSE_SECONDS", "60")),
+            pausa_maxima_s=float(os.getenv("CB_MAX_PAUSE_SECONDS", "600")),
+        )
+
+    @property
+    def tasa_actual(self) -> float:
+        if not self.resultados:
+            return 0.0
+        return self.resultados.count(False) / len(self.resultados)
+
+    def espera_restante(self) -> float:
+        """Segundos que la tarea debe pausar antes del siguiente intento"""
+        if self.estado != self.ABIERTO:
+            return 0.0
+        restante = self.abierto_hasta - time.monotonic()
+        if restante <= 0:
+            self.estado = self.SEMIABIERTO
+            return 0.0
+        return restante
+
+    def _abrir(self):
+        self.estado = self.ABIERTO
+        self.abierto_hasta = time.monotonic() + self.pausa_s
+        self.aperturas += 1
+
+    def registrar(self, exito: bool) -> bool:
+        """Registrar el resultado de un intento. Devuelve True si el circuito se abrió"""
+        if self.estado == self.SEMIABIERTO:
+            if exito:
+                self.estado = self.CERRADO
+                self.pausa_s = self.pausa_inicial_s
+                self.resultados.clear()
+                self.resultados.append(True)
+                return False
+            self.pausa_s = min(self.pausa_maxima_s, self.pausa_s * 2)
+            self._abrir()
+            return True
+
+        self.resultados.append(exito)
+        if (
+            self.estado == self.CERRADO
+            and len(self.resultados) >= self.muestras_minimas
+            and self.tasa_actual >= self.tasa_error
+        ):
+            self._abrir()
+            return True
+        return False
+
+    def resumen(self) -> dict:
+        return {
+            "estado": self.estado,
+            "tasa_error": round(self.tasa_actual, 2),
+            "aperturas": self.aperturas,
+        }
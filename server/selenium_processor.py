@@ -1,6 +1,5 @@
 import os
 import time
-import re
 import asyncio
 import subprocess
 import shutil
@@ -11,27 +10,33 @@ from selenium.webdriver.support.ui import WebDriverWait
 from selenium.webdriver.support import expected_conditions as EC
 from selenium.webdriver.support.ui import Select
 from selenium.common.exceptions import NoSuchElementException, TimeoutException
+from site_config import CONFIG_NAVEGADOR, PERFILES_SITIO, obtener_perfil
+from retry_policy import PERMANENTE, clasificar_excepcion, es_sesion_muerta
+from normalizacion import normalizar_nombre
+from control_tareas import TareaCancelada
+from motores import MotorAfiliacion
+from browser_watchdog import (
+    arbol, matar_procesos, politica_memoria, proceso_vivo, sesiones_navegador, DISPONIBLE as PROC_DISPONIBLE
+)
+from perfiles_navegador import gestor_perfiles
 
 # === CONFIGURACIÓN ===
-URLS_AFILIACION = {
-    "express": "https://www.joinmarriottbonvoy.com/calaqr/s/ES/ch/cunxc",
-    "junior": "https://www.joinmarriottbonvoy.com/calaqr/s/ES/ch/cunjc"
-}
+# URLs por tipo de afiliación (derivadas de los perfiles de site_config)
+URLS_AFILIACION = {tipo: perfil.url for tipo, perfil in PERFILES_SITIO.items()}
 
-EXTENSIONES_PERMITIDAS = {
-    'hotmail.com', 'hotmail.es', 'hotmail.mx',
-    'gmail.com', 'gmail.mx',
-    'outlook.com', 'outlook.es', 'outlook.mx',
-    'icloud.com'
-}
+class MarriottProcessor(MotorAfiliacion):
+    motor = "selenium"
 
-class MarriottProcessor:
-    def __init__(self, tipo_afiliacion, nombre_afiliador):
-        self.tipo_afiliacion = tipo_afiliacion.lower()
-        self.nombre_afiliador = nombre_afiliador
+    def __init__(self, tipo_afiliacion, nombre_afiliador, task_id=None):
+        super().__init__(tipo_afiliacion, nombre_afiliador, task_id=task_id)
+        self.perfil = obtener_perfil(self.tipo_afiliacion)
         self.driver = None
         self.wait = None
-        self.correos_procesados = set()
+        self.sesion_id = None
+        self.perfil_sesion = None  # Directorios de Chrome (ver perfiles_navegador.py)
+
+    async def preparar(self):
+        return await self.setup_chrome_driver()
 
     async def setup_chrome_driver(self):
         """Configuración MEJORADA para Render con detección inteligente"""
@@ -47,6 +52,12 @@ class MarriottProcessor:
             # Configurar opciones de Chrome
             options = self._get_chrome_options(is_production)
             
+            # Perfil propio (cookies/storage aislados) con la caché HTTP compartida
+            await self._cerrar_perfil()
+            self.perfil_sesion = await asyncio.to_thread(gestor_perfiles.abrir_sesion)
+            for argumento in self.perfil_sesion.argumentos(gestor_perfiles.max_bytes):
+                options.add_argument(argumento)
+            
             if is_production:
                 driver = await self._setup_production_chrome(options)
             else:
@@ -54,7 +65,7 @@ class MarriottProcessor:
             
             if driver:
                 self.driver = driver
-                self.wait = WebDriverWait(self.driver, 30)
+                self.wait = WebDriverWait(self.driver, self.perfil.esperas.timeout)
                 
                 # Test de conectividad
                 await self._test_browser_connection()
@@ -62,6 +73,9 @@ class MarriottProcessor:
                 # Anti-detección
                 await self._setup_anti_detection()
                 
+                # Registrar la sesión para el vigilante de memoria (browser_watchdog.py)
+                self.sesion_id = sesiones_navegador.registrar(self._pid_servicio(), self.task_id)
+                
                 print("[✅] ChromeDriver configurado exitosamente!")
                 return True
             
@@ -69,6 +83,8 @@ class MarriottProcessor:
             
         except Exception as e:
             print(f"[🚨] Error configurando ChromeDriver: {e}")
+            if self.driver is None:
+                await self._cerrar_perfil()
             return False
 
     async def _setup_production_chrome(self, options):
@@ -288,7 +304,7 @@ class MarriottProcessor:
         options.add_argument("--no-sandbox")
         options.add_argument("--disable-dev-shm-usage")
         options.add_argument("--disable-gpu")
-        options.add_argument("--window-size=1920,1080")
+        options.add_argument(f"--window-size={CONFIG_NAVEGADOR.window_size}")
         
         if is_production:
             # Opciones específicas para producción
@@ -344,7 +360,7 @@ class MarriottProcessor:
         """Probar conexión del navegador"""
         try:
             print("[🧪] Probando conexión del navegador...")
-            self.driver.get("https://httpbin.org/ip")
+            self.driver.get(CONFIG_NAVEGADOR.url_prueba_conexion)
             await asyncio.sleep(2)
             
             # Verificar que la página cargó
@@ -385,25 +401,6 @@ class MarriottProcessor:
             print(f"[⚠️] Anti-detección falló: {e}")
 
     # [Resto de métodos permanecen iguales...]
-    def es_correo_valido(self, correo):
-        """Verifica extensión permitida y evita duplicados"""
-        if not correo or '@' not in correo:
-            return False, "Formato inválido"
-        
-        try:
-            dominio = correo.split('@')[1].lower()
-            
-            if dominio not in EXTENSIONES_PERMITIDAS:
-                return False, f"Extensión {dominio} no permitida"
-                
-            if correo in self.correos_procesados:
-                return False, "Correo ya procesado (duplicado)"
-            
-            return True, "Válido"
-            
-        except IndexError:
-            return False, "Error en formato"
-
     def llenar_campo_inteligente(self, campo, valor, nombre_campo="campo"):
         """Llenar campo con estrategias múltiples"""
         try:
@@ -454,16 +451,10 @@ class MarriottProcessor:
         print(f"[❌] {nombre_elemento} no encontrado")
         return None
 
-    def seleccionar_pais_inteligente(self, pais="MX"):
-        """Seleccionar México en dropdown país"""
-        localizadores_dropdown = [
-            (By.ID, "country"),
-            (By.NAME, "country"),
-            (By.CSS_SELECTOR, "select[name*='country']"),
-            (By.XPATH, "//select[contains(@id, 'country')]")
-        ]
-        
-        dropdown_pais = self.encontrar_elemento_inteligente(localizadores_dropdown, "Dropdown país")
+    def seleccionar_pais_inteligente(self, pais=None):
+        """Seleccionar el país del perfil (México por defecto) en dropdown país"""
+        pais = pais or self.perfil.pais
+        dropdown_pais = self.encontrar_elemento_inteligente(self.perfil.localizadores["pais"], "Dropdown país")
         if not dropdown_pais:
             return False
         
@@ -479,8 +470,7 @@ class MarriottProcessor:
                 pass
             
             # Intentar por texto
-            opciones_pais = ["mexico", "méxico", "mx"]
-            for opcion in opciones_pais:
+            for opcion in self.perfil.opciones_pais:
                 try:
                     for option in select.options:
                         if opcion in option.text.lower():
@@ -503,12 +493,12 @@ class MarriottProcessor:
             script = """
             var checkboxes = [];
             
-            // Buscar por IDs conocidos
-            var checkbox1 = document.getElementById('ctlAgree');
-            var checkbox2 = document.getElementById('chk_mi');
-            
-            if (checkbox1) checkboxes.push(checkbox1);
-            if (checkbox2) checkboxes.push(checkbox2);
+            // Buscar por IDs conocidos del perfil
+            var ids = arguments[0];
+            for (var i = 0; i < ids.length; i++) {
+                var checkbox = document.getElementById(ids[i]);
+                if (checkbox) checkboxes.push(checkbox);
+            }
             
             // Buscar otros checkboxes no marcados
             var alternativeChecks = document.querySelectorAll('input[type="checkbox"]:not([checked])');
@@ -529,7 +519,7 @@ class MarriottProcessor:
             return marcados;
             """
             
-            marcados = self.driver.execute_script(script)
+            marcados = self.driver.execute_script(script, list(self.perfil.checkboxes))
             print(f"[✅] {marcados} checkboxes marcados")
             return True
             
@@ -541,15 +531,17 @@ class MarriottProcessor:
         """Búsqueda exhaustiva del código de afiliación"""
         print("[🔍] Buscando código de afiliación...")
         
+        perfil = self.perfil
+        
         # Espera inteligente para carga de página
-        for i in range(20):  # Aumentado el tiempo de espera
+        for i in range(perfil.esperas.intentos_confirmacion):
             try:
                 url_actual = self.driver.current_url.lower()
-                if "confirmation" in url_actual or "success" in url_actual:
+                if any(keyword in url_actual for keyword in perfil.palabras_confirmacion_url):
                     break
                 
                 page_text = self.driver.page_source.lower()
-                if any(keyword in page_text for keyword in ["confirmation", "member", "congratulations", "bienvenido"]):
+                if any(keyword in page_text for keyword in perfil.palabras_confirmacion):
                     break
                     
             except Exception:
@@ -558,22 +550,7 @@ class MarriottProcessor:
             time.sleep(1)
         
         # === ESTRATEGIA 1: BÚSQUEDA POR ELEMENTOS ===
-        selectores_codigo = [
-            "//strong[contains(text(), 'MB')]",
-            "//strong[contains(text(), 'member')]//text()[string-length(.) >= 8]",
-            "//strong[string-length(text()) >= 8 and string-length(text()) <= 15]",
-            "//*[contains(text(), 'Member')]/following-sibling::*//strong",
-            "//div[contains(@class, 'confirmation')]//strong",
-            "//div[contains(@class, 'success')]//strong",
-            "//span[string-length(text()) >= 8 and string-length(text()) <= 15]",
-            "//*[contains(text(), 'number')]/following-sibling::*",
-            "//*[contains(text(), 'código')]/following-sibling::*",
-            "//h1//text()[string-length(.) >= 8]",
-            "//h2//text()[string-length(.) >= 8]",
-            "//p//strong[string-length(text()) >= 8]"
-        ]
-        
-        for selector in selectores_codigo:
+        for selector in perfil.selectores_codigo:
             try:
                 elementos = self.driver.find_elements(By.XPATH, selector)
                 for elemento in elementos:
@@ -588,20 +565,13 @@ class MarriottProcessor:
         try:
             page_text = self.driver.page_source
             
-            patrones = [
-                r'MB\d{8,12}',           # Códigos MB + dígitos
-                r'\b\d{10,12}\b',        # 10-12 dígitos exactos
-                r'\b\d{9}\b',            # 9 dígitos exactos
-                r'[A-Z]{2}\d{8,10}',     # 2 letras + 8-10 números
-                r'\b\d{8}\b',            # 8 dígitos exactos
-            ]
-            
-            for patron in patrones:
-                matches = re.findall(patron, page_text)
+            # Patrones precompilados del perfil
+            for patron in perfil.patrones_codigo:
+                matches = patron.findall(page_text)
                 if matches:
                     for match in matches:
                         # Filtrar fechas
-                        if not re.match(r'^(19|20)\d{2}', match):
+                        if not perfil.patron_descartar.match(match):
                             print(f"[✅] Código encontrado (patrón): {match}")
                             return match
         
@@ -611,73 +581,67 @@ class MarriottProcessor:
         print("[❌] Código de afiliación no encontrado")
         return None
 
-    async def procesar_afiliacion(self, nombre_completo, correo, numero_reserva):
-        """Procesar una afiliación individual"""
+    async def procesar_afiliacion(self, nombre_completo, correo, numero_reserva, nombre=None, apellido=None):
+        """
+        Procesar una afiliación individual.
+        nombre/apellido vienen separados desde la ingesta (normalizacion.py);
+        si no, se separan aquí con las mismas reglas.
+        """
         try:
             print(f"[🔄] Procesando: {nombre_completo} ({correo})")
             
             # Validar correo
             es_valido, razon = self.es_correo_valido(correo)
             if not es_valido:
-                return {"success": False, "error": f"Correo inválido: {razon}"}
+                return self._fallo(correo, f"Correo inválido: {razon}", PERMANENTE)
             
             # Separar nombre
-            partes = nombre_completo.strip().split()
-            if len(partes) < 2:
-                return {"success": False, "error": "Nombre completo debe tener al menos nombre y apellido"}
-            
-            nombre = partes[0]
-            apellido = " ".join(partes[1:])
+            if nombre is None or apellido is None:
+                separado = normalizar_nombre(nombre_completo)
+                nombre, apellido = separado.nombre, separado.apellido
+            if not nombre or not apellido:
+                return self._fallo(correo, "Nombre completo debe tener al menos nombre y apellido", PERMANENTE)
             
             # Marcar como procesado
             self.correos_procesados.add(correo)
             
+            perfil = self.perfil
+            localizadores = perfil.localizadores
+            
             # Abrir página de afiliación
-            url = URLS_AFILIACION[self.tipo_afiliacion]
+            url = perfil.url
             print(f"[🌐] Abriendo: {url}")
             self.driver.get(url)
+            sesiones_navegador.contar_pagina(self.sesion_id)
             
             # Esperar formulario
-            await asyncio.sleep(3)  # Espera fija inicial
+            await asyncio.sleep(perfil.esperas.carga_inicial)  # Espera fija inicial
+            self._punto_control()
             
             try:
-                self.wait.until(EC.presence_of_element_located((By.ID, "partial_enroll_form")))
+                self.wait.until(EC.presence_of_element_located(localizadores["formulario"][0]))
             except TimeoutException:
                 print("[⚠️] Formulario tardó en cargar, continuando...")
             
-            await asyncio.sleep(1)
+            await asyncio.sleep(perfil.esperas.despues_formulario)
+            self._punto_control()
             
             # === LLENAR FORMULARIO ===
             
             # 1. Nombre
-            localizadores_nombre = [
-                (By.ID, "first_name"),
-                (By.NAME, "first_name"),
-                (By.CSS_SELECTOR, "input[name*='first']")
-            ]
-            campo_nombre = self.encontrar_elemento_inteligente(localizadores_nombre, "Campo nombre")
+            campo_nombre = self.encontrar_elemento_inteligente(localizadores["nombre"], "Campo nombre")
             if not campo_nombre or not self.llenar_campo_inteligente(campo_nombre, nombre, "Nombre"):
-                return {"success": False, "error": "No se pudo llenar el nombre"}
+                return self._fallo(correo, "No se pudo llenar el nombre")
             
             # 2. Apellido
-            localizadores_apellido = [
-                (By.ID, "last_name"),
-                (By.NAME, "last_name"),
-                (By.CSS_SELECTOR, "input[name*='last']")
-            ]
-            campo_apellido = self.encontrar_elemento_inteligente(localizadores_apellido, "Campo apellido")
+            campo_apellido = self.encontrar_elemento_inteligente(localizadores["apellido"], "Campo apellido")
             if not campo_apellido or not self.llenar_campo_inteligente(campo_apellido, apellido, "Apellido"):
-                return {"success": False, "error": "No se pudo llenar el apellido"}
+                return self._fallo(correo, "No se pudo llenar el apellido")
             
             # 3. Email
-            localizadores_email = [
-                (By.ID, "email_address"),
-                (By.NAME, "email_address"),
-                (By.CSS_SELECTOR, "input[type='email']")
-            ]
-            campo_email = self.encontrar_elemento_inteligente(localizadores_email, "Campo email")
+            campo_email = self.encontrar_elemento_inteligente(localizadores["email"], "Campo email")
             if not campo_email or not self.llenar_campo_inteligente(campo_email, correo, "Email"):
-                return {"success": False, "error": "No se pudo llenar el email"}
+                return self._fallo(correo, "No se pudo llenar el email")
             
             # 4. Seleccionar país
             self.seleccionar_pais_inteligente()
@@ -685,20 +649,14 @@ class MarriottProcessor:
             # 5. Marcar checkboxes
             self.marcar_checkboxes_inteligente()
             
-            # Pequeña pausa antes de enviar
-            await asyncio.sleep(2)
+            # Pequeña pausa antes de enviar (último punto donde se puede cancelar)
+            await asyncio.sleep(perfil.esperas.antes_envio)
+            self._punto_control()
             
             # 6. Enviar formulario
-            localizadores_submit = [
-                (By.ID, "ctl00_PartialEnrollFormPlaceholder_partial_enroll_EnrollButton"),
-                (By.CSS_SELECTOR, "a.css_button"),
-                (By.XPATH, "//a[contains(@class, 'button')]"),
-                (By.XPATH, "//input[@type='submit']")
-            ]
-            
-            boton_submit = self.encontrar_elemento_inteligente(localizadores_submit, "Botón enviar")
+            boton_submit = self.encontrar_elemento_inteligente(localizadores["boton_envio"], "Botón enviar")
             if not boton_submit:
-                return {"success": False, "error": "Botón de envío no encontrado"}
+                return self._fallo(correo, "Botón de envío no encontrado")
             
             # Enviar
             try:
@@ -711,7 +669,7 @@ class MarriottProcessor:
             print("[📤] Formulario enviado")
             
             # 7. Buscar código
-            await asyncio.sleep(3)  # Esperar respuesta del servidor
+            await asyncio.sleep(perfil.esperas.respuesta_envio)  # Esperar respuesta del servidor
             codigo = self.buscar_codigo_afiliacion_inteligente()
             
             if codigo:
@@ -724,18 +682,85 @@ class MarriottProcessor:
                     "reserva": numero_reserva
                 }
             else:
-                return {"success": False, "error": "Código no encontrado en la página"}
+                return self._fallo(correo, "Código no encontrado en la página")
                 
+        except TareaCancelada:
+            self.correos_procesados.discard(correo)
+            raise
         except Exception as e:
             error_msg = f"Error procesando {nombre_completo}: {str(e)}"
             print(f"[🚨] {error_msg}")
-            return {"success": False, "error": error_msg}
+            resultado = self._fallo(correo, error_msg, clasificar_excepcion(e))
+            resultado["sesion_muerta"] = es_sesion_muerta(e)
+            return resultado
+
+    # === VIDA DE LA SESIÓN ===
+    async def sesion_activa(self):
+        """Sonda barata (un comando a chromedriver) para saber si la sesión sigue viva"""
+        if not self.driver:
+            return False
+        try:
+            self.driver.execute_script("return 1")
+            return True
+        except Exception as e:
+            # Otros errores (p. ej. un alert abierto) no significan que el navegador murió
+            return not es_sesion_muerta(e)
+
+    def _pid_servicio(self):
+        servicio = getattr(self.driver, "service", None)
+        proceso = getattr(servicio, "process", None)
+        return getattr(proceso, "pid", None)
+
+    def motivo_reciclaje(self):
+        """Motivo para reciclar la sesión (memoria o páginas), o None"""
+        sesion = sesiones_navegador.obtener(self.sesion_id)
+        if not sesion:
+            return None
+        rss = sesiones_navegador.muestrear(self.sesion_id)
+        return politica_memoria.motivo_reciclaje(sesion, rss)
+
+    async def liberar(self):
+        """Cerrar el navegador conservando la configuración (preparar lo vuelve a abrir)"""
+        await self.close()
+        self.driver = None
+        self.wait = None
+
+    async def _relanzar(self):
+        await self.liberar()
+        return await self.setup_chrome_driver()
+
+    async def reiniciar_navegador(self):
+        """Descartar la sesión caída y levantar otra con la misma configuración"""
+        self.reinicios += 1
+        print(f"[♻️] Reiniciando navegador (reinicio #{self.reinicios})...")
+        return await self._relanzar()
+
+    async def reciclar_navegador(self):
+        """Reemplazar una sesión sana que superó los límites de memoria/páginas"""
+        self.reciclajes += 1
+        print(f"[♻️] Reciclando navegador (reciclaje #{self.reciclajes})...")
+        return await self._relanzar()
 
     async def close(self):
-        """Cerrar navegador"""
+        """Cerrar navegador (y matar lo que quit() deje vivo)"""
         if self.driver:
+            # Árbol chromedriver -> chrome antes de cerrar, para no dejar huérfanos
+            pid = self._pid_servicio()
+            procesos = arbol(pid) if pid and PROC_DISPONIBLE else []
             try:
                 self.driver.quit()
                 print("[✅] Navegador cerrado")
             except Exception as e:
-                print(f"[⚠️] Error cerrando navegador: {e}")
\ No newline at end of file
+                print(f"[⚠️] Error cerrando navegador: {e}")
+            restantes = [p for p in procesos if proceso_vivo(p)]
+            if restantes and matar_procesos(restantes):
+                print(f"[🧟] {len(restantes)} procesos del navegador seguían vivos tras quit()")
+        sesiones_navegador.eliminar(self.sesion_id)
+        self.sesion_id = None
+        # Con Chrome ya cerrado: publicar su caché y borrar el perfil
+        await self._cerrar_perfil()
+
+    async def _cerrar_perfil(self):
+        perfil, self.perfil_sesion = self.perfil_sesion, None
+        if perfil is not None:
+            await asyncio.to_thread(gestor_perfiles.cerrar_sesion, perfil)
\ No newline at end of file
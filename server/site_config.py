@@ -0,0 +1,310 @@
+"""
+Perfiles de sitio para la automatización de afiliaciones.
+
+Cada tipo de afiliación (express, junior, ...) tiene un perfil con su URL,
+localizadores del formulario, esperas y patrones de extracción del código.
+Los perfiles se leen, validan y precompilan UNA sola vez al importar el módulo:
+
+1. Valores por defecto (_PERFIL_BASE + _PERFILES_POR_DEFECTO)
+2. Archivo JSON opcional indicado en SITE_PROFILES_FILE
+3. Variables de entorno: URL_<TIPO> (ej. URL_EXPRESS), SELENIUM_TIMEOUT,
+   WINDOW_SIZE, BROWSER_TEST_URL
+
+Formato del archivo JSON:
+    {
+      "navegador": {"timeout": 30, "window_size": "1920x1080"},
+      "perfiles": {
+        "express": {"url": "https://..."},
+        "playa": {"hereda": "express", "url": "https://.../cunpl"}
+      }
+    }
+"""
+import copy
+import json
+import os
+import re
+from dataclasses import dataclass
+from typing import Dict, Pattern, Tuple
+
+# Estrategias de localización aceptadas (valores equivalentes a selenium By.*)
+ESTRATEGIAS_LOCALIZADOR = {
+    "id": "id",
+    "name": "name",
+    "css": "css selector",
+    "css selector": "css selector",
+    "xpath": "xpath",
+    "class name": "class name",
+    "tag name": "tag name",
+}
+
+CAMPOS_REQUERIDOS = ("formulario", "nombre", "apellido", "email", "pais", "boton_envio")
+
+# === VALORES POR DEFECTO ===
+_NAVEGADOR_POR_DEFECTO = {
+    "timeout": 30,
+    "window_size": "1920x1080",
+    "url_prueba_conexion": "https://httpbin.org/ip",
+}
+
+_PERFIL_BASE = {
+    "localizadores": {
+        "formulario": [["id", "partial_enroll_form"]],
+        "nombre": [
+            ["id", "first_name"],
+            ["name", "first_name"],
+            ["css", "input[name*='first']"],
+        ],
+        "apellido": [
+            ["id", "last_name"],
+            ["name", "last_name"],
+            ["css", "input[name*='last']"],
+        ],
+        "email": [
+            ["id", "email_address"],
+            ["name", "email_address"],
+            ["css", "input[type='email']"],
+        ],
+        "pais": [
+            ["id", "country"],
+            ["name", "country"],
+            ["css", "select[name*='country']"],
+            ["xpath", "//select[contains(@id, 'country')]"],
+        ],
+        "boton_envio": [
+            ["id", "ctl00_PartialEnrollFormPlaceholder_partial_enroll_EnrollButton"],
+            ["css", "a.css_button"],
+            ["xpath", "//a[contains(@class, 'button')]"],
+            ["xpath", "//input[@type='submit']"],
+        ],
+    },
+    "checkboxes": ["ctlAgree", "chk_mi"],
+    "pais": "MX",
+    "opciones_pais": ["mexico", "méxico", "mx"],
+    "esperas": {
+        "carga_inicial": 3,
+        "despues_formulario": 1,
+        "antes_envio": 2,
+        "respuesta_envio": 3,
+        "intentos_confirmacion": 20,
+    },
+    "palabras_confirmacion_url": ["confirmation", "success"],
+    "palabras_confirmacion": ["confirmation", "member", "congratulations", "bienvenido"],
+    "selectores_codigo": [
+        "//strong[contains(text(), 'MB')]",
+        "//strong[contains(text(), 'member')]//text()[string-length(.) >= 8]",
+        "//strong[string-length(text()) >= 8 and string-length(text()) <= 15]",
+        "//*[contains(text(), 'Member')]/following-sibling::*//strong",
+        "//div[contains(@class, 'confirmation')]//strong",
+        "//div[contains(@class, 'success')]//strong",
+        "//span[string-length(text()) >= 8 and string-length(text()) <= 15]",
+        "//*[contains(text(), 'number')]/following-sibling::*",
+        "//*[contains(text(), 'código')]/following-sibling::*",
+        "//h1//text()[string-length(.) >= 8]",
+        "//h2//text()[string-length(.) >= 8]",
+        "//p//strong[string-length(text()) >= 8]",
+    ],
+    "patrones_codigo": [
+        r"MB\d{8,12}",           # Códigos MB + dígitos
+        r"\b\d{10,12}\b",        # 10-12 dígitos exactos
+        r"\b\d{9}\b",            # 9 dígitos exactos
+        r"[A-Z]{2}\d{8,10}",     # 2 letras + 8-10 números
+        r"\b\d{8}\b",            # 8 dígitos exactos
+    ],
+    "patron_descartar": r"^(19|20)\d{2}",  # Filtrar fechas
+}
+
+_PERFILES_POR_DEFECTO = {
+    "express": {"url": "https://www.joinmarriottbonvoy.com/calaqr/s/ES/ch/cunxc"},
+    "junior": {"url": "https://www.joinmarriottbonvoy.com/calaqr/s/ES/ch/cunjc"},
+}
+
+
+# === ESTRUCTURAS PRECOMPILADAS ===
+@dataclass(frozen=True)
+class Esperas:
+    timeout: float
+    carga_inicial: float
+    despues_formulario: float
+    antes_envio: float
+    respuesta_envio: float
+    intentos_confirmacion: int
+
+
+@dataclass(frozen=True)
+class PerfilSitio:
+    tipo: str
+    url: str
+    localizadores: Dict[str, Tuple[Tuple[str, str], ...]]
+    checkboxes: Tuple[str, ...]
+    pais: str
+    opciones_pais: Tuple[str, ...]
+    esperas: Esperas
+    palabras_confirmacion_url: Tuple[str, ...]
+    palabras_confirmacion: Tuple[str, ...]
+    selectores_codigo: Tuple[str, ...]
+    patrones_codigo: Tuple[Pattern, ...]
+    patron_descartar: Pattern
+
+
+@dataclass(frozen=True)
+class ConfigNavegador:
+    timeout: float
+    window_size: str  # Formato Chrome: "ancho,alto"
+    url_prueba_conexion: str
+
+
+# === CARGA Y VALIDACIÓN ===
+def _fusionar(base: dict, extra: dict) -> dict:
+    """Fusión recursiva de diccionarios (extra tiene prioridad)"""
+    resultado = copy.deepcopy(base)
+    for clave, valor in extra.items():
+        if isinstance(valor, dict) and isinstance(resultado.get(clave), dict):
+            resultado[clave] = _fusionar(resultado[clave], valor)
+        else:
+            resultado[clave] = copy.deepcopy(valor)
+    return resultado
+
+
+def _numero_positivo(valor, nombre, entero=False):
+    try:
+        numero = int(valor) if entero else float(valor)
+    except (TypeError, ValueError):
+        raise ValueError(f"{nombre} debe ser numérico, se recibió {valor!r}")
+    if numero < 0 or (entero and numero == 0):
+        raise ValueError(f"{nombre} debe ser positivo, se recibió {valor!r}")
+    return numero
+
+
+def _parsear_window_size(valor: str) -> str:
+    match = re.fullmatch(r"\s*(\d+)\s*[x,]\s*(\d+)\s*", str(valor))
+    if not match:
+        raise ValueError(f"WINDOW_SIZE inválido: {valor!r} (usar formato 1920x1080)")
+    return f"{match.group(1)},{match.group(2)}"
+
+
+def _compilar_localizadores(tipo: str, crudos: dict) -> Dict[str, Tuple[Tuple[str, str], ...]]:
+    faltantes = [campo for campo in CAMPOS_REQUERIDOS if not crudos.get(campo)]
+    if faltantes:
+        raise ValueError(f"Perfil '{tipo}': faltan localizadores para {', '.join(faltantes)}")
+
+    compilados = {}
+    for campo, lista in crudos.items():
+        tuplas = []
+        for localizador in lista:
+            if len(localizador) != 2:
+                raise ValueError(f"Perfil '{tipo}': localizador inválido en '{campo}': {localizador!r}")
+            estrategia, valor = localizador
+            if estrategia not in ESTRATEGIAS_LOCALIZADOR:
+                raise ValueError(f"Perfil '{tipo}': estrategia '{estrategia}' no soportada en '{campo}'")
+            tuplas.append((ESTRATEGIAS_LOCALIZADOR[estrategia], str(valor)))
+        compilados[campo] = tuple(tuplas)
+    return compilados
+
+
+def _compilar_regex(tipo: str, patron: str) -> Pattern:
+    try:
+        return re.compile(patron)
+    except re.error as e:
+        raise ValueError(f"Perfil '{tipo}': patrón inválido {patron!r}: {e}")
+
+
+def _construir_perfil(tipo: str, crudo: dict, timeout: float) -> PerfilSitio:
+    url = str(crudo.get("url", "")).strip()
+    if not re.match(r"^https?://", url):
+        raise ValueError(f"Perfil '{tipo}': URL inválida {url!r}")
+
+    esperas = crudo["esperas"]
+    return PerfilSitio(
+        tipo=tipo,
+        url=url,
+        localizadores=_compilar_localizadores(tipo, crudo["localizadores"]),
+        checkboxes=tuple(crudo["checkboxes"]),
+        pais=str(crudo["pais"]),
+        opciones_pais=tuple(opcion.lower() for opcion in crudo["opciones_pais"]),
+        esperas=Esperas(
+            timeout=_numero_positivo(esperas.get("timeout", timeout), f"{tipo}.esperas.timeout"),
+            carga_inicial=_numero_positivo(esperas["carga_inicial"], f"{tipo}.esperas.carga_inicial"),
+            despues_formulario=_numero_positivo(esperas["despues_formulario"], f"{tipo}.esperas.despues_formulario"),
+            antes_envio=_numero_positivo(esperas["antes_envio"], f"{tipo}.esperas.antes_envio"),
+            respuesta_envio=_numero_positivo(esperas["respuesta_envio"], f"{tipo}.esperas.respuesta_envio"),
+            intentos_confirmacion=_numero_positivo(
+                esperas["intentos_confirmacion"], f"{tipo}.esperas.intentos_confirmacion", entero=True
+            ),
+        ),
+        palabras_confirmacion_url=tuple(p.lower() for p in crudo["palabras_confirmacion_url"]),
+        palabras_confirmacion=tuple(p.lower() for p in crudo["palabras_confirmacion"]),
+        selectores_codigo=tuple(crudo["selectores_codigo"]),
+        patrones_codigo=tuple(_compilar_regex(tipo, p) for p in crudo["patrones_codigo"]),
+        patron_descartar=_compilar_regex(tipo, crudo["patron_descartar"]),
+    )
+
+
+def _leer_archivo_perfiles(ruta: str) -> dict:
+    if not ruta:
+        return {}
+    try:
+        with open(ruta, encoding="utf-8") as f:
+            datos = json.load(f)
+    except (OSError, json.JSONDecodeError) as e:
+        raise ValueError(f"No se pudo leer SITE_PROFILES_FILE ({ruta}): {e}")
+    if not isinstance(datos, dict):
+        raise ValueError(f"SITE_PROFILES_FILE ({ruta}) debe contener un objeto JSON")
+    return datos
+
+
+def cargar_configuracion(entorno=None):
+    """Construir (ConfigNavegador, {tipo: PerfilSitio}) a partir de defaults, archivo y entorno"""
+    entorno = os.environ if entorno is None else entorno
+    archivo = _leer_archivo_perfiles(entorno.get("SITE_PROFILES_FILE", ""))
+
+    navegador_crudo = _fusionar(_NAVEGADOR_POR_DEFECTO, archivo.get("navegador", {}))
+    if entorno.get("SELENIUM_TIMEOUT"):
+        navegador_crudo["timeout"] = entorno["SELENIUM_TIMEOUT"]
+    if entorno.get("WINDOW_SIZE"):
+        navegador_crudo["window_size"] = entorno["WINDOW_SIZE"]
+    if entorno.get("BROWSER_TEST_URL"):
+        navegador_crudo["url_prueba_conexion"] = entorno["BROWSER_TEST_URL"]
+
+    navegador = ConfigNavegador(
+        timeout=_numero_positivo(navegador_crudo["timeout"], "SELENIUM_TIMEOUT"),
+        window_size=_parsear_window_size(navegador_crudo["window_size"]),
+        url_prueba_conexion=str(navegador_crudo["url_prueba_conexion"]),
+    )
+
+    perfiles_crudos = {tipo: dict(datos) for tipo, datos in _PERFILES_POR_DEFECTO.items()}
+    for tipo, datos in archivo.get("perfiles", {}).items():
+        tipo = tipo.lower()
+        perfiles_crudos[tipo] = _fusionar(perfiles_crudos.get(tipo, {}), datos)
+
+    perfiles = {}
+    for tipo, crudo in perfiles_crudos.items():
+        padre = crudo.pop("hereda", None)
+        if padre:
+            if padre not in perfiles_crudos:
+                raise ValueError(f"Perfil '{tipo}' hereda de '{padre}', que no existe")
+            heredado = {k: v for k, v in perfiles_crudos[padre].items() if k not in ("url", "hereda")}
+            crudo = _fusionar(heredado, crudo)
+
+        url_entorno = entorno.get(f"URL_{tipo.upper()}")
+        if url_entorno:
+            crudo["url"] = url_entorno
+
+        perfiles[tipo] = _construir_perfil(tipo, _fusionar(_PERFIL_BASE, crudo), navegador.timeout)
+
+    return navegador, perfiles
+
+
+# === CONFIGURACIÓN CARGADA AL IMPORTAR ===
+CONFIG_NAVEGADOR, PERFILES_SITIO = cargar_configuracion()
+TIPOS_AFILIACION = tuple(PERFILES_SITIO)
+
+
+def obtener_perfil(tipo_afiliacion: str) -> PerfilSitio:
+    """Obtener el perfil precompilado de un tipo de afiliación"""
+    try:
+        return PERFILES_SITIO[tipo_afiliacion.lower()]
+    except KeyError:
+        raise ValueError(
+            f"Tipo de afiliación '{tipo_afiliacion}' no configurado. "
+            f"Disponibles: {', '.join(TIPOS_AFILIACION)}"
+        )
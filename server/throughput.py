@@ -0,0 +1,253 @@
+"""
+Modelo de rendimiento medido para estimar tiempos (ETAs).
+
+Reemplaza la constante histórica de 30 s por registro con lo que realmente
+tardan las filas:
+
+- Por tipo de afiliación: EWMA del tiempo por huésped (de una fila terminada a
+  la siguiente, incluyendo reintentos y pausas) y una ventana de muestras
+  recientes para los cuantiles p50/p90.
+- Por sesión (tarea en curso): EWMA propia, que manda en cuanto tiene unas
+  cuantas muestras (un navegador lento o un sitio degradado se notan en su ETA).
+- Costo de arranque: cuánto tarda en configurarse el navegador.
+
+El modelo se guarda en disco (JSON) para no empezar de cero tras un reinicio.
+Varios procesos (API y workers) comparten el archivo: cada uno guarda solo las
+muestras nuevas, combinándolas con lo que ya está en disco (releído bajo un
+lock de archivo), así ninguno pisa las mediciones de los demás.
+
+Configuración por entorno:
+    THROUGHPUT_PRIOR_SECONDS   Segundos por fila sin mediciones (30)
+    THROUGHPUT_STARTUP_SECONDS Arranque del navegador sin mediciones (15)
+    THROUGHPUT_ALPHA           Peso de la muestra nueva en la EWMA (0.2)
+    THROUGHPUT_STATE_FILE      Archivo donde persistir el modelo (modelo_rendimiento.json)
+"""
+import json
+import os
+import threading
+from collections import deque
+from contextlib import contextmanager
+from typing import Dict, List, Optional
+
+try:  # Lock entre procesos (solo POSIX; en Windows se combina sin lock)
+    import fcntl
+except ImportError:  # pragma: no cover - depende del sistema
+    fcntl = None
+
+VENTANA_CUANTILES = 200
+MUESTRAS_MINIMAS_SESION = 3
+
+
+class EstadisticaLatencia:
+    """EWMA + ventana de muestras recientes de una latencia (segundos)"""
+
+    def __init__(self, alpha: float, ventana: int = VENTANA_CUANTILES):
+        self.alpha = alpha
+        self.ewma: Optional[float] = None
+        self.muestras = deque(maxlen=ventana)
+        self.total = 0
+
+    def registrar(self, segundos: float):
+        self.ewma = segundos if self.ewma is None else self.alpha * segundos + (1 - self.alpha) * self.ewma
+        self.muestras.append(segundos)
+        self.total += 1
+
+    def cuantil(self, q: float) -> Optional[float]:
+        if not self.muestras:
+            return None
+        ordenadas = sorted(self.muestras)
+        return ordenadas[min(int(q * len(ordenadas)), len(ordenadas) - 1)]
+
+    def a_dict(self) -> Dict:
+        return {"ewma": self.ewma, "muestras": list(self.muestras), "total": self.total}
+
+    @classmethod
+    def desde_dict(cls, datos: Dict, alpha: float):
+        estadistica = cls(alpha)
+        estadistica.ewma = datos.get("ewma")
+        estadistica.muestras.extend(datos.get("muestras", []))
+        estadistica.total = datos.get("total", len(estadistica.muestras))
+        return estadistica
+
+
+class ModeloRendimiento:
+    """Latencias medidas por tipo de afiliación y por sesión"""
+
+    def __init__(self, prior_fila_s: float = 30.0, prior_arranque_s: float = 15.0,
+                 alpha: float = 0.2, ruta: Optional[str] = None):
+        self.prior_fila_s = prior_fila_s
+        self.prior_arranque_s = prior_arranque_s
+        self.alpha = alpha
+        self.ruta = ruta
+        self._filas: Dict[str, EstadisticaLatencia] = {}
+        self._arranques: Dict[str, EstadisticaLatencia] = {}
+        self._sesiones: Dict[str, EstadisticaLatencia] = {}
+        # Muestras registradas aquí que todavía no están en el archivo
+        self._nuevas_filas: Dict[str, List[float]] = {}
+        self._nuevos_arranques: Dict[str, List[float]] = {}
+        self._lock = threading.Lock()
+        self._mtime_cargado: Optional[float] = None
+
+    @classmethod
+    def desde_entorno(cls):
+        modelo = cls(
+            prior_fila_s=float(os.getenv("THROUGHPUT_PRIOR_SECONDS", "30")),
+            prior_arranque_s=float(os.getenv("THROUGHPUT_STARTUP_SECONDS", "15")),
+            alpha=float(os.getenv("THROUGHPUT_ALPHA", "0.2")),
+            ruta=os.getenv("THROUGHPUT_STATE_FILE", "modelo_rendimiento.json"),
+        )
+        modelo.cargar()
+        return modelo
+
+    # === MEDICIONES ===
+    def registrar_fila(self, tipo: str, segundos: float, sesion: Optional[str] = None):
+        with self._lock:
+            self._filas.setdefault(tipo, EstadisticaLatencia(self.alpha)).registrar(segundos)
+            self._nuevas_filas.setdefault(tipo, []).append(segundos)
+            if sesion:
+                self._sesiones.setdefault(sesion, EstadisticaLatencia(self.alpha, ventana=50)).registrar(segundos)
+
+    def registrar_arranque(self, tipo: str, segundos: float):
+        with self._lock:
+            self._arranques.setdefault(tipo, EstadisticaLatencia(self.alpha)).registrar(segundos)
+            self._nuevos_arranques.setdefault(tipo, []).append(segundos)
+
+    def olvidar_sesion(self, sesion: str):
+        with self._lock:
+            self._sesiones.pop(sesion, None)
+
+    # === ESTIMACIONES ===
+    def segundos_por_fila(self, tipo: str, sesion: Optional[str] = None, cuantil: Optional[float] = None) -> float:
+        """Tiempo esperado por huésped (EWMA, o el cuantil pedido)"""
+        with self._lock:
+            propia = self._sesiones.get(sesion) if sesion else None
+            if propia and propia.total >= MUESTRAS_MINIMAS_SESION:
+                estadistica = propia
+            else:
+                estadistica = self._filas.get(tipo)
+            if estadistica is None or estadistica.ewma is None:
+                return self.prior_fila_s
+            if cuantil is not None:
+                return estadistica.cuantil(cuantil)
+            return estadistica.ewma
+
+    def segundos_arranque(self, tipo: str) -> float:
+        with self._lock:
+            estadistica = self._arranques.get(tipo)
+            return estadistica.ewma if estadistica and estadistica.ewma is not None else self.prior_arranque_s
+
+    def estimar(self, tipo: str, filas: int, sesion: Optional[str] = None,
+                incluir_arranque: bool = False, cuantil: Optional[float] = None) -> float:
+        """Segundos para procesar `filas` huéspedes (más el arranque si se pide)"""
+        if filas <= 0:
+            return 0.0
+        segundos = filas * self.segundos_por_fila(tipo, sesion, cuantil)
+        if incluir_arranque:
+            segundos += self.segundos_arranque(tipo)
+        return segundos
+
+    def resumen(self) -> Dict:
+        with self._lock:
+            tipos = set(self._filas) | set(self._arranques)
+        resumen = {}
+        for tipo in sorted(tipos):
+            estadistica = self._filas.get(tipo)
+            resumen[tipo] = {
+                "seconds_per_guest": round(self.segundos_por_fila(tipo), 2),
+                "p50_seconds": round(self.segundos_por_fila(tipo, cuantil=0.5), 2),
+                "p90_seconds": round(self.segundos_por_fila(tipo, cuantil=0.9), 2),
+                "startup_seconds": round(self.segundos_arranque(tipo), 2),
+                "samples": estadistica.total if estadistica else 0,
+            }
+        return {"prior_seconds_per_guest": self.prior_fila_s, "types": resumen, "active_sessions": len(self._sesiones)}
+
+    # === PERSISTENCIA ===
+    @contextmanager
+    def _bloqueo_archivo(self):
+        if fcntl is None:
+            yield
+            return
+        with open(f"{self.ruta}.lock", "a") as lock:
+            fcntl.flock(lock, fcntl.LOCK_EX)
+            try:
+                yield
+            finally:
+                fcntl.flock(lock, fcntl.LOCK_UN)
+
+    def _leer_archivo(self) -> Optional[Dict]:
+        if not os.path.exists(self.ruta):
+            return None
+        try:
+            with open(self.ruta, encoding="utf-8") as f:
+                return json.load(f)
+        except (OSError, ValueError) as e:
+            print(f"[⚠️] Modelo de rendimiento ilegible, se empieza de cero: {e}")
+            return None
+
+    def _combinar(self, datos: Dict):
+        """Estado del archivo más las muestras propias aún no guardadas (con el lock tomado)"""
+        filas = {t: EstadisticaLatencia.desde_dict(d, self.alpha) for t, d in datos.get("filas", {}).items()}
+        arranques = {t: EstadisticaLatencia.desde_dict(d, self.alpha) for t, d in datos.get("arranques", {}).items()}
+        for destino, nuevas in ((filas, self._nuevas_filas), (arranques, self._nuevos_arranques)):
+            for tipo, muestras in nuevas.items():
+                estadistica = destino.setdefault(tipo, EstadisticaLatencia(self.alpha))
+                for segundos in muestras:
+                    estadistica.registrar(segundos)
+        self._filas, self._arranques = filas, arranques
+
+    def guardar(self):
+        """Releer el archivo, sumarle las muestras nuevas de este proceso y escribirlo"""
+        if not self.ruta:
+            return
+        try:
+            with self._bloqueo_archivo():
+                datos = self._leer_archivo()
+                with self._lock:
+                    if datos is not None:
+                        self._combinar(datos)
+                    datos = {
+                        "filas": {tipo: e.a_dict() for tipo, e in self._filas.items()},
+                        "arranques": {tipo: e.a_dict() for tipo, e in self._arranques.items()},
+                    }
+                    nuevas = (self._nuevas_filas, self._nuevos_arranques)
+                    self._nuevas_filas, self._nuevos_arranques = {}, {}
+                temporal = f"{self.ruta}.{os.getpid()}.tmp"
+                try:
+                    with open(temporal, "w", encoding="utf-8") as f:
+                        json.dump(datos, f)
+                    os.replace(temporal, self.ruta)
+                    self._mtime_cargado = os.path.getmtime(self.ruta)
+                except OSError:
+                    # Conservar las muestras para el próximo intento
+                    with self._lock:
+                        for pendientes, anteriores in zip((self._nuevas_filas, self._nuevos_arranques), nuevas):
+                            for tipo, muestras in anteriores.items():
+                                pendientes[tipo] = muestras + pendientes.get(tipo, [])
+                    raise
+        except OSError as e:
+            print(f"[⚠️] No se pudo guardar el modelo de rendimiento: {e}")
+
+    def cargar(self):
+        if not self.ruta or not os.path.exists(self.ruta):
+            return
+        try:
+            self._mtime_cargado = os.path.getmtime(self.ruta)
+        except OSError:
+            return
+        datos = self._leer_archivo()
+        if datos is None:
+            return
+        with self._lock:
+            self._combinar(datos)
+
+    def recargar_si_cambio(self):
+        """Releer el archivo si otro proceso (un worker) lo actualizó"""
+        try:
+            mtime = os.path.getmtime(self.ruta) if self.ruta else None
+        except OSError:
+            return
+        if mtime is not None and mtime != self._mtime_cargado:
+            self.cargar()
+
+
+modelo_rendimiento = ModeloRendimiento.desde_entorno()
@@ -0,0 +1,159 @@
+"""
+Caché de archivos subidos por contenido (hash SHA-256).
+
+- guardar_con_hash: copia el UploadFile a disco por bloques calculando el hash
+  al mismo tiempo (sin leer el archivo entero en memoria).
+- CacheLecturas: registros ya extraídos de un libro, por (hash, nombre, modo
+  de hojas), con expulsión LRU. Re-subir el mismo archivo no vuelve a
+  parsearlo.
+- RegistroEnvios: envíos idempotentes. El mismo conjunto de archivos con los
+  mismos parámetros, en curso o reciente, devuelve el task_id existente en vez
+  de crear otra tarea que procese a los mismos huéspedes.
+
+Configuración por entorno:
+    UPLOAD_CACHE_SIZE           Libros parseados en caché (32)
+    UPLOAD_CACHE_MAX_RECORDS    Registros totales máximos en caché (200000)
+    UPLOAD_DEDUP_SECONDS        Ventana de idempotencia de envíos (900)
+"""
+import asyncio
+import copy
+import hashlib
+import os
+import threading
+import time
+from collections import OrderedDict
+from typing import Dict, List, Optional, Tuple
+
+TAMANO_BLOQUE = 1024 * 1024
+
+ClaveLectura = Tuple[str, str, bool]
+
+
+async def guardar_con_hash(archivo, destino) -> str:
+    """Copiar un UploadFile a `destino` (archivo abierto en binario) y devolver su SHA-256"""
+    huella = hashlib.sha256()
+    while True:
+        bloque = await archivo.read(TAMANO_BLOQUE)
+        if not bloque:
+            break
+        huella.update(bloque)
+        destino.write(bloque)
+    return huella.hexdigest()
+
+
+class CacheLecturas:
+    """LRU de registros parseados por contenido de archivo (seguro entre hilos)"""
+
+    def __init__(self, capacidad: int = 32, max_registros: int = 200000):
+        self.capacidad = capacidad
+        self.max_registros = max_registros
+        self._datos: "OrderedDict[ClaveLectura, List[Dict]]" = OrderedDict()
+        self._registros = 0
+        self._lock = threading.Lock()
+        self.aciertos = 0
+        self.fallos = 0
+
+    @classmethod
+    def desde_entorno(cls):
+        return cls(
+            capacidad=int(os.getenv("UPLOAD_CACHE_SIZE", "32")),
+            max_registros=int(os.getenv("UPLOAD_CACHE_MAX_RECORDS", "200000")),
+        )
+
+    def buscar(self, clave: ClaveLectura) -> Optional[List[Dict]]:
+        with self._lock:
+            registros = self._datos.get(clave)
+            if registros is None:
+                self.fallos += 1
+                return None
+            self._datos.move_to_end(clave)
+            self.aciertos += 1
+        # Copia: normalización y tareas no deben modificar lo cacheado
+        return copy.deepcopy(registros)
+
+    def __contains__(self, clave: ClaveLectura) -> bool:
+        # Sin contar acierto/fallo ni copiar (solo para decidir cómo leer)
+        with self._lock:
+            return clave in self._datos
+
+    def guardar(self, clave: ClaveLectura, registros: List[Dict]):
+        if len(registros) > self.max_registros:
+            return
+        with self._lock:
+            anterior = self._datos.pop(clave, None)
+            if anterior is not None:
+                self._registros -= len(anterior)
+            self._datos[clave] = copy.deepcopy(registros)
+            self._registros += len(registros)
+            while len(self._datos) > self.capacidad or self._registros > self.max_registros:
+                _, expulsados = self._datos.popitem(last=False)
+                self._registros -= len(expulsados)
+
+    def resumen(self) -> Dict:
+        return {
+            "workbooks": len(self._datos),
+            "records": self._registros,
+            "hits": self.aciertos,
+            "misses": self.fallos,
+        }
+
+
+class RegistroEnvios:
+    """Huella del envío -> task_id, para devolver la misma tarea ante re-envíos"""
+
+    def __init__(self, ventana_s: float = 900.0):
+        self.ventana_s = ventana_s
+        self._envios: Dict[str, Tuple[str, float]] = {}
+        # Envíos idénticos que todavía se están leyendo (misma petición repetida)
+        self._en_curso: Dict[str, asyncio.Future] = {}
+        self.reutilizados = 0
+
+    @classmethod
+    def desde_entorno(cls):
+        return cls(ventana_s=float(os.getenv("UPLOAD_DEDUP_SECONDS", "900")))
+
+    @staticmethod
+    def huella(hashes: List[str], *parametros) -> str:
+        contenido = "|".join(sorted(hashes)) + "||" + "|".join(str(p).strip().lower() for p in parametros)
+        return hashlib.sha256(contenido.encode("utf-8")).hexdigest()
+
+    def buscar(self, huella: str) -> Optional[str]:
+        entrada = self._envios.get(huella)
+        if entrada is None:
+            return None
+        task_id, registrado = entrada
+        if time.monotonic() - registrado > self.ventana_s:
+            self._envios.pop(huella, None)
+            return None
+        return task_id
+
+    async def esperar_en_curso(self, huella: str) -> Optional[str]:
+        """Si un envío idéntico se está leyendo, esperar su task_id"""
+        futuro = self._en_curso.get(huella)
+        if futuro is None:
+            return None
+        return await asyncio.shield(futuro)
+
+    def reservar(self, huella: str):
+        self._en_curso[huella] = asyncio.get_running_loop().create_future()
+
+    def liberar(self, huella: str, task_id: Optional[str]):
+        """Terminar la reserva (task_id=None si el envío falló)"""
+        futuro = self._en_curso.pop(huella, None)
+        if futuro is not None and not futuro.done():
+            futuro.set_result(task_id)
+        ahora = time.monotonic()
+        for vencida in [h for h, (_, registrado) in self._envios.items() if ahora - registrado > self.ventana_s]:
+            del self._envios[vencida]
+        if task_id:
+            self._envios[huella] = (task_id, ahora)
+
+    def olvidar(self, huella: str):
+        self._envios.pop(huella, None)
+
+    def resumen(self) -> Dict:
+        return {"recent_submissions": len(self._envios), "in_flight": len(self._en_curso), "reused": self.reutilizados}
+
+
+cache_lecturas = CacheLecturas.desde_entorno()
+registro_envios = RegistroEnvios.desde_entorno()
@@ -0,0 +1,190 @@
+"""
+Worker de afiliaciones para el modo cola (EXECUTION_MODE=cola).
+
+Toma bloques de filas de la cola SQLite compartida (job_queue.py), los procesa
+con su propio navegador y publica cada fila terminada y sus logs en la cola;
+la API los lleva a /status y arma el Excel de resultados al completarse la
+tarea. Se pueden lanzar tantos workers como navegadores soporte la máquina (o
+en varias máquinas que compartan el archivo de la cola).
+
+Uso:
+    EXECUTION_MODE=cola JOB_QUEUE_DB=/datos/cola.sqlite3 python worker.py --id worker-1
+
+Configuración por entorno (además de la de job_queue.py):
+    WORKER_POLL_SECONDS       Espera cuando no hay trabajos pendientes (3)
+    WORKER_HEARTBEAT_SECONDS  Intervalo máximo del heartbeat; también es lo que
+                              tarda en notarse una cancelación (5)
+"""
+import argparse
+import asyncio
+import os
+import socket
+import time
+from typing import Dict, List, Optional, Tuple
+
+import main
+from control_tareas import TareaCancelada, controles_tareas, obtener_control
+from motores import crear_motor
+from job_queue import ColaTrabajos
+from registros import Registro
+from throughput import modelo_rendimiento
+
+INTERVALO_CONSULTA = float(os.getenv("WORKER_POLL_SECONDS", "3"))
+INTERVALO_LATIDO = float(os.getenv("WORKER_HEARTBEAT_SECONDS", "5"))
+
+
+class Worker:
+    """Bucle arrendar -> procesar -> completar, con heartbeat del lease"""
+
+    def __init__(self, cola: ColaTrabajos, worker_id: str):
+        self.cola = cola
+        self.worker_id = worker_id
+        # Un navegador por (tipo, afiliador, motor): se reutiliza entre bloques
+        self.processor = None
+        self.clave_processor: Optional[Tuple[str, str, Optional[str]]] = None
+        self.trabajos_completados = 0
+        main.oyentes_log.append(self._reenviar_log)
+
+    def _reenviar_log(self, task_id: str, mensaje: str):
+        try:
+            self.cola.registrar_evento(task_id, f"[{self.worker_id}] {mensaje}")
+        except Exception as e:
+            print(f"[⚠️] No se pudo publicar el log en la cola: {e}")
+
+    async def _obtener_processor(self, task_id: str, tipo_afiliacion: str, nombre_afiliador: str,
+                                 motor: Optional[str] = None):
+        clave = (tipo_afiliacion, nombre_afiliador, motor)
+        if self.processor is not None and self.clave_processor == clave:
+            self.processor.task_id = task_id
+            return self.processor
+
+        await self._cerrar_processor()
+        processor = crear_motor(motor, tipo_afiliacion, nombre_afiliador, task_id=task_id)
+        main.agregar_log_tarea(task_id, f"Configurando navegador (motor {processor.motor})...")
+        inicio = time.monotonic()
+        if not await processor.preparar():
+            await processor.close()
+            raise Exception(f"Error configurando el motor {processor.motor}")
+        modelo_rendimiento.registrar_arranque(tipo_afiliacion, time.monotonic() - inicio)
+        self.processor, self.clave_processor = processor, clave
+        return processor
+
+    async def _cerrar_processor(self):
+        if self.processor is not None:
+            try:
+                await self.processor.close()
+            except Exception:
+                pass
+        self.processor, self.clave_processor = None, None
+
+    async def _heartbeat(self, trabajo: Dict):
+        """
+        Renovar el lease. Si ya no se puede (tarea cancelada o bloque
+        reasignado) se corta el bloque en el siguiente punto de control, sin
+        interrumpir un formulario ya enviado.
+        """
+        while True:
+            await asyncio.sleep(min(INTERVALO_LATIDO, self.cola.lease_s / 3))
+            actual = main.tasks_storage.get(trabajo["task_id"], {}).get("current_processing")
+            try:
+                vigente = await asyncio.to_thread(self.cola.renovar, trabajo["id"], self.worker_id, actual)
+            except Exception as e:
+                print(f"[⚠️] Heartbeat fallido ({e}); se reintenta")
+                continue
+            if not vigente:
+                print(f"[⛔] Lease perdido del bloque {trabajo['bloque']} de {trabajo['task_id']}")
+                obtener_control(trabajo["task_id"]).cancelar("Bloque cancelado o reasignado")
+                return
+
+    async def procesar_trabajo(self, trabajo: Dict):
+        task_id = trabajo["task_id"]
+        # Estado local mínimo para reutilizar ejecutar_afiliaciones tal cual
+        main.tasks_storage[task_id] = {
+            "task_id": task_id,
+            "status": "processing",
+            "logs": [],
+            "resultados": [],
+            "current_processing": "Preparando...",
+        }
+
+        pendientes: List[Registro] = []
+        for indice, registro in enumerate(trabajo["registros"]):
+            if indice not in trabajo["hechos"]:
+                pendientes.append(Registro.desde_dict(registro, indice_lote=indice))
+
+        main.agregar_log_tarea(
+            task_id,
+            f"Bloque {trabajo['bloque']} (intento {trabajo['intentos']}): "
+            f"{len(pendientes)} filas pendientes de {len(trabajo['registros'])}"
+        )
+
+        async def publicar_fila(registro: Dict, fila_resultado: List, segundos: float):
+            # SQLite puede esperar el lock de la cola: fuera del event loop (y del heartbeat)
+            await asyncio.to_thread(
+                self.cola.registrar_resultado, trabajo, registro["indice_lote"], fila_resultado, segundos
+            )
+
+        async def ejecutar():
+            processor = await self._obtener_processor(
+                task_id, trabajo["tipo_afiliacion"], trabajo["nombre_afiliador"], trabajo.get("motor")
+            )
+            return await main.ejecutar_afiliaciones(
+                task_id, processor, pendientes, trabajo["nombre_afiliador"], publicar_fila
+            )
+
+        latido = asyncio.create_task(self._heartbeat(trabajo))
+        try:
+            exitosos, errores = await ejecutar()
+            await asyncio.to_thread(self.cola.completar, trabajo["id"], self.worker_id)
+            self.trabajos_completados += 1
+            print(f"[✅] Bloque {trabajo['bloque']} de {task_id}: {exitosos} exitosos, {errores} errores")
+        except TareaCancelada:
+            # Tarea cancelada (se confirma) o bloque reasignado a otro worker (no se toca).
+            # El navegador sigue sano y queda disponible para el próximo bloque
+            if await asyncio.to_thread(self.cola.confirmar_cancelacion, trabajo["id"], self.worker_id):
+                print(f"[🛑] Bloque {trabajo['bloque']} de {task_id} cancelado")
+        except Exception as e:
+            # El navegador pudo quedar inservible: se cierra y el bloque vuelve a la cola
+            await self._cerrar_processor()
+            estado = await asyncio.to_thread(self.cola.fallar, trabajo["id"], self.worker_id, str(e))
+            main.agregar_log_tarea(task_id, f"🚨 Bloque {trabajo['bloque']} falló ({estado}): {e}")
+        finally:
+            latido.cancel()
+            main.tasks_storage.pop(task_id, None)
+            controles_tareas.pop(task_id, None)
+            # Mediciones para las ETAs de la API (mismo archivo del modelo)
+            modelo_rendimiento.olvidar_sesion(task_id)
+            await asyncio.to_thread(modelo_rendimiento.guardar)
+
+    async def ejecutar(self, una_vez: bool = False):
+        print(f"Worker {self.worker_id} usando la cola {self.cola.ruta}")
+        try:
+            while True:
+                trabajo = await asyncio.to_thread(self.cola.arrendar, self.worker_id)
+                if trabajo is None:
+                    if una_vez:
+                        break
+                    await asyncio.sleep(INTERVALO_CONSULTA)
+                    continue
+                await self.procesar_trabajo(trabajo)
+        finally:
+            await self._cerrar_processor()
+            main.oyentes_log.remove(self._reenviar_log)
+        print(f"Worker {self.worker_id} detenido ({self.trabajos_completados} bloques completados)")
+
+
+def main_worker():
+    parser = argparse.ArgumentParser(description="Worker de afiliaciones Marriott (modo cola)")
+    parser.add_argument("--id", default=f"{socket.gethostname()}-{os.getpid()}", help="Identificador del worker")
+    parser.add_argument("--una-vez", action="store_true", help="Terminar cuando la cola quede vacía")
+    args = parser.parse_args()
+
+    cola = main.cola_trabajos or ColaTrabajos.desde_entorno()
+    try:
+        asyncio.run(Worker(cola, args.id).ejecutar(una_vez=args.una_vez))
+    except KeyboardInterrupt:
+        pass
+
+
+if __name__ == "__main__":
+    main_worker()